@@ -0,0 +1,238 @@
+"""
+CarHub Activity Log Writer
+Buffers UserActivity rows in memory and writes them in batches from a background thread
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+
+class SQLAlchemySink:
+    """Bulk-insert activity rows into the UserActivity table"""
+
+    def __init__(self, app, db, UserActivity):
+        self.app = app
+        self.db = db
+        self.UserActivity = UserActivity
+
+    def write_batch(self, rows):
+        with self.app.app_context():
+            try:
+                self.db.session.execute(self.db.insert(self.UserActivity), rows)
+                self.db.session.commit()
+            except Exception:
+                self.db.session.rollback()
+                raise
+            finally:
+                self.db.session.remove()
+
+
+class JSONLSink:
+    """Append activity rows to a JSON Lines file"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write_batch(self, rows):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, default=_json_default) + '\n')
+
+
+class CollectorSink:
+    """POST activity batches as JSON to a collector endpoint (e.g. a local stand-in service)"""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def write_batch(self, rows):
+        body = json.dumps({'activities': rows}, default=_json_default).encode('utf-8')
+        req = urllib.request.Request(
+            self.url,
+            data=body,
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            response.read()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ActivityLogWriter:
+    def __init__(self, sink, max_queue=10000, batch_size=200, flush_interval_ms=500):
+        """Queue activity rows and write them in batches.
+
+        Rows are flushed whenever `batch_size` rows are waiting or
+        `flush_interval_ms` has passed since the first unflushed row. When
+        the queue is full new rows are dropped (and counted) rather than
+        blocking the request thread.
+        """
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+        self._dropped = 0
+        self._written = 0
+        self._batches = 0
+        self._errors = 0
+        self._last_flush_ms = 0.0
+
+        atexit.register(self.stop)
+
+    def record(self, row):
+        """Enqueue one activity row without blocking; returns False if it was dropped"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+
+    def flush(self, timeout=10):
+        """Block until every row queued so far has been handed to the sink"""
+        if self._thread is None or not self._thread.is_alive():
+            self._drain_synchronously()
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_FLUSH_MARKER, timeout=timeout)
+        except queue.Full:
+            pass  # saturated: the worker is still draining, so wait for the queue to empty instead
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def stop(self, timeout=10):
+        """Flush outstanding rows and stop the worker thread"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._stopping.set()
+            try:
+                self._queue.put(_FLUSH_MARKER, timeout=timeout)
+            except queue.Full:
+                pass  # the worker wakes on the rows already queued
+            self._thread.join(timeout)
+        self._drain_synchronously()
+
+    def stats(self):
+        """Current queue depth and delivery counters"""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'dropped': self._dropped,
+                'written': self._written,
+                'batches': self._batches,
+                'errors': self._errors,
+                'last_flush_ms': round(self._last_flush_ms, 2),
+            }
+
+    # Worker
+
+    def _ensure_worker(self):
+        # Started lazily, and restarted after fork, so pre-fork servers
+        # and import-only scripts never carry a dead writer thread
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch, markers = [], 0
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _FLUSH_MARKER:
+                    markers += 1
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            self._write(batch, markers)
+
+    def _write(self, batch, markers=0):
+        try:
+            if batch:
+                started = time.perf_counter()
+                try:
+                    self.sink.write_batch(batch)
+                except Exception as e:
+                    with self._lock:
+                        self._errors += 1
+                        self._dropped += len(batch)
+                    print(f"Error writing activity log batch: {e}")
+                else:
+                    with self._lock:
+                        self._written += len(batch)
+                        self._batches += 1
+                        self._last_flush_ms = (time.perf_counter() - started) * 1000
+        finally:
+            for _ in range(len(batch) + markers):
+                self._queue.task_done()
+
+    def _drain_synchronously(self):
+        batch, markers = [], 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _FLUSH_MARKER:
+                markers += 1
+                continue
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._write(batch, markers)
+                batch, markers = [], 0
+        self._write(batch, markers)
+
+
+_FLUSH_MARKER = object()
+
+
+def create_activity_sink(app, db, UserActivity):
+    """Build the sink selected by ACTIVITY_LOG_SINK (database, jsonl or collector)"""
+    sink_type = app.config.get('ACTIVITY_LOG_SINK', 'database')
+    if sink_type == 'jsonl':
+        return JSONLSink(app.config['ACTIVITY_LOG_PATH'])
+    if sink_type == 'collector':
+        return CollectorSink(app.config['ACTIVITY_LOG_COLLECTOR_URL'])
+    return SQLAlchemySink(app, db, UserActivity)
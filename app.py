@@ -1,49 +1,48 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, make_response, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, BooleanField, TextAreaField, SelectField, DateField, FileField
+from wtforms import StringField, PasswordField, SubmitField, BooleanField, TextAreaField, SelectField, DateField, FileField, HiddenField
 from wtforms.validators import InputRequired, Email, Length, EqualTo, ValidationError, Optional
 from flask_wtf.file import FileField, FileAllowed
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from flask_mail import Mail, Message
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
+from sqlalchemy.orm import deferred, undefer_group
 import secrets
 import os
 import json
-import time
 from datetime import datetime, timedelta
-from io import BytesIO
 from dotenv import load_dotenv
-
-# Google OAuth imports
-try:
-    from google.oauth2 import id_token
-    from google.auth.transport import requests as google_requests
-    GOOGLE_AUTH_AVAILABLE = True
-except ImportError:
-    GOOGLE_AUTH_AVAILABLE = False
+from catalog import VehicleCatalog
+from dashboard_stats import DashboardStats
+from pagination import KeysetPage, KeysetPaginator
+from user_search import create_user_search
+from activity_log import ActivityLogWriter, create_activity_sink
+from payments import PaymentProcessor, create_payment_gateway
+from otp_store import create_otp_store
+from mail_queue import create_mail_queue
+from invoices import (PDF_AVAILABLE, InvoiceCache, export_invoices_zip, get_invoice_renderer,
+                      invoice_data, invoice_filename, invoice_number)
+from lazy import LazyModule, LazyObject, module_available
+from user_principal import create_principal_cache
+from sql_profiler import create_sql_profiler
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, create_metrics
+
+# Google OAuth, imported by the first sign-in that needs it
+GOOGLE_AUTH_AVAILABLE = module_available('google.oauth2')
+id_token = LazyModule('google.oauth2.id_token')
+google_requests = LazyModule('google.auth.transport.requests')
 
 # Load environment variables from config folder
 load_dotenv(os.path.join(os.path.dirname(__file__), 'config', '.env'))
 
-try:
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-
 app = Flask(__name__)
 
 # Configuration
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', secrets.token_hex(16))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///carhub.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///carhub.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Email configuration (using environment variables)
@@ -62,11 +61,99 @@ app.config['MAIL_SUPPRESS_SEND'] = False
 app.config['MAIL_ASCII_ATTACHMENTS'] = False
 # Ensure default sender is set properly
 app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', os.getenv('MAIL_USERNAME', 'your-email@gmail.com'))
+# Outbound mail is spooled to disk and sent by background workers over pooled SMTP connections
+app.config['MAIL_SPOOL_PATH'] = os.getenv('MAIL_SPOOL_PATH', os.path.join(app.instance_path, 'mail_spool'))
+app.config['MAIL_POOL_SIZE'] = int(os.getenv('MAIL_POOL_SIZE', 2))
+app.config['MAIL_TIMEOUT'] = int(os.getenv('MAIL_TIMEOUT', 10))
+app.config['MAIL_MAX_ATTEMPTS'] = int(os.getenv('MAIL_MAX_ATTEMPTS', 5))
+app.config['MAIL_RETRY_DELAY'] = int(os.getenv('MAIL_RETRY_DELAY', 30))
+app.config['MAIL_FAILED_RETENTION_DAYS'] = int(os.getenv('MAIL_FAILED_RETENTION_DAYS', 7))
 
 # Google OAuth configuration
 app.config['GOOGLE_CLIENT_ID'] = os.getenv('GOOGLE_CLIENT_ID')
 app.config['GOOGLE_CLIENT_SECRET'] = os.getenv('GOOGLE_CLIENT_SECRET')
 
+# Activity log configuration (rows are written in batches by a background thread)
+app.config['ACTIVITY_LOG_SINK'] = os.getenv('ACTIVITY_LOG_SINK', 'database')  # database, jsonl or collector
+app.config['ACTIVITY_LOG_PATH'] = os.getenv('ACTIVITY_LOG_PATH', os.path.join('instance', 'activity_log.jsonl'))
+app.config['ACTIVITY_LOG_COLLECTOR_URL'] = os.getenv('ACTIVITY_LOG_COLLECTOR_URL', 'http://127.0.0.1:9400/activities')
+app.config['ACTIVITY_LOG_BATCH_SIZE'] = int(os.getenv('ACTIVITY_LOG_BATCH_SIZE', 200))
+app.config['ACTIVITY_LOG_FLUSH_MS'] = int(os.getenv('ACTIVITY_LOG_FLUSH_MS', 500))
+app.config['ACTIVITY_LOG_MAX_QUEUE'] = int(os.getenv('ACTIVITY_LOG_MAX_QUEUE', 10000))
+
+# Payment gateway configuration (payments are processed by background workers)
+app.config['PAYMENT_GATEWAY'] = os.getenv('PAYMENT_GATEWAY', 'simulated')  # simulated or http_stub
+app.config['PAYMENT_GATEWAY_URL'] = os.getenv('PAYMENT_GATEWAY_URL', 'http://127.0.0.1:8765')
+app.config['PAYMENT_WORKERS'] = int(os.getenv('PAYMENT_WORKERS', 4))
+app.config['PAYMENT_SIMULATED_LATENCY'] = float(os.getenv('PAYMENT_SIMULATED_LATENCY', 1.5))
+app.config['PAYMENT_RECOVERY_AFTER'] = int(os.getenv('PAYMENT_RECOVERY_AFTER', 120))  # idle seconds before a stuck order is re-queued
+
+# Vehicle catalog change stamp, touched on every catalog commit so other workers reload
+app.config['CATALOG_STAMP_PATH'] = os.getenv('CATALOG_STAMP_PATH', os.path.join(app.instance_path, 'catalog.stamp'))
+
+# Admin dashboard statistics cache (seconds)
+app.config['DASHBOARD_STATS_TTL'] = int(os.getenv('DASHBOARD_STATS_TTL', 30))
+
+# Admin user search backend: auto (FTS5 when SQLite has it), fts5 or trigram
+app.config['USER_SEARCH_BACKEND'] = os.getenv('USER_SEARCH_BACKEND', 'auto')
+app.config['USER_SEARCH_LIMIT'] = int(os.getenv('USER_SEARCH_LIMIT', 100))
+
+# Password reset OTPs: database (shared by all workers) or memory (single process)
+app.config['OTP_STORE'] = os.getenv('OTP_STORE', 'database')
+app.config['OTP_TTL_SECONDS'] = int(os.getenv('OTP_TTL_SECONDS', 600))
+app.config['OTP_RATE_LIMIT'] = int(os.getenv('OTP_RATE_LIMIT', 3))  # codes per email per window
+app.config['OTP_RATE_WINDOW_SECONDS'] = int(os.getenv('OTP_RATE_WINDOW_SECONDS', 900))
+app.config['OTP_MAX_ATTEMPTS'] = int(os.getenv('OTP_MAX_ATTEMPTS', 5))
+
+# Chatbot response cache (non-personalized, first-turn questions only)
+app.config['CHAT_CACHE_ENABLED'] = os.getenv('CHAT_CACHE_ENABLED', 'True').lower() == 'true'
+app.config['CHAT_CACHE_SIZE'] = int(os.getenv('CHAT_CACHE_SIZE', 1000))
+app.config['CHAT_CACHE_TTL'] = int(os.getenv('CHAT_CACHE_TTL', 3600))
+app.config['CHAT_CACHE_PATH'] = os.getenv('CHAT_CACHE_PATH', '')  # SQLite file shared by workers; empty = memory only
+
+# LLM gateway: concurrent completions, deadlines and the circuit breaker that switches to canned answers
+app.config['LLM_MAX_CONCURRENCY'] = int(os.getenv('LLM_MAX_CONCURRENCY', 8))
+app.config['LLM_QUEUE_TIMEOUT'] = float(os.getenv('LLM_QUEUE_TIMEOUT', 2))  # seconds to wait for a free slot
+app.config['LLM_TIMEOUT'] = float(os.getenv('LLM_TIMEOUT', 20))  # deadline per completion, streamed ones included
+app.config['LLM_CONNECT_TIMEOUT'] = float(os.getenv('LLM_CONNECT_TIMEOUT', 5))
+app.config['LLM_BREAKER_FAILURES'] = int(os.getenv('LLM_BREAKER_FAILURES', 5))  # consecutive failures that open it
+app.config['LLM_BREAKER_RESET'] = float(os.getenv('LLM_BREAKER_RESET', 30))  # seconds before a trial call
+
+# Chatbot conversation memory, kept server-side per browser session
+app.config['CHAT_MEMORY_ENABLED'] = os.getenv('CHAT_MEMORY_ENABLED', 'True').lower() == 'true'
+app.config['CHAT_MEMORY_TURNS'] = int(os.getenv('CHAT_MEMORY_TURNS', 20))  # exchanges kept per conversation
+app.config['CHAT_MEMORY_TTL'] = int(os.getenv('CHAT_MEMORY_TTL', 1800))  # idle seconds before a conversation is forgotten
+app.config['CHAT_MEMORY_MESSAGE_TOKENS'] = int(os.getenv('CHAT_MEMORY_MESSAGE_TOKENS', 500))  # longer messages are stored cut down
+app.config['CHAT_CONTEXT_TOKENS'] = int(os.getenv('CHAT_CONTEXT_TOKENS', 1500))  # question, user context and history tokens per call
+
+# Chatbot retrieval index, built offline with build_retrieval_index.py; without a build the full knowledge base is sent
+app.config['RETRIEVAL_ENABLED'] = os.getenv('RETRIEVAL_ENABLED', 'True').lower() == 'true'
+app.config['RETRIEVAL_INDEX_PATH'] = os.getenv('RETRIEVAL_INDEX_PATH', '')  # empty = instance/retrieval_index
+app.config['RETRIEVAL_TOP_K'] = int(os.getenv('RETRIEVAL_TOP_K', 3))  # snippets sent with each question
+app.config['RETRIEVAL_MIN_SCORE'] = float(os.getenv('RETRIEVAL_MIN_SCORE', 0.1))  # cosine similarity a snippet needs
+
+# Logged-in user cache: id, username, email and admin flag per user, so requests skip the User query
+app.config['USER_CACHE_ENABLED'] = os.getenv('USER_CACHE_ENABLED', 'True').lower() == 'true'
+app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', 10000))
+app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 60))  # seconds other workers may serve a stale name
+
+# SQL profiling: per-request query counts and DB time by route, slow requests to a rotating log
+app.config['SQL_PROFILE_ENABLED'] = os.getenv('SQL_PROFILE_ENABLED', 'True').lower() == 'true'
+app.config['SQL_PROFILE_SAMPLE_RATE'] = float(os.getenv('SQL_PROFILE_SAMPLE_RATE', 1.0))  # share of requests profiled
+app.config['SQL_PROFILE_TOP_STATEMENTS'] = int(os.getenv('SQL_PROFILE_TOP_STATEMENTS', 5))  # slowest kept per request
+app.config['SQL_SLOW_REQUEST_MS'] = float(os.getenv('SQL_SLOW_REQUEST_MS', 200))  # DB time that makes a request slow
+app.config['SQL_SLOW_LOG_PATH'] = os.getenv('SQL_SLOW_LOG_PATH', '')  # empty = instance/slow_queries.log
+app.config['SQL_SLOW_LOG_MAX_BYTES'] = int(os.getenv('SQL_SLOW_LOG_MAX_BYTES', 5 * 1024 * 1024))
+app.config['SQL_SLOW_LOG_BACKUPS'] = int(os.getenv('SQL_SLOW_LOG_BACKUPS', 3))
+
+# Prometheus-style /metrics: request latency by endpoint plus payment, invoice, chatbot and mail figures
+app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')  # bearer token scrapers must send; empty = local scrapes only
+
+# Bulk invoice export (0 = one render process per CPU) and the rendered-PDF cache
+app.config['INVOICE_EXPORT_WORKERS'] = int(os.getenv('INVOICE_EXPORT_WORKERS', 0))
+app.config['INVOICE_CACHE_PATH'] = os.getenv('INVOICE_CACHE_PATH', os.path.join(app.instance_path, 'invoice_cache'))
+
 # File upload configuration
 UPLOAD_FOLDER = 'static/uploads/profiles'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
@@ -84,10 +171,15 @@ login_manager.login_view = 'login'
 login_manager.login_message = 'Please log in to access this page.'
 login_manager.login_message_category = 'info'
 serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'])
+paginator = KeysetPaginator(app.config['SECRET_KEY'])
+metrics = create_metrics(app)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # A cached principal (see user_principal.py); the User row loads only if a page needs it
+    if principal_cache is not None:
+        return principal_cache.load(int(user_id))
+    return db.session.get(User, int(user_id))
 
 # User Model
 class User(UserMixin, db.Model):
@@ -96,28 +188,31 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=True)  # Make nullable for Google users
     is_verified = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     last_login = db.Column(db.DateTime)
     
     # Google OAuth fields
     google_id = db.Column(db.String(100), unique=True, nullable=True)
-    profile_picture = db.Column(db.String(200), nullable=True)
+    # Only the profile pages and admin user views read these, so they are deferred:
+    # logins, current_user and Order.user load a narrow row, and the first access
+    # (or load_profile()) fetches the whole 'profile' group in one query
+    profile_picture = deferred(db.Column(db.String(200), nullable=True), group='profile')
     
     # Enhanced profile fields
     first_name = db.Column(db.String(50), nullable=True)
     last_name = db.Column(db.String(50), nullable=True)
-    phone = db.Column(db.String(20), nullable=True)
-    date_of_birth = db.Column(db.Date, nullable=True)
-    gender = db.Column(db.String(10), nullable=True)
-    address = db.Column(db.Text, nullable=True)
-    city = db.Column(db.String(100), nullable=True)
-    state = db.Column(db.String(100), nullable=True)
-    zip_code = db.Column(db.String(20), nullable=True)
-    country = db.Column(db.String(100), nullable=True)
-    occupation = db.Column(db.String(100), nullable=True)
-    bio = db.Column(db.Text, nullable=True)
-    preferred_contact_method = db.Column(db.String(20), default='email')
-    profile_updated_at = db.Column(db.DateTime, nullable=True)
+    phone = deferred(db.Column(db.String(20), nullable=True), group='profile')
+    date_of_birth = deferred(db.Column(db.Date, nullable=True), group='profile')
+    gender = deferred(db.Column(db.String(10), nullable=True), group='profile')
+    address = deferred(db.Column(db.Text, nullable=True), group='profile')
+    city = deferred(db.Column(db.String(100), nullable=True), group='profile')
+    state = deferred(db.Column(db.String(100), nullable=True), group='profile')
+    zip_code = deferred(db.Column(db.String(20), nullable=True), group='profile')
+    country = deferred(db.Column(db.String(100), nullable=True), group='profile')
+    occupation = deferred(db.Column(db.String(100), nullable=True), group='profile')
+    bio = deferred(db.Column(db.Text, nullable=True), group='profile')
+    preferred_contact_method = deferred(db.Column(db.String(20), default='email'), group='profile')
+    profile_updated_at = deferred(db.Column(db.DateTime, nullable=True), group='profile')
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -141,8 +236,17 @@ class User(UserMixin, db.Model):
         else:
             return self.username
     
+    def load_profile(self):
+        """Load any deferred profile columns now, in one query; returns the user"""
+        state = db.inspect(self)
+        unloaded = [column for column in PROFILE_COLUMNS if column in state.unloaded]
+        if unloaded and state.persistent:
+            db.session.refresh(self, attribute_names=unloaded)
+        return self
+    
     def get_profile_completion_percentage(self):
         """Calculate profile completion percentage"""
+        self.load_profile()
         fields = [
             self.first_name, self.last_name, self.phone, self.date_of_birth,
             self.gender, self.address, self.city, self.state, self.zip_code,
@@ -157,6 +261,8 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         return f'<User {self.username}>'
 
+PROFILE_COLUMNS = tuple(prop.key for prop in db.inspect(User).column_attrs if prop.group == 'profile')
+
 # Payment and Order Models
 class Car(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -166,12 +272,38 @@ class Car(db.Model):
     category = db.Column(db.String(50), nullable=False)
     description = db.Column(db.Text)
     video_url = db.Column(db.String(200))
+    model_file = db.Column(db.String(200))  # 3D model asset under static/
+
+    # Specifications
+    year = db.Column(db.String(10))
+    engine = db.Column(db.String(100))
+    horsepower = db.Column(db.String(50))
+    torque = db.Column(db.String(50))
+    top_speed = db.Column(db.String(50))
+    acceleration = db.Column(db.String(100))
+    transmission = db.Column(db.String(100))
+    drivetrain = db.Column(db.String(50))
+    fuel_economy = db.Column(db.String(100))
+    features = db.Column(db.Text)  # JSON list of feature strings
+
+    # Stock and showroom details
+    status = db.Column(db.String(20), default='Available')
+    mileage = db.Column(db.String(20), default='0 miles')
+    location = db.Column(db.String(100))
+    color = db.Column(db.String(50))
+
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
         return f'<Car {self.name}>'
 
 class Order(db.Model):
+    __table_args__ = (
+        db.Index('ix_order_user_id_created_at', 'user_id', 'created_at'),  # my_orders, admin user detail
+        db.Index('ix_order_payment_status_created_at', 'payment_status', 'created_at'),  # admin status filter
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     car_id = db.Column(db.Integer, db.ForeignKey('car.id'), nullable=False)
@@ -181,11 +313,13 @@ class Order(db.Model):
     order_status = db.Column(db.String(20), default='pending')  # Track order status
     payment_method = db.Column(db.String(50))
     transaction_id = db.Column(db.String(100))
+    payment_message = db.Column(db.String(255))  # Last gateway response
+    idempotency_key = db.Column(db.String(64), unique=True, index=True)  # Makes checkout retries safe
     billing_name = db.Column(db.String(100), nullable=False)
     billing_email = db.Column(db.String(120), nullable=False)
     billing_phone = db.Column(db.String(20), nullable=False)
     billing_address = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
@@ -197,7 +331,7 @@ class Order(db.Model):
 
 class FinanceApplication(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     car_id = db.Column(db.String(50))  # Can be string since it comes from URL params
     car_name = db.Column(db.String(200), nullable=False)
     car_price = db.Column(db.String(50), nullable=False)
@@ -236,6 +370,10 @@ class Part(db.Model):
 
 class UserActivity(db.Model):
     __tablename__ = 'user_activity_log'  # Explicit table name to avoid conflicts
+    __table_args__ = (
+        db.Index('ix_user_activity_log_user_id_created_at', 'user_id', 'created_at'),  # per-user history
+        db.Index('ix_user_activity_log_activity_type_created_at', 'activity_type', 'created_at'),  # admin type filter
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -244,7 +382,7 @@ class UserActivity(db.Model):
     ip_address = db.Column(db.String(45), nullable=True)  # IPv4/IPv6
     user_agent = db.Column(db.String(500), nullable=True)
     activity_data = db.Column(db.Text, nullable=True)  # JSON string for additional data (changed from metadata)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     # Relationships
     user = db.relationship('User', backref=db.backref('activities', lazy=True, order_by='UserActivity.created_at.desc()'))
@@ -252,6 +390,78 @@ class UserActivity(db.Model):
     def __repr__(self):
         return f'<UserActivity {self.activity_type} by {self.user_id}>'
 
+class PasswordResetOTP(db.Model):
+    email = db.Column(db.String(120), primary_key=True)  # normalized (lower-cased) email
+    otp_hash = db.Column(db.String(64), nullable=True)  # HMAC of the code; cleared once used or burned
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    window_start = db.Column(db.DateTime, nullable=False)  # start of the rate-limit window
+    sent_count = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<PasswordResetOTP {self.email}>'
+
+# Background activity log writer
+activity_writer = ActivityLogWriter(
+    create_activity_sink(app, db, UserActivity),
+    max_queue=app.config['ACTIVITY_LOG_MAX_QUEUE'],
+    batch_size=app.config['ACTIVITY_LOG_BATCH_SIZE'],
+    flush_interval_ms=app.config['ACTIVITY_LOG_FLUSH_MS']
+)
+
+# Background payment processing
+payment_results = metrics.counter('carhub_payments_total', 'Payments processed, by result', ('result',))
+
+def record_payment_result(order, success, message):
+    """Log the outcome of a background payment job"""
+    payment_results.inc('succeeded' if success else 'failed')
+    car_name = order.car.name if order.car else 'Unknown'
+    log_user_activity(
+        user_id=order.user_id,
+        activity_type='payment_successful' if success else 'payment_failed',
+        description=f'Successfully processed payment for {car_name}' if success else f'Payment failed for {car_name}: {message}',
+        metadata={
+            'order_id': order.id,
+            'car_id': order.car_id,
+            'amount': float(order.total_amount),
+            'payment_method': order.payment_method,
+            **({} if success else {'error': message})
+        }
+    )
+
+payment_processor = PaymentProcessor(
+    app, db, Order,
+    create_payment_gateway(app),
+    max_workers=app.config['PAYMENT_WORKERS'],
+    on_result=record_payment_result,
+    stale_after=app.config['PAYMENT_RECOVERY_AFTER']
+)
+
+@app.before_request
+def recover_interrupted_payments():
+    # Once per worker process: re-queue orders a restart left pending or authorized
+    payment_processor.recover_once()
+
+# Vehicle catalog (single source of truth for car_details, buy_car and inventory)
+catalog = VehicleCatalog(db, Car, stamp_path=app.config['CATALOG_STAMP_PATH'])
+
+# Admin dashboard aggregates (kept current from Order/User/FinanceApplication commits)
+dashboard_stats = DashboardStats(db, User, Order, FinanceApplication, ttl=app.config['DASHBOARD_STATS_TTL'])
+
+# Ranked admin user search (FTS5 index kept in sync by triggers, or in-process trigrams)
+user_search = create_user_search(app, db, User)
+
+# Rendered invoice PDFs, keyed on order id, last update and template version
+invoice_cache = InvoiceCache(app.config['INVOICE_CACHE_PATH']) if PDF_AVAILABLE else None
+invoice_renders = metrics.counter('carhub_invoices_total', 'Invoices served: rendered, cached or failed', ('result',))
+
+# Outbound email (spooled, retried and delivered by background workers)
+mail_queue = create_mail_queue(app)
+metrics.gauge('carhub_mail_queue_depth', 'Emails waiting in the outbound spool', callback=lambda: mail_queue.spool.depth())
+
+# Per-request SQL timing by route (see /admin/sql-profile)
+sql_profiler = create_sql_profiler(app, db)
+
 # Forms
 class LoginForm(FlaskForm):
     email = StringField('Email', validators=[InputRequired(), Email()])
@@ -318,6 +528,7 @@ class PaymentForm(FlaskForm):
     card_number = StringField('Card Number')
     card_expiry = StringField('Expiry Date (MM/YY)')
     card_cvv = StringField('CVV')
+    idempotency_key = HiddenField()
     submit = SubmitField('Complete Payment')
 
 class ProfileForm(FlaskForm):
@@ -361,18 +572,17 @@ class ProfileForm(FlaskForm):
 
 # Helper functions
 def log_user_activity(user_id, activity_type, description, metadata=None):
-    """Log user activity"""
+    """Queue a user activity row for the background activity log writer"""
     try:
-        activity = UserActivity(
-            user_id=user_id,
-            activity_type=activity_type,
-            description=description,
-            ip_address=request.remote_addr if request else None,
-            user_agent=request.headers.get('User-Agent', '') if request else None,
-            activity_data=json.dumps(metadata) if metadata else None
-        )
-        db.session.add(activity)
-        db.session.commit()
+        activity_writer.record({
+            'user_id': user_id,
+            'activity_type': activity_type,
+            'description': description,
+            'ip_address': request.remote_addr if request else None,
+            'user_agent': request.headers.get('User-Agent', '') if request else None,
+            'activity_data': json.dumps(metadata) if metadata else None,
+            'created_at': datetime.utcnow()
+        })
     except Exception as e:
         print(f"Error logging activity: {e}")
 
@@ -380,12 +590,14 @@ def is_admin(user):
     """Check if user is admin"""
     return user and user.is_authenticated and user.email == 'admin@carhub.com'
 
+principal_cache = create_principal_cache(app, db, User, is_admin=is_admin)
+
 def send_email(subject, recipient, template, **kwargs):
-    """Send email using Flask-Mail"""
+    """Queue an email for background delivery"""
     try:
         msg = Message(subject, recipients=[recipient])
         msg.html = template
-        mail.send(msg)
+        mail_queue.send(msg)
         return True
     except Exception as e:
         print(f"Error sending email: {e}")
@@ -686,8 +898,8 @@ def about():
                     html=html_body,
                     reply_to=email
                 )
-                mail.send(msg)
-                print(f"Email sent successfully to {app.config['MAIL_USERNAME']}")
+                mail_queue.send(msg)
+                print(f"Email queued for {app.config['MAIL_USERNAME']}")
             except Exception as email_error:
                 print(f"Email sending failed: {email_error}")
                 # Continue without failing the form submission
@@ -770,111 +982,7 @@ def inventory():
             
         return render_template('inventory.html', items=parts_list, display_type='parts')
     else:
-        # Sample inventory data - in a real app, this would come from a database
-        inventory_cars = [
-            {
-                'id': 'lamborghini-revuelto',
-                'name': 'Lamborghini Revuelto',
-                'year': '2024',
-                'price': '$516,000',
-                'status': 'Available',
-                'mileage': '0 miles',
-                'location': 'New York Showroom',
-                'color': 'Nero Aldebaran',
-                'image': 'lamborghini_revuelto.glb'
-            },
-            {
-                'id': 'bugatti-centodieci', 
-                'name': 'Bugatti Centodieci',
-                'year': '2022',
-                'price': '$9,000,000',
-                'status': 'Reserved',
-            'mileage': '25 miles',
-            'location': 'Beverly Hills Showroom',
-            'color': 'EB110 Blue',
-            'image': 'bugatti_centodieci.glb'
-        },
-        {
-            'id': 'ferrari-296',
-            'name': 'Ferrari 296 GTB', 
-            'year': '2023',
-            'price': '$320,000',
-            'status': 'Available',
-            'mileage': '0 miles',
-            'location': 'Miami Showroom',
-            'color': 'Rosso Corsa',
-            'image': 'ferrari_296.glb'
-        },
-        {
-            'id': 'mclaren-720s',
-            'name': 'McLaren 720S',
-            'year': '2023', 
-            'price': '$310,000',
-            'status': 'Available',
-            'mileage': '12 miles',
-            'location': 'Los Angeles Showroom',
-            'color': 'Papaya Orange',
-            'image': 'mclaren.glb'
-        },
-        {
-            'id': 'porsche-718-cayman-gt4',
-            'name': 'Porsche 718 Cayman GT4',
-            'year': '2023',
-            'price': '$110,000', 
-            'status': 'Available',
-            'mileage': '0 miles',
-            'location': 'Chicago Showroom',
-            'color': 'Guards Red',
-            'image': 'porsche_718_cayman_gt4.glb'
-        },
-        {
-            'id': 'aston-martin-v8-vantage',
-            'name': 'Aston Martin V8 Vantage',
-            'year': '2023',
-            'price': '$150,000',
-            'status': 'Sold',
-            'mileage': '5 miles',
-            'location': 'Dallas Showroom',
-            'color': 'British Racing Green',
-            'image': 'aston_martin_v8_vantage.glb'
-        },
-        {
-            'id': 'tesla-cybertruck',
-            'name': 'Tesla Cybertruck',
-            'year': '2024',
-            'price': '$100,000',
-            'status': 'Pre-Order',
-            'mileage': '0 miles',
-            'location': 'Austin Showroom',
-            'color': 'Stainless Steel',
-            'image': 'tesla_cybertruck.glb'
-        },
-        {
-            'id': 'bmw-m2-g87',
-            'name': 'BMW M2 G87',
-            'year': '2023',
-            'price': '$65,000',
-            'status': 'Available',
-            'mileage': '8 miles',
-            'location': 'Seattle Showroom',
-            'color': 'Alpine White',
-            'image': 'bmw_m2_g87.glb'
-        }
-    ]
-        # Convert to format consistent with parts list
-        car_list = []
-        for car in inventory_cars:
-            car_detail = {
-                'id': car['id'],
-                'name': car['name'],
-                'price': car['price'],
-                'image': car['image'],
-                'brand': car.get('name', '').split(' ')[0],  # Extract brand from name
-                'type': 'car'
-            }
-            car_list.append(car_detail)
-            
-        return render_template('inventory.html', items=car_list, display_type='cars')
+        return render_template('inventory.html', items=catalog.all(), display_type='cars')
 
 @app.route('/car-details/<car_name>')
 def car_details(car_name):
@@ -887,655 +995,7 @@ def car_details(car_name):
             metadata={'car_name': car_name}
         )
     
-    # Sample car data - in a real app, this would come from a database
-    car_data = {
-        'lamborghini-revuelto': {
-            'name': 'Lamborghini Revuelto',
-            'model': 'lamborghini_revuelto.glb',
-            'year': '2024',
-            'price': '$516,000',
-            'engine': '6.5L V12 Hybrid',
-            'horsepower': '1,001 hp',
-            'torque': '725 lb-ft',
-            'topSpeed': '217 mph',
-            'acceleration': '2.5 seconds (0-60 mph)',
-            'transmission': '8-Speed Dual-Clutch',
-            'drivetrain': 'All-Wheel Drive',
-            'fuelEconomy': '11 mpg city / 18 mpg highway',
-            'description': 'The Lamborghini Revuelto represents the pinnacle of automotive engineering, combining a naturally aspirated V12 engine with hybrid technology for unprecedented performance.',
-            'features': [
-                'Carbon fiber monocoque chassis',
-                'Advanced aerodynamics package',
-                'Adaptive suspension system',
-                'Premium leather interior',
-                'Advanced infotainment system',
-                'Track-focused driving modes'
-            ]
-        },
-        'bugatti-centodieci': {
-            'name': 'Bugatti Centodieci',
-            'model': 'bugatti_centodieci.glb',
-            'year': '2022',
-            'price': '$9,000,000',
-            'engine': '8.0L Quad-Turbo W16',
-            'horsepower': '1,577 hp',
-            'torque': '1,180 lb-ft',
-            'topSpeed': '236 mph',
-            'acceleration': '2.4 seconds (0-60 mph)',
-            'transmission': '7-Speed Dual-Clutch',
-            'drivetrain': 'All-Wheel Drive',
-            'fuelEconomy': '8 mpg city / 14 mpg highway',
-            'description': 'A tribute to the legendary EB110, the Centodieci combines Bugatti\'s rich heritage with cutting-edge technology and unparalleled luxury.',
-            'features': [
-                'Limited production (10 units)',
-                'Carbon fiber bodywork',
-                'Michelin Pilot Sport Cup 2 tires',
-                'Brembo carbon-ceramic brakes',
-                'Exclusive interior appointments',
-                'Track telemetry system'
-            ]
-        },
-        'ferrari-296': {
-            'name': 'Ferrari 296 GTB',
-            'model': 'ferrari_296.glb',
-            'year': '2023',
-            'price': '$320,000',
-            'engine': '2.9L V6 Hybrid Turbo',
-            'horsepower': '819 hp',
-            'torque': '546 lb-ft',
-            'topSpeed': '205 mph',
-            'acceleration': '2.9 seconds (0-60 mph)',
-            'transmission': '8-Speed Dual-Clutch',
-            'drivetrain': 'Rear-Wheel Drive',
-            'fuelEconomy': '16 mpg city / 22 mpg highway',
-            'description': 'The Ferrari 296 GTB is a groundbreaking mid-rear-engined 2-seater berlinetta that introduces the new 120° V6 engine coupled with a plug-in electric motor.',
-            'features': [
-                'Hybrid V6 powertrain',
-                'Active aerodynamics',
-                'Carbon fiber construction',
-                'Manettino dial with hybrid modes',
-                'F1-derived technology',
-                'Customizable interior options'
-            ]
-        },
-        'mclaren-720s': {
-            'name': 'McLaren 720S',
-            'model': 'mclaren.glb',
-            'year': '2023',
-            'price': '$310,000',
-            'engine': '4.0L Twin-Turbo V8',
-            'horsepower': '710 hp',
-            'torque': '568 lb-ft',
-            'topSpeed': '212 mph',
-            'acceleration': '2.8 seconds (0-60 mph)',
-            'transmission': '7-Speed Dual-Clutch',
-            'drivetrain': 'Rear-Wheel Drive',
-            'fuelEconomy': '15 mpg city / 22 mpg highway',
-            'description': 'The McLaren 720S delivers breathtaking performance with its lightweight carbon fiber construction and advanced aerodynamics.',
-            'features': [
-                'Carbon fiber MonoCell II chassis',
-                'Proactive Chassis Control II',
-                'Variable Drift Control',
-                'Adaptive suspension',
-                'Track telemetry system',
-                'Lightweight construction'
-            ]
-        },
-        'porsche-718-cayman-gt4': {
-            'name': 'Porsche 718 Cayman GT4',
-            'model': 'porsche_718_cayman_gt4.glb',
-            'year': '2023',
-            'price': '$110,000',
-            'engine': '4.0L Naturally Aspirated Flat-6',
-            'horsepower': '414 hp',
-            'torque': '309 lb-ft',
-            'topSpeed': '188 mph',
-            'acceleration': '4.2 seconds (0-60 mph)',
-            'transmission': '6-Speed Manual',
-            'drivetrain': 'Rear-Wheel Drive',
-            'fuelEconomy': '18 mpg city / 24 mpg highway',
-            'description': 'The Porsche 718 Cayman GT4 represents the perfect balance of track performance and daily usability with its naturally aspirated engine.',
-            'features': [
-                'Naturally aspirated flat-6 engine',
-                'Sport Chrono Package',
-                'PASM adaptive suspension',
-                'Track-focused aerodynamics',
-                'Carbon fiber elements',
-                'Racing-inspired interior'
-            ]
-        },
-        'aston-martin-v8-vantage': {
-            'name': 'Aston Martin V8 Vantage',
-            'model': 'aston_martin_v8_vantage.glb',
-            'year': '2023',
-            'price': '$150,000',
-            'engine': '4.0L Twin-Turbo V8',
-            'horsepower': '503 hp',
-            'torque': '461 lb-ft',
-            'topSpeed': '195 mph',
-            'acceleration': '3.5 seconds (0-60 mph)',
-            'transmission': '8-Speed Automatic',
-            'drivetrain': 'Rear-Wheel Drive',
-            'fuelEconomy': '16 mpg city / 24 mpg highway',
-            'description': 'The Aston Martin V8 Vantage combines British luxury with exhilarating performance in a beautifully crafted sports car.',
-            'features': [
-                'Handcrafted luxury interior',
-                'Adaptive damping system',
-                'Electronic rear differential',
-                'Premium leather appointments',
-                'Bang & Olufsen sound system',
-                'Advanced infotainment'
-            ]
-        },
-        'lamborghini-temerario': {
-            'name': 'Lamborghini Temerario',
-            'model': 'lamborghini_temerario.glb',
-            'year': '2024',
-            'price': '$240,000',
-            'engine': '4.0L Twin-Turbo V8 Hybrid',
-            'horsepower': '907 hp',
-            'torque': '627 lb-ft',
-            'topSpeed': '210 mph',
-            'acceleration': '2.7 seconds (0-60 mph)',
-            'transmission': '8-Speed Dual-Clutch',
-            'drivetrain': 'All-Wheel Drive',
-            'fuelEconomy': '14 mpg city / 20 mpg highway',
-            'description': 'The Lamborghini Temerario showcases the future of Lamborghini with its hybrid V8 powertrain and cutting-edge technology.',
-            'features': [
-                'Hybrid V8 powertrain',
-                'Active aerodynamics package',
-                'Carbon fiber body panels',
-                'Advanced traction control',
-                'Customizable drive modes',
-                'Premium Alcantara interior'
-            ]
-        },
-        'tesla-cybertruck': {
-            'name': 'Tesla Cybertruck',
-            'model': 'tesla_cybertruck.glb',
-            'year': '2024',
-            'price': '$100,000',
-            'engine': 'Tri-Motor Electric',
-            'horsepower': '845 hp',
-            'torque': '930 lb-ft',
-            'topSpeed': '130 mph',
-            'acceleration': '2.8 seconds (0-60 mph)',
-            'transmission': 'Single-Speed Direct Drive',
-            'drivetrain': 'All-Wheel Drive',
-            'fuelEconomy': '340 miles range',
-            'description': 'The Tesla Cybertruck redefines what a pickup truck can be with its revolutionary design and all-electric powertrain.',
-            'features': [
-                'Ultra-hard 30X cold-rolled steel',
-                'Armor glass windows',
-                'Air suspension system',
-                'Autopilot capabilities',
-                'Solar panel integration ready',
-                'Massive towing capacity'
-            ]
-        },
-        'koenigsegg-agera-rs': {
-            'name': 'Koenigsegg Agera RS',
-            'model': 'koenigsegg_agera.glb',
-            'year': '2023',
-            'price': '$2,500,000',
-            'engine': '5.0L Twin-Turbo V8',
-            'horsepower': '1,360 hp',
-            'torque': '1,011 lb-ft',
-            'topSpeed': '278 mph',
-            'acceleration': '2.8 seconds (0-60 mph)',
-            'transmission': '7-Speed Automatic',
-            'drivetrain': 'Rear-Wheel Drive',
-            'fuelEconomy': '12 mpg city / 18 mpg highway',
-            'description': 'The Koenigsegg Agera RS represents the ultimate expression of Swedish hypercar engineering with record-breaking performance.',
-            'features': [
-                'Carbon fiber construction',
-                'Active aerodynamics',
-                'Track-focused suspension',
-                'Lightweight titanium components',
-                'Bespoke interior craftsmanship',
-                'Advanced telemetry system'
-            ]
-        },
-        'bmw-m2-g87': {
-            'name': 'BMW M2 G87',
-            'model': 'bmw_m2_g87.glb',
-            'year': '2023',
-            'price': '$65,000',
-            'engine': '3.0L Twin-Turbo Inline-6',
-            'horsepower': '453 hp',
-            'torque': '406 lb-ft',
-            'topSpeed': '177 mph',
-            'acceleration': '4.1 seconds (0-60 mph)',
-            'transmission': '6-Speed Manual / 8-Speed Auto',
-            'drivetrain': 'Rear-Wheel Drive',
-            'fuelEconomy': '19 mpg city / 26 mpg highway',
-            'description': 'The BMW M2 G87 delivers pure driving excitement with its perfect balance of power, handling, and everyday usability.',
-            'features': [
-                'M TwinPower Turbo engine',
-                'Adaptive M suspension',
-                'M differential',
-                'Carbon fiber roof',
-                'M-specific interior',
-                'Track-ready performance'
-            ]
-        },
-        'lamborghini-diablo-sv': {
-            'name': '1995 Lamborghini Diablo SV',
-            'model': '1995_lamborghini_diablo_sv.glb',
-            'year': '1995',
-            'price': '$300,000',
-            'engine': '5.7L V12',
-            'horsepower': '510 hp',
-            'torque': '428 lb-ft',
-            'topSpeed': '202 mph',
-            'acceleration': '4.0 seconds (0-60 mph)',
-            'transmission': '5-Speed Manual',
-            'drivetrain': 'Rear-Wheel Drive',
-            'fuelEconomy': '9 mpg city / 15 mpg highway',
-            'description': 'The Lamborghini Diablo SV is a legendary supercar that defined the 1990s with its aggressive styling and raw V12 power.',
-            'features': [
-                'Naturally aspirated V12 engine',
-                'Carbon fiber aerodynamic kit',
-                'Adjustable rear wing',
-                'Racing-inspired interior',
-                'Limited slip differential',
-                'Iconic scissor doors'
-            ]
-        },
-        'renault-clio-v6': {
-            'name': '2003 Renault Clio V6 Sport',
-            'model': '2003_renault_clio_v6_renault_sport.glb',
-            'year': '2003',
-            'price': '$45,000',
-            'engine': '3.0L V6',
-            'horsepower': '255 hp',
-            'torque': '221 lb-ft',
-            'topSpeed': '153 mph',
-            'acceleration': '5.8 seconds (0-60 mph)',
-            'transmission': '6-Speed Manual',
-            'drivetrain': 'Rear-Wheel Drive',
-            'fuelEconomy': '18 mpg city / 25 mpg highway',
-            'description': 'The Renault Clio V6 is a unique mid-engined hot hatch that combines practicality with exceptional performance.',
-            'features': [
-                'Mid-mounted V6 engine',
-                'Widebody aerodynamic kit',
-                'Brembo braking system',
-                'Recaro sport seats',
-                'Limited production run',
-                'Track-focused suspension'
-            ]
-        },
-        'porsche-718-cayman-gts': {
-            'name': '2018 Porsche 718 Cayman GTS',
-            'model': '2018_porsche_718_cayman_gts.glb',
-            'year': '2018',
-            'price': '$85,000',
-            'engine': '2.5L Turbo Flat-4',
-            'horsepower': '365 hp',
-            'torque': '309 lb-ft',
-            'topSpeed': '180 mph',
-            'acceleration': '4.1 seconds (0-60 mph)',
-            'transmission': '6-Speed Manual',
-            'drivetrain': 'Rear-Wheel Drive',
-            'fuelEconomy': '20 mpg city / 28 mpg highway',
-            'description': 'The 718 Cayman GTS offers the perfect balance of performance and daily usability with Porsche\'s legendary handling.',
-            'features': [
-                'Turbocharged flat-4 engine',
-                'Sport Chrono Package',
-                'PASM adaptive suspension',
-                'Sport exhaust system',
-                'Alcantara interior trim',
-                'GTS-specific styling'
-            ]
-        },
-        'lamborghini-countach': {
-            'name': '2022 Lamborghini Countach LPI 800-4',
-            'model': '2022_lamborghini_countach_lpi_800-4.glb',
-            'year': '2022',
-            'price': '$2,650,000',
-            'engine': '6.5L V12 Hybrid',
-            'horsepower': '803 hp',
-            'torque': '531 lb-ft',
-            'topSpeed': '221 mph',
-            'acceleration': '2.8 seconds (0-60 mph)',
-            'transmission': '7-Speed Automatic',
-            'drivetrain': 'All-Wheel Drive',
-            'fuelEconomy': '10 mpg city / 16 mpg highway',
-            'description': 'The modern Countach pays homage to the iconic original while delivering cutting-edge hybrid performance.',
-            'features': [
-                'Hybrid V12 powertrain',
-                'Limited production (112 units)',
-                'Carbon fiber construction',
-                'Retro-futuristic design',
-                'Advanced aerodynamics',
-                'Exclusive interior materials'
-            ]
-        },
-        'hyundai-ioniq-5n': {
-            'name': '2024 Hyundai Ioniq 5 N',
-            'model': '2024_hyundai_ioniq_5_n.glb',
-            'year': '2024',
-            'price': '$67,000',
-            'engine': 'Dual Electric Motors',
-            'horsepower': '641 hp',
-            'torque': '545 lb-ft',
-            'topSpeed': '162 mph',
-            'acceleration': '3.4 seconds (0-60 mph)',
-            'transmission': 'Single-Speed Direct Drive',
-            'drivetrain': 'All-Wheel Drive',
-            'fuelEconomy': '303 miles range',
-            'description': 'The Ioniq 5 N combines high-performance electric propulsion with innovative technology and distinctive design.',
-            'features': [
-                'Dual motor electric drivetrain',
-                'N Grin Boost mode',
-                'Ultra-fast charging capability',
-                'Active aerodynamics',
-                'Advanced driver assistance',
-                'Sporty N interior package'
-            ]
-        },
-        'lamborghini-huracan-sterrato': {
-            'name': '2024 Lamborghini Huracán Sterrato',
-            'model': '2024_lamborghini_huracan_sterrato.glb',
-            'year': '2024',
-            'price': '$265,000',
-            'engine': '5.2L V10',
-            'horsepower': '602 hp',
-            'torque': '413 lb-ft',
-            'topSpeed': '162 mph',
-            'acceleration': '3.4 seconds (0-60 mph)',
-            'transmission': '7-Speed Dual-Clutch',
-            'drivetrain': 'All-Wheel Drive',
-            'fuelEconomy': '13 mpg city / 18 mpg highway',
-            'description': 'The Huracán Sterrato is the world\'s first super sports car designed for off-road adventures.',
-            'features': [
-                'Rally-inspired design',
-                'Increased ground clearance',
-                'All-terrain capabilities',
-                'Reinforced underbody protection',
-                'Off-road driving modes',
-                'Roof-mounted LED light bar'
-            ]
-        },
-        'bentley-mulliner-batur': {
-            'name': 'Bentley Mulliner Batur',
-            'model': 'bentley_mulliner_batur.glb',
-            'year': '2023',
-            'price': '$2,000,000',
-            'engine': '6.0L Twin-Turbo W12',
-            'horsepower': '730 hp',
-            'torque': '738 lb-ft',
-            'topSpeed': '209 mph',
-            'acceleration': '3.7 seconds (0-60 mph)',
-            'transmission': '8-Speed Dual-Clutch',
-            'drivetrain': 'All-Wheel Drive',
-            'fuelEconomy': '12 mpg city / 20 mpg highway',
-            'description': 'The Bentley Mulliner Batur is a bespoke grand tourer that showcases the future of Bentley design.',
-            'features': [
-                'Handcrafted Mulliner interior',
-                'Carbon fiber bodywork',
-                'Bespoke paint finishes',
-                'Premium leather appointments',
-                'Limited production (18 units)',
-                'Advanced chassis technology'
-            ]
-        },
-        'ferrari-monza-sp1': {
-            'name': 'Ferrari Monza SP1',
-            'model': 'ferrari_monza_sp1.glb',
-            'year': '2023',
-            'price': '$1,750,000',
-            'engine': '6.5L V12',
-            'horsepower': '809 hp',
-            'torque': '530 lb-ft',
-            'topSpeed': '186 mph',
-            'acceleration': '2.9 seconds (0-60 mph)',
-            'transmission': '7-Speed Dual-Clutch',
-            'drivetrain': 'Rear-Wheel Drive',
-            'fuelEconomy': '12 mpg city / 17 mpg highway',
-            'description': 'The Ferrari Monza SP1 is a limited-series speedster that celebrates Ferrari\'s racing heritage.',
-            'features': [
-                'Single-seat speedster design',
-                'Carbon fiber construction',
-                'Active aerodynamics',
-                'Racing-inspired cockpit',
-                'Limited production series',
-                'Heritage-inspired styling'
-            ]
-        },
-        'jeep-wrangler-rubicon': {
-            'name': 'Jeep Wrangler Rubicon',
-            'model': 'jeep_wrangler_rubicon.glb',
-            'year': '2023',
-            'price': '$55,000',
-            'engine': '3.6L V6',
-            'horsepower': '285 hp',
-            'torque': '260 lb-ft',
-            'topSpeed': '112 mph',
-            'acceleration': '6.5 seconds (0-60 mph)',
-            'transmission': '8-Speed Automatic',
-            'drivetrain': '4WD',
-            'fuelEconomy': '18 mpg city / 24 mpg highway',
-            'description': 'The Jeep Wrangler Rubicon is the most capable off-road vehicle in the Jeep lineup.',
-            'features': [
-                'Rock-Trac 4WD system',
-                'Rubicon rock rails',
-                'Electronic front and rear lockers',
-                'Disconnecting front sway bar',
-                'Skid plates protection',
-                'All-terrain tires'
-            ]
-        },
-        'mercedes-maybach': {
-            'name': 'Mercedes-Benz Maybach S-Class',
-            'model': 'mercedes-benz_maybach_2022.glb',
-            'year': '2022',
-            'price': '$185,000',
-            'engine': '4.0L Twin-Turbo V8',
-            'horsepower': '496 hp',
-            'torque': '516 lb-ft',
-            'topSpeed': '155 mph',
-            'acceleration': '4.4 seconds (0-60 mph)',
-            'transmission': '9-Speed Automatic',
-            'drivetrain': 'All-Wheel Drive',
-            'fuelEconomy': '17 mpg city / 25 mpg highway',
-            'description': 'The Mercedes-Maybach S-Class represents the pinnacle of luxury and automotive craftsmanship.',
-            'features': [
-                'Executive rear seating',
-                'Burmester 4D surround sound',
-                'Active body control',
-                'Massage seats with heating/cooling',
-                'Premium leather and wood trim',
-                'Advanced driver assistance'
-            ]
-        },
-        'rolls-royce-ghost': {
-            'name': 'Rolls-Royce Ghost',
-            'model': 'rolls_royce_ghost.glb',
-            'year': '2023',
-            'price': '$350,000',
-            'engine': '6.75L Twin-Turbo V12',
-            'horsepower': '563 hp',
-            'torque': '627 lb-ft',
-            'topSpeed': '155 mph',
-            'acceleration': '4.6 seconds (0-60 mph)',
-            'transmission': '8-Speed Automatic',
-            'drivetrain': 'All-Wheel Drive',
-            'fuelEconomy': '14 mpg city / 21 mpg highway',
-            'description': 'The Rolls-Royce Ghost embodies the spirit of ecstasy with unparalleled luxury and refinement.',
-            'features': [
-                'Hand-crafted interior',
-                'Whisper-quiet cabin',
-                'Starlight headliner',
-                'Spirit of Ecstasy ornament',
-                'Bespoke customization options',
-                'Advanced air suspension'
-            ]
-        },
-        'rolls-royce-spectre': {
-            'name': 'Rolls-Royce Spectre',
-            'model': 'rolls-royce_spectre.glb',
-            'year': '2024',
-            'price': '$420,000',
-            'engine': 'Dual Electric Motors',
-            'horsepower': '577 hp',
-            'torque': '664 lb-ft',
-            'topSpeed': '155 mph',
-            'acceleration': '4.4 seconds (0-60 mph)',
-            'transmission': 'Single-Speed Direct Drive',
-            'drivetrain': 'All-Wheel Drive',
-            'fuelEconomy': '291 miles range',
-            'description': 'The Rolls-Royce Spectre is the first fully electric Rolls-Royce, combining luxury with sustainable performance.',
-            'features': [
-                'All-electric powertrain',
-                'Ultra-luxury interior',
-                'Advanced battery technology',
-                'Whisper-silent operation',
-                'Bespoke craftsmanship',
-                'Cutting-edge infotainment'
-            ]
-        },
-        'ssc-tuatara-striker': {
-            'name': 'SSC Tuatara Striker',
-            'model': 'ssc_tuatara_striker.glb',
-            'year': '2023',
-            'price': '$1,900,000',
-            'engine': '5.9L Twin-Turbo V8',
-            'horsepower': '1,750 hp',
-            'torque': '1,280 lb-ft',
-            'topSpeed': '295 mph',
-            'acceleration': '2.5 seconds (0-60 mph)',
-            'transmission': '7-Speed Automated Manual',
-            'drivetrain': 'Rear-Wheel Drive',
-            'fuelEconomy': '11 mpg city / 16 mpg highway',
-            'description': 'The SSC Tuatara Striker is designed to be the fastest production car in the world.',
-            'features': [
-                'World record top speed',
-                'Carbon fiber monocoque',
-                'Active aerodynamics',
-                'Track-focused suspension',
-                'Lightweight construction',
-                'Advanced telemetry system'
-            ]
-        },
-        'tesla-model-3': {
-            'name': 'Tesla Model 3',
-            'model': 'tesla_m3_model.glb',
-            'year': '2023',
-            'price': '$40,000',
-            'engine': 'Electric Motor',
-            'horsepower': '283 hp',
-            'torque': '317 lb-ft',
-            'topSpeed': '140 mph',
-            'acceleration': '5.3 seconds (0-60 mph)',
-            'transmission': 'Single-Speed Direct Drive',
-            'drivetrain': 'Rear-Wheel Drive',
-            'fuelEconomy': '272 miles range',
-            'description': 'The Tesla Model 3 has revolutionized the electric vehicle market with its combination of performance and efficiency.',
-            'features': [
-                'Electric powertrain',
-                'Autopilot capability',
-                'Over-the-air updates',
-                'Minimalist interior design',
-                'Supercharger network access',
-                'Premium sound system'
-            ]
-        },
-        'tata-tiago': {
-            'name': 'Tata Tiago',
-            'model': 'tata_tiago.glb',
-            'year': '2023',
-            'price': '$8,000',
-            'engine': '1.2L Petrol',
-            'horsepower': '86 hp',
-            'torque': '113 lb-ft',
-            'topSpeed': '93 mph',
-            'acceleration': '12.3 seconds (0-60 mph)',
-            'transmission': '5-Speed Manual',
-            'drivetrain': 'Front-Wheel Drive',
-            'fuelEconomy': '23 mpg city / 33 mpg highway',
-            'description': 'The Tata Tiago is an affordable and practical compact car designed for urban mobility.',
-            'features': [
-                'Compact urban design',
-                'Fuel-efficient engine',
-                'Modern infotainment system',
-                'Safety features',
-                'Affordable pricing',
-                'Easy maneuverability'
-            ]
-        },
-        'mahindra-scorpio': {
-            'name': 'Mahindra Scorpio',
-            'model': 'mahindra_scorpio.glb',
-            'year': '2023',
-            'price': '$15,000',
-            'engine': '2.2L Turbo Diesel',
-            'horsepower': '130 hp',
-            'torque': '300 lb-ft',
-            'topSpeed': '93 mph',
-            'acceleration': '11.5 seconds (0-60 mph)',
-            'transmission': '6-Speed Manual',
-            'drivetrain': '4WD',
-            'fuelEconomy': '16 mpg city / 22 mpg highway',
-            'description': 'The Mahindra Scorpio is a rugged SUV built for Indian roads and tough conditions.',
-            'features': [
-                '4WD capability',
-                'High ground clearance',
-                'Robust build quality',
-                '7-seater configuration',
-                'Powerful diesel engine',
-                'Off-road capabilities'
-            ]
-        },
-        'maruti-suzuki-xl6': {
-            'name': 'Maruti Suzuki XL6',
-            'model': 'maruti_suzuki_xl6.glb',
-            'year': '2023',
-            'price': '$12,000',
-            'engine': '1.5L Petrol',
-            'horsepower': '103 hp',
-            'torque': '138 lb-ft',
-            'topSpeed': '99 mph',
-            'acceleration': '11.2 seconds (0-60 mph)',
-            'transmission': '5-Speed Manual',
-            'drivetrain': 'Front-Wheel Drive',
-            'fuelEconomy': '21 mpg city / 28 mpg highway',
-            'description': 'The Maruti Suzuki XL6 is a premium MPV that combines style, comfort, and practicality.',
-            'features': [
-                'Premium MPV design',
-                'Captain seats in middle row',
-                'Smart infotainment system',
-                'Efficient petrol engine',
-                '6-seater configuration',
-                'Modern styling elements'
-            ]
-        },
-        'bugatti-centodieci': {
-            'name': 'Bugatti Centodieci',
-            'model': '2019_bugatti_centodieci.glb',
-            'year': '2022',
-            'price': '$9,000,000',
-            'engine': '8.0L Quad-Turbo W16',
-            'horsepower': '1,577 hp',
-            'torque': '1,180 lb-ft',
-            'topSpeed': '236 mph',
-            'acceleration': '2.4 seconds (0-60 mph)',
-            'transmission': '7-Speed Dual-Clutch',
-            'drivetrain': 'All-Wheel Drive',
-            'fuelEconomy': '8 mpg city / 14 mpg highway',
-            'description': 'A tribute to the legendary EB110, the Centodieci combines Bugatti\'s rich heritage with cutting-edge technology and unparalleled luxury.',
-            'features': [
-                'Limited production (10 units)',
-                'Carbon fiber bodywork',
-                'Michelin Pilot Sport Cup 2 tires',
-                'Brembo carbon-ceramic brakes',
-                'Exclusive interior appointments',
-                'Track telemetry system'
-            ]
-        }
-    }
-    
-    car = car_data.get(car_name.lower())
+    car = catalog.get(car_name)
     if not car:
         return render_template('404.html'), 404
     
@@ -1554,31 +1014,7 @@ def buy_car(car_name):
         metadata={'car_name': car_name}
     )
     
-    # Get car data (in production, this would be from database)
-    car_data = {
-        'bugatti-centodieci': {'name': 'Bugatti Centodieci', 'price': 9000000},
-        'mclaren-720s': {'name': 'McLaren 720S', 'price': 1200000},
-        'maruti-suzuki-xl6': {'name': 'Maruti Suzuki XL6', 'price': 18000},
-        'bentley-mulliner-batur': {'name': 'Bentley Mulliner Batur', 'price': 1200000},
-        'lamborghini-diablo-sv': {'name': 'Lamborghini Diablo SV', 'price': 300000},
-        'tesla-model-3': {'name': 'Tesla Model 3', 'price': 40000},
-        'tesla-cybertruck': {'name': 'Tesla Cybertruck', 'price': 2000000},
-        'tata-tiago': {'name': 'Tata Tiago', 'price': 8000},
-        'rolls-royce-spectre': {'name': 'Rolls Royce Spectre', 'price': 1200000},
-        'rolls-royce-ghost': {'name': 'Rolls Royce Ghost', 'price': 1200000},
-        'porsche-718-cayman-gt4': {'name': 'Porsche 718 Cayman', 'price': 120000},
-        'mercedes-maybach': {'name': 'Mercedes Benz Maybach', 'price': 300000},
-        'lamborghini-revuelto': {'name': 'Lamborghini Revuelto', 'price': 650000},
-        'ferrari-monza-sp1': {'name': 'Ferrari Monza', 'price': 1750000},
-        'bmw-m2-g87': {'name': 'BMW M2 G87', 'price': 65000},
-        'aston-martin-v8-vantage': {'name': 'Aston Martin V8 Vantage', 'price': 150000},
-        'lamborghini-temerario': {'name': 'Lamborghini Temerario', 'price': 400000},
-        'hyundai-ioniq-5n': {'name': 'Hyundai Ioniq 5N', 'price': 67000},
-        'jeep-wrangler-rubicon': {'name': 'Jeep Wrangler Rubicon', 'price': 45000},
-        'mahindra-scorpio': {'name': 'Mahindra Scorpio', 'price': 15000},
-    }
-    
-    car = car_data.get(car_name.lower())
+    car = catalog.get(car_name)
     if not car:
         flash('Car not found.', 'error')
         return redirect(url_for('cars'))
@@ -1586,8 +1022,8 @@ def buy_car(car_name):
     # Store car info in session for payment process
     session['purchase_car'] = {
         'name': car['name'],
-        'slug': car_name.lower(),
-        'price': car['price']
+        'slug': car['slug'],
+        'price': car['price_value']
     }
     
     return redirect(url_for('payment'))
@@ -1610,6 +1046,7 @@ def payment():
         form.billing_email.data = current_user.email
         form.billing_phone.data = current_user.phone if hasattr(current_user, 'phone') else ''
         form.billing_address.data = current_user.address if hasattr(current_user, 'address') else ''
+        form.idempotency_key.data = get_checkout_idempotency_key()
 
     if request.method == 'POST':
         # Manually get the payment_method from form data to handle custom validation
@@ -1619,6 +1056,18 @@ def payment():
         
         if form.validate_on_submit():
             try:
+                # A retried submit (double click, refresh) reuses the order created by the first one
+                idempotency_key = form.idempotency_key.data or request.headers.get('Idempotency-Key') or get_checkout_idempotency_key()
+                existing_order = Order.query.filter_by(idempotency_key=idempotency_key).first()
+                if existing_order and existing_order.user_id != current_user.id:
+                    # Keys are unique across all users: never reuse, or reveal, another customer's order
+                    app.logger.warning(f"User {current_user.id} sent the idempotency key of order {existing_order.id}")
+                    session['purchase_car'] = {k: v for k, v in car_info.items() if k != 'idempotency_key'}
+                    flash('This checkout has expired. Please review your details and pay again.', 'error')
+                    return redirect(url_for('payment'))
+                if existing_order:
+                    return redirect(url_for('payment_processing', order_id=existing_order.id))
+
                 # Resolve car from database using slug stored in session
                 car_slug = car_info.get('slug')
                 car_obj = None
@@ -1641,6 +1090,7 @@ def payment():
                     payment_status='pending',
                     payment_method=form.payment_method.data,
                     transaction_id=None,
+                    idempotency_key=idempotency_key,
                     billing_name=form.billing_name.data,
                     billing_email=form.billing_email.data,
                     billing_phone=form.billing_phone.data,
@@ -1650,52 +1100,15 @@ def payment():
                 db.session.add(order)
                 db.session.commit()
 
-                # Process the payment (this is a safe, simulated processor for development)
-                success, txn_id, message = process_payment(form, order)
-
-                if success:
-                    order.payment_status = 'completed'
-                    order.transaction_id = txn_id or f"TXN_{secrets.token_hex(8)}"
-                    order.order_status = 'processing'
-                    db.session.commit()
-
-                    # Log the successful payment
-                    log_user_activity(
-                        user_id=current_user.id,
-                        activity_type='payment_successful',
-                        description=f'Successfully processed payment for {car_obj.name}',
-                        metadata={
-                            'order_id': order.id,
-                            'car_id': car_obj.id,
-                            'amount': float(total_amount),
-                            'payment_method': form.payment_method.data
-                        }
-                    )
-
-                    # Clear session data after successful payment
-                    session.pop('purchase_car', None)
-
-                    flash(f'Payment successful! Your order for {car_info["name"]} has been confirmed.', 'success')
-                    return redirect(url_for('payment_success', order_id=order.id))
-                else:
-                    order.payment_status = 'failed'
-                    db.session.commit()
-                    
-                    # Log the failed payment
-                    log_user_activity(
-                        user_id=current_user.id,
-                        activity_type='payment_failed',
-                        description=f'Payment failed for {car_obj.name}: {message}',
-                        metadata={
-                            'order_id': order.id,
-                            'car_id': car_obj.id,
-                            'amount': float(total_amount),
-                            'payment_method': form.payment_method.data,
-                            'error': message
-                        }
-                    )
-                    
-                    flash(f'Payment failed: {message}', 'error')
+                # Hand the gateway call to a background worker; card details are never stored
+                payment_processor.submit(order.id, {
+                    'payment_method': form.payment_method.data,
+                    'card_number': form.card_number.data,
+                    'card_expiry': form.card_expiry.data,
+                    'card_cvv': form.card_cvv.data
+                })
+
+                return redirect(url_for('payment_processing', order_id=order.id))
             except Exception as e:
                 db.session.rollback()
                 app.logger.error(f"Payment error: {str(e)}")
@@ -1708,123 +1121,59 @@ def payment():
     return render_template('payment.html', form=form, car=car_info)
 
 
-def process_payment(form: PaymentForm, order: Order):
-    """Simulate a payment gateway interaction.
+def get_checkout_idempotency_key():
+    """Return the idempotency key for the current checkout, rotating it after a failed attempt"""
+    car_info = session.get('purchase_car') or {}
+    key = car_info.get('idempotency_key')
 
-    Rules:
-    - For 'credit_card' method, lightly validate card fields and return success if basic checks pass.
-    - For 'paypal' or other methods, simulate success with appropriate delays.
-    - This function does NOT perform any real network calls or charge cards.
+    if key:
+        used_by = Order.query.filter_by(idempotency_key=key).first()
+        if used_by is not None and used_by.payment_status == 'failed':
+            key = None
 
-    Returns tuple (success: bool, transaction_id: Optional[str], message: str)
-    """
-    try:
-        method = (form.payment_method.data or '').lower()
-        app.logger.info(f"Processing payment for order {order.id} with method {method}")
-
-        # Basic allowed methods
-        allowed = {'credit_card', 'paypal', 'bank_transfer', 'cash'}
-        if method not in allowed:
-            app.logger.error(f"Unsupported payment method: {method}")
-            return False, None, 'Unsupported payment method.'
-
-        # For development, we'll add a small delay to simulate network latency
-        time.sleep(1.5)
-
-        # If credit card, do validation
-        if method == 'credit_card':
-            card = (form.card_number.data or '').replace(' ', '')
-            exp = (form.card_expiry.data or '').strip()
-            cvv = (form.card_cvv.data or '').strip()
-
-            if not card:
-                return False, None, 'Card number is required.'
-            if not exp:
-                return False, None, 'Expiration date is required.'
-            if not cvv:
-                return False, None, 'CVV is required.'
-
-            if not (card.isdigit() and 12 <= len(card) <= 19):
-                return False, None, 'Invalid card number. Must be 12-19 digits.'
-            if not (cvv.isdigit() and 3 <= len(cvv) <= 4):
-                return False, None, 'Invalid CVV. Must be 3-4 digits.'
-            
-            # Basic expiry validation (MM/YY format)
-            if not exp or '/' not in exp:
-                return False, None, 'Invalid expiry date format. Use MM/YY.'
-            
-            try:
-                month, year = exp.split('/')
-                month = int(month)
-                year = int('20' + year) if len(year) == 2 else int(year)
-                
-                if not (1 <= month <= 12):
-                    return False, None, 'Invalid month in expiry date.'
-                
-                # Check if card is expired
-                current_year = datetime.now().year
-                current_month = datetime.now().month
-                
-                if year < current_year or (year == current_year and month < current_month):
-                    return False, None, 'Card has expired.'
-            except ValueError:
-                return False, None, 'Invalid expiry date format.'
-
-            # Do Luhn algorithm validation (basic checksum for card numbers)
-            if not is_valid_card_number(card):
-                # For testing, we'll still accept cards that fail checksum
-                app.logger.warning(f"Card number failed checksum: {card[:6]}...{card[-4:]}")
-                # But we'll warn in logs without failing the payment
-
-            # Simulate rejection for specific test values
-            if card.endswith('0000'):
-                return False, None, 'Card declined by issuer.'
-
-            # Simulate approval for development/testing
-            txn = f"CC_{secrets.token_hex(12)}"
-            return True, txn, 'Approved'
-
-        # Simulate success for PayPal
-        if method == 'paypal':
-            # Add slightly more delay for PayPal to simulate redirect
-            time.sleep(0.5)
-            txn = f"PP_{secrets.token_hex(12)}"
-            return True, txn, 'PayPal payment approved'
-
-        # Simulate bank transfer
-        if method == 'bank_transfer':
-            txn = f"BT_{secrets.token_hex(12)}"
-            return True, txn, 'Bank transfer confirmed'
-        
-        # Simulate cash
-        if method == 'cash':
-            txn = f"CASH_{secrets.token_hex(8)}"
-            return True, txn, 'Cash payment recorded'
+    if not key:
+        key = secrets.token_urlsafe(24)
+        session['purchase_car'] = dict(car_info, idempotency_key=key)
+    return key
+
+@app.route('/payment-processing/<int:order_id>')
+@login_required
+def payment_processing(order_id):
+    """Waiting page that polls the payment status until the gateway finishes"""
+    order = Order.query.filter_by(id=order_id, user_id=current_user.id).first()
+    if not order:
+        flash('Order not found.', 'error')
+        return redirect(url_for('cars'))
 
-        # Fallback for any other method
-        txn = f"{method.upper()}_{secrets.token_hex(10)}"
-        return True, txn, 'Payment approved'
+    if order.payment_status == 'completed':
+        return redirect(url_for('payment_success', order_id=order.id))
 
-    except Exception as e:
-        app.logger.error(f"Payment processing error: {str(e)}")
-        return False, None, f'Processing error: {str(e)}'
-
-def is_valid_card_number(card_number):
-    """
-    Validate a card number using the Luhn algorithm.
-    This is a basic checksum used by credit card companies.
-    """
-    digits = [int(d) for d in card_number if d.isdigit()]
-    checksum = 0
-    
-    for i, digit in enumerate(reversed(digits)):
-        if i % 2 == 1:  # Odd positions (from right to left)
-            doubled = digit * 2
-            checksum += doubled if doubled < 10 else doubled - 9
-        else:  # Even positions
-            checksum += digit
-            
-    return checksum % 10 == 0
+    return render_template('payment_processing.html', order=order)
+
+@app.route('/payment-status/<int:order_id>')
+@login_required
+def payment_status(order_id):
+    """JSON payment status for the processing page to poll"""
+    order = Order.query.filter_by(id=order_id, user_id=current_user.id).first()
+    if not order:
+        return jsonify({'success': False, 'message': 'Order not found'}), 404
+
+    # An order whose job was lost (worker restart) would otherwise be polled forever
+    payment_processor.resume(order)
+
+    response = {
+        'success': True,
+        'order_id': order.id,
+        'payment_status': order.payment_status,
+        'order_status': order.order_status,
+        'message': order.payment_message,
+        'done': order.payment_status in ('completed', 'failed')
+    }
+    if order.payment_status == 'completed':
+        response['redirect_url'] = url_for('payment_success', order_id=order.id)
+    elif order.payment_status == 'failed':
+        response['redirect_url'] = url_for('payment')
+    return jsonify(response)
 
 @app.route('/finance', methods=['GET', 'POST'])
 @login_required
@@ -1913,6 +1262,12 @@ def payment_success(order_id):
         flash('Order not found.', 'error')
         return redirect(url_for('cars'))
     
+    if order.payment_status in ('pending', 'authorized'):
+        return redirect(url_for('payment_processing', order_id=order.id))
+    
+    # Clear session data after successful payment
+    session.pop('purchase_car', None)
+    
     # Log user activity for successful payment
     log_user_activity(
         user_id=current_user.id,
@@ -1932,7 +1287,9 @@ def payment_success(order_id):
 @login_required
 def my_orders():
     """View user's orders"""
-    orders = Order.query.filter_by(user_id=current_user.id).order_by(Order.created_at.desc()).all()
+    # The template shows each order's car; load them in the same query
+    orders = (Order.query.options(db.joinedload(Order.car))
+              .filter_by(user_id=current_user.id).order_by(Order.created_at.desc()).all())
     return render_template('my_orders.html', orders=orders)
 
 @app.route('/cancel-order/<int:order_id>', methods=['POST'])
@@ -1996,428 +1353,18 @@ def download_invoice(order_id):
         flash('PDF generation is not available. Please install reportlab: pip install reportlab', 'error')
         return redirect(url_for('my_orders'))
     
-    # Create PDF
-    buffer = BytesIO()
-    
-    # Set up the document with margins
-    doc = SimpleDocTemplate(
-        buffer, 
-        pagesize=A4, 
-        leftMargin=36, 
-        rightMargin=36, 
-        topMargin=36, 
-        bottomMargin=36
-    )
-    
-    # Get the width and height of the page
-    width, height = A4
-    
-    # Create custom styles
-    styles = getSampleStyleSheet()
-    
-    # Custom title style with CarHub colors
-    title_style = styles['Title'].clone('CarHubTitle')
-    title_style.fontName = 'Helvetica-Bold'
-    title_style.fontSize = 24
-    title_style.leading = 30
-    title_style.alignment = 1  # Centered
-    title_style.textColor = colors.HexColor('#7c4dff')  # Primary purple color
-    
-    # Custom header style
-    header_style = styles['Heading2'].clone('CarHubHeader')
-    header_style.fontName = 'Helvetica-Bold'
-    header_style.fontSize = 14
-    header_style.textColor = colors.HexColor('#23235b')  # Dark blue
-    
-    # Custom normal text style
-    normal_style = styles['Normal'].clone('CarHubNormal')
-    normal_style.fontName = 'Helvetica'
-    normal_style.fontSize = 10
-    normal_style.leading = 12
-    
-    # Custom bold text style
-    bold_style = styles['Normal'].clone('CarHubBold')
-    bold_style.fontName = 'Helvetica-Bold'
-    bold_style.fontSize = 10
-    bold_style.leading = 12
-    
-    # Generate invoice number (combination of order ID and timestamp)
-    invoice_number = f"INV-{order.id}-{order.created_at.strftime('%Y%m%d')}"
-    
-    # Create story container for Flowables
-    story = []
-    
-    # Create custom drawing function for the first page
-    def add_first_page_elements(canvas, doc):
-        # Save canvas state
-        canvas.saveState()
-        
-        # Add watermark if paid
-        if order.payment_status.lower() == 'paid':
-            watermark_path = os.path.join(app.root_path, 'static', 'paid_watermark.png')
-            if os.path.exists(watermark_path):
-                # Position the watermark in the center of the page with transparency
-                canvas.saveState()
-                canvas.setFillAlpha(0.15)  # Set transparency
-                canvas.drawImage(watermark_path, width/2 - 100, height/2 - 100, 
-                                width=200, height=200, preserveAspectRatio=True)
-                canvas.restoreState()
-        
-        # Add logo in top left corner
-        logo_path = os.path.join(app.root_path, 'static', 'logo.png')
-        if os.path.exists(logo_path):
-            # Position logo at top left
-            canvas.drawImage(logo_path, 36, height - 90, width=120, height=60, preserveAspectRatio=True)
-        
-        # Add company info in top right with enhanced styling
-        company_info = [
-            "CarHub Premium Auto",
-            "123 Luxury Drive",
-            "Automotive City, AC 98765",
-            "support@carhub.com",
-            "+1 (555) 123-4567",
-            "www.carhub.com"
-        ]
-        
-        # Draw a light background for company info
-        canvas.setFillColor(colors.HexColor('#f8f9fa'))
-        canvas.roundRect(width - 210, height - 100, 180, 80, 5, fill=1, stroke=0)
-        
-        text_obj = canvas.beginText(width - 200, height - 50)
-        text_obj.setFont("Helvetica-Bold", 10)
-        text_obj.setFillColor(colors.HexColor('#23235b'))
-        text_obj.textLine(company_info[0])  # Company name in bold
-        text_obj.setFont("Helvetica", 9)
-        for line in company_info[1:]:
-            text_obj.textLine(line)
-        canvas.drawText(text_obj)
-        
-        # Add a decorative divider line below the header
-        canvas.setStrokeColor(colors.HexColor('#7c4dff'))
-        canvas.setLineWidth(2)
-        canvas.line(36, height - 100, width - 36, height - 100)
-        
-        # Add a subtle shadow line
-        canvas.setStrokeColor(colors.HexColor('#e6e6fa'))
-        canvas.setLineWidth(1)
-        canvas.line(36, height - 102, width - 36, height - 102)
-        
-        # Add invoice title with enhanced styling
-        canvas.saveState()
-        # Draw background for invoice title
-        canvas.setFillColor(colors.HexColor('#f0f0ff'))
-        canvas.roundRect(width/2 - 150, height - 145, 300, 30, 10, fill=1, stroke=0)
-        
-        canvas.setFont("Helvetica-Bold", 18)
-        canvas.setFillColor(colors.HexColor('#23235b'))
-        canvas.drawCentredString(width/2, height - 130, f"INVOICE #{invoice_number}")
-        canvas.restoreState()
-        
-        # Generate QR code data - in a real implementation you'd use the qrcode library
-        qr_data = f"INVOICE:{invoice_number}|ORDER:{order.id}|DATE:{order.created_at.strftime('%Y-%m-%d')}"
-        
-        # Draw a border around the QR code area
-        canvas.setStrokeColor(colors.HexColor('#7c4dff'))
-        canvas.roundRect(width - 100, 30, 60, 70, 5, fill=0, stroke=1)
-        
-        # Add QR code for invoice verification (simulated as a square with internal pattern)
-        canvas.setFillColor(colors.black)
-        canvas.rect(width - 90, 40, 50, 50, fill=0)
-        
-        # Add some patterns to simulate a QR code (this is just for visual effect)
-        canvas.setFillColor(colors.black)
-        for i in range(3):
-            for j in range(3):
-                if (i + j) % 2 == 0:  # Checker pattern
-                    canvas.rect(width - 90 + i*16, 40 + j*16, 16, 16, fill=1)
-        
-        canvas.setFont("Helvetica", 7)
-        canvas.drawCentredString(width - 65, 30, "Scan to verify invoice")
-        
-        # Add footer with improved styling
-        # Draw background for footer
-        canvas.setFillColor(colors.HexColor('#f8f9fa'))
-        canvas.roundRect(36, 30, width - 72, 50, 5, fill=1, stroke=0)
-        
-        # Add terms & conditions
-        terms_text = canvas.beginText(46, 70)
-        terms_text.setFont("Helvetica-Bold", 9)
-        terms_text.setFillColor(colors.HexColor('#23235b'))
-        terms_text.textLine("Terms & Conditions:")
-        terms_text.setFont("Helvetica", 8)
-        terms_text.setFillColor(colors.black)
-        terms_text.textLine("Payment is due within 30 days. CarHub reserves ownership until full payment.")
-        terms_text.textLine("For questions about this invoice, contact our customer support.")
-        canvas.drawText(terms_text)
-        
-        # Add page number with decorative element
-        canvas.setFont("Helvetica", 9)
-        canvas.drawRightString(width - 36, 36, f"Page {doc.page}")
-        
-        # Add decorative element to page number
-        canvas.setStrokeColor(colors.HexColor('#7c4dff'))
-        canvas.line(width - 80, 34, width - 36, 34)
-        
-        # Restore canvas state
-        canvas.restoreState()
-    
-    # Add spacer for logo area
-    story.append(Spacer(1, 140))
-    
-    # Add date and customer info in two-column layout
-    customer_data = [
-        ["BILL TO:", "INVOICE DETAILS:"],
-        [order.billing_name, f"Invoice Date: {order.created_at.strftime('%B %d, %Y')}"],
-        [order.billing_address or "N/A", f"Due Date: {(order.created_at + timedelta(days=30)).strftime('%B %d, %Y')}"],
-        [order.billing_email, f"Order ID: #{order.id}"],
-        [order.billing_phone or "N/A", f"Transaction ID: {order.transaction_id}"]
-    ]
-    
-    customer_table = Table(customer_data, colWidths=[doc.width/2 - 20, doc.width/2 - 20])
-    customer_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONT', (0, 1), (-1, -1), 'Helvetica'),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#23235b')),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-    ]))
-    
-    story.append(customer_table)
-    story.append(Spacer(1, 20))
-    
-    # Add vehicle info section with enhanced styling
-    # Create a styled header with background
-    vehicle_header = Paragraph("VEHICLE DETAILS", header_style)
-    header_background = Table([[vehicle_header]], colWidths=[doc.width])
-    header_background.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, 0), colors.HexColor('#f0f0ff')),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('LEFTPADDING', (0, 0), (0, 0), 10),
-        ('RIGHTPADDING', (0, 0), (0, 0), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    
-    story.append(header_background)
-    story.append(Spacer(1, 10))
-    
-    # Create vehicle info table
-    vehicle_info = []
-    
-    # Header row
-    vehicle_info.append(["ITEM", "DESCRIPTION", "PRICE"])
-    
-    # Vehicle row with enhanced details
-    if order.car:
-        # Extract more details from the car if available
-        car_details = [
-            f"Make/Model: {order.car.name}",
-            f"VIN: {order.car.vin if hasattr(order.car, 'vin') else 'Not Available'}",
-            f"Color: {order.car.color if hasattr(order.car, 'color') else 'Standard'}"
-        ]
-        
-        # Add year and engine details if available
-        if hasattr(order.car, 'year'):
-            car_details.insert(1, f"Year: {order.car.year}")
-        
-        if hasattr(order.car, 'engine'):
-            car_details.append(f"Engine: {order.car.engine}")
-        
-        if hasattr(order.car, 'transmission'):
-            car_details.append(f"Transmission: {order.car.transmission}")
-            
-        vehicle_info.append([
-            "Premium Vehicle",
-            "\n".join(car_details),
-            f"${order.car.price:,.2f}" if hasattr(order.car, 'price') else "N/A"
-        ])
-    else:
-        vehicle_info.append(["Vehicle", "Information Not Available", "N/A"])
+    data = invoice_data(order)
     
-    # Add fees and taxes
-    base_price = order.car.price if order.car and hasattr(order.car, 'price') else (order.total_amount / 1.1)
-    
-    # Add delivery fee if applicable
-    if hasattr(order, 'delivery_fee') and order.delivery_fee:
-        delivery_fee = order.delivery_fee
-    else:
-        delivery_fee = base_price * 0.01  # Default 1% delivery fee
-        
-    vehicle_info.append(["Delivery Fee", "Vehicle delivery and handling", f"${delivery_fee:,.2f}"])
-    vehicle_info.append(["Processing Fee", "Documentation and registration", f"${base_price * 0.02:,.2f}"])
-    vehicle_info.append(["Tax", "Sales tax (8%)", f"${base_price * 0.08:,.2f}"])
-    
-    # Add subtotal line
-    vehicle_info.append(["", "Subtotal", f"${base_price + delivery_fee + (base_price * 0.02) + (base_price * 0.08):,.2f}"])
-    
-    # Style the vehicle table
-    vehicle_table = Table(vehicle_info, colWidths=[doc.width * 0.2, doc.width * 0.5, doc.width * 0.2])
-    vehicle_table_style = TableStyle([
-        # Header row styling
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#7c4dff')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, 0), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        
-        # Vehicle row styling
-        ('FONT', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('VALIGN', (0, 1), (-1, -1), 'TOP'),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),  # Right align all prices
-        
-        # Alternate row colors
-        ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor('#f8f9fa')),
-        ('BACKGROUND', (0, 3), (-1, 3), colors.HexColor('#f8f9fa')),
-        ('BACKGROUND', (0, 5), (-1, 5), colors.HexColor('#f8f9fa')),
-        
-        # All cell borders
-        ('GRID', (0, 0), (-1, -2), 0.5, colors.grey),
-        ('LINEABOVE', (0, 0), (-1, 0), 2, colors.HexColor('#7c4dff')),
-        
-        # Subtotal row styling
-        ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
-        ('FONT', (-2, -1), (-1, -1), 'Helvetica-Bold'),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e6e6fa')),
-        ('SPAN', (0, -1), (-2, -1)),  # Span the first two columns
-        ('ALIGN', (-2, -1), (-2, -1), 'RIGHT'),  # Right align "Subtotal" text
-    ])
-    
-    # Apply the style to the table and add to story
-    vehicle_table.setStyle(vehicle_table_style)
-    story.append(vehicle_table)
-    story.append(Spacer(1, 20))
-    
-    # Create payment status indicator with color-coded badge
-    status_color = colors.HexColor('#4CAF50') if order.payment_status.lower() == 'paid' else colors.HexColor('#FF9800')
-    
-    # Add payment summary header
-    payment_header = Paragraph("PAYMENT SUMMARY", header_style)
-    story.append(payment_header)
-    story.append(Spacer(1, 10))
-    
-    # Create payment info with enhanced styling
-    payment_data = [
-        ["Payment Date:", order.created_at.strftime('%B %d, %Y')],
-        ["Transaction ID:", order.transaction_id if hasattr(order, 'transaction_id') and order.transaction_id else "N/A"],
-        ["Payment Method:", order.payment_method.replace('_', ' ').title()],
-        ["Payment Status:", ""]  # Empty cell for custom status badge
-    ]
-    
-    # Create the payment table
-    payment_table = Table(payment_data, colWidths=[doc.width * 0.3, doc.width * 0.6])
-    
-    # Style the payment table
-    payment_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONT', (1, 0), (1, -1), 'Helvetica'),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#23235b')),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f8f9fa')),
-        ('BACKGROUND', (0, 2), (-1, 2), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-    ]))
-    
-    story.append(payment_table)
-    
-    # Create a separate styled status badge
-    status_text = order.payment_status.upper()
-    status_table = Table([["", status_text]], colWidths=[10, doc.width * 0.3])
-    status_table.setStyle(TableStyle([
-        ('FONT', (1, 0), (1, 0), 'Helvetica-Bold'),
-        ('TEXTCOLOR', (1, 0), (1, 0), colors.white),
-        ('BACKGROUND', (1, 0), (1, 0), status_color),
-        ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-        ('VALIGN', (1, 0), (1, 0), 'MIDDLE'),
-        ('TOPPADDING', (1, 0), (1, 0), 6),
-        ('BOTTOMPADDING', (1, 0), (1, 0), 6),
-    ]))
-    
-    story.append(Spacer(1, -30))  # Negative spacer to position the badge at the right location
-    story.append(status_table)
-    story.append(Spacer(1, 20))
-    
-    # Create total amount section with gradient background
-    total_info = [
-        ["TOTAL AMOUNT DUE:", f"${order.total_amount:,.2f}"]
-    ]
-    
-    # Apply different styling based on payment status
-    if order.payment_status.lower() == 'paid':
-        total_info[0][0] = "TOTAL AMOUNT PAID:"
-    
-    total_table = Table(total_info, colWidths=[doc.width * 0.5, doc.width * 0.4])
-    total_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (0, 0), 'Helvetica-Bold'),
-        ('FONT', (1, 0), (1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (1, 0), 16),  # Larger font for total amount
-        ('BACKGROUND', (0, 0), (1, 0), colors.HexColor('#23235b')),  # Dark background
-        ('TEXTCOLOR', (0, 0), (1, 0), colors.white),  # White text
-        ('TOPPADDING', (0, 0), (1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (1, 0), 12),
-        ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-        ('VALIGN', (0, 0), (1, 0), 'MIDDLE'),
-        ('BOX', (0, 0), (1, 0), 2, colors.HexColor('#7c4dff')),
-    ]))
-    
-    story.append(total_table)
-    story.append(Spacer(1, 30))
-    
-    # Create a styled box for the thank you message
-    thank_you_paragraphs = [
-        Paragraph("<b>Thank you for choosing CarHub Premium Auto!</b>", bold_style),
-        Spacer(1, 5),
-        Paragraph("We value your business and look forward to serving you again. Your satisfaction is our top priority.", normal_style),
-        Spacer(1, 10),
-        Paragraph("For any questions or concerns regarding this invoice, please contact our customer service team at <b>support@carhub.com</b> or call us at <b>+1 (555) 123-4567</b>.", normal_style)
-    ]
-    
-    # Create a table for the thank you message with background
-    thank_you_content = [[p] for p in thank_you_paragraphs]
-    thank_you_table = Table(thank_you_content, colWidths=[doc.width - 80])
-    thank_you_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#23235b')),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#e6e6fa')),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('LEFTPADDING', (0, 0), (-1, -1), 20),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 20),
-    ]))
-    
-    story.append(thank_you_table)
-    
-    # Add a promotional message if appropriate
-    if order.payment_status.lower() == 'paid':
-        story.append(Spacer(1, 20))
-        promo_text = "As a valued customer, enjoy 10% off your next premium vehicle service by using code: <b>CARHUB10</b>"
-        promo_para = Paragraph(promo_text, normal_style)
-        promo_table = Table([[promo_para]], colWidths=[doc.width - 80])
-        promo_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, 0), colors.HexColor('#e6e6fa')),
-            ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-            ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
-            ('BOX', (0, 0), (0, 0), 1, colors.HexColor('#7c4dff')),
-            ('TOPPADDING', (0, 0), (0, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (0, 0), 10),
-        ]))
-        story.append(promo_table)
-    
-    # Build the PDF with our custom header/footer
-    doc.build(story, onFirstPage=add_first_page_elements, onLaterPages=add_first_page_elements)
-    buffer.seek(0)
+    # Rendered PDFs are cached on disk, keyed on the order's last update
+    try:
+        renderer = get_invoice_renderer(app.static_folder)
+        pdf_path, cache_key, cache_hit = invoice_cache.get_or_render(data, renderer.render)
+    except Exception as e:
+        print(f"Invoice generation error: {e}")
+        invoice_renders.inc('failed')
+        flash('Error generating invoice. Please try again later.', 'error')
+        return redirect(url_for('my_orders'))
+    invoice_renders.inc('cached' if cache_hit else 'rendered')
     
     # Log invoice download
     log_user_activity(
@@ -2426,266 +1373,20 @@ def download_invoice(order_id):
         description=f'Downloaded invoice for order #{order.id}',
         metadata={
             'order_id': order.id,
-            'invoice_number': invoice_number,
+            'invoice_number': invoice_number(data),
+            'cached': cache_hit,
         }
     )
     
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=carhub_invoice_{order.id}.pdf'
-    
-    return response
-    
-    # Add vehicle info section with enhanced styling
-    # Create a styled header with background
-    vehicle_header = Paragraph("VEHICLE DETAILS", header_style)
-    header_background = Table([[vehicle_header]], colWidths=[doc.width])
-    header_background.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, 0), colors.HexColor('#f0f0ff')),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('LEFTPADDING', (0, 0), (0, 0), 10),
-        ('RIGHTPADDING', (0, 0), (0, 0), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('ROUNDEDCORNERS', [5, 5, 5, 5]),
-    ]))
-    
-    story.append(header_background)
-    story.append(Spacer(1, 10))
-    
-    # Create vehicle info table
-    vehicle_info = []
-    
-    # Header row
-    vehicle_info.append(["ITEM", "DESCRIPTION", "PRICE"])
-    
-    # Vehicle row with enhanced details
-    if order.car:
-        # Extract more details from the car if available
-        car_details = [
-            f"Make/Model: {order.car.name}",
-            f"VIN: {order.car.vin if hasattr(order.car, 'vin') else 'Not Available'}",
-            f"Color: {order.car.color if hasattr(order.car, 'color') else 'Standard'}"
-        ]
-        
-        # Add year and engine details if available
-        if hasattr(order.car, 'year'):
-            car_details.insert(1, f"Year: {order.car.year}")
-        
-        if hasattr(order.car, 'engine'):
-            car_details.append(f"Engine: {order.car.engine}")
-        
-        if hasattr(order.car, 'transmission'):
-            car_details.append(f"Transmission: {order.car.transmission}")
-            
-        vehicle_info.append([
-            "Premium Vehicle",
-            "\n".join(car_details),
-            f"${order.car.price:,.2f}" if hasattr(order.car, 'price') else "N/A"
-        ])
-    else:
-        vehicle_info.append(["Vehicle", "Information Not Available", "N/A"])
-    
-    # Add fees and taxes
-    base_price = order.car.price if order.car and hasattr(order.car, 'price') else (order.total_amount / 1.1)
-    
-    # Add delivery fee if applicable
-    if hasattr(order, 'delivery_fee') and order.delivery_fee:
-        delivery_fee = order.delivery_fee
-    else:
-        delivery_fee = base_price * 0.01  # Default 1% delivery fee
-        
-    vehicle_info.append(["Delivery Fee", "Vehicle delivery and handling", f"${delivery_fee:,.2f}"])
-    vehicle_info.append(["Processing Fee", "Documentation and registration", f"${base_price * 0.02:,.2f}"])
-    vehicle_info.append(["Tax", "Sales tax (8%)", f"${base_price * 0.08:,.2f}"])
-    
-    # Add subtotal line
-    vehicle_info.append(["", "Subtotal", f"${base_price + delivery_fee + (base_price * 0.02) + (base_price * 0.08):,.2f}"])
-    
-    # Style the vehicle table
-    vehicle_table = Table(vehicle_info, colWidths=[doc.width * 0.2, doc.width * 0.5, doc.width * 0.2])
-    vehicle_table_style = TableStyle([
-        # Header row styling
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#7c4dff')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, 0), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        
-        # Vehicle row styling
-        ('FONT', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('VALIGN', (0, 1), (-1, -1), 'TOP'),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),  # Right align all prices
-        
-        # Alternate row colors
-        ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor('#f8f9fa')),
-        ('BACKGROUND', (0, 3), (-1, 3), colors.HexColor('#f8f9fa')),
-        ('BACKGROUND', (0, 5), (-1, 5), colors.HexColor('#f8f9fa')),
-        
-        # All cell borders
-        ('GRID', (0, 0), (-1, -2), 0.5, colors.grey),
-        ('LINEABOVE', (0, 0), (-1, 0), 2, colors.HexColor('#7c4dff')),
-        
-        # Subtotal row styling
-        ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
-        ('FONT', (-2, -1), (-1, -1), 'Helvetica-Bold'),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e6e6fa')),
-        ('SPAN', (0, -1), (-2, -1)),  # Span the first two columns
-        ('ALIGN', (-2, -1), (-2, -1), 'RIGHT'),  # Right align "Subtotal" text
-    ])
-    
-    vehicle_table.setStyle(vehicle_table_style)
-    story.append(vehicle_table)
-    story.append(Spacer(1, 20))
-    
-    # Create payment status indicator with color-coded badge
-    status_color = colors.HexColor('#4CAF50') if order.payment_status.lower() == 'paid' else colors.HexColor('#FF9800')
-    
-    # Add payment summary header
-    payment_header = Paragraph("PAYMENT SUMMARY", header_style)
-    story.append(payment_header)
-    story.append(Spacer(1, 10))
-    
-    # Create payment info with enhanced styling
-    payment_data = [
-        ["Payment Date:", order.created_at.strftime('%B %d, %Y')],
-        ["Transaction ID:", order.transaction_id if hasattr(order, 'transaction_id') and order.transaction_id else "N/A"],
-        ["Payment Method:", order.payment_method.replace('_', ' ').title()],
-        ["Payment Status:", ""]  # Empty cell for custom status badge
-    ]
-    
-    # Create the payment table
-    payment_table = Table(payment_data, colWidths=[doc.width * 0.3, doc.width * 0.6])
-    
-    # Style the payment table
-    payment_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONT', (1, 0), (1, -1), 'Helvetica'),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#23235b')),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f8f9fa')),
-        ('BACKGROUND', (0, 2), (-1, 2), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-    ]))
-    
-    story.append(payment_table)
-    
-    # Create a separate styled status badge
-    status_text = order.payment_status.upper()
-    status_table = Table([["", status_text]], colWidths=[10, doc.width * 0.3])
-    status_table.setStyle(TableStyle([
-        ('FONT', (1, 0), (1, 0), 'Helvetica-Bold'),
-        ('TEXTCOLOR', (1, 0), (1, 0), colors.white),
-        ('BACKGROUND', (1, 0), (1, 0), status_color),
-        ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-        ('VALIGN', (1, 0), (1, 0), 'MIDDLE'),
-        ('TOPPADDING', (1, 0), (1, 0), 6),
-        ('BOTTOMPADDING', (1, 0), (1, 0), 6),
-        ('ROUNDEDCORNERS', [5, 5, 5, 5]),
-    ]))
-    
-    story.append(Spacer(1, -30))  # Negative spacer to position the badge at the right location
-    story.append(status_table)
-    story.append(Spacer(1, 20))
-    
-    # Create total amount section with gradient background
-    total_info = [
-        ["TOTAL AMOUNT DUE:", f"${order.total_amount:,.2f}"]
-    ]
-    
-    # Apply different styling based on payment status
-    if order.payment_status.lower() == 'paid':
-        total_info[0][0] = "TOTAL AMOUNT PAID:"
-    
-    total_table = Table(total_info, colWidths=[doc.width * 0.5, doc.width * 0.4])
-    total_table.setStyle(TableStyle([
-        ('FONT', (0, 0), (0, 0), 'Helvetica-Bold'),
-        ('FONT', (1, 0), (1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (1, 0), 16),  # Larger font for total amount
-        ('BACKGROUND', (0, 0), (1, 0), colors.HexColor('#23235b')),  # Dark background
-        ('TEXTCOLOR', (0, 0), (1, 0), colors.white),  # White text
-        ('TOPPADDING', (0, 0), (1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (1, 0), 12),
-        ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-        ('VALIGN', (0, 0), (1, 0), 'MIDDLE'),
-        ('BOX', (0, 0), (1, 0), 2, colors.HexColor('#7c4dff')),
-    ]))
-    
-    story.append(total_table)
-    story.append(Spacer(1, 30))
-    
-    # Create a styled box for the thank you message
-    thank_you_paragraphs = [
-        Paragraph("<b>Thank you for choosing CarHub Premium Auto!</b>", bold_style),
-        Spacer(1, 5),
-        Paragraph("We value your business and look forward to serving you again. Your satisfaction is our top priority.", normal_style),
-        Spacer(1, 10),
-        Paragraph("For any questions or concerns regarding this invoice, please contact our customer service team at <b>support@carhub.com</b> or call us at <b>+1 (555) 123-4567</b>.", normal_style)
-    ]
-    
-    # Create a table for the thank you message with background
-    thank_you_content = [[p] for p in thank_you_paragraphs]
-    thank_you_table = Table(thank_you_content, colWidths=[doc.width - 80])
-    thank_you_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#23235b')),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#e6e6fa')),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('LEFTPADDING', (0, 0), (-1, -1), 20),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 20),
-    ]))
-    
-    story.append(thank_you_table)
-    
-    # Add a promotional message if appropriate
-    if order.payment_status.lower() == 'paid':
-        story.append(Spacer(1, 20))
-        promo_text = "As a valued customer, enjoy 10% off your next premium vehicle service by using code: <b>CARHUB10</b>"
-        promo_para = Paragraph(promo_text, normal_style)
-        promo_table = Table([[promo_para]], colWidths=[doc.width - 80])
-        promo_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, 0), colors.HexColor('#e6e6fa')),
-            ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-            ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
-            ('BOX', (0, 0), (0, 0), 1, colors.HexColor('#7c4dff')),
-            ('TOPPADDING', (0, 0), (0, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (0, 0), 10),
-        ]))
-        story.append(promo_table)
-    
-    # Build the PDF with our custom header/footer
-    doc.build(story, onFirstPage=add_first_page_elements, onLaterPages=add_first_page_elements)
-    buffer.seek(0)
-    
-    # Log invoice download
-    log_user_activity(
-        user_id=current_user.id,
-        activity_type='invoice_downloaded',
-        description=f'Downloaded invoice for order #{order.id}',
-        metadata={
-            'order_id': order.id,
-            'invoice_number': invoice_number,
-        }
+    return send_file(
+        pdf_path,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=invoice_filename(data),
+        etag=cache_key,
+        conditional=True,
+        max_age=0
     )
-    
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=carhub_invoice_{order.id}.pdf'
-    
-    return response
 
 @app.route('/create-test-order')
 @login_required
@@ -2723,7 +1424,7 @@ def create_test_order():
 @app.route('/profile')
 @login_required
 def profile():
-    return render_template('profile.html', user=current_user)
+    return render_template('profile.html', user=current_user.load_profile())
 
 def save_profile_picture(form_file):
     """Save uploaded profile picture and return filename"""
@@ -2748,6 +1449,7 @@ def save_profile_picture(form_file):
 @login_required
 def edit_profile():
     form = ProfileForm()
+    user = current_user.load_profile()
     
     if request.method == 'GET':
         # Pre-populate form with existing user data
@@ -2801,7 +1503,7 @@ def edit_profile():
             flash('An error occurred while updating your profile. Please try again.', 'error')
             print(f"Profile update error: {e}")
     
-    return render_template('edit_profile.html', form=form, user=current_user)
+    return render_template('edit_profile.html', form=form, user=user)
 
 @app.route('/dashboard')
 @login_required
@@ -2843,32 +1545,33 @@ def admin_panel():
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('index'))
     
-    # Get dashboard statistics
-    total_users = User.query.count()
-    total_orders = Order.query.count()
-    total_finance_apps = FinanceApplication.query.count()
-    recent_activities = UserActivity.query.order_by(UserActivity.created_at.desc()).limit(10).all()
-    
-    # Revenue calculation
-    completed_orders = Order.query.filter_by(payment_status='completed').all()
-    total_revenue = sum(order.total_amount for order in completed_orders)
-    
-    # Recent users (last 7 days)
-    from datetime import timedelta
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    new_users_this_week = User.query.filter(User.created_at >= week_ago).count()
-    
-    stats = {
-        'total_users': total_users,
-        'total_orders': total_orders,
-        'total_finance_apps': total_finance_apps,
-        'total_revenue': total_revenue,
-        'new_users_this_week': new_users_this_week,
-        'recent_activities': recent_activities
-    }
+    # Aggregates come from the cached snapshot; only the activity feed is queried live
+    stats = dict(dashboard_stats.snapshot())
+    stats['recent_activities'] = UserActivity.query.order_by(UserActivity.created_at.desc()).limit(10).all()
     
     return render_template('admin_panel.html', stats=stats)
 
+@app.route('/admin/dashboard/stats')
+@login_required
+def admin_dashboard_stats():
+    """Dashboard aggregates as JSON"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Admin privileges required'}), 403
+    
+    snapshot = dashboard_stats.snapshot()
+    return jsonify({
+        'success': True,
+        'stats': {
+            **snapshot,
+            'week_start': snapshot['week_start'].isoformat(),
+            'generated_at': snapshot['generated_at'].isoformat(),
+        }
+    })
+
+def admin_user_list_options():
+    """Loader options for the admin user list: profile columns and order ids (for the order count) per page"""
+    return (undefer_group('profile'), db.selectinload(User.orders).load_only(Order.id))
+
 @app.route('/admin/users')
 @login_required
 def admin_users():
@@ -2877,21 +1580,20 @@ def admin_users():
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('index'))
     
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', type=str)
     search = request.args.get('search', '', type=str)
     
-    query = User.query
     if search:
-        query = query.filter(
-            (User.username.contains(search)) | 
-            (User.email.contains(search)) |
-            (User.first_name.contains(search)) |
-            (User.last_name.contains(search))
-        )
-    
-    users = query.order_by(User.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+        # Ranked results from the search index, best match first
+        limit = app.config['USER_SEARCH_LIMIT']
+        user_ids = user_search.search(search, limit=limit)
+        by_id = {user.id: user for user in
+                 User.query.options(*admin_user_list_options()).filter(User.id.in_(user_ids)).all()}
+        matches = [by_id[user_id] for user_id in user_ids if user_id in by_id]
+        label = f"{len(matches)}+" if len(user_ids) >= limit else str(len(matches))
+        users = KeysetPage(matches, per_page=limit, total=len(matches), total_label=label)
+    else:
+        users = paginator.paginate(User.query.options(*admin_user_list_options()), User, cursor=cursor, per_page=20)
     
     return render_template('admin_users.html', users=users, search=search)
 
@@ -2903,19 +1605,74 @@ def admin_orders():
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('index'))
     
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', type=str)
     status_filter = request.args.get('status', 'all', type=str)
     
-    query = Order.query
+    # Each row shows its customer and car; join them in rather than one query per row
+    query = Order.query.options(db.joinedload(Order.user), db.joinedload(Order.car))
     if status_filter != 'all':
         query = query.filter(Order.payment_status == status_filter)
     
-    orders = query.order_by(Order.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    orders = paginator.paginate(query, Order, cursor=cursor, per_page=20)
     
     return render_template('admin_orders.html', orders=orders, status_filter=status_filter)
 
+def invoice_export_query(start=None, end=None, status='all'):
+    """Orders for bulk invoice export, oldest first; `end` is an inclusive date"""
+    query = Order.query.options(db.joinedload(Order.car))
+    if start:
+        query = query.filter(Order.created_at >= start)
+    if end:
+        query = query.filter(Order.created_at < end + timedelta(days=1))
+    if status and status != 'all':
+        query = query.filter(Order.payment_status == status)
+    return query.order_by(Order.created_at, Order.id)
+
+@app.route('/admin/invoices/export')
+@login_required
+def admin_export_invoices():
+    """Stream a ZIP of invoices for orders in a date range and/or payment status"""
+    if not is_admin(current_user):
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('index'))
+    
+    if not PDF_AVAILABLE:
+        flash('PDF generation is not available. Please install reportlab: pip install reportlab', 'error')
+        return redirect(url_for('admin_orders'))
+    
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') if request.args.get('end') else None
+    except ValueError:
+        flash('Invalid date. Use YYYY-MM-DD.', 'error')
+        return redirect(url_for('admin_orders'))
+    status = request.args.get('status', 'all', type=str)
+    
+    log_user_activity(
+        user_id=current_user.id,
+        activity_type='invoices_exported',
+        description='Exported invoices in bulk',
+        metadata={'start': request.args.get('start'), 'end': request.args.get('end'), 'status': status}
+    )
+    
+    query = invoice_export_query(start, end, status)
+    datas = (invoice_data(order) for order in query.yield_per(200))
+    chunks = export_invoices_zip(
+        datas,
+        app.static_folder,
+        max_workers=app.config['INVOICE_EXPORT_WORKERS'],
+        cache=invoice_cache,
+        on_invoice=lambda row: invoice_renders.inc(
+            'failed' if row['error'] else 'cached' if row['cached'] == 'yes' else 'rendered')
+    )
+    
+    filename = f"carhub_invoices_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.zip"
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @app.route('/admin/activities')
 @login_required
 def admin_activities():
@@ -2924,7 +1681,7 @@ def admin_activities():
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('index'))
     
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', type=str)
     activity_type = request.args.get('type', 'all', type=str)
     user_id = request.args.get('user_id', type=int)
     
@@ -2934,13 +1691,118 @@ def admin_activities():
     if user_id:
         query = query.filter(UserActivity.user_id == user_id)
     
-    activities = query.order_by(UserActivity.created_at.desc()).paginate(
-        page=page, per_page=50, error_out=False
-    )
+    activities = paginator.paginate(query, UserActivity, cursor=cursor, per_page=50)
     
     return render_template('admin_activities.html', activities=activities, 
                          activity_type=activity_type, user_id=user_id)
 
+@app.route('/admin/activity-log/stats')
+@login_required
+def admin_activity_log_stats():
+    """Activity log writer queue depth and delivery counters"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Admin privileges required'}), 403
+
+    return jsonify({'success': True, 'stats': activity_writer.stats()})
+
+@app.route('/admin/chat/cache/stats')
+@login_required
+def admin_chat_cache_stats():
+    """Chatbot response cache hit ratio and LLM time saved"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Admin privileges required'}), 403
+
+    cache = chatbot_instance.response_cache if chatbot_instance else None
+    if cache is None:
+        return jsonify({'success': False, 'message': 'Chat response cache is disabled'}), 404
+    return jsonify({'success': True, 'stats': cache.stats()})
+
+@app.route('/admin/chat/memory/stats')
+@login_required
+def admin_chat_memory_stats():
+    """Chatbot conversation memory and prompt sizes sent to the LLM"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Admin privileges required'}), 403
+
+    if chatbot_instance is None:
+        return jsonify({'success': False, 'message': 'Chatbot is not available'}), 404
+    memory = chatbot_instance.memory
+    return jsonify({
+        'success': True,
+        'memory': memory.stats() if memory is not None else None,
+        'prompts': chatbot_instance.prompt_stats()
+    })
+
+@app.route('/admin/chat/llm/stats')
+@login_required
+def admin_chat_llm_stats():
+    """LLM gateway circuit state, slot usage and completion latency histograms"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Admin privileges required'}), 403
+
+    if chatbot_instance is None:
+        return jsonify({'success': False, 'message': 'Chatbot is not available'}), 404
+    return jsonify({'success': True, 'stats': chatbot_instance.llm.stats()})
+
+@app.route('/admin/users/cache/stats')
+@login_required
+def admin_user_cache_stats():
+    """Logged-in user cache hit ratio and invalidations"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Admin privileges required'}), 403
+
+    if principal_cache is None:
+        return jsonify({'success': False, 'message': 'User cache is disabled'}), 404
+    return jsonify({'success': True, 'stats': principal_cache.stats()})
+
+@app.route('/admin/mail/stats')
+@login_required
+def admin_mail_stats():
+    """Outbound mail queue depth, delivery counters and latency"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Admin privileges required'}), 403
+
+    return jsonify({'success': True, 'stats': mail_queue.stats()})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape target"""
+    if not app.config['METRICS_ENABLED']:
+        return Response('Metrics are disabled\n', status=404, mimetype='text/plain')
+    token = app.config['METRICS_TOKEN']
+    if token:
+        # Compared as bytes: compare_digest rejects non-ASCII str, which a client could send
+        sent = request.headers.get('Authorization', '').encode('utf-8', 'surrogateescape')
+        allowed = secrets.compare_digest(sent, f'Bearer {token}'.encode('utf-8'))
+    else:
+        # No token: only a scraper on this host, not one reaching us through a local proxy
+        allowed = request.remote_addr in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+    if not allowed:
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/admin/sql-profile')
+@login_required
+def admin_sql_profile():
+    """Routes ranked by total database time, with their slowest statements"""
+    if not is_admin(current_user):
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('index'))
+
+    return render_template('admin_sql_profile.html', stats=sql_profiler.stats() if sql_profiler else None)
+
+@app.route('/admin/sql-profile/stats')
+@login_required
+def admin_sql_profile_stats():
+    """Sampled request counts and the top routes by database time"""
+    if not is_admin(current_user):
+        return jsonify({'success': False, 'message': 'Admin privileges required'}), 403
+
+    if sql_profiler is None:
+        return jsonify({'success': False, 'message': 'SQL profiling is disabled'}), 404
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    return jsonify({'success': True, 'stats': sql_profiler.stats(limit=limit)})
+
 @app.route('/admin/user/<int:user_id>')
 @login_required
 def admin_user_detail(user_id):
@@ -2949,8 +1811,9 @@ def admin_user_detail(user_id):
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('index'))
     
-    user = User.query.get_or_404(user_id)
-    user_orders = Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
+    user = User.query.options(undefer_group('profile')).filter_by(id=user_id).first_or_404()
+    user_orders = (Order.query.options(db.joinedload(Order.car))
+                   .filter_by(user_id=user_id).order_by(Order.created_at.desc()).all())
     user_finance_apps = FinanceApplication.query.filter_by(user_id=user_id).order_by(FinanceApplication.created_at.desc()).all()
     user_activities = UserActivity.query.filter_by(user_id=user_id).order_by(UserActivity.created_at.desc()).limit(50).all()
     
@@ -2982,25 +1845,27 @@ def create_tables():
     except Exception as e:
         print(f"Error creating database tables: {e}")
 
-# Initialize chatbot
+# Initialize chatbot (routes now; the chatbot itself is built by the first request that uses it)
 try:
     from chatbot import create_chatbot_routes
-    chatbot_instance = create_chatbot_routes(app, db, User, Car, Order)
-    print("✅ Chatbot initialized successfully!")
+    chatbot_instance = create_chatbot_routes(app, db, User, Car, Order, catalog=catalog, metrics=metrics)
 except Exception as e:
-    print(f"❌ Error initializing chatbot: {e}")
-    print("💡 Make sure you have set your OPENAI_API_KEY in your .env file")
+    chatbot_instance = None
+    app.logger.error(f"Error initializing chatbot: {e}. Make sure you have set your OPENAI_API_KEY in your .env file")
 
-# Initialize password reset system
+# Initialize password reset system (routes now; the manager and its OTP store on first use)
 try:
     from password_reset import PasswordResetManager
     from password_reset_routes import init_password_reset_routes
-    password_reset_manager = PasswordResetManager(app, mail, db, User)
+    password_reset_manager = LazyObject(
+        lambda: PasswordResetManager(app, mail, db, User,
+                                     otp_store=create_otp_store(app, db, PasswordResetOTP),
+                                     mail_queue=mail_queue),
+        'password_reset_manager')
     init_password_reset_routes(app, password_reset_manager)
-    print("✅ Password reset system initialized successfully!")
 except Exception as e:
-    print(f"❌ Error initializing password reset system: {e}")
-    print("💡 Make sure your email settings are configured in .env file")
+    app.logger.error(f"Error initializing password reset system: {e}. "
+                     "Make sure your email settings are configured in .env file")
         
 def create_sample_parts():
     """Create sample parts data if none exists"""
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Chat matcher benchmark
+Compares the old per-list keyword scans with the precompiled ChatMatcher on the two paths
+that analyze every message: fallback replies and LLM replies
+
+Usage:
+    python benchmark_chat_matcher.py --messages 20000 --reply-chars 2000
+"""
+
+import argparse
+import random
+import time
+
+SAMPLES = [
+    "Hi there! I'm looking for an electric SUV under $60,000",
+    "What financing options do you have for the Tesla Model 3?",
+    "Can I trade in my old car when I buy a new one?",
+    "How much does the Lamborghini Revuelto cost?",
+    "My brakes are squeaking, can you schedule a repair appointment?",
+    "Do you have any vintage or classic cars from the 1960s?",
+    "I want to sell my BMW M2 G87, what's the process for car selling?",
+    "Tell me about the Rolls Royce Ghost and the Bentley Mulliner Batur",
+    "What are your opening hours and how can I contact the showroom?",
+    "Every weekend I drive seventy miles; which model has the best range?",
+]
+
+REPLY_SENTENCES = [
+    "The Tesla Model 3 and Hyundai Ioniq 5N are both in stock right now.",
+    "Our car buying specialists can arrange a virtual tour or a test drive.",
+    "Car servicing is included for the first year with every purchase.",
+    "Financing is available with flexible monthly plans and quick approval.",
+    "Trade-in valuations are free and usually take less than a day.",
+    "The Ferrari 296 GTB pairs a twin-turbo V6 with a plug-in hybrid system.",
+    "Every vehicle passes a rigorous multi-point inspection before delivery.",
+    "Contact us for more information or to book an appointment.",
+]
+
+
+def legacy_analyze(chatbot, response, user_message):
+    """The per-call lower() and any(word in ...) scans the matcher replaced"""
+    message_lower = user_message.lower()
+    if any(word in message_lower for word in ['buy', 'purchase', 'looking for', 'want to buy']):
+        intent = 'buying_intent'
+    elif any(word in message_lower for word in ['sell', 'selling', 'trade', 'trade-in']):
+        intent = 'selling_intent'
+    elif any(word in message_lower for word in ['service', 'maintenance', 'repair', 'fix']):
+        intent = 'service_intent'
+    elif any(word in message_lower for word in ['price', 'cost', 'how much', 'pricing']):
+        intent = 'pricing_inquiry'
+    elif any(word in message_lower for word in ['financing', 'loan', 'payment', 'finance']):
+        intent = 'financing_inquiry'
+    else:
+        intent = 'general_inquiry'
+    cars = [car['name'] for car in chatbot.knowledge_base['current_inventory'] if car['name'].lower() in response.lower()]
+    services = [s for s in chatbot.knowledge_base['services'] if s.replace('_', ' ') in response.lower()]
+    followup = any(word in response.lower() for word in
+                   ['contact', 'schedule', 'visit', 'appointment', 'specialist', 'call', 'more information'])
+    return intent, cars, services, followup
+
+
+def legacy_topic(user_message):
+    message_lower = user_message.lower()
+    for topic, words in [
+        ('greeting', ['hello', 'hi', 'hey', 'greetings']),
+        ('buying', ['buy', 'purchase', 'looking for', 'want to buy']),
+        ('selling', ['sell', 'selling', 'trade']),
+        ('service', ['service', 'maintenance', 'repair']),
+        ('luxury', ['luxury', 'expensive', 'premium']),
+        ('electric', ['electric', 'ev', 'tesla', 'eco']),
+        ('financing', ['financing', 'loan', 'payment', 'credit']),
+        ('vintage', ['vintage', 'classic', 'old', 'antique']),
+        ('pricing', ['price', 'cost', 'how much', 'expensive']),
+        ('contact', ['contact', 'phone', 'call', 'reach']),
+    ]:
+        if any(word in message_lower for word in words):
+            return topic
+    return None
+
+
+def time_per_item(fn, items):
+    fn(items[:100])  # warm up
+    started = time.perf_counter()
+    fn(items)
+    return (time.perf_counter() - started) / len(items)
+
+
+def run(count, reply_chars, seed):
+    from chatbot import CarHubChatbot
+
+    chatbot = CarHubChatbot(None, None, None, None)
+    rng = random.Random(seed)
+
+    started = time.perf_counter()
+    chatbot._build_matcher()
+    build_ms = (time.perf_counter() - started) * 1000
+
+    # Every user message is different, as in production; the canned replies are not
+    messages = [f"{rng.choice(SAMPLES)} (#{i})" for i in range(count)]
+    canned = {message: chatbot._get_fallback_response(message)['message'] for message in messages}
+
+    def legacy_fallback(batch):
+        for message in batch:
+            legacy_topic(message)
+            legacy_analyze(chatbot, canned[message], message)
+
+    def matcher_fallback(batch):
+        for message in batch:
+            chatbot.matcher.match(message, ('topic',))['topic']
+            chatbot._analyze_response(canned[message], message)
+
+    # LLM replies are long and never repeat
+    replies = []
+    for i in range(max(1, count // 10)):
+        parts, length = [], 0
+        while length < reply_chars:
+            parts.append(rng.choice(REPLY_SENTENCES))
+            length += len(parts[-1]) + 1
+        replies.append((messages[i], ' '.join(parts) + f" Ref {i}."))
+
+    def legacy_llm(batch):
+        for message, reply in batch:
+            legacy_analyze(chatbot, reply, message)
+
+    def matcher_llm(batch):
+        for message, reply in batch:
+            chatbot._analyze_response(reply, message)
+
+    print("-" * 64)
+    print(f"{'path':>22} {'implementation':>16} {'us/message':>12} {'messages/s':>12}")
+    for path, legacy, compiled, items in (
+        ('fallback reply', legacy_fallback, matcher_fallback, messages),
+        (f'LLM reply ~{reply_chars} chars', legacy_llm, matcher_llm, replies),
+    ):
+        for name, fn in (('legacy scans', legacy), ('ChatMatcher', compiled)):
+            per_item = time_per_item(fn, items)
+            print(f"{path:>22} {name:>16} {per_item * 1e6:>12.1f} {1 / per_item:>12,.0f}")
+    print(f"Matcher build: {build_ms:.1f} ms (once per knowledge base)")
+
+    # Where the two disagree, the legacy scan matched inside another word
+    for message in SAMPLES:
+        old, new = legacy_topic(message), chatbot.matcher.match(message, ('topic',))['topic']
+        if old != new:
+            print(f"   topic {old!r} -> {new!r}: {message}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark chatbot keyword matching')
+    parser.add_argument('--messages', type=int, default=20000, help='Messages per run')
+    parser.add_argument('--reply-chars', type=int, default=2000, help='Approximate length of each LLM reply')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the message mix')
+    args = parser.parse_args()
+
+    run(args.messages, args.reply_chars, args.seed)
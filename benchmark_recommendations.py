@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Recommendation engine benchmark
+Times RecommendationEngine queries over a synthetic catalog of many listings
+
+Usage:
+    python benchmark_recommendations.py --listings 50000 --queries 2000
+"""
+
+import argparse
+import random
+import time
+
+from recommender import RecommendationEngine
+
+CATEGORIES = ['sports', 'luxury', 'electric', 'hypercar', 'classic', 'suv', 'sedan']
+STATUSES = ['Available'] * 8 + ['Reserved', 'Sold']
+QUERIES = [
+    {'budget': '$50k-$100k', 'category': 'sports', 'usage': 'performance'},
+    {'budget': 60000, 'usage': 'eco'},
+    {'category': ['luxury', 'hypercar'], 'usage': 'luxury'},
+    {'budget': 'under_40k', 'usage': 'daily'},
+    {'category': 'classic', 'usage': 'collector'},
+]
+
+
+class SyntheticCatalog:
+    """Stands in for VehicleCatalog: same entry keys, fixed version"""
+
+    version = 1
+
+    def __init__(self, count, seed):
+        rng = random.Random(seed)
+        self._entries = []
+        for i in range(count):
+            price = round(rng.lognormvariate(11.3, 1.0), -2)
+            self._entries.append({
+                'name': f'Listing {i}',
+                'slug': f'listing-{i}',
+                'price': f'${price:,.0f}',
+                'price_value': price,
+                'category': rng.choice(CATEGORIES),
+                'status': rng.choice(STATUSES),
+                'horsepower': f'{rng.randint(90, 1500)} hp',
+                'acceleration': f'{rng.uniform(2.0, 12.0):.1f} seconds (0-60 mph)',
+                'year': str(rng.randint(1955, 2025)),
+                'engine': rng.choice(['Electric', '2.0L I4', '4.0L V8', '6.5L V12']),
+            })
+
+    def all(self):
+        return self._entries
+
+
+def run(listings, queries, seed):
+    engine = RecommendationEngine(SyntheticCatalog(listings, seed))
+
+    started = time.perf_counter()
+    engine.recommend({'usage': 'daily'})
+    build_ms = (time.perf_counter() - started) * 1000
+
+    batch = [QUERIES[i % len(QUERIES)] for i in range(queries)]
+    started = time.perf_counter()
+    for preferences in batch:
+        engine.recommend(preferences, 5)
+    per_query = (time.perf_counter() - started) / queries
+
+    print("-" * 56)
+    print(f"Listings:           {listings:,}")
+    print(f"Array build:        {build_ms:.1f} ms (once per catalog version)")
+    print(f"Query (top 5):      {per_query * 1e6:.0f} us  ({1 / per_query:,.0f} queries/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark car recommendations')
+    parser.add_argument('--listings', type=int, default=50000, help='Synthetic catalog size')
+    parser.add_argument('--queries', type=int, default=2000, help='Queries to time')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the catalog')
+    args = parser.parse_args()
+
+    run(args.listings, args.queries, args.seed)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark
+Times `import app` in fresh interpreters with `python -X importtime` and fails when it goes over budget
+or when a module that should load lazily is imported at start-up
+
+Usage:
+    python benchmark_startup.py --budget-ms 1000 --runs 5
+    python benchmark_startup.py --module populate_cars --top 30
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Imported on first use (see lazy.py, invoices.py, llm_gateway.py, retrieval_index.py and chatbot.py)
+LAZY_MODULES = ('openai', 'reportlab', 'sklearn', 'scipy', 'numpy', 'google.auth')
+
+
+def import_times(module='app', env=None):
+    """Import `module` in a fresh interpreter, with `env` added to the environment;
+    returns (wall seconds, [(name, self_us, cumulative_us, depth)])"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, **(env or {})),
+        capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return wall, rows
+
+
+def eager_lazy_modules(rows):
+    """Modules from LAZY_MODULES that were imported anyway"""
+    names = {name for name, _, _, _ in rows}
+    return sorted(lazy for lazy in LAZY_MODULES if lazy in names)
+
+
+def run(module, runs, budget_ms, top):
+    results = [import_times(module) for _ in range(runs)]
+    totals = [sum(cumulative for _, _, cumulative, depth in rows if depth == 0) / 1000 for _, rows in results]
+    walls = [wall * 1000 for wall, _ in results]
+    best = min(range(runs), key=totals.__getitem__)
+    rows = results[best][1]
+
+    print("-" * 64)
+    print(f"Module:             {module}")
+    print(f"Import time:        best {totals[best]:.0f} ms, worst {max(totals):.0f} ms ({runs} runs)")
+    print(f"Interpreter wall:   best {min(walls):.0f} ms")
+    print(f"Modules imported:   {len(rows)}")
+    print(f"Slowest imports (cumulative, top {top}):")
+    for name, _, cumulative, depth in sorted(rows, key=lambda row: -row[2])[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {'  ' * depth}{name}")
+
+    ok = True
+    eager = eager_lazy_modules(rows)
+    if eager:
+        print(f"❌ Imported at start-up but meant to load lazily: {', '.join(eager)}")
+        ok = False
+    if budget_ms and totals[best] > budget_ms:
+        print(f"❌ Over budget: {totals[best]:.0f} ms > {budget_ms:.0f} ms")
+        ok = False
+    if ok:
+        print(f"✅ Within budget ({budget_ms:.0f} ms)" if budget_ms else "✅ No lazy module imported")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark CarHub start-up import time')
+    parser.add_argument('--module', default='app', help='Module to import (default: app)')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters to time; the best run counts')
+    parser.add_argument('--budget-ms', type=float, default=1000, help='Import time budget, 0 to disable')
+    parser.add_argument('--top', type=int, default=15, help='Slowest imports to list')
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.module, args.runs, args.budget_ms, args.top) else 1)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Admin user search benchmark
+Compares the old LIKE scan with the FTS5 and trigram indexes as the user table grows
+
+Usage:
+    python benchmark_user_search.py --sizes 10000,100000,1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+FIRST_NAMES = ['John', 'Ann', 'Maria', 'Robert', 'Li', 'Priya', 'Ahmed', 'Sofia', 'Lucas', 'Emma',
+               'Noah', 'Olivia', 'Ravi', 'Chen', 'Fatima', 'Diego', 'Hana', 'Ivan', 'Zoe', 'Omar']
+LAST_NAMES = ['Smith', 'Jones', 'Garcia', 'Patel', 'Nguyen', 'Kim', 'Müller', 'Rossi', 'Silva', 'Khan',
+              'Brown', 'Lopez', 'Singh', 'Ivanova', 'Cohen', 'Sato', 'Dubois', 'Novak', 'Haddad', 'Berg']
+DOMAINS = ['gmail.com', 'yahoo.com', 'outlook.com', 'carhub.com', 'example.org']
+
+TERMS = ['smi', 'john', 'maria lop', 'patel', 'user12', 'outlook', 'zz-no-match']
+
+
+def make_users(start, count, rng):
+    for i in range(start, start + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield {
+            'username': f"{first.lower()}{last.lower()}{i}" if i % 3 else f"user{i}",
+            'email': f"{first.lower()}.{last.lower()}{i}@{rng.choice(DOMAINS)}",
+            'first_name': first,
+            'last_name': last,
+        }
+
+
+def time_query(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1] if len(samples) > 1 else samples[0]
+
+
+def run(sizes, backends, repeat, trigram_max):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='carhub-search-'), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from app import app, db, User
+    from user_search import FTS5UserSearch, TrigramUserSearch
+
+    rng = random.Random(42)
+    results = []
+
+    with app.app_context():
+        db.create_all()
+        fts5 = FTS5UserSearch(db) if 'fts5' in backends else None
+        trigram = TrigramUserSearch(db, User) if 'trigram' in backends else None
+        if fts5:
+            fts5.ensure_index()
+
+        seeded = 0
+        for size in sizes:
+            print(f"🔧 Seeding users {seeded + 1:,}..{size:,}")
+            started = time.perf_counter()
+            rows = list(make_users(seeded, size - seeded, rng))
+            for offset in range(0, len(rows), 10000):
+                db.session.execute(db.insert(User), rows[offset:offset + 10000])
+                db.session.commit()
+            seeded = size
+            print(f"   done in {time.perf_counter() - started:.1f}s")
+
+            def like_search(term):
+                query = User.query.filter(
+                    (User.username.contains(term)) |
+                    (User.email.contains(term)) |
+                    (User.first_name.contains(term)) |
+                    (User.last_name.contains(term))
+                )
+                # The old admin_users page: first page plus a full COUNT(*)
+                query.order_by(User.created_at.desc()).limit(20).all()
+                query.count()
+
+            runners = {}
+            if 'like' in backends:
+                runners['like'] = like_search
+            if fts5:
+                runners['fts5'] = lambda term: fts5.search(term)
+            if trigram and size <= trigram_max:
+                started = time.perf_counter()
+                trigram.rebuild()
+                print(f"   trigram index built in {time.perf_counter() - started:.1f}s")
+                runners['trigram'] = lambda term: trigram.search(term)
+
+            for name, fn in runners.items():
+                timings = [time_query(lambda: fn(term), repeat) for term in TERMS]
+                p50 = statistics.median(t[0] for t in timings)
+                p95 = max(t[1] for t in timings)
+                results.append((size, name, p50, p95))
+                print(f"   {name:8s} p50 {p50:9.2f} ms   worst p95 {p95:9.2f} ms")
+
+    print("-" * 60)
+    print(f"{'users':>10} {'backend':>8} {'p50 ms':>10} {'p95 ms':>10}")
+    for size, name, p50, p95 in results:
+        print(f"{size:>10,} {name:>8} {p50:>10.2f} {p95:>10.2f}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark admin user search backends')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='Comma-separated user counts')
+    parser.add_argument('--backends', default='like,fts5,trigram', help='Comma-separated: like, fts5, trigram')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per search term')
+    parser.add_argument('--trigram-max', type=int, default=100000,
+                        help='Skip the in-memory trigram index above this many users')
+    args = parser.parse_args()
+
+    run(sorted(int(size) for size in args.sizes.split(',')), set(args.backends.split(',')),
+        args.repeat, args.trigram_max)
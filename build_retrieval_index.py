@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Chatbot retrieval index build
+Indexes catalog cars, parts, services and features for the chatbot; running workers pick up the new build
+
+Usage:
+    python build_retrieval_index.py
+    python build_retrieval_index.py -o instance/retrieval_index --query "carbon ceramic brakes"
+"""
+
+import argparse
+import os
+import time
+
+from app import app, Car, Part, chatbot_instance
+from retrieval_index import Retriever, build_index, collect_documents
+
+
+def build_retrieval_index(directory=None):
+    directory = directory or app.config['RETRIEVAL_INDEX_PATH'] or os.path.join(app.instance_path, 'retrieval_index')
+    os.makedirs(directory, exist_ok=True)
+    print(f"📚 Building retrieval index in {directory}...")
+
+    started = time.perf_counter()
+    with app.app_context():
+        documents = collect_documents(
+            cars=Car.query.order_by(Car.id).all(),
+            parts=Part.query.order_by(Part.id).all(),
+            knowledge_base=chatbot_instance.knowledge_base if chatbot_instance else None,
+        )
+    if not documents:
+        print("❌ Nothing to index")
+        return None
+    meta = build_index(documents, directory)
+
+    print("-" * 60)
+    print(f"✅ {meta['documents']} documents, {meta['terms']} terms, {meta['nonzeros']} weights "
+          f"in {time.perf_counter() - started:.1f}s (build {meta['version']})")
+    return directory
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the CarHub chatbot retrieval index')
+    parser.add_argument('-o', '--output', help='Index directory (default: RETRIEVAL_INDEX_PATH)')
+    parser.add_argument('-q', '--query', help='Search the new build and print the matches')
+    args = parser.parse_args()
+
+    directory = build_retrieval_index(args.output)
+    if directory and args.query:
+        for hit in Retriever(directory, top_k=app.config['RETRIEVAL_TOP_K']).search(args.query):
+            print(f"  {hit['score']:.3f}  [{hit['kind']}] {hit['title']}")
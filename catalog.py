@@ -0,0 +1,191 @@
+"""
+CarHub Vehicle Catalog
+Read-only, in-process index of the Car table keyed by slug
+"""
+
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from sqlalchemy import event
+
+
+class VehicleCatalog:
+    def __init__(self, db, Car, stamp_path=None, stamp_check_interval=1.0):
+        """Serve car listings from an immutable snapshot of the Car table.
+
+        The snapshot is built on first use and kept until invalidate() is
+        called. Commits that touch Car rows invalidate it automatically;
+        other processes (populate_cars.py, admin scripts) signal a change by
+        touching the stamp file, which is checked at most once per
+        `stamp_check_interval` seconds.
+        """
+        self.db = db
+        self.Car = Car
+        self.stamp_path = stamp_path
+        self.stamp_check_interval = stamp_check_interval
+
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._generation = 0
+        self._stamp_mtime = self._read_stamp()
+        self._next_stamp_check = 0.0
+
+        self._register_hooks()
+
+    # Public API
+
+    def get(self, slug):
+        """Return the catalog entry for a slug, or None if unknown"""
+        if not slug:
+            return None
+        return self._current()[0].get(slug.lower())
+
+    def all(self):
+        """Return every catalog entry in display order"""
+        return self._current()[1]
+
+    def invalidate(self):
+        """Drop the snapshot so the next read reloads it from the database"""
+        with self._lock:
+            self._snapshot = None
+            self._generation += 1
+        self._touch_stamp()
+
+    @property
+    def version(self):
+        """Monotonic counter bumped on every invalidation, including ones signalled by other processes"""
+        self._check_stamp()
+        return self._generation
+
+    # Snapshot handling
+
+    def _current(self):
+        self._check_stamp()
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            generation = self._generation
+
+        snapshot = self._build()
+
+        with self._lock:
+            # Only publish if nobody invalidated while we were loading
+            if generation == self._generation:
+                self._snapshot = snapshot
+        return snapshot
+
+    def _build(self):
+        cars = self.Car.query.order_by(self.Car.id).all()
+        entries = tuple(self._to_entry(car) for car in cars)
+        by_slug = MappingProxyType({entry['slug']: entry for entry in entries})
+        return by_slug, entries
+
+    @staticmethod
+    def _to_entry(car):
+        """Convert a Car row into the read-only mapping the templates expect"""
+        try:
+            features = tuple(json.loads(car.features)) if car.features else ()
+        except (TypeError, ValueError):
+            features = ()
+
+        return MappingProxyType({
+            'id': car.slug,
+            'db_id': car.id,
+            'slug': car.slug,
+            'name': car.name,
+            'brand': car.name.split(' ')[0],
+            'type': 'car',
+            'price': f"${car.price:,.0f}",
+            'price_value': car.price,
+            'category': car.category,
+            'description': car.description or '',
+            'video_url': car.video_url,
+            'model': car.model_file,
+            'image': car.model_file,
+            'year': car.year or '',
+            'engine': car.engine or '',
+            'horsepower': car.horsepower or '',
+            'torque': car.torque or '',
+            'topSpeed': car.top_speed or '',
+            'acceleration': car.acceleration or '',
+            'transmission': car.transmission or '',
+            'drivetrain': car.drivetrain or '',
+            'fuelEconomy': car.fuel_economy or '',
+            'features': features,
+            'status': car.status or 'Available',
+            'mileage': car.mileage or '0 miles',
+            'location': car.location or '',
+            'color': car.color or '',
+        })
+
+    # Cross-process invalidation via stamp file
+
+    def _read_stamp(self):
+        if not self.stamp_path:
+            return None
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _touch_stamp(self):
+        if not self.stamp_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.stamp_path) or '.', exist_ok=True)
+            with open(self.stamp_path, 'w') as stamp:
+                stamp.write(str(time.time()))
+            self._stamp_mtime = self._read_stamp()
+        except OSError as e:
+            print(f"Error writing catalog stamp: {e}")
+
+    def _check_stamp(self):
+        if not self.stamp_path:
+            return
+        now = time.monotonic()
+        if now < self._next_stamp_check:
+            return
+        self._next_stamp_check = now + self.stamp_check_interval
+
+        mtime = self._read_stamp()
+        if mtime != self._stamp_mtime:
+            self._stamp_mtime = mtime
+            with self._lock:
+                self._snapshot = None
+                self._generation += 1
+
+    # ORM hooks
+
+    def _register_hooks(self):
+        Car = self.Car
+        session = self.db.session
+
+        def touches_car(objects):
+            return any(isinstance(obj, Car) for obj in objects)
+
+        @event.listens_for(session, 'after_flush')
+        def _mark_flush(sess, flush_context):
+            if touches_car(sess.new) or touches_car(sess.dirty) or touches_car(sess.deleted):
+                sess.info['catalog_dirty'] = True
+
+        @event.listens_for(session, 'do_orm_execute')
+        def _mark_bulk(orm_execute_state):
+            if orm_execute_state.is_update or orm_execute_state.is_delete:
+                if any(mapper.class_ is Car for mapper in orm_execute_state.all_mappers):
+                    orm_execute_state.session.info['catalog_dirty'] = True
+
+        @event.listens_for(session, 'after_commit')
+        def _invalidate_on_commit(sess):
+            if sess.info.pop('catalog_dirty', False):
+                self.invalidate()
+
+        @event.listens_for(session, 'after_rollback')
+        def _clear_on_rollback(sess):
+            sess.info.pop('catalog_dirty', None)
@@ -0,0 +1,168 @@
+"""
+CarHub Chat Response Cache
+LRU + TTL cache of chatbot replies, optionally backed by a SQLite file shared across workers
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]', re.UNICODE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_message(message):
+    """Lower-case, drop punctuation and collapse whitespace, so trivial variants share an entry"""
+    return _SPACE_RE.sub(' ', _PUNCTUATION_RE.sub(' ', (message or '').lower())).strip()
+
+
+def prompt_hash(system_prompt):
+    """Short hash of the system prompt; entries from an older prompt never match"""
+    return hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:16]
+
+
+class ChatResponseCache:
+    def __init__(self, max_entries=1000, ttl=3600, path=None):
+        """Cache replies by normalized message, intent and system prompt hash.
+
+        Entries live in an in-process LRU. With `path` set they are also
+        written to a SQLite file, which is consulted on a memory miss, so
+        a restarted or sibling worker starts warm.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+
+        self._entries = OrderedDict()  # key -> (expires_at, response, latency_ms)
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chat_response_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, latency_ms REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+        self._hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._stores = 0
+        self._saved_ms = 0.0
+        self._hit_ms = 0.0
+
+    @staticmethod
+    def key(message, intent, system_prompt_hash):
+        raw = f"{system_prompt_hash}|{intent}|{normalize_message(message)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return a copy of the cached response, or None"""
+        started = time.perf_counter()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None and self._db is not None:
+                entry = self._load(key, now)
+                if entry is not None:
+                    self._remember(key, entry)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            self._saved_ms += entry[2]
+            self._hit_ms += (time.perf_counter() - started) * 1000
+            return dict(entry[1])
+
+    def put(self, key, response, latency_ms):
+        """Store a response that took `latency_ms` to produce"""
+        entry = (time.time() + self.ttl, dict(response), latency_ms)
+        with self._lock:
+            self._remember(key, entry)
+            self._stores += 1
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO chat_response_cache (key, response, latency_ms, expires_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, json.dumps(response), latency_ms, entry[0])
+                    )
+                    # Prune now and then rather than on every write
+                    if self._stores % 100 == 0:
+                        self._db.execute("DELETE FROM chat_response_cache WHERE expires_at <= ?", (time.time(),))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Chat cache write failed: {e}")
+
+    def bypass(self):
+        """Count a turn that was not eligible for caching"""
+        with self._lock:
+            self._bypassed += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM chat_response_cache")
+                self._db.commit()
+
+    def stats(self):
+        """Hit ratio and the LLM time saved by hits"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'capacity': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'persistent': self._db is not None,
+                'hits': self._hits,
+                'misses': self._misses,
+                'bypassed': self._bypassed,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else 0.0,
+                'saved_ms': round(self._saved_ms, 2),
+                'avg_saved_ms': round(self._saved_ms / self._hits, 2) if self._hits else 0.0,
+                'avg_hit_ms': round(self._hit_ms / self._hits, 3) if self._hits else 0.0,
+            }
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key, now):
+        try:
+            row = self._db.execute(
+                "SELECT response, latency_ms, expires_at FROM chat_response_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ Chat cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        return (row[2], json.loads(row[0]), row[1])
+
+
+def create_chat_cache(app):
+    """Build the cache from CHAT_CACHE_* settings; returns None when disabled"""
+    if not app.config.get('CHAT_CACHE_ENABLED', True):
+        return None
+    return ChatResponseCache(
+        max_entries=app.config.get('CHAT_CACHE_SIZE', 1000),
+        ttl=app.config.get('CHAT_CACHE_TTL', 3600),
+        path=app.config.get('CHAT_CACHE_PATH') or None,
+    )
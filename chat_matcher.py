@@ -0,0 +1,131 @@
+"""
+CarHub Chat Matcher
+Finds intents, topics, car and service mentions in a message using a phrase table compiled once
+"""
+
+import re
+
+# Inflections accepted after phrases of three or more letters ("buy" matches "buying");
+# shorter ones must match exactly so "hi" does not match "his"
+INFLECTIONS = ('s', 'es', 'd', 'ed', 'ing', 'er', 'ers')
+
+KINDS = ('intent', 'topic', 'car', 'service', 'followup')
+
+
+def _phrase_regex(phrase):
+    """Whole-word regex for a phrase: any whitespace between words, optional inflection at the end"""
+    body = r'\s+'.join(re.escape(word) for word in phrase.split())
+    suffix = '(?:' + '|'.join(INFLECTIONS) + ')?' if len(phrase) >= 3 else ''
+    return re.compile(rf'(?<!\w){body}{suffix}(?!\w)')
+
+
+class ChatMatcher:
+    def __init__(self, intents=(), topics=(), cars=(), services=(), followup=(), memo_size=512, memo_max_length=2000):
+        """Compile every keyword and name into a table of word-bounded phrases.
+
+        `intents` and `topics` are ordered (label, keywords) pairs; the
+        first label that matches wins, as in an if/elif chain. `cars` and
+        `services` are (name, phrase) pairs reported in the given order.
+
+        A text is lower-cased once. Each phrase is then located with
+        str.find on its first word and its word-boundary regex is only
+        tried where that lands, so a phrase costs one C-level search
+        instead of a regex step per character. Scan results for texts up
+        to `memo_max_length` characters are remembered, so canned fallback
+        replies are scanned only once.
+        """
+        self.intent_order = [label for label, _ in intents]
+        self.topic_order = [label for label, _ in topics]
+        self.car_order = [name for name, _ in cars]
+        self.service_order = [name for name, _ in services]
+
+        labels = [('intent', label, keyword) for label, keywords in intents for keyword in keywords]
+        labels += [('topic', label, keyword) for label, keywords in topics for keyword in keywords]
+        labels += [('car', name, phrase) for name, phrase in cars]
+        labels += [('service', name, phrase) for name, phrase in services]
+        labels += [('followup', True, keyword) for keyword in followup]
+
+        # Each label is one bit, so a scan just ORs integers together
+        self._bits = {}
+        phrases = {}  # normalized phrase -> (kinds, mask)
+        for kind, label, phrase in labels:
+            bit = self._bits.setdefault((kind, label), 1 << len(self._bits))
+            phrase = ' '.join(phrase.lower().split())
+            if not phrase:
+                continue
+            kinds, mask = phrases.get(phrase, (frozenset(), 0))
+            phrases[phrase] = (kinds | {kind}, mask | bit)
+
+        # Per kind, the (first word, regex, mask) of every phrase that answers it
+        compiled = {phrase: (phrase.split()[0], _phrase_regex(phrase), mask)
+                    for phrase, (_, mask) in phrases.items()}
+        self._tables = {
+            kind: tuple(compiled[phrase] for phrase, (kinds, _) in phrases.items() if kind in kinds)
+            for kind in KINDS
+        }
+        self._described = {}  # mask -> match() fields; few distinct combinations occur
+        self._memo = {}  # (text, kinds) -> mask
+        self.memo_size = memo_size
+        self.memo_max_length = memo_max_length
+
+    def match(self, text, kinds=KINDS):
+        """Everything the text mentions, looking only for the given `kinds`.
+
+        Returns a dict with the winning `intent` (or 'general_inquiry'),
+        all matched `intents`, the winning fallback `topic` (or None), the
+        `cars` and `services` mentioned and whether `followup` words appear.
+        Fields for kinds that were not asked for are left empty.
+        """
+        text = text or ''
+        key = (text, tuple(kinds))
+        mask = self._memo.get(key)
+        if mask is None:
+            mask = self._scan(text, key[1])
+            if len(text) <= self.memo_max_length:
+                if len(self._memo) >= self.memo_size:
+                    self._memo.clear()
+                self._memo[key] = mask
+
+        described = self._described.get(mask)
+        if described is None:
+            described = self._describe(mask)
+            if len(self._described) < 4096:
+                self._described[mask] = described
+        intents, topic, cars, services, followup = described
+        return {
+            'intent': intents[0] if intents else 'general_inquiry',
+            'intents': list(intents),
+            'topic': topic,
+            'cars': list(cars),
+            'services': list(services),
+            'followup': followup,
+        }
+
+    def _scan(self, text, kinds):
+        lowered = text.lower()
+        mask = 0
+        for kind in kinds:
+            for first_word, regex, bits in self._tables[kind]:
+                # Skip phrases whose labels are all found already
+                if bits & mask == bits:
+                    continue
+                # str.find does the scanning; the regex only checks boundaries where it lands
+                position = lowered.find(first_word)
+                while position >= 0:
+                    if regex.match(lowered, position):
+                        mask |= bits
+                        break
+                    position = lowered.find(first_word, position + 1)
+        return mask
+
+    def _describe(self, mask):
+        def present(kind, names):
+            return tuple(name for name in names if mask & self._bits.get((kind, name), 0))
+        topics = present('topic', self.topic_order)
+        return (
+            present('intent', self.intent_order),
+            topics[0] if topics else None,
+            present('car', self.car_order),
+            present('service', self.service_order),
+            bool(mask & self._bits.get(('followup', True), 0)),
+        )
@@ -3,56 +3,72 @@ CarHub AI Chatbot
 Powered by OpenAI GPT with comprehensive CarHub business knowledge
 """
 
-import openai
 import os
 import json
+import logging
+import secrets
+import threading
+import time
 import traceback
+from collections import deque
 from datetime import datetime
-from flask import Flask, request, jsonify, session
-from flask_sqlalchemy import SQLAlchemy
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+from flask import Response, request, jsonify, session, stream_with_context
+
+from chat_cache import ChatResponseCache, create_chat_cache, prompt_hash
+from conversation_memory import create_conversation_memory, fit_history, message_tokens, truncate
+from llm_gateway import LLMGateway, LLMUnavailableError, gateway_options, pooled_http_client
+from chat_matcher import ChatMatcher
+from lazy import LazyObject
+
+logger = logging.getLogger(__name__)
+
+# Intent of a user message, for response metadata (first match wins)
+INTENT_KEYWORDS = [
+    ('buying_intent', ['buy', 'purchase', 'looking for', 'want to buy']),
+    ('selling_intent', ['sell', 'selling', 'trade', 'trade-in']),
+    ('service_intent', ['service', 'maintenance', 'repair', 'fix']),
+    ('pricing_inquiry', ['price', 'cost', 'how much', 'pricing']),
+    ('financing_inquiry', ['financing', 'loan', 'payment', 'finance']),
+]
+
+# Topic of the canned reply used when the LLM is unavailable (first match wins)
+FALLBACK_TOPIC_KEYWORDS = [
+    ('greeting', ['hello', 'hi', 'hey', 'greetings']),
+    ('buying', ['buy', 'purchase', 'looking for', 'want to buy']),
+    ('selling', ['sell', 'selling', 'trade']),
+    ('service', ['service', 'maintenance', 'repair']),
+    ('luxury', ['luxury', 'expensive', 'premium']),
+    ('electric', ['electric', 'ev', 'tesla', 'eco']),
+    ('financing', ['financing', 'loan', 'payment', 'credit']),
+    ('vintage', ['vintage', 'classic', 'old', 'antique']),
+    ('pricing', ['price', 'cost', 'how much', 'expensive']),
+    ('contact', ['contact', 'phone', 'call', 'reach']),
+]
+
+# Words in a reply that suggest the user should take a next step
+FOLLOWUP_KEYWORDS = [
+    'contact', 'schedule', 'visit', 'appointment',
+    'specialist', 'call', 'more information'
+]
+
+# Retrieval score a fallback answer needs before it quotes the index instead of a canned reply
+FALLBACK_RETRIEVAL_SCORE = 0.2
 
 class CarHubChatbot:
-    def __init__(self, db, User, Car, Order):
+    def __init__(self, db, User, Car, Order, response_cache=None, memory=None, context_tokens=1500, catalog=None,
+                 llm_options=None, retriever=None, metrics=None):
         """Initialize the ChatBot with OpenAI API key and CarHub knowledge base"""
         
-        # Check if OpenAI API key is available
+        # Every completion goes through the gateway (see llm_gateway.py), which bounds
+        # concurrency and latency and stops calling a failing provider. The client (and
+        # the openai package) is only built once the first question needs it.
         api_key = os.getenv('OPENAI_API_KEY')
-        print(f"🔑 API Key found: {api_key[:20] + '...' if api_key and len(api_key) > 20 else 'None'}")
-        
-        if api_key and api_key != 'your-openai-api-key-here' and len(api_key) > 20:
-            try:
-                # Set the API key as environment variable
-                os.environ['OPENAI_API_KEY'] = api_key
-                
-                # Check if this is an OpenRouter API key
-                if api_key.startswith('sk-or-'):
-                    print("🔗 Detected OpenRouter API key - configuring for OpenRouter")
-                    self.client = openai.OpenAI(
-                        api_key=api_key,
-                        base_url="https://openrouter.ai/api/v1",
-                        default_headers={
-                            "HTTP-Referer": "http://localhost:5000",  # Your site URL
-                            "X-Title": "CarHub Chatbot"  # Your app name
-                        }
-                    )
-                else:
-                    print("🔗 Detected OpenAI API key - configuring for OpenAI")
-                    self.client = openai.OpenAI()
-                
-                self.openai_available = True
-                print("✅ OpenAI client initialized successfully!")
-            except Exception as e:
-                print(f"❌ Error initializing OpenAI client: {e}")
-                self.client = None
-                self.openai_available = False
-        else:
-            self.client = None
-            self.openai_available = False
-            print("⚠️  OpenAI API key not configured - chatbot will use fallback responses")
+        self.llm = LLMGateway(client_factory=lambda: self._create_client(api_key), **(llm_options or {}))
+        self.openai_available = bool(api_key and api_key != 'your-openai-api-key-here' and len(api_key) > 20)
+        if not self.openai_available:
+            logger.warning("OpenAI API key not configured - chatbot will use fallback responses")
+        # OpenRouter keys get OpenRouter's model names
+        self.model_name = "openai/gpt-3.5-turbo" if (api_key or '').startswith('sk-or-') else "gpt-3.5-turbo"
         
         self.db = db
         self.User = User
@@ -165,28 +181,103 @@ class CarHubChatbot:
             }
         }
         
-        # System prompt for the chatbot
+        # With a catalog (see catalog.py) the inventory comes from the Car table and is
+        # rebuilt whenever the catalog version changes; the list above is only the
+        # stand-in for scripts that run without a database
+        self.catalog = catalog
+        self._inventory_version = None
+        from recommender import RecommendationEngine  # numpy, so only once a chatbot is built
+        self.recommender = RecommendationEngine(catalog) if catalog is not None else None
+        self._knowledge_lock = threading.Lock()
+        
+        # With a retrieval index (see retrieval_index.py) only the snippets relevant to a
+        # question are sent, so services and features leave the system prompt
+        self.retriever = retriever
+        self._retrieval_state = (0, False)
+        
+        # System prompt for the chatbot; the sections that never change are serialized once
+        self._static_prompt = self._create_static_prompt()
         self.system_prompt = self._create_system_prompt()
+        self.system_prompt_hash = prompt_hash(self.system_prompt)
+        
+        # Keyword, car and service matcher, compiled once per inventory
+        self.matcher = self._build_matcher()
+        
+        # Cached replies to common, non-personalized questions (see chat_cache.py)
+        self.response_cache = response_cache
+        
+        # Answers by source (llm, cache or fallback) for /metrics (see metrics.py)
+        self.answers = metrics.counter('carhub_chatbot_answers_total', 'Chatbot answers, by source',
+                                       ('source',)) if metrics is not None else None
+        
+        # Server-side conversation history (see conversation_memory.py); earlier
+        # turns sent to the LLM are cut down to `context_tokens` tokens
+        self.memory = memory
+        self.context_tokens = context_tokens
+        self._prompt_sizes = deque(maxlen=1000)
+        self._prompt_lock = threading.Lock()
+        self._prompts_reported = 0
+        self._reported_prompt_tokens = 0
+        self._cached_prompt_tokens = 0
+    
+    def _create_client(self, api_key):
+        """OpenAI or OpenRouter client sharing one pooled connection pool"""
+        import openai
+        http_client = pooled_http_client(self.llm.max_concurrency, self.llm.timeout, self.llm.connect_timeout)
+        
+        # Check if this is an OpenRouter API key
+        if api_key.startswith('sk-or-'):
+            print("🔗 Detected OpenRouter API key - configuring for OpenRouter")
+            return openai.OpenAI(
+                api_key=api_key,
+                base_url="https://openrouter.ai/api/v1",
+                default_headers={
+                    "HTTP-Referer": "http://localhost:5000",  # Your site URL
+                    "X-Title": "CarHub Chatbot"  # Your app name
+                },
+                http_client=http_client,
+                max_retries=0  # a failed call answers from the knowledge base instead
+            )
+        print("🔗 Detected OpenAI API key - configuring for OpenAI")
+        return openai.OpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+    
+    @property
+    def client(self):
+        """The OpenAI-compatible client the gateway calls"""
+        return self.llm.client
+    
+    @client.setter
+    def client(self, client):
+        self.llm.client = client
     
     def _create_system_prompt(self):
         """Create a comprehensive system prompt with CarHub knowledge"""
+        # The inventory goes last so a stock change leaves the cacheable prefix intact
+        return f"""{self._static_prompt}
+CURRENT INVENTORY (name, price, category, status):
+{compact_json([[car['name'], car['price'], car['category'], car['status']] for car in self.knowledge_base['current_inventory']])}
+"""
+    
+    def _create_static_prompt(self, retrieval=False):
+        """The part of the system prompt that does not depend on stock"""
+        if retrieval:
+            services = "Details on CarHub services, features, cars and parts relevant to each question are provided as RELEVANT CARHUB INFORMATION.\n"
+        else:
+            services = f"""SERVICES OFFERED:
+{compact_json(self.knowledge_base['services'])}
+
+FEATURES & TECHNOLOGY:
+{compact_json(self.knowledge_base['features'])}
+"""
         return f"""
 You are CarHub's AI Assistant, a knowledgeable and professional automotive expert representing CarHub - "Where Every Journey Begins."
 
 COMPANY INFORMATION:
-{json.dumps(self.knowledge_base['company_info'], indent=2)}
-
-SERVICES OFFERED:
-{json.dumps(self.knowledge_base['services'], indent=2)}
-
-CURRENT INVENTORY:
-{json.dumps(self.knowledge_base['current_inventory'], indent=2)}
-
-FEATURES & TECHNOLOGY:
-{json.dumps(self.knowledge_base['features'], indent=2)}
+{compact_json(self.knowledge_base['company_info'])}
 
+{services}
 CUSTOMER SATISFACTION:
-{json.dumps(self.knowledge_base['customer_reviews'], indent=2)}
+{compact_json(self.knowledge_base['customer_reviews'])}
 
 PERSONALITY & GUIDELINES:
 - Be professional, friendly, and knowledgeable about automotive topics
@@ -214,6 +305,61 @@ IMPORTANT:
 - Always maintain a helpful and professional tone
 - Reference specific CarHub services and features when relevant
 """
+    
+    def refresh_knowledge(self):
+        """Rebuild the inventory, system prompt and matcher if the catalog or retrieval index changed since the last build"""
+        version = self.catalog.version if self.catalog is not None else None
+        retrieval = self._current_retrieval()
+        if version == self._inventory_version and retrieval == self._retrieval_state:
+            return False
+        
+        with self._knowledge_lock:
+            if version == self._inventory_version and retrieval == self._retrieval_state:
+                return False
+            knowledge_base = self.knowledge_base
+            if version != self._inventory_version:
+                try:
+                    inventory = [{
+                        "name": car['name'],
+                        "price": car['price'],
+                        "category": car['category'],
+                        "status": car['status'].lower()
+                    } for car in self.catalog.all()]
+                except Exception as e:
+                    print(f"⚠️ Chatbot inventory refresh failed: {e}")
+                    return False
+                # Swap in a new dict so readers never see a half-updated knowledge base
+                knowledge_base = dict(knowledge_base, current_inventory=inventory)
+            
+            self.knowledge_base = knowledge_base
+            if retrieval[1] != self._retrieval_state[1]:
+                self._static_prompt = self._create_static_prompt(retrieval=retrieval[1])
+            self.system_prompt = self._create_system_prompt()
+            # A rebuilt index changes the snippets sent, so cached replies keyed on the old hash go stale
+            self.system_prompt_hash = prompt_hash(f"{self.system_prompt}\nretrieval:{retrieval[0]}")
+            self.matcher = self._build_matcher()
+            self._inventory_version = version
+            self._retrieval_state = retrieval
+        print(f"🔄 Chatbot knowledge rebuilt: {len(knowledge_base['current_inventory'])} cars, "
+              f"retrieval {'on' if retrieval[1] else 'off'}, {len(self.system_prompt)} prompt chars")
+        return True
+    
+    def _current_retrieval(self):
+        """(generation, loaded) of the retrieval index, picking up a newly published build"""
+        if self.retriever is None:
+            return (0, False)
+        loaded = self.retriever.current() is not None
+        return (self.retriever.generation, loaded)
+    
+    def _retrieve(self, user_message):
+        """Index snippets relevant to the message, or [] without an index"""
+        if self.retriever is None:
+            return []
+        try:
+            return self.retriever.search(user_message)
+        except Exception as e:
+            print(f"⚠️ Retrieval failed: {e}")
+            return []
 
     def get_chat_response(self, user_message, user_context=None, conversation_history=None):
         """
@@ -227,55 +373,43 @@ IMPORTANT:
         Returns:
             dict: Response with message and metadata
         """
+        self.refresh_knowledge()
         try:
             # If OpenAI is not available, use fallback responses
             if not self.openai_available:
                 return self._get_fallback_response(user_message, user_context)
             
-            # Prepare conversation history
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # Add conversation history if provided
-            if conversation_history:
-                messages.extend(conversation_history[-10:])  # Keep last 10 messages for context
-            
-            # Add user context if available
-            context_message = ""
-            if user_context:
-                context_message = f"\nUser Context: {json.dumps(user_context)}\n"
-            
-            # Add current user message
-            messages.append({
-                "role": "user", 
-                "content": context_message + user_message
-            })
+            cache_key = self._cache_key(user_message, user_context, conversation_history)
+            cached = self._cached_response(cache_key)
+            if cached:
+                return cached
             
             # Get response from OpenAI/OpenRouter
-            model_name = "gpt-3.5-turbo"
-            if hasattr(self, 'client') and self.client and hasattr(self.client, '_base_url'):
-                if "openrouter.ai" in str(self.client._base_url):
-                    model_name = "openai/gpt-3.5-turbo"  # OpenRouter format
-            
-            response = self.client.chat.completions.create(
-                model=model_name,
-                messages=messages,
-                max_tokens=1000,
-                temperature=0.7,
-                presence_penalty=0.1,
-                frequency_penalty=0.1
-            )
+            started = time.perf_counter()
+            params = self._completion_params(user_message, user_context, conversation_history)
+            response = self.llm.complete(**params)
+            self._record_prompt(params["messages"], getattr(response, "usage", None))
             
             assistant_message = response.choices[0].message.content
             
             # Check if the response contains specific CarHub information
             response_metadata = self._analyze_response(assistant_message, user_message)
             
-            return {
+            result = {
                 "success": True,
                 "message": assistant_message,
                 "metadata": response_metadata,
                 "timestamp": datetime.now().isoformat()
             }
+            if cache_key:
+                self.response_cache.put(cache_key, result, (time.perf_counter() - started) * 1000)
+            self._count_answer("llm")
+            return result
+            
+        except LLMUnavailableError as e:
+            # Circuit open or every slot busy: answer at once rather than queue
+            print(f"⚡ {e} - falling back to knowledge base")
+            return self._get_fallback_response(user_message, user_context)
             
         except Exception as e:
             # Handle specific OpenAI errors
@@ -293,17 +427,195 @@ IMPORTANT:
                 print("⚠️  OpenAI API error - falling back to knowledge base")
                 return self._get_fallback_response(user_message, user_context)
     
+    def stream_chat_response(self, user_message, user_context=None, conversation_history=None):
+        """
+        Generate a response like get_chat_response, yielding the reply as it arrives
+        
+        Yields:
+            tuple: ("token", text) for each piece of the reply, then
+                   ("done", response) with the full message and metadata
+        """
+        self.refresh_knowledge()
+        if not self.openai_available:
+            yield from self._stream_whole(self._get_fallback_response(user_message, user_context))
+            return
+        
+        cache_key = self._cache_key(user_message, user_context, conversation_history)
+        cached = self._cached_response(cache_key)
+        if cached:
+            yield from self._stream_whole(cached)
+            return
+        
+        parts = []
+        usage = None
+        interrupted = False
+        started = time.perf_counter()
+        params = self._completion_params(user_message, user_context, conversation_history)
+        stream = self.llm.stream(stream_options={"include_usage": True}, **params)
+        try:
+            for chunk in stream:
+                # With include_usage the last chunk has no choices, only token counts
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    parts.append(content)
+                    yield "token", content
+        except LLMUnavailableError as e:
+            print(f"⚡ {e} - falling back to knowledge base")
+            yield from self._stream_whole(self._get_fallback_response(user_message, user_context))
+            return
+        except Exception as e:
+            print(f"OpenAI Error: {e}")
+            if not parts:
+                print("⚠️  OpenAI API error - falling back to knowledge base")
+                yield from self._stream_whole(self._get_fallback_response(user_message, user_context))
+                return
+            print("⚠️  OpenAI stream interrupted - sending the partial reply")
+            interrupted = True
+        finally:
+            # Also runs when the browser disconnects, so the upstream request is not left running
+            stream.close()
+            if parts or usage:
+                self._record_prompt(params["messages"], usage)
+        
+        assistant_message = "".join(parts)
+        response = {
+            "success": True,
+            "message": assistant_message,
+            "metadata": self._analyze_response(assistant_message, user_message),
+            "timestamp": datetime.now().isoformat()
+        }
+        if interrupted:
+            response["incomplete"] = True
+        elif cache_key:
+            self.response_cache.put(cache_key, response, (time.perf_counter() - started) * 1000)
+        self._count_answer("llm")
+        yield "done", response
+    
+    def _cache_key(self, user_message, user_context=None, conversation_history=None):
+        """Cache key for this turn, or None if it is personalized, follows earlier turns or caching is off"""
+        if self.response_cache is None:
+            return None
+        if user_context or conversation_history:
+            self.response_cache.bypass()
+            return None
+        return ChatResponseCache.key(user_message, self._detect_intent(user_message), self.system_prompt_hash)
+    
+    def _cached_response(self, cache_key):
+        """Cached reply for `cache_key`, marked as cached and re-stamped, or None"""
+        if not cache_key:
+            return None
+        cached = self.response_cache.get(cache_key)
+        if cached:
+            cached["cached"] = True
+            cached["timestamp"] = datetime.now().isoformat()
+            self._count_answer("cache")
+        return cached
+    
+    def _count_answer(self, source):
+        if self.answers is not None:
+            self.answers.inc(source)
+    
+    def _stream_whole(self, response):
+        """Yield an already complete response in the streaming format"""
+        yield "token", response["message"]
+        yield "done", response
+    
+    def _completion_params(self, user_message, user_context=None, conversation_history=None):
+        """Chat completion arguments for the user's message, history and context"""
+        # The system prompt always comes first and unchanged, so providers that
+        # cache prompt prefixes (OpenAI does above 1024 tokens) reuse it
+        messages = [{"role": "system", "content": self.system_prompt}]
+        
+        # Then the catalog and service snippets that match this question, if any
+        hits = self._retrieve(user_message)
+        if hits:
+            messages.append({"role": "system", "content": "RELEVANT CARHUB INFORMATION:\n" + "\n".join(
+                f"- [{hit['kind']}] {hit['snippet']}" for hit in hits)})
+        
+        # The question and the user context share the context budget with the history:
+        # the context gets at most a quarter and the question half, history what is left
+        context_message = ""
+        if user_context:
+            context_message = truncate(f"\nUser Context: {json.dumps(user_context)}\n", self.context_tokens // 4)
+        question = {"role": "user", "content": context_message + truncate(user_message, self.context_tokens // 2)}
+        
+        # Add as much recent history as fits the rest of the budget
+        if conversation_history:
+            messages.extend(fit_history(conversation_history, self.context_tokens - message_tokens(question)))
+        
+        # Add current user message
+        messages.append(question)
+        
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "max_tokens": 1000,
+            "temperature": 0.7,
+            "presence_penalty": 0.1,
+            "frequency_penalty": 0.1
+        }
+    
+    def _record_prompt(self, messages, usage=None):
+        """Remember the estimated size of a prompt and what the provider reported for it"""
+        estimated = sum(message_tokens(message) for message in messages)
+        details = getattr(usage, "prompt_tokens_details", None)
+        with self._prompt_lock:
+            self._prompt_sizes.append(estimated)
+            if usage is not None:
+                self._prompts_reported += 1
+                self._reported_prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+                self._cached_prompt_tokens += getattr(details, "cached_tokens", 0) or 0
+    
+    def prompt_stats(self):
+        """Size of recent prompts and how much of them the provider served from its prefix cache"""
+        with self._prompt_lock:
+            sizes = sorted(self._prompt_sizes)
+            reported = self._reported_prompt_tokens
+            cached = self._cached_prompt_tokens
+            prompts_reported = self._prompts_reported
+        return {
+            'recent_prompts': len(sizes),
+            'system_prompt_tokens': message_tokens({"content": self.system_prompt}),
+            'context_budget_tokens': self.context_tokens,
+            'avg_tokens': round(sum(sizes) / len(sizes), 1) if sizes else 0.0,
+            'p95_tokens': sizes[int(len(sizes) * 0.95)] if sizes else 0,
+            'max_tokens': sizes[-1] if sizes else 0,
+            'prompts_reported': prompts_reported,
+            'reported_prompt_tokens': reported,
+            'cached_prompt_tokens': cached,
+            'cached_ratio': round(cached / reported, 4) if reported else 0.0,
+        }
+    
     def _get_fallback_response(self, user_message, user_context=None):
         """
         Generate fallback responses when OpenAI is not available
         """
-        message_lower = user_message.lower()
+        self._count_answer("fallback")
+        topic = self.matcher.match(user_message, ('topic',))['topic']
+        
+        # Questions about specific cars or parts, and anything the canned topics miss,
+        # are answered from the retrieval index without a network call
+        hits = [] if topic == 'greeting' else [
+            hit for hit in self._retrieve(user_message) if hit['score'] >= FALLBACK_RETRIEVAL_SCORE
+        ]
         
         # Detect intent and provide relevant responses
-        if any(word in message_lower for word in ['hello', 'hi', 'hey', 'greetings']):
+        if hits and (topic is None or hits[0]['kind'] in ('car', 'part')):
+            found = "\n".join(f"• {hit['title']}: {hit['snippet']}" for hit in hits)
+            response = f"""Here's what I found at CarHub:
+
+{found}
+
+Would you like more information about any of these, or to schedule a visit?"""
+            
+        elif topic == 'greeting':
             response = f"Welcome to CarHub! 🚗 I'm your automotive assistant. How can I help you today?"
             
-        elif any(word in message_lower for word in ['buy', 'purchase', 'looking for', 'want to buy']):
+        elif topic == 'buying':
             response = f"""I'd be happy to help you find the perfect car! 
 
 Here are some of our featured vehicles:
@@ -314,7 +626,7 @@ Here are some of our featured vehicles:
 
 What type of car are you interested in? Luxury, sports, electric, or family vehicles?"""
 
-        elif any(word in message_lower for word in ['sell', 'selling', 'trade']):
+        elif topic == 'selling':
             response = f"""Great! CarHub offers seamless car selling with maximized value.
 
 Our selling process:
@@ -326,7 +638,7 @@ Our selling process:
 
 Would you like to get a quote for your vehicle? I can help you get started!"""
 
-        elif any(word in message_lower for word in ['service', 'maintenance', 'repair']):
+        elif topic == 'service':
             response = f"""CarHub provides precision service for peak performance!
 
 Our services include:
@@ -338,7 +650,7 @@ Our services include:
 
 Our certified technicians use state-of-the-art equipment. Would you like to schedule a service appointment?"""
 
-        elif any(word in message_lower for word in ['luxury', 'expensive', 'premium']):
+        elif topic == 'luxury':
             response = f"""Our luxury collection features the finest automobiles:
 
 Premium Vehicles Available:
@@ -350,7 +662,7 @@ Premium Vehicles Available:
 
 All vehicles come with comprehensive warranties and white-glove service."""
 
-        elif any(word in message_lower for word in ['electric', 'ev', 'tesla', 'eco']):
+        elif topic == 'electric':
             response = f"""Discover our electric vehicle collection:
 
 Electric Cars Available:
@@ -365,7 +677,7 @@ Benefits of going electric:
 
 Would you like more details about any of these electric vehicles?"""
 
-        elif any(word in message_lower for word in ['financing', 'loan', 'payment', 'credit']):
+        elif topic == 'financing':
             response = f"""CarHub offers flexible financing options:
 
 Available Options:
@@ -377,7 +689,7 @@ Available Options:
 
 We work with multiple lenders to get you the best rates. What's your budget range?"""
 
-        elif any(word in message_lower for word in ['vintage', 'classic', 'old', 'antique']):
+        elif topic == 'vintage':
             response = f"""Explore our exquisite vintage collection - timeless beauty and rare finds!
 
 Our vintage cars feature:
@@ -388,7 +700,7 @@ Our vintage cars feature:
 
 Each classic car is a piece of history, meticulously inspected and ready for a new legacy. Are you looking for a specific vintage model?"""
 
-        elif any(word in message_lower for word in ['price', 'cost', 'how much', 'expensive']):
+        elif topic == 'pricing':
             response = f"""CarHub offers vehicles across all price ranges:
 
 Price Categories:
@@ -400,7 +712,7 @@ Price Categories:
 
 We also offer financing to make your dream car affordable. What's your budget range?"""
 
-        elif any(word in message_lower for word in ['contact', 'phone', 'call', 'reach']):
+        elif topic == 'contact':
             response = f"""You can reach CarHub through:
 
 • Website: Visit us at localhost:5000
@@ -432,103 +744,65 @@ What would you like to know more about?"""
     
     def _analyze_response(self, response, user_message):
         """Analyze the response to provide metadata"""
+        # Replies can be long; scan them only for what the metadata reports
+        reply = self.matcher.match(response, ('car', 'service', 'followup'))
         metadata = {
             "intent": self._detect_intent(user_message),
-            "mentioned_cars": self._extract_car_mentions(response),
-            "mentioned_services": self._extract_service_mentions(response),
-            "requires_followup": self._requires_followup(response)
+            "mentioned_cars": reply['cars'],
+            "mentioned_services": reply['services'],
+            "requires_followup": reply['followup']
         }
         return metadata
     
+    def _build_matcher(self):
+        """Compile intents, fallback topics, inventory names and services into one phrase table"""
+        return ChatMatcher(
+            intents=INTENT_KEYWORDS,
+            topics=FALLBACK_TOPIC_KEYWORDS,
+            cars=[(car['name'], car['name']) for car in self.knowledge_base['current_inventory']],
+            services=[(service, service.replace('_', ' ')) for service in self.knowledge_base['services']],
+            followup=FOLLOWUP_KEYWORDS
+        )
+    
     def _detect_intent(self, message):
         """Detect user intent from the message"""
-        message_lower = message.lower()
-        
-        if any(word in message_lower for word in ['buy', 'purchase', 'looking for', 'want to buy']):
-            return 'buying_intent'
-        elif any(word in message_lower for word in ['sell', 'selling', 'trade', 'trade-in']):
-            return 'selling_intent'
-        elif any(word in message_lower for word in ['service', 'maintenance', 'repair', 'fix']):
-            return 'service_intent'
-        elif any(word in message_lower for word in ['price', 'cost', 'how much', 'pricing']):
-            return 'pricing_inquiry'
-        elif any(word in message_lower for word in ['financing', 'loan', 'payment', 'finance']):
-            return 'financing_inquiry'
-        else:
-            return 'general_inquiry'
+        return self.matcher.match(message, ('intent',))['intent']
     
     def _extract_car_mentions(self, response):
         """Extract mentioned car models from the response"""
-        mentioned_cars = []
-        for car in self.knowledge_base['current_inventory']:
-            if car['name'].lower() in response.lower():
-                mentioned_cars.append(car['name'])
-        return mentioned_cars
+        return self.matcher.match(response, ('car',))['cars']
     
     def _extract_service_mentions(self, response):
         """Extract mentioned services from the response"""
-        mentioned_services = []
-        for service in self.knowledge_base['services'].keys():
-            if service.replace('_', ' ') in response.lower():
-                mentioned_services.append(service)
-        return mentioned_services
+        return self.matcher.match(response, ('service',))['services']
     
     def _requires_followup(self, response):
         """Determine if the response requires follow-up action"""
-        followup_indicators = [
-            'contact', 'schedule', 'visit', 'appointment', 
-            'specialist', 'call', 'more information'
-        ]
-        return any(indicator in response.lower() for indicator in followup_indicators)
+        return self.matcher.match(response, ('followup',))['followup']
     
     def get_personalized_recommendations(self, user_preferences):
         """
         Get personalized car recommendations based on user preferences
         
         Args:
-            user_preferences (dict): User preferences like budget, category, etc.
+            user_preferences (dict): budget, category, usage and optionally limit
         
         Returns:
             list: Recommended cars with reasons
         """
-        recommendations = []
+        if self.recommender is None:
+            print("⚠️ Recommendations need the vehicle catalog")
+            return []
         
-        budget = user_preferences.get('budget', 'any')
-        category = user_preferences.get('category', 'any')
-        usage = user_preferences.get('usage', 'any')
-        
-        for car in self.knowledge_base['current_inventory']:
-            score = 0
-            reasons = []
-            
-            # Budget matching (simplified)
-            if budget != 'any':
-                # Add budget logic here
-                pass
-            
-            # Category matching
-            if category != 'any' and car['category'] == category:
-                score += 2
-                reasons.append(f"Matches your preferred {category} category")
-            
-            # Usage matching
-            if usage != 'any':
-                # Add usage logic here
-                pass
-            
-            if score > 0:
-                recommendations.append({
-                    "car": car,
-                    "score": score,
-                    "reasons": reasons
-                })
-        
-        # Sort by score
-        recommendations.sort(key=lambda x: x['score'], reverse=True)
-        return recommendations[:5]  # Return top 5 recommendations
+        try:
+            limit = min(max(int(user_preferences.get('limit', 5)), 1), 50)
+        except (TypeError, ValueError):
+            limit = 5
+        return self.recommender.recommend(user_preferences, limit)
     
     def get_car_details(self, car_name):
         """Get detailed information about a specific car"""
+        self.refresh_knowledge()
         for car in self.knowledge_base['current_inventory']:
             if car_name.lower() in car['name'].lower():
                 return {
@@ -547,12 +821,41 @@ What would you like to know more about?"""
             "financing": "Flexible financing options available"
         }
 
+def compact_json(data):
+    """JSON without indentation or spaces, for prompt text"""
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 # Flask routes for chatbot integration
-def create_chatbot_routes(app, db, User, Car, Order):
-    """Create Flask routes for the chatbot"""
+def create_chatbot_routes(app, db, User, Car, Order, catalog=None, metrics=None):
+    """Create Flask routes for the chatbot; the chatbot itself is built by the first request that uses it"""
     
-    # Initialize chatbot
-    chatbot = CarHubChatbot(db, User, Car, Order)
+    def build():
+        from retrieval_index import create_retriever  # numpy and the index files
+        chatbot = CarHubChatbot(
+            db, User, Car, Order,
+            response_cache=create_chat_cache(app),
+            memory=create_conversation_memory(app),
+            context_tokens=app.config.get('CHAT_CONTEXT_TOKENS', 1500),
+            catalog=catalog,
+            llm_options=gateway_options(app),
+            retriever=create_retriever(app),
+            metrics=metrics
+        )
+        logger.info("Chatbot initialized")
+        return chatbot
+    
+    chatbot = LazyObject(build, 'chatbot')
+    
+    def remember(conversation_id, user_message, events):
+        """Pass stream events through, storing the exchange once the reply is complete"""
+        for event, payload in events:
+            if event == "done" and payload.get("message"):
+                chatbot.memory.append(conversation_id, user_message, payload["message"])
+            yield event, payload
     
     @app.route('/api/chat', methods=['POST'])
     def chat_endpoint():
@@ -570,9 +873,19 @@ def create_chatbot_routes(app, db, User, Car, Order):
                 }), 400
             
             user_message = data['message']
-            conversation_history = data.get('history', [])
             print(f"💬 Processing message: {user_message}")
             
+            # History comes from the server-side memory for this browser session;
+            # a client-supplied history is only used when the memory is disabled
+            conversation_id = None
+            if chatbot.memory is not None:
+                conversation_id = session.get('chat_conversation_id')
+                if not conversation_id:
+                    conversation_id = session['chat_conversation_id'] = secrets.token_urlsafe(16)
+                conversation_history = chatbot.memory.history(conversation_id)
+            else:
+                conversation_history = data.get('history', [])
+            
             # Get user context if logged in
             user_context = None
             try:
@@ -589,6 +902,22 @@ def create_chatbot_routes(app, db, User, Car, Order):
                 print(f"⚠️ User context error: {ctx_error}")
                 pass
             
+            # Stream the reply as Server-Sent Events when the client asks for it
+            if data.get('stream') or request.accept_mimetypes.best == 'text/event-stream':
+                print("🤖 Streaming chatbot response...")
+                events = chatbot.stream_chat_response(user_message, user_context, conversation_history)
+                if conversation_id:
+                    events = remember(conversation_id, user_message, events)
+                body = (
+                    sse_event(event, {"content": payload} if event == "token" else payload)
+                    for event, payload in events
+                )
+                return Response(
+                    stream_with_context(body),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+                )
+            
             # Get response from chatbot
             print("🤖 Getting chatbot response...")
             response = chatbot.get_chat_response(
@@ -596,6 +925,8 @@ def create_chatbot_routes(app, db, User, Car, Order):
                 user_context, 
                 conversation_history
             )
+            if conversation_id and response.get('message'):
+                chatbot.memory.append(conversation_id, user_message, response['message'])
             
             print(f"✅ Chatbot response: {response}")
             return jsonify(response)
@@ -0,0 +1,177 @@
+"""
+CarHub Conversation Memory
+Server-side chat history per browser session, fitted to a token budget before each LLM call
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Roughly four characters per token for English text, plus the per-message framing the API adds
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "Earlier in this conversation the customer asked: "
+
+
+def estimate_tokens(text):
+    """Cheap token estimate; close enough to budget prompts without a tokenizer"""
+    return -(-len(text or '') // CHARS_PER_TOKEN)
+
+
+def message_tokens(message):
+    return estimate_tokens(message.get('content')) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate(text, tokens):
+    """`text` cut down to about `tokens` tokens, marked with an ellipsis when anything was cut"""
+    limit = max(tokens, 1) * CHARS_PER_TOKEN
+    if len(text or '') <= limit:
+        return text
+    return text[:limit - 3] + '...'
+
+
+def fit_history(history, budget):
+    """Newest turns of `history` that fit in `budget` tokens.
+
+    Turns that do not fit are dropped oldest first. If any were dropped,
+    the questions the customer asked in them are condensed into one short
+    system message ahead of the kept turns, within a quarter of the budget.
+    A user message is never kept without the reply that followed it.
+    """
+    history = [m for m in (history or [])
+               if isinstance(m, dict) and m.get('role') in ('user', 'assistant') and m.get('content')]
+    if not history or budget <= 0:
+        return []
+
+    summary_budget = budget // 4
+    kept = []
+    used = 0
+    index = len(history)
+    while index > 0:
+        # Step back a whole turn at a time: the assistant reply and the question before it
+        start = index - 1
+        if history[start]['role'] == 'assistant' and start > 0 and history[start - 1]['role'] == 'user':
+            start -= 1
+        turn = history[start:index]
+        cost = sum(message_tokens(m) for m in turn)
+        # Keep room for a summary unless this turn is the oldest one
+        reserve = summary_budget if start > 0 else 0
+        if used + cost > budget - reserve:
+            break
+        kept[:0] = turn
+        used += cost
+        index = start
+
+    if index == 0:
+        return kept
+
+    summary = _summarize(history[:index], min(summary_budget, budget - used))
+    return ([summary] if summary else []) + kept
+
+
+def _summarize(messages, budget):
+    """The dropped questions, newest kept when the budget runs out"""
+    limit = (budget - MESSAGE_OVERHEAD_TOKENS) * CHARS_PER_TOKEN - len(SUMMARY_PREFIX)
+    questions = []
+    length = 0
+    for message in reversed(messages):
+        if message['role'] != 'user':
+            continue
+        question = ' '.join(message['content'].split())
+        if len(question) > 120:
+            question = question[:117] + '...'
+        if length + len(question) + 3 > limit:
+            break
+        questions.insert(0, f'"{question}"')
+        length += len(question) + 3
+    if not questions:
+        return None
+    return {"role": "system", "content": SUMMARY_PREFIX + '; '.join(questions)}
+
+
+class ConversationMemory:
+    def __init__(self, max_turns=20, ttl=1800, max_conversations=5000, max_message_tokens=500):
+        """Keep the last `max_turns` exchanges of each conversation.
+
+        Messages are stored cut down to `max_message_tokens` tokens, so one
+        huge paste cannot crowd the rest of the conversation out of the
+        context budget. Conversations idle for `ttl` seconds are forgotten,
+        and the least recently used ones are evicted beyond
+        `max_conversations`. Memory is per process; with several workers a
+        conversation only follows the worker that served it when requests
+        are sticky.
+        """
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.max_conversations = max_conversations
+        self.max_message_tokens = max_message_tokens
+
+        self._conversations = OrderedDict()  # id -> (expires_at, deque of messages), oldest use first
+        self._lock = threading.Lock()
+        self._appended = 0
+        self._expired = 0
+        self._evicted = 0
+
+    def history(self, conversation_id):
+        """Stored messages of a conversation, oldest first"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            entry = self._conversations.get(conversation_id)
+            if entry is None or entry[0] <= now:
+                return []
+            return list(entry[1])
+
+    def append(self, conversation_id, user_message, assistant_message):
+        """Record one exchange and refresh the conversation's expiry"""
+        now = time.time()
+        with self._lock:
+            entry = self._conversations.pop(conversation_id, None)
+            messages = entry[1] if entry else deque(maxlen=self.max_turns * 2)
+            messages.append({"role": "user", "content": truncate(user_message, self.max_message_tokens)})
+            messages.append({"role": "assistant", "content": truncate(assistant_message, self.max_message_tokens)})
+            self._conversations[conversation_id] = (now + self.ttl, messages)
+            self._appended += 1
+            self._prune(now)
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+                self._evicted += 1
+
+    def clear(self, conversation_id):
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+
+    def stats(self):
+        with self._lock:
+            self._prune(time.time())
+            return {
+                'conversations': len(self._conversations),
+                'messages': sum(len(messages) for _, messages in self._conversations.values()),
+                'max_turns': self.max_turns,
+                'max_message_tokens': self.max_message_tokens,
+                'ttl_seconds': self.ttl,
+                'turns_recorded': self._appended,
+                'expired': self._expired,
+                'evicted': self._evicted,
+            }
+
+    def _prune(self, now):
+        # Expiry slides with use, so the least recently used conversations expire first
+        while self._conversations:
+            conversation_id, (expires_at, _) = next(iter(self._conversations.items()))
+            if expires_at > now:
+                break
+            del self._conversations[conversation_id]
+            self._expired += 1
+
+
+def create_conversation_memory(app):
+    """Build the memory from CHAT_MEMORY_* settings; returns None when disabled"""
+    if not app.config.get('CHAT_MEMORY_ENABLED', True):
+        return None
+    return ConversationMemory(
+        max_turns=app.config.get('CHAT_MEMORY_TURNS', 20),
+        ttl=app.config.get('CHAT_MEMORY_TTL', 1800),
+        max_message_tokens=app.config.get('CHAT_MEMORY_MESSAGE_TOKENS', 500),
+    )
@@ -0,0 +1,251 @@
+"""
+CarHub Dashboard Statistics
+SQL-side aggregates for the admin panel, cached and kept current from ORM write events
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, event, func, inspect
+
+
+class DashboardStats:
+    def __init__(self, db, User, Order, FinanceApplication, ttl=30, days=14):
+        """Serve admin dashboard totals from a cached snapshot.
+
+        The snapshot is computed with a handful of aggregate queries (COUNT,
+        SUM, GROUP BY status and day) and reused for `ttl` seconds. Commits
+        made through this process's session apply their inserts and payment
+        status changes to the cached snapshot directly; changes that cannot
+        be applied as a delta (deletes, bulk updates, amount edits) mark it
+        stale so the next read recomputes it. Writes from other processes
+        show up once the TTL expires.
+        """
+        self.db = db
+        self.User = User
+        self.Order = Order
+        self.FinanceApplication = FinanceApplication
+        self.ttl = ttl
+        self.days = days
+
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._refreshes = 0
+
+        self._register_hooks()
+
+    # Public API
+
+    def snapshot(self):
+        """Return the current dashboard totals, recomputing them if stale"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._expires_at:
+            return snapshot
+
+        with self._lock:
+            generation = self._generation
+
+        snapshot = self._compute()
+
+        with self._lock:
+            # Only publish if no write invalidated the snapshot while we were querying
+            if generation == self._generation:
+                self._snapshot = snapshot
+                self._expires_at = time.monotonic() + self.ttl
+            self._refreshes += 1
+        return snapshot
+
+    def invalidate(self):
+        """Drop the snapshot so the next read recomputes it"""
+        with self._lock:
+            self._snapshot = None
+            self._generation += 1
+
+    @property
+    def refreshes(self):
+        """Number of times the aggregates were recomputed from the database"""
+        return self._refreshes
+
+    # Aggregation
+
+    def _compute(self):
+        started = time.perf_counter()
+        session = self.db.session
+        Order, User = self.Order, self.User
+        now = datetime.utcnow()
+        week_ago = now - timedelta(days=7)
+        since = (now - timedelta(days=self.days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        completed_amount = case((Order.payment_status == 'completed', Order.total_amount), else_=0)
+
+        orders_by_status = {}
+        total_orders = 0
+        total_revenue = 0.0
+        status_rows = session.query(
+            Order.payment_status,
+            func.count(Order.id),
+            func.coalesce(func.sum(completed_amount), 0)
+        ).group_by(Order.payment_status).all()
+        for status, count, revenue in status_rows:
+            orders_by_status[status or 'unknown'] = count
+            total_orders += count
+            total_revenue += float(revenue or 0)
+
+        total_users, new_users_this_week = session.query(
+            func.count(User.id),
+            func.coalesce(func.sum(case((User.created_at >= week_ago, 1), else_=0)), 0)
+        ).one()
+
+        total_finance_apps = session.query(func.count(self.FinanceApplication.id)).scalar()
+
+        day = func.date(Order.created_at)
+        day_rows = session.query(
+            day,
+            func.count(Order.id),
+            func.coalesce(func.sum(completed_amount), 0)
+        ).filter(Order.created_at >= since).group_by(day).all()
+        daily = {str(d): {'orders': count, 'revenue': float(revenue or 0)} for d, count, revenue in day_rows}
+
+        return {
+            'total_users': total_users,
+            'total_orders': total_orders,
+            'total_finance_apps': total_finance_apps,
+            'total_revenue': total_revenue,
+            'new_users_this_week': int(new_users_this_week),
+            'orders_by_status': orders_by_status,
+            'orders_by_day': self._fill_days(daily, since),
+            'week_start': week_ago,
+            'generated_at': now,
+            'query_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def _fill_days(self, daily, since):
+        """One row per day in the window, oldest first, including empty days"""
+        rows = []
+        for offset in range(self.days):
+            key = (since + timedelta(days=offset)).strftime('%Y-%m-%d')
+            counts = daily.get(key, {'orders': 0, 'revenue': 0.0})
+            rows.append({'day': key, 'orders': counts['orders'], 'revenue': counts['revenue']})
+        return rows
+
+    # Incremental updates
+
+    def _apply(self, delta):
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return
+            if delta.get('stale'):
+                self._snapshot = None
+                self._generation += 1
+                return
+
+            updated = dict(snapshot)
+            updated['total_users'] += delta['users']
+            updated['total_orders'] += delta['orders']
+            updated['total_finance_apps'] += delta['finance']
+            updated['total_revenue'] += delta['revenue']
+            for created_at in delta['new_user_dates']:
+                if created_at and created_at >= snapshot['week_start']:
+                    updated['new_users_this_week'] += 1
+
+            by_status = dict(snapshot['orders_by_status'])
+            for status, count in delta['status'].items():
+                by_status[status] = by_status.get(status, 0) + count
+            updated['orders_by_status'] = {s: c for s, c in by_status.items() if c}
+
+            by_day = []
+            for row in snapshot['orders_by_day']:
+                change = delta['days'].get(row['day'])
+                if change:
+                    row = {'day': row['day'], 'orders': row['orders'] + change[0],
+                           'revenue': row['revenue'] + change[1]}
+                by_day.append(row)
+            updated['orders_by_day'] = by_day
+
+            self._snapshot = updated
+            self._generation += 1
+
+    @staticmethod
+    def _empty_delta():
+        return {'users': 0, 'orders': 0, 'finance': 0, 'revenue': 0.0,
+                'new_user_dates': [], 'status': {}, 'days': {}, 'stale': False}
+
+    def _record_flush(self, sess):
+        User, Order, FinanceApplication = self.User, self.Order, self.FinanceApplication
+        delta = sess.info.get('dashboard_delta')
+        if delta is None:
+            delta = sess.info['dashboard_delta'] = self._empty_delta()
+
+        def add_order(status, created_at, amount, sign):
+            status = status or 'unknown'
+            delta['status'][status] = delta['status'].get(status, 0) + sign
+            revenue = (amount or 0) * sign if status == 'completed' else 0.0
+            delta['revenue'] += revenue
+            if created_at:
+                day = delta['days'].setdefault(created_at.strftime('%Y-%m-%d'), [0, 0.0])
+                day[1] += revenue
+                return day
+            return None
+
+        for obj in sess.new:
+            if isinstance(obj, User):
+                delta['users'] += 1
+                delta['new_user_dates'].append(obj.created_at)
+            elif isinstance(obj, Order):
+                delta['orders'] += 1
+                day = add_order(obj.payment_status, obj.created_at, obj.total_amount, 1)
+                if day is not None:
+                    day[0] += 1
+            elif isinstance(obj, FinanceApplication):
+                delta['finance'] += 1
+
+        for obj in sess.dirty:
+            if not isinstance(obj, Order):
+                continue
+            attrs = inspect(obj).attrs
+            if attrs.total_amount.history.has_changes() or attrs.created_at.history.has_changes():
+                delta['stale'] = True
+                continue
+            history = attrs.payment_status.history
+            if not history.has_changes():
+                continue
+            if not history.deleted:
+                # Previous value was never loaded, so the move can't be applied
+                delta['stale'] = True
+                continue
+            add_order(history.deleted[0], obj.created_at, obj.total_amount, -1)
+            add_order(obj.payment_status, obj.created_at, obj.total_amount, 1)
+
+        if any(isinstance(obj, (User, Order, FinanceApplication)) for obj in sess.deleted):
+            delta['stale'] = True
+
+    # ORM hooks
+
+    def _register_hooks(self):
+        tracked = (self.User, self.Order, self.FinanceApplication)
+        session = self.db.session
+
+        @event.listens_for(session, 'after_flush')
+        def _collect_flush(sess, flush_context):
+            self._record_flush(sess)
+
+        @event.listens_for(session, 'do_orm_execute')
+        def _mark_bulk(orm_execute_state):
+            if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+                if any(mapper.class_ in tracked for mapper in orm_execute_state.all_mappers):
+                    delta = orm_execute_state.session.info.setdefault('dashboard_delta', self._empty_delta())
+                    delta['stale'] = True
+
+        @event.listens_for(session, 'after_commit')
+        def _apply_on_commit(sess):
+            delta = sess.info.pop('dashboard_delta', None)
+            if delta is not None:
+                self._apply(delta)
+
+        @event.listens_for(session, 'after_rollback')
+        def _clear_on_rollback(sess):
+            sess.info.pop('dashboard_delta', None)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Bulk invoice export
+Renders invoices for a date range and/or payment status into a ZIP file
+
+Usage:
+    python export_invoices.py --start 2025-01-01 --end 2025-01-31 --status completed -o january.zip
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def export_invoices(start=None, end=None, status='all', output=None, workers=None):
+    # Imported here rather than at the top: each render process re-imports this script as its
+    # __main__, and must not load the Flask app and its background threads
+    from app import app, invoice_cache, invoice_data, invoice_export_query, export_invoices_zip
+    if workers is None:
+        workers = app.config['INVOICE_EXPORT_WORKERS']
+    output = output or f"carhub_invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    print(f"🧾 Exporting invoices to {output}...")
+
+    rendered = []
+
+    def report(row):
+        rendered.append(row)
+        source = 'cached' if row['cached'] == 'yes' else f"{row['render_ms']} ms"
+        if row['error']:
+            print(f"  ❌ {row['invoice_number']}: {row['error']}")
+        else:
+            print(f"  ✅ {row['invoice_number']} ({source})")
+
+    started = time.perf_counter()
+    with app.app_context():
+        query = invoice_export_query(start, end, status)
+        datas = (invoice_data(order) for order in query.yield_per(200))
+        with open(output, 'wb') as f:
+            for chunk in export_invoices_zip(datas, app.static_folder, max_workers=workers,
+                                             cache=invoice_cache, on_invoice=report):
+                f.write(chunk)
+
+    elapsed = time.perf_counter() - started
+    render_times = [float(row['render_ms']) for row in rendered if row['cached'] == 'no' and not row['error']]
+    print("-" * 60)
+    print(f"📦 {len(rendered)} invoices in {elapsed:.1f}s")
+    if render_times:
+        print(f"⏱️  Render time: avg {sum(render_times) / len(render_times):.1f} ms, max {max(render_times):.1f} ms")
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export CarHub invoices as a ZIP file')
+    parser.add_argument('--start', type=parse_date, help='First order date (YYYY-MM-DD)')
+    parser.add_argument('--end', type=parse_date, help='Last order date, inclusive (YYYY-MM-DD)')
+    parser.add_argument('--status', default='all', help='Payment status filter (default: all)')
+    parser.add_argument('-o', '--output', help='Output ZIP path')
+    parser.add_argument('-w', '--workers', type=int,
+                        help='Render processes (default: INVOICE_EXPORT_WORKERS, 0 = one per CPU)')
+    args = parser.parse_args()
+
+    export_invoices(args.start, args.end, args.status, args.output, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""
+CarHub Invoice Layout
+ReportLab invoice layout with per-process static resources; see invoices.py for caching and export
+"""
+
+import base64
+import os
+from datetime import timedelta
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+from invoices import COMPANY_INFO, PAGE_LAYER_FORM, invoice_number
+
+
+def _load_image(path, max_px):
+    """Decode an image once and downscale it to the size it is drawn at"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        raw = f.read()
+    # Some assets are checked in as base64 text rather than binary PNG
+    if not raw.startswith(b'\x89PNG'):
+        try:
+            raw = base64.b64decode(raw, validate=False)
+        except ValueError:
+            return None
+
+    try:
+        from PIL import Image
+        image = Image.open(BytesIO(raw))
+        image.thumbnail((max_px, max_px))
+        buffer = BytesIO()
+        image.save(buffer, format='PNG')
+        return ImageReader(BytesIO(buffer.getvalue()))
+    except Exception as e:
+        print(f"Error loading invoice image {path}: {e}")
+        return None
+
+
+class InvoiceRenderer:
+    def __init__(self, static_folder):
+        """Build the parts of the invoice that never change between orders.
+
+        Styles, table styles and the decoded logo/watermark images are
+        prepared once per process; the page decoration (logo, company
+        header, footer and terms) is recorded once per document as a PDF
+        form and stamped onto each page.
+        """
+        self.width, self.height = A4
+
+        styles = getSampleStyleSheet()
+
+        # Custom header style
+        self.header_style = styles['Heading2'].clone('CarHubHeader')
+        self.header_style.fontName = 'Helvetica-Bold'
+        self.header_style.fontSize = 14
+        self.header_style.textColor = colors.HexColor('#23235b')  # Dark blue
+
+        # Custom normal text style
+        self.normal_style = styles['Normal'].clone('CarHubNormal')
+        self.normal_style.fontName = 'Helvetica'
+        self.normal_style.fontSize = 10
+        self.normal_style.leading = 12
+
+        # Custom bold text style
+        self.bold_style = styles['Normal'].clone('CarHubBold')
+        self.bold_style.fontName = 'Helvetica-Bold'
+        self.bold_style.fontSize = 10
+        self.bold_style.leading = 12
+
+        # Images are drawn at most 200pt wide, so 2x that is plenty for print
+        self.logo = _load_image(os.path.join(static_folder, 'logo.png'), 240)
+        self.watermark = _load_image(os.path.join(static_folder, 'paid_watermark.png'), 400)
+
+        self.customer_table_style = TableStyle([
+            ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONT', (0, 1), (-1, -1), 'Helvetica'),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#23235b')),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ])
+
+        self.section_header_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, 0), colors.HexColor('#f0f0ff')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('LEFTPADDING', (0, 0), (0, 0), 10),
+            ('RIGHTPADDING', (0, 0), (0, 0), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ])
+
+        self.vehicle_table_style = TableStyle([
+            # Header row styling
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#7c4dff')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('TOPPADDING', (0, 0), (-1, 0), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+
+            # Vehicle row styling
+            ('FONT', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('VALIGN', (0, 1), (-1, -1), 'TOP'),
+            ('TOPPADDING', (0, 1), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+            ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),  # Right align all prices
+
+            # Alternate row colors
+            ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor('#f8f9fa')),
+            ('BACKGROUND', (0, 3), (-1, 3), colors.HexColor('#f8f9fa')),
+            ('BACKGROUND', (0, 5), (-1, 5), colors.HexColor('#f8f9fa')),
+
+            # All cell borders
+            ('GRID', (0, 0), (-1, -2), 0.5, colors.grey),
+            ('LINEABOVE', (0, 0), (-1, 0), 2, colors.HexColor('#7c4dff')),
+
+            # Subtotal row styling
+            ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
+            ('FONT', (-2, -1), (-1, -1), 'Helvetica-Bold'),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e6e6fa')),
+            ('SPAN', (0, -1), (-2, -1)),  # Span the first two columns
+            ('ALIGN', (-2, -1), (-2, -1), 'RIGHT'),  # Right align "Subtotal" text
+        ])
+
+        self.payment_table_style = TableStyle([
+            ('FONT', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONT', (1, 0), (1, -1), 'Helvetica'),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#23235b')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f8f9fa')),
+            ('BACKGROUND', (0, 2), (-1, 2), colors.HexColor('#f8f9fa')),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+        ])
+
+        self.total_table_style = TableStyle([
+            ('FONT', (0, 0), (0, 0), 'Helvetica-Bold'),
+            ('FONT', (1, 0), (1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (1, 0), 16),  # Larger font for total amount
+            ('BACKGROUND', (0, 0), (1, 0), colors.HexColor('#23235b')),  # Dark background
+            ('TEXTCOLOR', (0, 0), (1, 0), colors.white),  # White text
+            ('TOPPADDING', (0, 0), (1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (1, 0), 12),
+            ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
+            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+            ('VALIGN', (0, 0), (1, 0), 'MIDDLE'),
+            ('BOX', (0, 0), (1, 0), 2, colors.HexColor('#7c4dff')),
+        ])
+
+        self.thank_you_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f8f9fa')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#23235b')),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#e6e6fa')),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+            ('LEFTPADDING', (0, 0), (-1, -1), 20),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 20),
+        ])
+
+        self.promo_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, 0), colors.HexColor('#e6e6fa')),
+            ('ALIGN', (0, 0), (0, 0), 'CENTER'),
+            ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
+            ('BOX', (0, 0), (0, 0), 1, colors.HexColor('#7c4dff')),
+            ('TOPPADDING', (0, 0), (0, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (0, 0), 10),
+        ])
+
+    # Page decoration
+
+    def _draw_page_layer(self, canvas):
+        """Static header/footer artwork shared by every invoice page"""
+        width, height = self.width, self.height
+
+        # Add logo in top left corner
+        if self.logo is not None:
+            canvas.drawImage(self.logo, 36, height - 90, width=120, height=60, preserveAspectRatio=True)
+
+        # Draw a light background for company info
+        canvas.setFillColor(colors.HexColor('#f8f9fa'))
+        canvas.roundRect(width - 210, height - 100, 180, 80, 5, fill=1, stroke=0)
+
+        text_obj = canvas.beginText(width - 200, height - 50)
+        text_obj.setFont("Helvetica-Bold", 10)
+        text_obj.setFillColor(colors.HexColor('#23235b'))
+        text_obj.textLine(COMPANY_INFO[0])  # Company name in bold
+        text_obj.setFont("Helvetica", 9)
+        for line in COMPANY_INFO[1:]:
+            text_obj.textLine(line)
+        canvas.drawText(text_obj)
+
+        # Add a decorative divider line below the header
+        canvas.setStrokeColor(colors.HexColor('#7c4dff'))
+        canvas.setLineWidth(2)
+        canvas.line(36, height - 100, width - 36, height - 100)
+
+        # Add a subtle shadow line
+        canvas.setStrokeColor(colors.HexColor('#e6e6fa'))
+        canvas.setLineWidth(1)
+        canvas.line(36, height - 102, width - 36, height - 102)
+
+        # Draw a border around the QR code area
+        canvas.setStrokeColor(colors.HexColor('#7c4dff'))
+        canvas.roundRect(width - 100, 30, 60, 70, 5, fill=0, stroke=1)
+
+        # Add QR code for invoice verification (simulated as a square with internal pattern)
+        canvas.setFillColor(colors.black)
+        canvas.rect(width - 90, 40, 50, 50, fill=0)
+        for i in range(3):
+            for j in range(3):
+                if (i + j) % 2 == 0:  # Checker pattern
+                    canvas.rect(width - 90 + i*16, 40 + j*16, 16, 16, fill=1)
+
+        canvas.setFont("Helvetica", 7)
+        canvas.drawCentredString(width - 65, 30, "Scan to verify invoice")
+
+        # Draw background for footer
+        canvas.setFillColor(colors.HexColor('#f8f9fa'))
+        canvas.roundRect(36, 30, width - 72, 50, 5, fill=1, stroke=0)
+
+        # Add terms & conditions
+        terms_text = canvas.beginText(46, 70)
+        terms_text.setFont("Helvetica-Bold", 9)
+        terms_text.setFillColor(colors.HexColor('#23235b'))
+        terms_text.textLine("Terms & Conditions:")
+        terms_text.setFont("Helvetica", 8)
+        terms_text.setFillColor(colors.black)
+        terms_text.textLine("Payment is due within 30 days. CarHub reserves ownership until full payment.")
+        terms_text.textLine("For questions about this invoice, contact our customer support.")
+        canvas.drawText(terms_text)
+
+        # Decorative element under the page number
+        canvas.setStrokeColor(colors.HexColor('#7c4dff'))
+        canvas.line(width - 80, 34, width - 36, 34)
+
+    def _page_callback(self, data):
+        width, height = self.width, self.height
+        number = invoice_number(data)
+        paid = data['payment_status'].lower() == 'paid'
+
+        def draw_page(canvas, doc):
+            canvas.saveState()
+
+            # Add watermark if paid
+            if paid and self.watermark is not None:
+                canvas.saveState()
+                canvas.setFillAlpha(0.15)  # Set transparency
+                canvas.drawImage(self.watermark, width/2 - 100, height/2 - 100,
+                                 width=200, height=200, preserveAspectRatio=True)
+                canvas.restoreState()
+
+            # Record the static layer once per document, then reuse it on every page
+            if not canvas.hasForm(PAGE_LAYER_FORM):
+                canvas.beginForm(PAGE_LAYER_FORM)
+                self._draw_page_layer(canvas)
+                canvas.endForm()
+            canvas.doForm(PAGE_LAYER_FORM)
+
+            # Add invoice title with enhanced styling
+            canvas.saveState()
+            canvas.setFillColor(colors.HexColor('#f0f0ff'))
+            canvas.roundRect(width/2 - 150, height - 145, 300, 30, 10, fill=1, stroke=0)
+            canvas.setFont("Helvetica-Bold", 18)
+            canvas.setFillColor(colors.HexColor('#23235b'))
+            canvas.drawCentredString(width/2, height - 130, f"INVOICE #{number}")
+            canvas.restoreState()
+
+            # Add page number
+            canvas.setFont("Helvetica", 9)
+            canvas.drawRightString(width - 36, 36, f"Page {doc.page}")
+
+            canvas.restoreState()
+
+        return draw_page
+
+    # Document body
+
+    def render(self, data):
+        """Render an invoice for an invoice_data() snapshot and return the PDF bytes"""
+        buffer = BytesIO()
+
+        # Set up the document with margins
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            leftMargin=36,
+            rightMargin=36,
+            topMargin=36,
+            bottomMargin=36
+        )
+
+        created_at = data['created_at']
+        paid = data['payment_status'].lower() == 'paid'
+        car = data['car']
+        story = []
+
+        # Add spacer for logo area
+        story.append(Spacer(1, 140))
+
+        # Add date and customer info in two-column layout
+        customer_data = [
+            ["BILL TO:", "INVOICE DETAILS:"],
+            [data['billing_name'], f"Invoice Date: {created_at.strftime('%B %d, %Y')}"],
+            [data['billing_address'] or "N/A", f"Due Date: {(created_at + timedelta(days=30)).strftime('%B %d, %Y')}"],
+            [data['billing_email'], f"Order ID: #{data['id']}"],
+            [data['billing_phone'] or "N/A", f"Transaction ID: {data['transaction_id']}"]
+        ]
+        customer_table = Table(customer_data, colWidths=[doc.width/2 - 20, doc.width/2 - 20])
+        customer_table.setStyle(self.customer_table_style)
+        story.append(customer_table)
+        story.append(Spacer(1, 20))
+
+        # Vehicle section header with background
+        vehicle_header = Paragraph("VEHICLE DETAILS", self.header_style)
+        header_background = Table([[vehicle_header]], colWidths=[doc.width])
+        header_background.setStyle(self.section_header_style)
+        story.append(header_background)
+        story.append(Spacer(1, 10))
+
+        # Create vehicle info table
+        vehicle_info = [["ITEM", "DESCRIPTION", "PRICE"]]
+
+        if car:
+            car_details = [
+                f"Make/Model: {car['name']}",
+                "VIN: Not Available",
+                f"Color: {car['color'] or 'Standard'}"
+            ]
+            if car['year']:
+                car_details.insert(1, f"Year: {car['year']}")
+            if car['engine']:
+                car_details.append(f"Engine: {car['engine']}")
+            if car['transmission']:
+                car_details.append(f"Transmission: {car['transmission']}")
+
+            vehicle_info.append([
+                "Premium Vehicle",
+                "\n".join(car_details),
+                f"${car['price']:,.2f}"
+            ])
+        else:
+            vehicle_info.append(["Vehicle", "Information Not Available", "N/A"])
+
+        # Add fees and taxes
+        base_price = car['price'] if car else (data['total_amount'] / 1.1)
+        delivery_fee = base_price * 0.01  # Default 1% delivery fee
+
+        vehicle_info.append(["Delivery Fee", "Vehicle delivery and handling", f"${delivery_fee:,.2f}"])
+        vehicle_info.append(["Processing Fee", "Documentation and registration", f"${base_price * 0.02:,.2f}"])
+        vehicle_info.append(["Tax", "Sales tax (8%)", f"${base_price * 0.08:,.2f}"])
+        vehicle_info.append(["", "Subtotal", f"${base_price + delivery_fee + (base_price * 0.02) + (base_price * 0.08):,.2f}"])
+
+        vehicle_table = Table(vehicle_info, colWidths=[doc.width * 0.2, doc.width * 0.5, doc.width * 0.2])
+        vehicle_table.setStyle(self.vehicle_table_style)
+        story.append(vehicle_table)
+        story.append(Spacer(1, 20))
+
+        # Payment summary
+        status_color = colors.HexColor('#4CAF50') if paid else colors.HexColor('#FF9800')
+
+        story.append(Paragraph("PAYMENT SUMMARY", self.header_style))
+        story.append(Spacer(1, 10))
+
+        payment_data = [
+            ["Payment Date:", created_at.strftime('%B %d, %Y')],
+            ["Transaction ID:", data['transaction_id'] or "N/A"],
+            ["Payment Method:", data['payment_method'].replace('_', ' ').title()],
+            ["Payment Status:", ""]  # Empty cell for custom status badge
+        ]
+        payment_table = Table(payment_data, colWidths=[doc.width * 0.3, doc.width * 0.6])
+        payment_table.setStyle(self.payment_table_style)
+        story.append(payment_table)
+
+        # Separate styled status badge
+        status_table = Table([["", data['payment_status'].upper()]], colWidths=[10, doc.width * 0.3])
+        status_table.setStyle(TableStyle([
+            ('FONT', (1, 0), (1, 0), 'Helvetica-Bold'),
+            ('TEXTCOLOR', (1, 0), (1, 0), colors.white),
+            ('BACKGROUND', (1, 0), (1, 0), status_color),
+            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+            ('VALIGN', (1, 0), (1, 0), 'MIDDLE'),
+            ('TOPPADDING', (1, 0), (1, 0), 6),
+            ('BOTTOMPADDING', (1, 0), (1, 0), 6),
+        ]))
+        story.append(Spacer(1, -30))  # Negative spacer to position the badge at the right location
+        story.append(status_table)
+        story.append(Spacer(1, 20))
+
+        # Total amount section
+        total_label = "TOTAL AMOUNT PAID:" if paid else "TOTAL AMOUNT DUE:"
+        total_table = Table([[total_label, f"${data['total_amount']:,.2f}"]],
+                            colWidths=[doc.width * 0.5, doc.width * 0.4])
+        total_table.setStyle(self.total_table_style)
+        story.append(total_table)
+        story.append(Spacer(1, 30))
+
+        # Thank you message box
+        thank_you_paragraphs = [
+            Paragraph("<b>Thank you for choosing CarHub Premium Auto!</b>", self.bold_style),
+            Spacer(1, 5),
+            Paragraph("We value your business and look forward to serving you again. Your satisfaction is our top priority.", self.normal_style),
+            Spacer(1, 10),
+            Paragraph("For any questions or concerns regarding this invoice, please contact our customer service team at <b>support@carhub.com</b> or call us at <b>+1 (555) 123-4567</b>.", self.normal_style)
+        ]
+        thank_you_table = Table([[p] for p in thank_you_paragraphs], colWidths=[doc.width - 80])
+        thank_you_table.setStyle(self.thank_you_table_style)
+        story.append(thank_you_table)
+
+        # Add a promotional message if appropriate
+        if paid:
+            story.append(Spacer(1, 20))
+            promo_text = "As a valued customer, enjoy 10% off your next premium vehicle service by using code: <b>CARHUB10</b>"
+            promo_table = Table([[Paragraph(promo_text, self.normal_style)]], colWidths=[doc.width - 80])
+            promo_table.setStyle(self.promo_table_style)
+            story.append(promo_table)
+
+        draw_page = self._page_callback(data)
+        doc.build(story, onFirstPage=draw_page, onLaterPages=draw_page)
+        return buffer.getvalue()
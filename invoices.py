@@ -0,0 +1,262 @@
+"""
+CarHub Invoices
+Invoice snapshots, the per-process renderer, an on-disk PDF cache and bulk ZIP export
+"""
+
+import csv
+import glob
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy import module_available
+
+# The ReportLab layout lives in invoice_renderer.py and is only imported
+# when the first invoice is rendered; app start-up just checks it exists
+PDF_AVAILABLE = module_available('reportlab')
+
+# Bump whenever the layout changes so cached PDFs are re-rendered
+INVOICE_TEMPLATE_VERSION = 1
+
+PAGE_LAYER_FORM = 'carhubPageLayer'
+
+COMPANY_INFO = [
+    "CarHub Premium Auto",
+    "123 Luxury Drive",
+    "Automotive City, AC 98765",
+    "support@carhub.com",
+    "+1 (555) 123-4567",
+    "www.carhub.com"
+]
+
+
+def invoice_data(order):
+    """Snapshot the fields of an Order needed to render its invoice.
+
+    The result only holds plain values so it can be pickled into worker
+    processes and hashed for the cache key.
+    """
+    car = order.car
+    return {
+        'id': order.id,
+        'created_at': order.created_at,
+        'updated_at': order.updated_at or order.created_at,
+        'billing_name': order.billing_name,
+        'billing_email': order.billing_email,
+        'billing_phone': order.billing_phone,
+        'billing_address': order.billing_address,
+        'transaction_id': order.transaction_id,
+        'payment_method': order.payment_method or '',
+        'payment_status': order.payment_status or '',
+        'total_amount': order.total_amount,
+        'car': {
+            'name': car.name,
+            'price': car.price,
+            'year': car.year,
+            'engine': car.engine,
+            'transmission': car.transmission,
+            'color': car.color,
+            'updated_at': car.updated_at,
+        } if car else None,
+    }
+
+
+def invoice_number(data):
+    return f"INV-{data['id']}-{data['created_at'].strftime('%Y%m%d')}"
+
+
+def invoice_filename(data):
+    return f"carhub_invoice_{data['id']}.pdf"
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_invoice_renderer(static_folder):
+    """Return the process-wide InvoiceRenderer, building it on first use"""
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                from invoice_renderer import InvoiceRenderer
+                _renderer = InvoiceRenderer(static_folder)
+    return _renderer
+
+
+class InvoiceCache:
+    def __init__(self, cache_dir):
+        """Content-addressed on-disk store of rendered invoice PDFs"""
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(data):
+        """Cache key from order id, last update and template version"""
+        car = data['car'] or {}
+        parts = [
+            str(data['id']),
+            data['updated_at'].isoformat() if data['updated_at'] else '',
+            car['updated_at'].isoformat() if car.get('updated_at') else '',
+            str(INVOICE_TEMPLATE_VERSION),
+        ]
+        return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def path(self, data, key=None):
+        return os.path.join(self.cache_dir, f"invoice-{data['id']}-{key or self.key(data)}.pdf")
+
+    def get_or_render(self, data, render):
+        """Return (path, key, cache_hit), rendering and storing the PDF on a miss"""
+        key = self.key(data)
+        path = self.path(data, key)
+        if os.path.exists(path):
+            return path, key, True
+
+        pdf = render(data)
+        self.store(data, key, pdf)
+        return path, key, False
+
+    def store(self, data, key, pdf):
+        path = self.path(data, key)
+        # Write atomically so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pdf)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._prune(data['id'], keep=path)
+        return path
+
+    def _prune(self, order_id, keep):
+        """Remove renders of older versions of the same order"""
+        for stale in glob.glob(os.path.join(self.cache_dir, f"invoice-{order_id}-*.pdf")):
+            if stale != keep:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+
+# Bulk export
+
+def _render_job(static_folder, data):
+    """Render one invoice in a worker process; returns (pdf, render_ms)"""
+    started = time.perf_counter()
+    pdf = get_invoice_renderer(static_folder).render(data)
+    return pdf, (time.perf_counter() - started) * 1000
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, non-seekable sink that hands zipfile output back in chunks"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def export_invoices_zip(datas, static_folder, max_workers=None, cache=None, on_invoice=None):
+    """Yield a ZIP archive of invoices, chunk by chunk.
+
+    `datas` is an iterable of invoice_data() snapshots. Invoices are
+    rendered across a process pool (ReportLab is CPU-bound) with only a
+    small window of renders in flight, and each PDF is written to the
+    archive and released as soon as it is ready. Cached renders are read
+    from `cache` instead of being rendered again, and fresh renders are
+    stored there.
+
+    The archive ends with manifest.csv listing every invoice with its
+    render time. `on_invoice(row)` is called with each manifest row.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    stream = _ZipStream()
+    manifest = []
+
+    def add(data, pdf, render_ms, cached, error=''):
+        if pdf is not None:
+            info = zipfile.ZipInfo(invoice_filename(data), date_time=data['created_at'].timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, pdf)
+        row = {
+            'order_id': data['id'],
+            'invoice_number': invoice_number(data),
+            'filename': invoice_filename(data) if pdf is not None else '',
+            'render_ms': f"{render_ms:.1f}",
+            'cached': 'yes' if cached else 'no',
+            'error': error,
+        }
+        manifest.append(row)
+        if on_invoice:
+            on_invoice(row)
+
+    def collect(data, job):
+        if isinstance(job, str):
+            try:
+                with open(job, 'rb') as f:
+                    add(data, f.read(), 0.0, True)
+                return
+            except FileNotFoundError:
+                # Pruned since the lookup (the order changed meanwhile): render it now
+                job = executor.submit(_render_job, static_folder, data)
+        try:
+            pdf, render_ms = job.result()
+        except Exception as e:
+            add(data, None, 0.0, False, error=str(e))
+            return
+        if cache is not None:
+            cache.store(data, cache.key(data), pdf)
+        add(data, pdf, render_ms, False)
+
+    # Spawned workers import this module and re-import the parent's main script (minus its
+    # `if __name__ == "__main__"` block). Under gunicorn, `flask run` or export_invoices.py that
+    # leaves the Flask app and its background threads out; under `python app.py` (the
+    # development server) every worker loads the app as well
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                             initializer=get_invoice_renderer, initargs=(static_folder,)) as executor, \
+            zipfile.ZipFile(stream, 'w') as archive:
+        pending = deque()
+        for data in datas:
+            cached_path = cache.path(data) if cache is not None else None
+            if cached_path and os.path.exists(cached_path):
+                pending.append((data, cached_path))
+            else:
+                pending.append((data, executor.submit(_render_job, static_folder, data)))
+
+            while len(pending) > max_workers * 2:
+                collect(*pending.popleft())
+                yield stream.drain()
+
+        while pending:
+            collect(*pending.popleft())
+            yield stream.drain()
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=['order_id', 'invoice_number', 'filename',
+                                                    'render_ms', 'cached', 'error'])
+        writer.writeheader()
+        writer.writerows(manifest)
+        archive.writestr('manifest.csv', buffer.getvalue())
+
+    yield stream.drain()
@@ -0,0 +1,82 @@
+"""
+CarHub Lazy Loading
+Stand-ins for optional, slow-to-import modules and slow-to-build objects so worker start-up and scripts skip them
+until first use
+"""
+
+import importlib
+import threading
+from importlib.util import find_spec
+
+
+def module_available(name):
+    """Whether `name` can be imported, without importing it"""
+    try:
+        return find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False  # a parent package is missing
+
+
+class LazyModule:
+    def __init__(self, name):
+        """Proxy for module `name`, imported on the first attribute access.
+
+        Lets module-level code keep `id_token.verify_oauth2_token(...)`
+        style calls while the import cost is only paid by the first
+        request that needs it.
+        """
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+                module = self._module
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+class LazyObject:
+    def __init__(self, factory, name):
+        """Proxy for the object `factory()` returns, built on the first attribute access.
+
+        Attribute reads, writes and deletes go to the built object. If
+        `factory` raises, nothing is kept and the next access tries again.
+        """
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_target', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def _resolve(self):
+        target = self._target
+        if target is None:
+            with self._lock:
+                if self._target is None:
+                    object.__setattr__(self, '_target', self._factory())
+                target = self._target
+        return target
+
+    @property
+    def loaded(self):
+        return self._target is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._resolve(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._resolve(), attr)
+
+    def __repr__(self):
+        state = 'built' if self._target is not None else 'not built'
+        return f"<LazyObject {self._name} ({state})>"
@@ -0,0 +1,314 @@
+"""
+CarHub LLM Gateway
+Bounds every chat completion: pooled connections, deadlines, a concurrency cap and a circuit breaker
+"""
+
+import bisect
+import threading
+import time
+
+# openai (and httpx with it) takes about half a second to import, so it is
+# imported on the first completion rather than when a worker starts
+
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0)
+
+
+class LLMUnavailableError(Exception):
+    """The gateway refused a call without contacting the provider"""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    def __init__(self, retry_after):
+        super().__init__(f"LLM circuit open, retrying in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class GatewayBusyError(LLMUnavailableError):
+    def __init__(self, limit):
+        super().__init__(f"All {limit} LLM slots are busy")
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, deadline):
+        super().__init__(f"LLM call exceeded its {deadline}s deadline")
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Cumulative-style latency histogram with fixed upper bounds in seconds"""
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+
+    def snapshot(self):
+        """Counts per bucket plus p50/p95/p99 estimated as the upper bound of their bucket"""
+        with self._lock:
+            counts = list(self._counts)
+            total_seconds = self._sum
+        count = sum(counts)
+        return {
+            'count': count,
+            'sum_seconds': round(total_seconds, 4),
+            'buckets': {str(bound): n for bound, n in zip(self.buckets + ('+Inf',), counts)},
+            'p50_seconds': self._quantile(counts, count, 0.50),
+            'p95_seconds': self._quantile(counts, count, 0.95),
+            'p99_seconds': self._quantile(counts, count, 0.99),
+        }
+
+    def _quantile(self, counts, count, q):
+        if not count:
+            return None
+        seen = 0
+        for bound, n in zip(self.buckets + (None,), counts):
+            seen += n
+            if seen >= q * count:
+                return bound
+        return None
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """Open after `failure_threshold` consecutive failures.
+
+        While open, calls are refused for `reset_timeout` seconds; then a
+        single trial call is let through and its outcome closes or reopens
+        the circuit.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self.trips = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited < self.reset_timeout or self._trial_running:
+                raise CircuitOpenError(max(self.reset_timeout - waited, 0))
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_running:
+                    self.trips += 1
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release_trial(self):
+        """The trial call ended without a verdict (e.g. the client went away)"""
+        with self._lock:
+            self._trial_running = False
+
+
+def pooled_http_client(max_connections=20, timeout=20.0, connect_timeout=5.0):
+    """One keep-alive connection pool shared by every completion in this process"""
+    import httpx
+    import openai
+    return openai.DefaultHttpxClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+    )
+
+
+class LLMGateway:
+    def __init__(self, client=None, max_concurrency=8, queue_timeout=2.0, timeout=20.0, connect_timeout=5.0,
+                 failure_threshold=5, reset_timeout=30.0, client_factory=None):
+        """Run chat completions on `client` within fixed limits.
+
+        At most `max_concurrency` completions are in flight; a caller that
+        cannot get a slot within `queue_timeout` seconds gets
+        GatewayBusyError instead of tying up its worker thread. Every call
+        has a `timeout` second deadline, streamed ones included, and
+        provider failures feed a CircuitBreaker. Callers treat
+        LLMUnavailableError like any other failure and answer from the
+        knowledge base.
+
+        Without a `client`, `client_factory()` builds one on the first
+        completion.
+        """
+        self._client = client
+        self._client_factory = client_factory
+        self._client_lock = threading.Lock()
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._request_timeout = None
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latency = LatencyHistogram()
+        self.first_token = LatencyHistogram()
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._calls = 0
+        self._failures = 0
+        self._rejected_busy = 0
+        self._rejected_open = 0
+        self._timeouts = 0
+
+    @property
+    def client(self):
+        """The provider client, built by `client_factory` on first use"""
+        if self._client is None and self._client_factory is not None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def request_timeout(self):
+        if self._request_timeout is None:
+            import httpx
+            self._request_timeout = httpx.Timeout(self.timeout, connect=self.connect_timeout)
+        return self._request_timeout
+
+    def complete(self, **params):
+        """Non-streamed chat completion"""
+        client = self.client
+        self._admit()
+        started = time.perf_counter()
+        try:
+            response = client.chat.completions.create(timeout=self.request_timeout, **params)
+        except Exception as e:
+            self._failed(e)
+            raise
+        else:
+            self.breaker.record_success()
+            return response
+        finally:
+            self._release(started)
+
+    def stream(self, **params):
+        """Streamed chat completion; yields chunks and holds its slot until closed"""
+        client = self.client
+        self._admit()
+        started = time.perf_counter()
+        stream = None
+        verdict = False
+        try:
+            stream = client.chat.completions.create(stream=True, timeout=self.request_timeout, **params)
+            first = True
+            for chunk in stream:
+                elapsed = time.perf_counter() - started
+                if first:
+                    self.first_token.observe(elapsed)
+                    first = False
+                yield chunk
+                if time.perf_counter() - started > self.timeout:
+                    raise DeadlineExceeded(self.timeout)
+            verdict = True
+            self.breaker.record_success()
+        except GeneratorExit:
+            # The consumer stopped reading (browser closed); says nothing about the provider
+            raise
+        except Exception as e:
+            verdict = True
+            self._failed(e)
+            raise
+        finally:
+            if not verdict:
+                self.breaker.release_trial()
+            if stream is not None:
+                stream.close()
+            self._release(started)
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                'in_flight': self._in_flight,
+                'max_concurrency': self.max_concurrency,
+                'calls': self._calls,
+                'failures': self._failures,
+                'timeouts': self._timeouts,
+                'rejected_busy': self._rejected_busy,
+                'rejected_open': self._rejected_open,
+            }
+        return dict(counters,
+                    circuit=self.breaker.state,
+                    circuit_trips=self.breaker.trips,
+                    timeout_seconds=self.timeout,
+                    latency=self.latency.snapshot(),
+                    first_token=self.first_token.snapshot())
+
+    def _admit(self):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            with self._lock:
+                self._rejected_open += 1
+            raise
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.breaker.release_trial()
+            with self._lock:
+                self._rejected_busy += 1
+            raise GatewayBusyError(self.max_concurrency)
+        with self._lock:
+            self._in_flight += 1
+            self._calls += 1
+
+    def _release(self, started):
+        self.latency.observe(time.perf_counter() - started)
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _failed(self, error):
+        import openai
+        timed_out = isinstance(error, (DeadlineExceeded, openai.APITimeoutError))
+        with self._lock:
+            self._failures += 1
+            if timed_out:
+                self._timeouts += 1
+        # Errors that say the provider is unhealthy or overloaded, as opposed to a bad request
+        if timed_out or isinstance(error, (openai.APIConnectionError, openai.RateLimitError,
+                                           openai.InternalServerError)):
+            self.breaker.record_failure()
+        else:
+            # A rejected request still shows the provider is answering
+            self.breaker.record_success()
+
+
+def gateway_options(app):
+    """LLMGateway keyword arguments from LLM_* settings"""
+    return {
+        'max_concurrency': app.config.get('LLM_MAX_CONCURRENCY', 8),
+        'queue_timeout': app.config.get('LLM_QUEUE_TIMEOUT', 2.0),
+        'timeout': app.config.get('LLM_TIMEOUT', 20.0),
+        'connect_timeout': app.config.get('LLM_CONNECT_TIMEOUT', 5.0),
+        'failure_threshold': app.config.get('LLM_BREAKER_FAILURES', 5),
+        'reset_timeout': app.config.get('LLM_BREAKER_RESET', 30.0),
+    }
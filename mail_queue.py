@@ -0,0 +1,448 @@
+"""
+CarHub Mail Queue
+Spools outbound email to disk and delivers it from background threads over pooled SMTP connections
+"""
+
+import atexit
+import json
+import os
+import re
+import smtplib
+import ssl
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from email.utils import formataddr
+
+
+class SMTPConnectionPool:
+    def __init__(self, host, port, username=None, password=None, use_ssl=False, use_tls=False,
+                 size=2, timeout=10, max_idle=60):
+        """Keep up to `size` authenticated SMTP connections open for reuse.
+
+        Connections idle for more than `max_idle` seconds are closed on
+        checkout instead of being reused, since most servers drop them
+        after a minute or two anyway.
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_idle = max_idle
+
+        self._idle = []  # (connection, last_used)
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.connects = 0
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection; it goes back to the pool unless the block raised"""
+        self._slots.acquire()
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+            except Exception:
+                self._close(conn)
+                raise
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def _checkout(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+            if now - last_used <= self.max_idle:
+                return conn
+            self._close(conn)
+        return self._connect()
+
+    def _connect(self):
+        context = ssl.create_default_context()
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=context)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                conn.starttls(context=context)
+        if self.username:
+            conn.login(self.username, self.password or '')
+        with self._lock:
+            self.connects += 1
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+class SMTPTransport:
+    """Deliver spooled envelopes through an SMTPConnectionPool"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def deliver(self, envelope):
+        for attempt in range(2):
+            try:
+                with self.pool.connection() as conn:
+                    conn.sendmail(envelope['sender'], envelope['recipients'], envelope['raw'].encode('utf-8'))
+                return
+            except smtplib.SMTPServerDisconnected:
+                # A pooled connection the server had already dropped; retry once on a fresh one
+                if attempt:
+                    raise
+
+
+class MailSpool:
+    """One JSON file per message in a directory shared by every worker process.
+
+    File names start with the time the message is next due, so a sorted
+    listing is the delivery order. A message is claimed by renaming it to
+    `.sending`, which is atomic, so two processes never send the same file.
+    Messages that run out of attempts are moved to `failed/` with their
+    body removed, and deleted after `failed_retention` seconds. Messages
+    can hold reset codes, so files are readable by the owner only.
+    """
+
+    def __init__(self, directory, failed_retention=7 * 86400):
+        self.directory = directory
+        self.failed_directory = os.path.join(directory, 'failed')
+        self.failed_retention = failed_retention
+        os.makedirs(self.failed_directory, mode=0o700, exist_ok=True)
+
+    def put(self, envelope):
+        name = f"{envelope['next_attempt_at']:017.6f}-{envelope['id']}.json"
+        path = os.path.join(self.directory, name)
+        self._write(path, envelope)
+        return path
+
+    def claim_due(self, limit, now=None):
+        """Claim up to `limit` messages that are due; returns [(claimed_path, envelope)]"""
+        now = time.time() if now is None else now
+        claimed = []
+        for name in sorted(self._pending_names()):
+            if len(claimed) >= limit or float(name.split('-', 1)[0]) > now:
+                break
+            path = os.path.join(self.directory, name)
+            claimed_path = path + '.sending'
+            try:
+                os.rename(path, claimed_path)
+            except FileNotFoundError:
+                continue  # Claimed by another worker
+            try:
+                with open(claimed_path, encoding='utf-8') as f:
+                    claimed.append((claimed_path, json.load(f)))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Unreadable spooled email {name}: {e}")
+                os.replace(claimed_path, os.path.join(self.failed_directory, name))
+        return claimed
+
+    def complete(self, claimed_path):
+        try:
+            os.remove(claimed_path)
+        except FileNotFoundError:
+            pass
+
+    def reschedule(self, claimed_path, envelope):
+        self.put(envelope)
+        self.complete(claimed_path)
+
+    def fail(self, claimed_path, envelope):
+        """Park a message in `failed/`, keeping its headers and error but not its body"""
+        name = os.path.basename(claimed_path)[:-len('.sending')]
+        self._write(os.path.join(self.failed_directory, name), dict(envelope, raw=_without_body(envelope['raw'])))
+        self.complete(claimed_path)
+        self.prune_failed()
+
+    def prune_failed(self, now=None):
+        """Delete failed messages older than `failed_retention` seconds; returns how many"""
+        cutoff = (time.time() if now is None else now) - self.failed_retention
+        pruned = 0
+        for entry in os.scandir(self.failed_directory):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    pruned += 1
+            except FileNotFoundError:
+                pass  # Pruned by another worker
+        return pruned
+
+    def recover(self, older_than=600):
+        """Return messages left claimed by a crashed worker to the queue"""
+        cutoff = time.time() - older_than
+        recovered = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.sending') and entry.stat().st_mtime < cutoff:
+                try:
+                    os.rename(entry.path, entry.path[:-len('.sending')])
+                    recovered += 1
+                except FileNotFoundError:
+                    pass
+        return recovered
+
+    def depth(self):
+        return sum(1 for _ in self._pending_names())
+
+    def failed_count(self):
+        return sum(1 for name in os.listdir(self.failed_directory) if name.endswith('.json'))
+
+    def _pending_names(self):
+        return (name for name in os.listdir(self.directory) if name.endswith('.json'))
+
+    @staticmethod
+    def _write(path, envelope):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as f:
+            json.dump(envelope, f)
+        os.replace(tmp_path, path)
+
+
+def _without_body(raw):
+    """A raw message's headers, with the body (which may hold a reset code) dropped"""
+    headers = re.split(r'\r?\n\r?\n', raw, maxsplit=1)[0]
+    return headers + '\r\n\r\n[body removed]\r\n'
+
+
+class MailQueue:
+    def __init__(self, spool, transport, workers=1, max_attempts=5, retry_delay=30, poll_interval=1.0):
+        """Accept messages from request threads and deliver them in the background.
+
+        send() only writes the message to the spool, so a slow or
+        unreachable SMTP server never holds up a request. Temporary
+        failures are retried with exponential backoff starting at
+        `retry_delay` seconds; permanent (5xx) rejections and messages
+        that fail `max_attempts` times are moved to the failed folder.
+        """
+        self.spool = spool
+        self.transport = transport
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+
+        self._wakeup = threading.Condition()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._stopping = threading.Event()
+        self._in_flight = 0
+
+        self._enqueued = 0
+        self._sent = 0
+        self._retried = 0
+        self._failed = 0
+        self._last_error = None
+        self._latencies = deque(maxlen=1000)  # enqueue to delivery, ms
+        self._send_times = deque(maxlen=1000)  # SMTP transaction only, ms
+
+        atexit.register(self.stop)
+
+    def send(self, message):
+        """Spool a Flask-Mail Message for delivery; returns the message id"""
+        sender = message.sender
+        if isinstance(sender, (tuple, list)):
+            sender = formataddr(tuple(sender))
+        if message.date is None:
+            message.date = time.time()
+        return self.enqueue(sender, list(message.send_to), message.as_string())
+
+    def enqueue(self, sender, recipients, raw):
+        """Spool a raw RFC 5322 message for delivery; returns the message id"""
+        self._ensure_workers()
+        now = time.time()
+        envelope = {
+            'id': uuid.uuid4().hex,
+            'sender': sender,
+            'recipients': recipients,
+            'raw': raw,
+            'attempts': 0,
+            'enqueued_at': now,
+            'next_attempt_at': now,
+            'last_error': None,
+        }
+        self.spool.put(envelope)
+        with self._lock:
+            self._enqueued += 1
+        with self._wakeup:
+            self._wakeup.notify()
+        return envelope['id']
+
+    def flush(self, timeout=10):
+        """Block until nothing due is waiting or being sent; returns True if the queue drained"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._threads and any(t.is_alive() for t in self._threads) and self._pid == os.getpid():
+                with self._wakeup:
+                    self._wakeup.notify_all()
+                time.sleep(0.01)
+            else:
+                self._process(limit=100)
+            with self._lock:
+                busy = self._in_flight
+            if not busy and not self._has_due():
+                return True
+        return False
+
+    def stop(self, timeout=5):
+        """Stop the worker threads; unsent messages stay in the spool for the next start"""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        if self._pid == os.getpid():
+            for thread in self._threads:
+                thread.join(timeout)
+        self._threads = []
+        close = getattr(getattr(self.transport, 'pool', None), 'close', None)
+        if close:
+            close()
+
+    def stats(self):
+        """Queue depth, delivery counters and latency percentiles"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            send_times = sorted(self._send_times)
+            stats = {
+                'queue_depth': self.spool.depth(),
+                'in_flight': self._in_flight,
+                'failed_total': self.spool.failed_count(),
+                'enqueued': self._enqueued,
+                'sent': self._sent,
+                'retried': self._retried,
+                'failed': self._failed,
+                'last_error': self._last_error,
+                'delivery_latency_ms': _percentiles(latencies),
+                'smtp_send_ms': _percentiles(send_times),
+            }
+        pool = getattr(self.transport, 'pool', None)
+        if pool is not None:
+            stats['smtp_connects'] = pool.connects
+        return stats
+
+    # Workers
+
+    def _ensure_workers(self):
+        # Started lazily, and restarted after fork, like the activity log writer
+        pid = os.getpid()
+        if self._pid == pid and self._threads and all(t.is_alive() for t in self._threads):
+            return
+        with self._lock:
+            if self._pid == pid and self._threads and all(t.is_alive() for t in self._threads):
+                return
+            if self._pid != pid:
+                self.spool.recover()
+                self.spool.prune_failed()
+            self._pid = pid
+            self._stopping.clear()
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f'mail-queue-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            if not self._process(limit=1):
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+
+    def _process(self, limit):
+        with self._lock:
+            claimed = self.spool.claim_due(limit)
+            self._in_flight += len(claimed)
+        for claimed_path, envelope in claimed:
+            try:
+                self._deliver(claimed_path, envelope)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+        return len(claimed)
+
+    def _deliver(self, claimed_path, envelope):
+        started = time.perf_counter()
+        try:
+            self.transport.deliver(envelope)
+        except Exception as e:
+            envelope['attempts'] += 1
+            envelope['last_error'] = str(e)
+            permanent = isinstance(e, smtplib.SMTPResponseException) and 500 <= e.smtp_code < 600
+            if permanent or isinstance(e, smtplib.SMTPRecipientsRefused) or envelope['attempts'] >= self.max_attempts:
+                self.spool.fail(claimed_path, envelope)
+                with self._lock:
+                    self._failed += 1
+                    self._last_error = str(e)
+                print(f"❌ Email {envelope['id']} to {', '.join(envelope['recipients'])} failed: {e}")
+            else:
+                envelope['next_attempt_at'] = time.time() + self.retry_delay * 2 ** (envelope['attempts'] - 1)
+                self.spool.reschedule(claimed_path, envelope)
+                with self._lock:
+                    self._retried += 1
+                    self._last_error = str(e)
+                print(f"⚠️ Email {envelope['id']} will be retried (attempt {envelope['attempts']}): {e}")
+            return
+
+        self.spool.complete(claimed_path)
+        with self._lock:
+            self._sent += 1
+            self._send_times.append((time.perf_counter() - started) * 1000)
+            self._latencies.append((time.time() - envelope['enqueued_at']) * 1000)
+
+    def _has_due(self):
+        now = time.time()
+        return any(float(name.split('-', 1)[0]) <= now for name in self.spool._pending_names())
+
+
+def _percentiles(samples):
+    if not samples:
+        return {'count': 0, 'p50': None, 'p95': None, 'max': None}
+    return {
+        'count': len(samples),
+        'p50': round(samples[len(samples) // 2], 2),
+        'p95': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+        'max': round(samples[-1], 2),
+    }
+
+
+def create_mail_queue(app):
+    """Build the queue from the MAIL_* and MAIL_QUEUE_* settings"""
+    pool = SMTPConnectionPool(
+        app.config['MAIL_SERVER'],
+        app.config['MAIL_PORT'],
+        username=app.config.get('MAIL_USERNAME'),
+        password=app.config.get('MAIL_PASSWORD'),
+        use_ssl=app.config.get('MAIL_USE_SSL', False),
+        use_tls=app.config.get('MAIL_USE_TLS', False),
+        size=app.config.get('MAIL_POOL_SIZE', 2),
+        timeout=app.config.get('MAIL_TIMEOUT', 10),
+    )
+    return MailQueue(
+        MailSpool(app.config['MAIL_SPOOL_PATH'],
+                  failed_retention=app.config.get('MAIL_FAILED_RETENTION_DAYS', 7) * 86400),
+        SMTPTransport(pool),
+        workers=app.config.get('MAIL_POOL_SIZE', 2),
+        max_attempts=app.config.get('MAIL_MAX_ATTEMPTS', 5),
+        retry_delay=app.config.get('MAIL_RETRY_DELAY', 30),
+    )
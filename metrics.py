@@ -0,0 +1,232 @@
+"""
+CarHub Metrics
+Counters, gauges and latency histograms in the Prometheus text format, recorded without locks
+"""
+
+import bisect
+import threading
+import time
+import weakref
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _ShardOwner:
+    """Lives in a thread's local storage; when the thread ends it is collected and its shard retired"""
+
+
+class Metric:
+    def __init__(self, registry, name, kind, help_text, labelnames=(), buckets=None):
+        self.registry = registry
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets else None
+
+    def _key(self, labelvalues):
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {labelvalues}")
+        return (self.name, tuple(str(value) for value in labelvalues))
+
+
+class Counter(Metric):
+    def inc(self, *labelvalues, amount=1):
+        shard = self.registry._shard()
+        key = self._key(labelvalues)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    """Summed across threads, so an inc() and dec() from the same request cancel out"""
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(Metric):
+    def observe(self, value, *labelvalues):
+        shard = self.registry._shard()
+        key = self._key(labelvalues)
+        counts = shard.get(key)
+        if counts is None:
+            counts = shard[key] = [0] * (len(self.buckets) + 2)  # buckets, +Inf, then the sum
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+
+class Metrics:
+    def __init__(self):
+        """A registry of metrics whose values are kept per thread.
+
+        Each thread writes only to its own shard (a plain dict), so
+        recording a value takes no lock; a scrape sums the shards. When a
+        thread ends its shard is folded into the retired totals, so
+        short-lived threads do not pile up.
+        """
+        self._metrics = {}  # name -> Metric, in registration order
+        self._callbacks = {}  # name -> (help, fn) read at scrape time
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()  # registration, new threads and scrapes only
+
+    # Registration (returns the existing metric when the name is taken)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, 'counter', help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=(), callback=None):
+        """A gauge set with inc()/dec(), or read from `callback()` at scrape time"""
+        if callback is not None:
+            with self._lock:
+                self._callbacks[name] = (help_text, callback)
+            return None
+        return self._register(Gauge, name, 'gauge', help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=HTTP_BUCKETS):
+        return self._register(Histogram, name, 'histogram', help_text, labelnames, buckets=buckets)
+
+    def _register(self, cls, name, kind, help_text, labelnames, buckets=None):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, kind, help_text, labelnames, buckets)
+            return metric
+
+    # Per-thread shards
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            owner = self._local.owner = _ShardOwner()
+            with self._lock:
+                self._shards.append(shard)
+            weakref.finalize(owner, self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._lock:
+            self._shards = [other for other in self._shards if other is not shard]
+            _merge(self._retired, shard)
+
+    def values(self):
+        """{(name, labelvalues): total} summed over every thread, past and present"""
+        with self._lock:
+            totals = {}
+            _merge(totals, self._retired)
+            for shard in self._shards:
+                _merge(totals, shard.copy())  # dict.copy() is atomic, so the owner may keep writing
+        return totals
+
+    # Exposition
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        totals = self.values()
+        with self._lock:
+            metrics = list(self._metrics.values())
+            callbacks = list(self._callbacks.items())
+
+        by_name = {}
+        for (name, labelvalues), value in totals.items():
+            by_name.setdefault(name, []).append((labelvalues, value))
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            samples = sorted(by_name.get(metric.name, []))
+            if not samples and not metric.labelnames and metric.kind != 'histogram':
+                samples = [((), 0)]
+            for labelvalues, value in samples:
+                labels = list(zip(metric.labelnames, labelvalues))
+                if metric.kind != 'histogram':
+                    lines.append(f'{metric.name}{_labels(labels)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    lines.append(f'{metric.name}_bucket{_labels(labels + [("le", bound)])} {cumulative}')
+                lines.append(f'{metric.name}_sum{_labels(labels)} {_number(value[-1])}')
+                lines.append(f'{metric.name}_count{_labels(labels)} {cumulative}')
+
+        for name, (help_text, callback) in callbacks:
+            try:
+                value = callback()
+            except Exception as e:
+                print(f"⚠️  Metric {name} unavailable: {e}")
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+    # Flask hooks
+
+    def init_app(self, app):
+        """Time every request by endpoint and count those in flight"""
+        from flask import request
+
+        in_flight = self.gauge('carhub_http_requests_in_flight', 'Requests being served', ('endpoint',))
+        requests = self.counter('carhub_http_requests_total', 'Requests served', ('endpoint', 'method', 'status'))
+        latency = self.histogram('carhub_http_request_duration_seconds', 'Time to serve a request',
+                                 ('endpoint', 'method'))
+
+        @app.before_request
+        def _start_timer():
+            endpoint = request.endpoint or 'unmatched'
+            request.environ['carhub.metrics'] = [time.perf_counter(), endpoint, '500']
+            in_flight.inc(endpoint)
+
+        @app.after_request
+        def _record_status(response):
+            timing = request.environ.get('carhub.metrics')
+            if timing is not None:
+                timing[2] = str(response.status_code)
+            return response
+
+        @app.teardown_request
+        def _observe(exc):
+            timing = request.environ.pop('carhub.metrics', None)
+            if timing is None:
+                return
+            started, endpoint, status = timing
+            in_flight.dec(endpoint)
+            requests.inc(endpoint, request.method, status)
+            latency.observe(time.perf_counter() - started, endpoint, request.method)
+
+
+def _merge(totals, shard):
+    for key, value in shard.items():
+        if isinstance(value, list):
+            current = totals.get(key)
+            totals[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def create_metrics(app):
+    """The app's metrics registry; request timing is hooked in unless METRICS_ENABLED is off"""
+    metrics = Metrics()
+    if app.config.get('METRICS_ENABLED', True):
+        metrics.init_app(app)
+    return metrics
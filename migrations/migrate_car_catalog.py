@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Database Migration Script - Add catalog columns to Car table
+Adds the spec, status, location and asset columns used by the vehicle catalog.
+Run populate_cars.py afterwards to fill them in.
+"""
+
+import sqlite3
+import os
+from datetime import datetime
+
+# Column name -> SQL type
+CATALOG_COLUMNS = {
+    'model_file': 'VARCHAR(200)',
+    'year': 'VARCHAR(10)',
+    'engine': 'VARCHAR(100)',
+    'horsepower': 'VARCHAR(50)',
+    'torque': 'VARCHAR(50)',
+    'top_speed': 'VARCHAR(50)',
+    'acceleration': 'VARCHAR(100)',
+    'transmission': 'VARCHAR(100)',
+    'drivetrain': 'VARCHAR(50)',
+    'fuel_economy': 'VARCHAR(100)',
+    'features': 'TEXT',
+    'status': "VARCHAR(20) DEFAULT 'Available'",
+    'mileage': "VARCHAR(20) DEFAULT '0 miles'",
+    'location': 'VARCHAR(100)',
+    'color': 'VARCHAR(50)',
+    'updated_at': 'DATETIME',
+}
+
+def migrate_database():
+    """Add catalog columns to Car table"""
+    print("🔧 Starting car catalog migration...")
+
+    # Database file path
+    db_path = "instance/carhub.db"
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database file not found: {db_path}")
+        return False
+
+    # Create backup first
+    backup_path = f"instance/carhub.db.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    try:
+        import shutil
+        shutil.copy2(db_path, backup_path)
+        print(f"✅ Backup created: {backup_path}")
+    except Exception as e:
+        print(f"⚠️ Could not create backup: {e}")
+
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('PRAGMA table_info(car)')
+        columns = [column[1] for column in cursor.fetchall()]
+
+        added = 0
+        for column_name, column_type in CATALOG_COLUMNS.items():
+            if column_name in columns:
+                print(f"✅ {column_name} column already exists")
+                continue
+            print(f"Adding {column_name} column...")
+            cursor.execute(f"ALTER TABLE car ADD COLUMN {column_name} {column_type}")
+            added += 1
+
+        conn.commit()
+        print(f"✅ Car catalog migration completed! ({added} columns added)")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        if conn:
+            conn.rollback()
+            conn.close()
+        return False
+
+if __name__ == "__main__":
+    success = migrate_database()
+    if success:
+        print("\n🎉 Migration completed! Run populate_cars.py to load the catalog data.")
+    else:
+        print("\n💥 Migration failed! Please check the error and try again.")
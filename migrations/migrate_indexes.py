@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Database Migration Script - Add secondary indexes for the hot queries
+Creates the indexes declared on the models in app.py. Safe to run repeatedly.
+"""
+
+import sqlite3
+import os
+from datetime import datetime
+
+# Index name -> (table, columns); must match the model definitions in app.py
+INDEXES = {
+    'ix_order_user_id_created_at': ('order', ['user_id', 'created_at']),
+    'ix_order_payment_status_created_at': ('order', ['payment_status', 'created_at']),
+    'ix_order_created_at': ('order', ['created_at']),
+    'ix_user_activity_log_user_id_created_at': ('user_activity_log', ['user_id', 'created_at']),
+    'ix_user_activity_log_activity_type_created_at': ('user_activity_log', ['activity_type', 'created_at']),
+    'ix_user_activity_log_created_at': ('user_activity_log', ['created_at']),
+    'ix_finance_application_user_id': ('finance_application', ['user_id']),
+    'ix_user_created_at': ('user', ['created_at']),
+}
+
+def migrate_database():
+    """Create missing secondary indexes"""
+    print("🔧 Starting index migration...")
+
+    # Database file path
+    db_path = "instance/carhub.db"
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database file not found: {db_path}")
+        return False
+
+    # Create backup first
+    backup_path = f"instance/carhub.db.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    try:
+        import shutil
+        shutil.copy2(db_path, backup_path)
+        print(f"✅ Backup created: {backup_path}")
+    except Exception as e:
+        print(f"⚠️ Could not create backup: {e}")
+
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        tables = {row[0] for row in cursor.fetchall()}
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        existing = {row[0] for row in cursor.fetchall()}
+
+        created = 0
+        for index_name, (table, columns) in INDEXES.items():
+            if table not in tables:
+                print(f"⚠️ Table {table} not found, skipping {index_name}")
+                continue
+            if index_name in existing:
+                print(f"✅ {index_name} already exists")
+                continue
+            print(f"Creating {index_name}...")
+            column_list = ', '.join(f'"{column}"' for column in columns)
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON "{table}" ({column_list})')
+            created += 1
+
+        # Refresh planner statistics so SQLite picks the new indexes
+        cursor.execute("ANALYZE")
+
+        conn.commit()
+        print(f"✅ Index migration completed! ({created} indexes created)")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        if conn:
+            conn.rollback()
+            conn.close()
+        return False
+
+if __name__ == "__main__":
+    success = migrate_database()
+    if success:
+        print("\n🎉 Migration completed! Hot queries now use indexes.")
+    else:
+        print("\n💥 Migration failed! Please check the error and try again.")
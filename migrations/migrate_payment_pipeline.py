@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Database Migration Script - Add payment pipeline columns to Order table
+Adds idempotency_key (with a unique index) and payment_message.
+"""
+
+import sqlite3
+import os
+from datetime import datetime
+
+def migrate_database():
+    """Add idempotency_key and payment_message columns to Order table"""
+    print("🔧 Starting payment pipeline migration...")
+
+    # Database file path
+    db_path = "instance/carhub.db"
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database file not found: {db_path}")
+        return False
+
+    # Create backup first
+    backup_path = f"instance/carhub.db.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    try:
+        import shutil
+        shutil.copy2(db_path, backup_path)
+        print(f"✅ Backup created: {backup_path}")
+    except Exception as e:
+        print(f"⚠️ Could not create backup: {e}")
+
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('PRAGMA table_info([order])')
+        columns = [column[1] for column in cursor.fetchall()]
+
+        if 'payment_message' not in columns:
+            print("Adding payment_message column...")
+            cursor.execute("ALTER TABLE [order] ADD COLUMN payment_message VARCHAR(255)")
+        else:
+            print("✅ payment_message column already exists")
+
+        if 'idempotency_key' not in columns:
+            print("Adding idempotency_key column...")
+            cursor.execute("ALTER TABLE [order] ADD COLUMN idempotency_key VARCHAR(64)")
+        else:
+            print("✅ idempotency_key column already exists")
+
+        # SQLite cannot add a UNIQUE column directly, so enforce it with an index
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ix_order_idempotency_key
+            ON [order] (idempotency_key)
+        """)
+
+        conn.commit()
+        print("✅ Payment pipeline migration completed successfully!")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        if conn:
+            conn.rollback()
+            conn.close()
+        return False
+
+if __name__ == "__main__":
+    success = migrate_database()
+    if success:
+        print("\n🎉 Migration completed! Checkout now runs through the background payment pipeline.")
+    else:
+        print("\n💥 Migration failed! Please check the error and try again.")
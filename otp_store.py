@@ -0,0 +1,273 @@
+"""
+CarHub OTP Stores
+Password reset codes with expiry, per-email rate limiting and bounded storage
+"""
+
+import hashlib
+import heapq
+import hmac
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class OTPRateLimitError(Exception):
+    """Raised when an email asks for more reset codes than the window allows"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        minutes = max(1, int(retry_after // 60) + (1 if retry_after % 60 else 0))
+        super().__init__(f"Too many reset requests. Please try again in {minutes} minute{'s' if minutes != 1 else ''}.")
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+class OTPStore:
+    """Base class for OTP backends.
+
+    Codes are stored as salted hashes and compared in constant time. An
+    email may be issued at most `rate_limit` codes per `rate_window`
+    seconds, and a code is burned after `max_attempts` wrong guesses.
+    """
+
+    def __init__(self, secret_key, ttl=600, rate_limit=3, rate_window=900, max_attempts=5):
+        self.secret_key = secret_key.encode('utf-8') if isinstance(secret_key, str) else secret_key
+        self.ttl = ttl
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.max_attempts = max_attempts
+
+    def issue(self, email, otp):
+        """Store a new code for `email`, replacing any previous one; raises OTPRateLimitError"""
+        raise NotImplementedError
+
+    def verify(self, email, otp):
+        """Return True and consume the code if it matches and has not expired"""
+        raise NotImplementedError
+
+    def sweep(self):
+        """Remove expired entries; returns how many were removed"""
+        raise NotImplementedError
+
+    def _hash(self, email, otp):
+        return hmac.new(self.secret_key, f"{email}:{otp}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def _matches(self, stored_hash, email, otp):
+        return hmac.compare_digest(stored_hash, self._hash(email, otp))
+
+
+class MemoryOTPStore(OTPStore):
+    def __init__(self, secret_key, ttl=600, rate_limit=3, rate_window=900, max_attempts=5,
+                 max_entries=100000, sweep_interval=60):
+        """Per-process OTP store with a background sweeper.
+
+        Entries live in a dict keyed by email, and a min-heap ordered by
+        expiry lets the sweeper remove only what has expired. When
+        `max_entries` is reached the entry closest to expiry is evicted, so
+        memory stays bounded no matter how many emails request codes.
+        """
+        super().__init__(secret_key, ttl, rate_limit, rate_window, max_attempts)
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+
+        self._entries = {}   # email -> entry dict
+        self._expiry = []    # heap of (expires_at, email); stale pairs are skipped
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+    def issue(self, email, otp):
+        self._ensure_sweeper()
+        email = normalize_email(email)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or now - entry['window_start'] >= self.rate_window:
+                window_start, sent = now, 0
+            else:
+                window_start, sent = entry['window_start'], entry['sent']
+            if sent >= self.rate_limit:
+                raise OTPRateLimitError(window_start + self.rate_window - now)
+
+            if entry is None and len(self._entries) >= self.max_entries:
+                self._sweep_locked(now)
+                if len(self._entries) >= self.max_entries:
+                    self._evict_one()
+
+            entry = {
+                'hash': self._hash(email, otp),
+                'expires_at': now + self.ttl,
+                'attempts': 0,
+                'window_start': window_start,
+                'sent': sent + 1,
+            }
+            self._entries[email] = entry
+            heapq.heappush(self._expiry, (self._end_of_life(entry), email))
+
+    def verify(self, email, otp):
+        email = normalize_email(email)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry['hash'] is None or now > entry['expires_at']:
+                return False
+            if self._matches(entry['hash'], email, otp):
+                entry['hash'] = None  # Single use; the rate-limit window stays in place
+                return True
+            entry['attempts'] += 1
+            if entry['attempts'] >= self.max_attempts:
+                entry['hash'] = None
+            return False
+
+    def sweep(self):
+        with self._lock:
+            return self._sweep_locked(time.monotonic())
+
+    def stop(self):
+        self._stopping.set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Internals
+
+    def _end_of_life(self, entry):
+        # Keep the entry until both the code and the rate-limit window have expired
+        return max(entry['expires_at'], entry['window_start'] + self.rate_window)
+
+    def _sweep_locked(self, now):
+        removed = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            end_of_life, email = heapq.heappop(self._expiry)
+            entry = self._entries.get(email)
+            if entry is not None and self._end_of_life(entry) == end_of_life:
+                del self._entries[email]
+                removed += 1
+        return removed
+
+    def _evict_one(self):
+        while self._expiry:
+            end_of_life, email = heapq.heappop(self._expiry)
+            entry = self._entries.get(email)
+            if entry is not None and self._end_of_life(entry) == end_of_life:
+                del self._entries[email]
+                return
+
+    def _ensure_sweeper(self):
+        # Started lazily, and restarted after fork, like the other background workers
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='otp-sweeper', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.sweep_interval):
+            self.sweep()
+
+
+class DatabaseOTPStore(OTPStore):
+    def __init__(self, db, PasswordResetOTP, secret_key, ttl=600, rate_limit=3, rate_window=900,
+                 max_attempts=5, sweep_interval=60):
+        """OTP store backed by the PasswordResetOTP table, shared by every worker process.
+
+        One row per email (primary key lookup) holds the current code and
+        the rate-limit window. Expired rows are deleted at most once per
+        `sweep_interval` seconds as codes are issued.
+        """
+        super().__init__(secret_key, ttl, rate_limit, rate_window, max_attempts)
+        self.db = db
+        self.PasswordResetOTP = PasswordResetOTP
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+
+    def issue(self, email, otp):
+        email = normalize_email(email)
+        now = datetime.utcnow()
+        session = self.db.session
+        try:
+            row = session.get(self.PasswordResetOTP, email)
+            if row is None:
+                row = self.PasswordResetOTP(email=email, window_start=now, sent_count=0)
+                session.add(row)
+            elif now - row.window_start >= timedelta(seconds=self.rate_window):
+                row.window_start, row.sent_count = now, 0
+
+            if row.sent_count >= self.rate_limit:
+                retry_after = (row.window_start + timedelta(seconds=self.rate_window) - now).total_seconds()
+                session.rollback()
+                raise OTPRateLimitError(retry_after)
+
+            row.otp_hash = self._hash(email, otp)
+            row.expires_at = now + timedelta(seconds=self.ttl)
+            row.attempts = 0
+            row.sent_count += 1
+            session.commit()
+        except OTPRateLimitError:
+            raise
+        except Exception:
+            session.rollback()
+            raise
+
+        if time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + self.sweep_interval
+            self.sweep()
+
+    def verify(self, email, otp):
+        email = normalize_email(email)
+        session = self.db.session
+        row = session.get(self.PasswordResetOTP, email)
+        if row is None or row.otp_hash is None or datetime.utcnow() > row.expires_at:
+            return False
+        try:
+            if self._matches(row.otp_hash, email, otp):
+                row.otp_hash = None  # Single use; the rate-limit window stays in place
+                session.commit()
+                return True
+            row.attempts += 1
+            if row.attempts >= self.max_attempts:
+                row.otp_hash = None
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return False
+
+    def sweep(self):
+        now = datetime.utcnow()
+        Model = self.PasswordResetOTP
+        window_cutoff = now - timedelta(seconds=self.rate_window)
+        try:
+            removed = Model.query.filter(
+                Model.expires_at < now,
+                Model.window_start < window_cutoff
+            ).delete(synchronize_session=False)
+            self.db.session.commit()
+            return removed
+        except Exception as e:
+            self.db.session.rollback()
+            print(f"Error sweeping OTP store: {e}")
+            return 0
+
+
+def create_otp_store(app, db, PasswordResetOTP):
+    """Build the store selected by OTP_STORE (database or memory)"""
+    options = dict(
+        secret_key=app.config['SECRET_KEY'],
+        ttl=app.config.get('OTP_TTL_SECONDS', 600),
+        rate_limit=app.config.get('OTP_RATE_LIMIT', 3),
+        rate_window=app.config.get('OTP_RATE_WINDOW_SECONDS', 900),
+        max_attempts=app.config.get('OTP_MAX_ATTEMPTS', 5),
+    )
+    if app.config.get('OTP_STORE') == 'memory':
+        return MemoryOTPStore(max_entries=app.config.get('OTP_MAX_ENTRIES', 100000), **options)
+    return DatabaseOTPStore(db, PasswordResetOTP, **options)
@@ -0,0 +1,129 @@
+"""
+CarHub Keyset Pagination
+Cursor-based paging on (created_at, id), newest first, with opaque next/prev tokens
+"""
+
+from datetime import datetime
+
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import and_, func, or_, select, tuple_
+
+
+class KeysetPage:
+    """One page of results plus the cursors needed to move from it"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None, total_label=''):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_label = total_label  # e.g. "1,234", "~1,234" or "10,000+"
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+class KeysetPaginator:
+    def __init__(self, secret_key, count_cap=10000):
+        """Paginate queries newest-first on (created_at, id).
+
+        Cursors are signed so they stay opaque and cannot be forged into
+        arbitrary filters; an invalid or foreign cursor just returns the
+        first page. Totals are optional and approximate: MAX(id) for
+        unfiltered queries, and a COUNT capped at `count_cap` rows
+        otherwise, so no page ever pays for a full table count. Rows
+        without a created_at (older scripts did not always set one) sort
+        as SQLite orders NULLs: after every dated row, newest first.
+        """
+        self.serializer = URLSafeSerializer(secret_key, salt='keyset-cursor')
+        self.count_cap = count_cap
+
+    def paginate(self, query, model, cursor=None, per_page=20, with_total=True):
+        table = model.__tablename__
+        created_at, row_id = model.created_at, model.id
+        position = self._decode(cursor, table)
+
+        if position is None:
+            direction = 'next'
+            rows = query.order_by(created_at.desc(), row_id.desc()).limit(per_page + 1).all()
+        else:
+            direction, key = position
+            if direction == 'next':
+                rows = (query.filter(self._older(created_at, row_id, key))
+                        .order_by(created_at.desc(), row_id.desc())
+                        .limit(per_page + 1).all())
+            else:
+                rows = (query.filter(self._newer(created_at, row_id, key))
+                        .order_by(created_at.asc(), row_id.asc())
+                        .limit(per_page + 1).all())
+
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if direction == 'prev':
+            rows.reverse()
+
+        next_cursor = prev_cursor = None
+        if rows:
+            # Moving forward there is always a way back (unless this is the first page), and vice versa
+            if (direction == 'next' and has_more) or (direction == 'prev' and position is not None):
+                next_cursor = self._encode(table, 'next', rows[-1])
+            if (direction == 'prev' and has_more) or (direction == 'next' and position is not None):
+                prev_cursor = self._encode(table, 'prev', rows[0])
+
+        total, label = self.approximate_total(query, model) if with_total else (None, '')
+        return KeysetPage(rows, per_page, next_cursor, prev_cursor, total, label)
+
+    def approximate_total(self, query, model):
+        """Return (total, display label) without scanning the whole table"""
+        session = query.session
+        if query.whereclause is None:
+            # Ids are assigned in insert order, so MAX(id) tracks the row count closely
+            total = session.scalar(select(func.max(model.id))) or 0
+            return total, f"~{total:,}" if total else "0"
+
+        capped = query.with_entities(model.id).order_by(None).limit(self.count_cap + 1).subquery()
+        count = session.scalar(select(func.count()).select_from(capped))
+        if count > self.count_cap:
+            return self.count_cap, f"{self.count_cap:,}+"
+        return count, f"{count:,}"
+
+    # Keyset conditions; a NULL created_at sorts below every date, as SQLite orders it
+
+    @staticmethod
+    def _older(created_at, row_id, key):
+        """Rows after `key` in newest-first order"""
+        when, key_id = key
+        if when is None:
+            return and_(created_at.is_(None), row_id < key_id)
+        return or_(tuple_(created_at, row_id) < (when, key_id), created_at.is_(None))
+
+    @staticmethod
+    def _newer(created_at, row_id, key):
+        """Rows before `key` in newest-first order"""
+        when, key_id = key
+        if when is None:
+            return or_(created_at.isnot(None), row_id > key_id)
+        return tuple_(created_at, row_id) > (when, key_id)
+
+    # Cursor tokens
+
+    def _encode(self, table, direction, row):
+        created_at = row.created_at.isoformat() if row.created_at is not None else None
+        return self.serializer.dumps([table, direction, created_at, row.id])
+
+    def _decode(self, cursor, table):
+        if not cursor:
+            return None
+        try:
+            cursor_table, direction, created_at, row_id = self.serializer.loads(cursor)
+            if cursor_table != table or direction not in ('next', 'prev'):
+                return None
+            return direction, (datetime.fromisoformat(created_at) if created_at is not None else None, int(row_id))
+        except (BadSignature, ValueError, TypeError):
+            return None
@@ -1,44 +1,32 @@
 from flask import render_template
 from flask_mail import Message
-import random
+import secrets
 import string
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from otp_store import MemoryOTPStore
 
 class PasswordResetManager:
-    def __init__(self, app, mail, db, User):
+    def __init__(self, app, mail, db, User, otp_store=None, mail_queue=None):
         self.app = app
         self.mail = mail
+        self.mail_queue = mail_queue
         self.db = db
         self.User = User
-        self.otp_store = {}  # Store OTPs with expiration time
+        # Hashed OTPs with expiry and per-email rate limiting (see otp_store.py)
+        self.otp_store = otp_store or MemoryOTPStore(app.config['SECRET_KEY'])
         
     def generate_otp(self, length=6):
         """Generate a numeric OTP of specified length"""
-        return ''.join(random.choices(string.digits, k=length))
+        return ''.join(secrets.choice(string.digits) for _ in range(length))
     
     def store_otp(self, email, otp):
-        """Store OTP with expiration time (10 minutes)"""
-        expiration = datetime.now() + timedelta(minutes=10)
-        self.otp_store[email] = {
-            'otp': otp,
-            'expiration': expiration
-        }
+        """Store OTP with expiration time; raises OTPRateLimitError if the email asked too often"""
+        self.otp_store.issue(email, otp)
     
     def verify_otp(self, email, otp):
-        """Verify if OTP is valid and not expired"""
-        if email not in self.otp_store:
-            return False
-        
-        stored_data = self.otp_store[email]
-        if datetime.now() > stored_data['expiration']:
-            del self.otp_store[email]  # Clear expired OTP
-            return False
-        
-        if stored_data['otp'] == otp:
-            del self.otp_store[email]  # Clear used OTP
-            return True
-            
-        return False
+        """Verify if OTP is valid and not expired; a matching OTP is consumed"""
+        return self.otp_store.verify(email, otp)
     
     def verify_mail_config(self):
         """Verify mail configuration"""
@@ -67,8 +55,6 @@ class PasswordResetManager:
         
         # Create email message
         try:
-            from datetime import datetime  # Add this import
-            
             msg = Message('Password Reset Request - CarHub',
                          sender=self.app.config['MAIL_DEFAULT_SENDER'],
                          recipients=[email])
@@ -84,90 +70,19 @@ class PasswordResetManager:
             return False
         
         try:
-            # Print configuration for debugging
-            print("\nMail Configuration:")
-            print(f"Server: {self.app.config['MAIL_SERVER']}")
-            print(f"Port: {self.app.config['MAIL_PORT']}")
-            print(f"Use TLS: {self.app.config.get('MAIL_USE_TLS', False)}")
-            print(f"Use SSL: {self.app.config.get('MAIL_USE_SSL', False)}")
-            print(f"Username: {self.app.config['MAIL_USERNAME']}")
-            print(f"Sender: {self.app.config['MAIL_DEFAULT_SENDER']}")
-            
-            # Verify credentials format
-            password = self.app.config['MAIL_PASSWORD']
-            if ' ' in password:
-                print("Warning: Mail password contains spaces - removing spaces")
-                # Update the password without spaces
-                self.app.config['MAIL_PASSWORD'] = password.replace(" ", "")
-                
-            if not password:
-                print("Error: Mail password is empty")
-                return False
-                
-            if len(password) != 16:
-                print(f"Warning: Mail password length is {len(password)} (expected 16 for Gmail App Password)")
-            
-            # Try direct SMTP method if flask-mail fails
-            print("\nAttempting to send email...")
-            try:
+            if self.mail_queue is not None:
+                # Delivered (and retried) by the mail queue's background workers
+                self.mail_queue.send(msg)
+                print(f"Password reset email queued for {email}")
+            else:
                 self.mail.send(msg)
                 print("Email sent successfully via Flask-Mail!")
-                return True
-            except Exception as mail_error:
-                print(f"Flask-Mail error: {str(mail_error)}")
-                print("Trying alternate direct SMTP method...")
-                
-                # Fall back to direct SMTP
-                import smtplib
-                import ssl
-                from email.mime.text import MIMEText
-                from email.mime.multipart import MIMEMultipart
-                
-                message = MIMEMultipart('alternative')
-                message['Subject'] = msg.subject
-                message['From'] = msg.sender
-                message['To'] = ", ".join(msg.recipients)
-                message.attach(MIMEText(msg.html, 'html'))
-                
-                # Try SSL connection first (more reliable with Gmail)
-                try:
-                    context = ssl.create_default_context()
-                    with smtplib.SMTP_SSL(self.app.config['MAIL_SERVER'], 465, context=context) as server:
-                        server.login(self.app.config['MAIL_USERNAME'], self.app.config['MAIL_PASSWORD'])
-                        server.send_message(message)
-                        print("Email sent successfully via direct SSL connection!")
-                        return True
-                except Exception as ssl_error:
-                    print(f"SSL connection failed: {str(ssl_error)}")
-                    
-                    # Fall back to TLS as last resort
-                    try:
-                        with smtplib.SMTP(self.app.config['MAIL_SERVER'], 587) as server:
-                            server.ehlo()
-                            server.starttls(context=context)
-                            server.ehlo()
-                            server.login(self.app.config['MAIL_USERNAME'], self.app.config['MAIL_PASSWORD'])
-                            server.send_message(message)
-                            print("Email sent successfully via direct TLS connection!")
-                            return True
-                    except Exception as tls_error:
-                        print(f"TLS connection failed: {str(tls_error)}")
-                        raise tls_error
-                
-            print("Email sent successfully!")
             return True
         except Exception as e:
             print(f"\nDetailed error sending email: {str(e)}")
             import traceback
             print("Full traceback:")
             print(traceback.format_exc())
-            
-            # Additional Gmail-specific error hints
-            if "Username and Password not accepted" in str(e):
-                print("\nPossible solutions:")
-                print("1. Verify 2-Step Verification is enabled in your Google Account")
-                print("2. Generate a new App Password in Google Account settings")
-                print("3. Check for any Google security alerts about blocked sign-in attempts")
             return False
             
     def reset_password(self, email, otp, new_password):
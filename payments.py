@@ -0,0 +1,393 @@
+"""
+CarHub Payment Pipeline
+Gateway abstraction and a background job queue that moves orders
+through pending -> authorized -> completed (or failed)
+"""
+
+import atexit
+import json
+import os
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+ALLOWED_METHODS = {'credit_card', 'paypal', 'bank_transfer', 'cash'}
+
+
+def is_valid_card_number(card_number):
+    """
+    Validate a card number using the Luhn algorithm.
+    This is a basic checksum used by credit card companies.
+    """
+    digits = [int(d) for d in card_number if d.isdigit()]
+    checksum = 0
+
+    for i, digit in enumerate(reversed(digits)):
+        if i % 2 == 1:  # Odd positions (from right to left)
+            doubled = digit * 2
+            checksum += doubled if doubled < 10 else doubled - 9
+        else:  # Even positions
+            checksum += digit
+
+    return checksum % 10 == 0
+
+
+class PaymentGateway:
+    """Base class for payment gateways.
+
+    authorize() and capture() return (success, transaction_id, message).
+    Both receive the order's idempotency key so a retried job never
+    charges twice.
+    """
+
+    def authorize(self, idempotency_key, amount, details):
+        raise NotImplementedError
+
+    def capture(self, idempotency_key, transaction_id, amount):
+        raise NotImplementedError
+
+
+class SimulatedGateway(PaymentGateway):
+    def __init__(self, latency=1.5, paypal_latency=0.5, logger=None, max_results=10000, result_ttl=86400):
+        """Development gateway that never performs real network calls or charges cards.
+
+        Rules:
+        - 'credit_card' lightly validates card fields; cards ending in 0000 are declined.
+        - 'paypal', 'bank_transfer' and 'cash' are approved after a simulated delay.
+
+        Results are replayed for a repeated idempotency key for `result_ttl`
+        seconds, keeping at most `max_results` keys (least recently used go first).
+        """
+        self.latency = latency
+        self.paypal_latency = paypal_latency
+        self.logger = logger
+        self.max_results = max_results
+        self.result_ttl = result_ttl
+        self._results = OrderedDict()  # idempotency key -> (expires_at, result)
+        self._lock = threading.Lock()
+
+    def authorize(self, idempotency_key, amount, details):
+        with self._lock:
+            entry = self._results.get(idempotency_key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._results.move_to_end(idempotency_key)
+                return entry[1]
+
+        result = self._authorize(details)
+
+        with self._lock:
+            entry = self._results.get(idempotency_key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]  # a concurrent retry finished first
+            self._results[idempotency_key] = (time.monotonic() + self.result_ttl, result)
+            self._results.move_to_end(idempotency_key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+            return result
+
+    def capture(self, idempotency_key, transaction_id, amount):
+        return True, transaction_id, 'Captured'
+
+    def _authorize(self, details):
+        method = (details.get('payment_method') or '').lower()
+
+        if method not in ALLOWED_METHODS:
+            self._log('error', f"Unsupported payment method: {method}")
+            return False, None, 'Unsupported payment method.'
+
+        # Simulate network latency to the processor
+        time.sleep(self.latency)
+
+        if method == 'credit_card':
+            return self._authorize_card(details)
+
+        if method == 'paypal':
+            # Slightly more delay for PayPal to simulate redirect
+            time.sleep(self.paypal_latency)
+            return True, f"PP_{secrets.token_hex(12)}", 'PayPal payment approved'
+
+        if method == 'bank_transfer':
+            return True, f"BT_{secrets.token_hex(12)}", 'Bank transfer confirmed'
+
+        return True, f"CASH_{secrets.token_hex(8)}", 'Cash payment recorded'
+
+    def _authorize_card(self, details):
+        card = (details.get('card_number') or '').replace(' ', '')
+        exp = (details.get('card_expiry') or '').strip()
+        cvv = (details.get('card_cvv') or '').strip()
+
+        if not card:
+            return False, None, 'Card number is required.'
+        if not exp:
+            return False, None, 'Expiration date is required.'
+        if not cvv:
+            return False, None, 'CVV is required.'
+
+        if not (card.isdigit() and 12 <= len(card) <= 19):
+            return False, None, 'Invalid card number. Must be 12-19 digits.'
+        if not (cvv.isdigit() and 3 <= len(cvv) <= 4):
+            return False, None, 'Invalid CVV. Must be 3-4 digits.'
+
+        # Basic expiry validation (MM/YY format)
+        if '/' not in exp:
+            return False, None, 'Invalid expiry date format. Use MM/YY.'
+
+        try:
+            month, year = exp.split('/')
+            month = int(month)
+            year = int('20' + year) if len(year) == 2 else int(year)
+
+            if not (1 <= month <= 12):
+                return False, None, 'Invalid month in expiry date.'
+
+            now = datetime.now()
+            if year < now.year or (year == now.year and month < now.month):
+                return False, None, 'Card has expired.'
+        except ValueError:
+            return False, None, 'Invalid expiry date format.'
+
+        if not is_valid_card_number(card):
+            # For testing we still accept cards that fail the checksum, but warn
+            self._log('warning', f"Card number failed checksum: {card[:6]}...{card[-4:]}")
+
+        # Simulate rejection for specific test values
+        if card.endswith('0000'):
+            return False, None, 'Card declined by issuer.'
+
+        return True, f"CC_{secrets.token_hex(12)}", 'Approved'
+
+    def _log(self, level, message):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+
+class HTTPStubGateway(PaymentGateway):
+    """Gateway client for an HTTP payment stub (see run_stub_server)"""
+
+    def __init__(self, base_url, timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def authorize(self, idempotency_key, amount, details):
+        return self._post('/authorize', idempotency_key, {'amount': amount, **details})
+
+    def capture(self, idempotency_key, transaction_id, amount):
+        return self._post('/capture', idempotency_key, {'amount': amount, 'transaction_id': transaction_id})
+
+    def _post(self, path, idempotency_key, payload):
+        req = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'Idempotency-Key': idempotency_key},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                data = json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            data = json.loads(e.read().decode('utf-8') or '{}')
+        return bool(data.get('success')), data.get('transaction_id'), data.get('message', '')
+
+
+def run_stub_server(host='127.0.0.1', port=8765, gateway=None):
+    """Serve SimulatedGateway rules over HTTP for local development and tests.
+
+    Returns the server; call serve_forever() (or run it in a thread) and
+    shutdown() when done.
+    """
+    gateway = gateway or SimulatedGateway()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            key = self.headers.get('Idempotency-Key', '')
+
+            if self.path == '/authorize':
+                result = gateway.authorize(key, payload.get('amount'), payload)
+            elif self.path == '/capture':
+                result = gateway.capture(key, payload.get('transaction_id'), payload.get('amount'))
+            else:
+                self.send_error(404)
+                return
+
+            success, transaction_id, message = result
+            body = json.dumps({
+                'success': success,
+                'transaction_id': transaction_id,
+                'message': message
+            }).encode('utf-8')
+            self.send_response(200 if success else 402)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), StubHandler)
+
+
+class PaymentProcessor:
+    def __init__(self, app, db, Order, gateway, max_workers=4, on_result=None, stale_after=120):
+        """Run gateway calls for orders on a background worker pool.
+
+        `on_result(order, success, message)` is called inside an app context
+        once an order reaches 'completed' or 'failed'.
+
+        Jobs only live in this process, so an order left 'pending' or
+        'authorized' by a restart is re-queued by recover() once it has not
+        changed for `stale_after` seconds. The gateway's idempotency key
+        makes the retry replay an earlier authorization rather than charge
+        again; card details are gone by then, so a card that never reached
+        the gateway fails and the customer is asked to pay again.
+        """
+        self.app = app
+        self.db = db
+        self.Order = Order
+        self.gateway = gateway
+        self.max_workers = max_workers
+        self.on_result = on_result
+        self.stale_after = stale_after
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._active = set()  # order ids queued or running in this process
+        self._recovered_pid = None
+
+        atexit.register(self.shutdown)
+
+    def submit(self, order_id, details):
+        """Queue a payment job; card details only live in memory for the job's lifetime"""
+        with self._lock:
+            self._active.add(order_id)
+        return self._get_executor().submit(self._process, order_id, dict(details))
+
+    def resume(self, order):
+        """Re-queue `order` if it is stuck mid-payment and no job in this process has it; returns the future"""
+        if order.payment_status not in ('pending', 'authorized'):
+            return None
+        changed = order.updated_at or order.created_at
+        if changed and changed > datetime.utcnow() - timedelta(seconds=self.stale_after):
+            return None  # probably still being processed, here or by another worker
+        with self._lock:
+            if order.id in self._active:
+                return None
+        return self.submit(order.id, {'payment_method': order.payment_method, 'resumed': True})
+
+    def recover(self):
+        """Re-queue every order a restart left mid-payment; returns the futures"""
+        Order = self.Order
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        stuck = Order.query.filter(Order.payment_status.in_(('pending', 'authorized')),
+                                   Order.updated_at <= cutoff).all()
+        futures = [future for future in map(self.resume, stuck) if future is not None]
+        if futures:
+            print(f"🔁 Re-queued {len(futures)} interrupted payment(s)")
+        return futures
+
+    def recover_once(self):
+        """recover() on the first call in each process (called before the first request)"""
+        pid = os.getpid()
+        if self._recovered_pid == pid:
+            return
+        with self._lock:
+            if self._recovered_pid == pid:
+                return
+            self._recovered_pid = pid
+        try:
+            self.recover()
+        except Exception as e:
+            self.db.session.rollback()
+            self.app.logger.error(f"Payment recovery failed: {str(e)}")
+
+    def shutdown(self, wait=True):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def _get_executor(self):
+        # Created lazily and recreated after fork so pre-fork servers get a live pool
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            with self._lock:
+                if self._executor is None or self._pid != pid:
+                    self._pid = pid
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='payment-worker'
+                    )
+        return self._executor
+
+    def _process(self, order_id, details):
+        with self.app.app_context():
+            try:
+                order = self.db.session.get(self.Order, order_id)
+                if order is None or order.payment_status in ('completed', 'failed'):
+                    return
+
+                key = order.idempotency_key or f"order-{order.id}"
+
+                if order.payment_status == 'pending':
+                    success, txn_id, message = self.gateway.authorize(key, order.total_amount, details)
+                    if not success:
+                        if details.get('resumed'):
+                            message = f"Payment was interrupted, please try again ({message})"
+                        self._finish(order, False, message)
+                        return
+                    order.payment_status = 'authorized'
+                    order.transaction_id = txn_id
+                    order.payment_message = message
+                    self.db.session.commit()
+
+                success, txn_id, message = self.gateway.capture(key, order.transaction_id, order.total_amount)
+                if success:
+                    order.transaction_id = txn_id or order.transaction_id or f"TXN_{secrets.token_hex(8)}"
+                    order.order_status = 'processing'
+                self._finish(order, success, message)
+
+            except Exception as e:
+                self.db.session.rollback()
+                self.app.logger.error(f"Payment processing error for order {order_id}: {str(e)}")
+                order = self.db.session.get(self.Order, order_id)
+                if order is not None and order.payment_status not in ('completed', 'failed'):
+                    self._finish(order, False, f'Processing error: {str(e)}')
+            finally:
+                self.db.session.remove()
+                with self._lock:
+                    self._active.discard(order_id)
+
+    def _finish(self, order, success, message):
+        order.payment_status = 'completed' if success else 'failed'
+        order.payment_message = message
+        self.db.session.commit()
+        if self.on_result:
+            try:
+                self.on_result(order, success, message)
+            except Exception as e:
+                self.app.logger.error(f"Payment result hook failed for order {order.id}: {str(e)}")
+
+
+def create_payment_gateway(app):
+    """Build the gateway selected by PAYMENT_GATEWAY (simulated or http_stub)"""
+    if app.config.get('PAYMENT_GATEWAY') == 'http_stub':
+        return HTTPStubGateway(app.config['PAYMENT_GATEWAY_URL'])
+    return SimulatedGateway(
+        latency=app.config.get('PAYMENT_SIMULATED_LATENCY', 1.5),
+        logger=app.logger
+    )
+
+
+if __name__ == '__main__':
+    server = run_stub_server()
+    print(f"💳 Payment stub listening on http://{server.server_address[0]}:{server.server_address[1]}")
+    server.serve_forever()
@@ -1,188 +1,842 @@
-from app import app, db, Car
+from app import app, db, Car, catalog
+import json
 
-# Sample car data based on the cars.html template
+# Vehicle catalog data - the single source for car details, purchase prices and inventory
 cars_data = [
     {
         'name': 'Bugatti Centodieci',
         'slug': 'bugatti-centodieci',
         'price': 9000000,
         'category': 'hypercar',
-        'description': 'A rare hypercar with stunning performance and design. Limited edition.',
-        'video_url': '/static/bugatti_centodieci.mp4'
+        'description': "A tribute to the legendary EB110, the Centodieci combines Bugatti's rich heritage with cutting-edge technology and unparalleled luxury.",
+        'video_url': '/static/bugatti_centodieci.mp4',
+        'model_file': '2019_bugatti_centodieci.glb',
+        'year': '2022',
+        'engine': '8.0L Quad-Turbo W16',
+        'horsepower': '1,577 hp',
+        'torque': '1,180 lb-ft',
+        'top_speed': '236 mph',
+        'acceleration': '2.4 seconds (0-60 mph)',
+        'transmission': '7-Speed Dual-Clutch',
+        'drivetrain': 'All-Wheel Drive',
+        'fuel_economy': '8 mpg city / 14 mpg highway',
+        'status': 'Reserved',
+        'mileage': '25 miles',
+        'location': 'Beverly Hills Showroom',
+        'color': 'EB110 Blue',
+        'features': [
+            'Limited production (10 units)',
+            'Carbon fiber bodywork',
+            'Michelin Pilot Sport Cup 2 tires',
+            'Brembo carbon-ceramic brakes',
+            'Exclusive interior appointments',
+            'Track telemetry system',
+        ]
     },
     {
         'name': 'McLaren 720S',
         'slug': 'mclaren-720s',
         'price': 300000,
         'category': 'sports',
-        'description': 'British supercar with exceptional performance and luxury.',
-        'video_url': '/static/McLaren.mp4'
+        'description': 'The McLaren 720S delivers breathtaking performance with its lightweight carbon fiber construction and advanced aerodynamics.',
+        'video_url': '/static/McLaren.mp4',
+        'model_file': 'mclaren.glb',
+        'year': '2023',
+        'engine': '4.0L Twin-Turbo V8',
+        'horsepower': '710 hp',
+        'torque': '568 lb-ft',
+        'top_speed': '212 mph',
+        'acceleration': '2.8 seconds (0-60 mph)',
+        'transmission': '7-Speed Dual-Clutch',
+        'drivetrain': 'Rear-Wheel Drive',
+        'fuel_economy': '15 mpg city / 22 mpg highway',
+        'status': 'Available',
+        'mileage': '12 miles',
+        'location': 'Los Angeles Showroom',
+        'color': 'Papaya Orange',
+        'features': [
+            'Carbon fiber MonoCell II chassis',
+            'Proactive Chassis Control II',
+            'Variable Drift Control',
+            'Adaptive suspension',
+            'Track telemetry system',
+            'Lightweight construction',
+        ]
     },
     {
         'name': 'Maruti Suzuki XL6',
         'slug': 'maruti-suzuki-xl6',
         'price': 12000,
         'category': 'family',
-        'description': 'Premium multi-purpose vehicle for Indian families.',
-        'video_url': '/static/McLaren.mp4'
+        'description': 'The Maruti Suzuki XL6 is a premium MPV that combines style, comfort, and practicality.',
+        'video_url': '/static/McLaren.mp4',
+        'model_file': 'maruti_suzuki_xl6.glb',
+        'year': '2023',
+        'engine': '1.5L Petrol',
+        'horsepower': '103 hp',
+        'torque': '138 lb-ft',
+        'top_speed': '99 mph',
+        'acceleration': '11.2 seconds (0-60 mph)',
+        'transmission': '5-Speed Manual',
+        'drivetrain': 'Front-Wheel Drive',
+        'fuel_economy': '21 mpg city / 28 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Premium MPV design',
+            'Captain seats in middle row',
+            'Smart infotainment system',
+            'Efficient petrol engine',
+            '6-seater configuration',
+            'Modern styling elements',
+        ]
     },
     {
         'name': 'Bentley Mulliner Batur',
         'slug': 'bentley-mulliner-batur',
         'price': 2000000,
         'category': 'luxury',
-        'description': 'Ultra-luxury grand tourer with bespoke craftsmanship.',
-        'video_url': '/static/McLaren.mp4'
+        'description': 'The Bentley Mulliner Batur is a bespoke grand tourer that showcases the future of Bentley design.',
+        'video_url': '/static/McLaren.mp4',
+        'model_file': 'bentley_mulliner_batur.glb',
+        'year': '2023',
+        'engine': '6.0L Twin-Turbo W12',
+        'horsepower': '730 hp',
+        'torque': '738 lb-ft',
+        'top_speed': '209 mph',
+        'acceleration': '3.7 seconds (0-60 mph)',
+        'transmission': '8-Speed Dual-Clutch',
+        'drivetrain': 'All-Wheel Drive',
+        'fuel_economy': '12 mpg city / 20 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Handcrafted Mulliner interior',
+            'Carbon fiber bodywork',
+            'Bespoke paint finishes',
+            'Premium leather appointments',
+            'Limited production (18 units)',
+            'Advanced chassis technology',
+        ]
     },
     {
         'name': 'Lamborghini Diablo SV',
         'slug': 'lamborghini-diablo-sv',
         'price': 500000,
         'category': 'classic sports',
-        'description': 'Iconic 90s supercar with legendary V12 engine.',
-        'video_url': '/static/1995_lamborghini_diablo_sv.glb'
+        'description': 'The Lamborghini Diablo SV is a legendary supercar that defined the 1990s with its aggressive styling and raw V12 power.',
+        'video_url': '/static/1995_lamborghini_diablo_sv.glb',
+        'model_file': '1995_lamborghini_diablo_sv.glb',
+        'year': '1995',
+        'engine': '5.7L V12',
+        'horsepower': '510 hp',
+        'torque': '428 lb-ft',
+        'top_speed': '202 mph',
+        'acceleration': '4.0 seconds (0-60 mph)',
+        'transmission': '5-Speed Manual',
+        'drivetrain': 'Rear-Wheel Drive',
+        'fuel_economy': '9 mpg city / 15 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Naturally aspirated V12 engine',
+            'Carbon fiber aerodynamic kit',
+            'Adjustable rear wing',
+            'Racing-inspired interior',
+            'Limited slip differential',
+            'Iconic scissor doors',
+        ]
     },
     {
         'name': 'Tesla Model 3',
         'slug': 'tesla-model-3',
         'price': 40000,
         'category': 'electric',
-        'description': 'Popular electric sedan with advanced technology.',
-        'video_url': '/static/tesla_m3_model.glb'
+        'description': 'The Tesla Model 3 has revolutionized the electric vehicle market with its combination of performance and efficiency.',
+        'video_url': '/static/tesla_m3_model.glb',
+        'model_file': 'tesla_m3_model.glb',
+        'year': '2023',
+        'engine': 'Electric Motor',
+        'horsepower': '283 hp',
+        'torque': '317 lb-ft',
+        'top_speed': '140 mph',
+        'acceleration': '5.3 seconds (0-60 mph)',
+        'transmission': 'Single-Speed Direct Drive',
+        'drivetrain': 'Rear-Wheel Drive',
+        'fuel_economy': '272 miles range',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Electric powertrain',
+            'Autopilot capability',
+            'Over-the-air updates',
+            'Minimalist interior design',
+            'Supercharger network access',
+            'Premium sound system',
+        ]
     },
     {
         'name': 'Tesla Cybertruck',
         'slug': 'tesla-cybertruck',
         'price': 100000,
         'category': 'electric truck',
-        'description': 'Revolutionary electric pickup truck with unique design.',
-        'video_url': '/static/tesla_cybertruck.glb'
+        'description': 'The Tesla Cybertruck redefines what a pickup truck can be with its revolutionary design and all-electric powertrain.',
+        'video_url': '/static/tesla_cybertruck.glb',
+        'model_file': 'tesla_cybertruck.glb',
+        'year': '2024',
+        'engine': 'Tri-Motor Electric',
+        'horsepower': '845 hp',
+        'torque': '930 lb-ft',
+        'top_speed': '130 mph',
+        'acceleration': '2.8 seconds (0-60 mph)',
+        'transmission': 'Single-Speed Direct Drive',
+        'drivetrain': 'All-Wheel Drive',
+        'fuel_economy': '340 miles range',
+        'status': 'Pre-Order',
+        'mileage': '0 miles',
+        'location': 'Austin Showroom',
+        'color': 'Stainless Steel',
+        'features': [
+            'Ultra-hard 30X cold-rolled steel',
+            'Armor glass windows',
+            'Air suspension system',
+            'Autopilot capabilities',
+            'Solar panel integration ready',
+            'Massive towing capacity',
+        ]
     },
     {
         'name': 'Tata Tiago',
         'slug': 'tata-tiago',
         'price': 8000,
         'category': 'hatchback',
-        'description': 'A reliable and affordable family hatchback with modern features.',
-        'video_url': '/static/tata_tiago.glb'
+        'description': 'The Tata Tiago is an affordable and practical compact car designed for urban mobility.',
+        'video_url': '/static/tata_tiago.glb',
+        'model_file': 'tata_tiago.glb',
+        'year': '2023',
+        'engine': '1.2L Petrol',
+        'horsepower': '86 hp',
+        'torque': '113 lb-ft',
+        'top_speed': '93 mph',
+        'acceleration': '12.3 seconds (0-60 mph)',
+        'transmission': '5-Speed Manual',
+        'drivetrain': 'Front-Wheel Drive',
+        'fuel_economy': '23 mpg city / 33 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Compact urban design',
+            'Fuel-efficient engine',
+            'Modern infotainment system',
+            'Safety features',
+            'Affordable pricing',
+            'Easy maneuverability',
+        ]
     },
     {
         'name': 'Rolls Royce Spectre',
         'slug': 'rolls-royce-spectre',
         'price': 1200000,
         'category': 'luxury',
-        'description': 'The pinnacle of luxury electric grand touring.',
-        'video_url': '/static/rolls-royce_spectre.glb'
+        'description': 'The Rolls-Royce Spectre is the first fully electric Rolls-Royce, combining luxury with sustainable performance.',
+        'video_url': '/static/rolls-royce_spectre.glb',
+        'model_file': 'rolls-royce_spectre.glb',
+        'year': '2024',
+        'engine': 'Dual Electric Motors',
+        'horsepower': '577 hp',
+        'torque': '664 lb-ft',
+        'top_speed': '155 mph',
+        'acceleration': '4.4 seconds (0-60 mph)',
+        'transmission': 'Single-Speed Direct Drive',
+        'drivetrain': 'All-Wheel Drive',
+        'fuel_economy': '291 miles range',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'All-electric powertrain',
+            'Ultra-luxury interior',
+            'Advanced battery technology',
+            'Whisper-silent operation',
+            'Bespoke craftsmanship',
+            'Cutting-edge infotainment',
+        ]
     },
     {
         'name': 'Rolls Royce Ghost',
         'slug': 'rolls-royce-ghost',
         'price': 350000,
         'category': 'luxury',
-        'description': 'The most luxurious sedan with whisper-quiet ride.',
-        'video_url': '/static/rolls_royce_ghost.glb'
+        'description': 'The Rolls-Royce Ghost embodies the spirit of ecstasy with unparalleled luxury and refinement.',
+        'video_url': '/static/rolls_royce_ghost.glb',
+        'model_file': 'rolls_royce_ghost.glb',
+        'year': '2023',
+        'engine': '6.75L Twin-Turbo V12',
+        'horsepower': '563 hp',
+        'torque': '627 lb-ft',
+        'top_speed': '155 mph',
+        'acceleration': '4.6 seconds (0-60 mph)',
+        'transmission': '8-Speed Automatic',
+        'drivetrain': 'All-Wheel Drive',
+        'fuel_economy': '14 mpg city / 21 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Hand-crafted interior',
+            'Whisper-quiet cabin',
+            'Starlight headliner',
+            'Spirit of Ecstasy ornament',
+            'Bespoke customization options',
+            'Advanced air suspension',
+        ]
     },
     {
         'name': 'Porsche 718 Cayman GT4',
         'slug': 'porsche-718-cayman-gt4',
         'price': 85000,
         'category': 'sports',
-        'description': 'Perfect balance of performance and daily usability.',
-        'video_url': '/static/porsche_718_cayman_gt4.glb'
+        'description': 'The Porsche 718 Cayman GT4 represents the perfect balance of track performance and daily usability with its naturally aspirated engine.',
+        'video_url': '/static/porsche_718_cayman_gt4.glb',
+        'model_file': 'porsche_718_cayman_gt4.glb',
+        'year': '2023',
+        'engine': '4.0L Naturally Aspirated Flat-6',
+        'horsepower': '414 hp',
+        'torque': '309 lb-ft',
+        'top_speed': '188 mph',
+        'acceleration': '4.2 seconds (0-60 mph)',
+        'transmission': '6-Speed Manual',
+        'drivetrain': 'Rear-Wheel Drive',
+        'fuel_economy': '18 mpg city / 24 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': 'Chicago Showroom',
+        'color': 'Guards Red',
+        'features': [
+            'Naturally aspirated flat-6 engine',
+            'Sport Chrono Package',
+            'PASM adaptive suspension',
+            'Track-focused aerodynamics',
+            'Carbon fiber elements',
+            'Racing-inspired interior',
+        ]
     },
     {
         'name': 'Mercedes Maybach',
         'slug': 'mercedes-maybach',
         'price': 200000,
         'category': 'luxury',
-        'description': 'Ultimate luxury sedan with exceptional comfort.',
-        'video_url': '/static/mercedes-benz_maybach_2022.glb'
+        'description': 'The Mercedes-Maybach S-Class represents the pinnacle of luxury and automotive craftsmanship.',
+        'video_url': '/static/mercedes-benz_maybach_2022.glb',
+        'model_file': 'mercedes-benz_maybach_2022.glb',
+        'year': '2022',
+        'engine': '4.0L Twin-Turbo V8',
+        'horsepower': '496 hp',
+        'torque': '516 lb-ft',
+        'top_speed': '155 mph',
+        'acceleration': '4.4 seconds (0-60 mph)',
+        'transmission': '9-Speed Automatic',
+        'drivetrain': 'All-Wheel Drive',
+        'fuel_economy': '17 mpg city / 25 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Executive rear seating',
+            'Burmester 4D surround sound',
+            'Active body control',
+            'Massage seats with heating/cooling',
+            'Premium leather and wood trim',
+            'Advanced driver assistance',
+        ]
     },
     {
         'name': 'Lamborghini Revuelto',
         'slug': 'lamborghini-revuelto',
         'price': 608000,
         'category': 'hypercar',
-        'description': 'First hybrid V12 Lamborghini with incredible performance.',
-        'video_url': '/static/lamborghini_revuelto.glb'
+        'description': 'The Lamborghini Revuelto represents the pinnacle of automotive engineering, combining a naturally aspirated V12 engine with hybrid technology for unprecedented performance.',
+        'video_url': '/static/lamborghini_revuelto.glb',
+        'model_file': 'lamborghini_revuelto.glb',
+        'year': '2024',
+        'engine': '6.5L V12 Hybrid',
+        'horsepower': '1,001 hp',
+        'torque': '725 lb-ft',
+        'top_speed': '217 mph',
+        'acceleration': '2.5 seconds (0-60 mph)',
+        'transmission': '8-Speed Dual-Clutch',
+        'drivetrain': 'All-Wheel Drive',
+        'fuel_economy': '11 mpg city / 18 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': 'New York Showroom',
+        'color': 'Nero Aldebaran',
+        'features': [
+            'Carbon fiber monocoque chassis',
+            'Advanced aerodynamics package',
+            'Adaptive suspension system',
+            'Premium leather interior',
+            'Advanced infotainment system',
+            'Track-focused driving modes',
+        ]
     },
     {
         'name': 'Ferrari Monza SP1',
         'slug': 'ferrari-monza-sp1',
         'price': 1750000,
         'category': 'limited edition',
-        'description': 'Exclusive single-seater speedster with racing DNA.',
-        'video_url': '/static/ferrari_monza_sp1.glb'
+        'description': "The Ferrari Monza SP1 is a limited-series speedster that celebrates Ferrari's racing heritage.",
+        'video_url': '/static/ferrari_monza_sp1.glb',
+        'model_file': 'ferrari_monza_sp1.glb',
+        'year': '2023',
+        'engine': '6.5L V12',
+        'horsepower': '809 hp',
+        'torque': '530 lb-ft',
+        'top_speed': '186 mph',
+        'acceleration': '2.9 seconds (0-60 mph)',
+        'transmission': '7-Speed Dual-Clutch',
+        'drivetrain': 'Rear-Wheel Drive',
+        'fuel_economy': '12 mpg city / 17 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Single-seat speedster design',
+            'Carbon fiber construction',
+            'Active aerodynamics',
+            'Racing-inspired cockpit',
+            'Limited production series',
+            'Heritage-inspired styling',
+        ]
     },
     {
         'name': 'BMW M2 G87',
         'slug': 'bmw-m2-g87',
         'price': 65000,
         'category': 'sports',
-        'description': 'Compact sports coupe with M performance DNA.',
-        'video_url': '/static/bmw_m2_g87.glb'
+        'description': 'The BMW M2 G87 delivers pure driving excitement with its perfect balance of power, handling, and everyday usability.',
+        'video_url': '/static/bmw_m2_g87.glb',
+        'model_file': 'bmw_m2_g87.glb',
+        'year': '2023',
+        'engine': '3.0L Twin-Turbo Inline-6',
+        'horsepower': '453 hp',
+        'torque': '406 lb-ft',
+        'top_speed': '177 mph',
+        'acceleration': '4.1 seconds (0-60 mph)',
+        'transmission': '6-Speed Manual / 8-Speed Auto',
+        'drivetrain': 'Rear-Wheel Drive',
+        'fuel_economy': '19 mpg city / 26 mpg highway',
+        'status': 'Available',
+        'mileage': '8 miles',
+        'location': 'Seattle Showroom',
+        'color': 'Alpine White',
+        'features': [
+            'M TwinPower Turbo engine',
+            'Adaptive M suspension',
+            'M differential',
+            'Carbon fiber roof',
+            'M-specific interior',
+            'Track-ready performance',
+        ]
     },
     {
         'name': 'Aston Martin V8 Vantage',
         'slug': 'aston-martin-v8-vantage',
         'price': 150000,
         'category': 'grand tourer',
-        'description': 'British grand tourer with stunning design and performance.',
-        'video_url': '/static/aston_martin_v8_vantage.glb'
+        'description': 'The Aston Martin V8 Vantage combines British luxury with exhilarating performance in a beautifully crafted sports car.',
+        'video_url': '/static/aston_martin_v8_vantage.glb',
+        'model_file': 'aston_martin_v8_vantage.glb',
+        'year': '2023',
+        'engine': '4.0L Twin-Turbo V8',
+        'horsepower': '503 hp',
+        'torque': '461 lb-ft',
+        'top_speed': '195 mph',
+        'acceleration': '3.5 seconds (0-60 mph)',
+        'transmission': '8-Speed Automatic',
+        'drivetrain': 'Rear-Wheel Drive',
+        'fuel_economy': '16 mpg city / 24 mpg highway',
+        'status': 'Sold',
+        'mileage': '5 miles',
+        'location': 'Dallas Showroom',
+        'color': 'British Racing Green',
+        'features': [
+            'Handcrafted luxury interior',
+            'Adaptive damping system',
+            'Electronic rear differential',
+            'Premium leather appointments',
+            'Bang & Olufsen sound system',
+            'Advanced infotainment',
+        ]
     },
     {
         'name': 'Lamborghini Temerario',
         'slug': 'lamborghini-temerario',
         'price': 520000,
         'category': 'sports',
-        'description': 'Latest hybrid V8 Lamborghini with cutting-edge technology.',
-        'video_url': '/static/lamborghini_temerario.glb'
+        'description': 'The Lamborghini Temerario showcases the future of Lamborghini with its hybrid V8 powertrain and cutting-edge technology.',
+        'video_url': '/static/lamborghini_temerario.glb',
+        'model_file': 'lamborghini_temerario.glb',
+        'year': '2024',
+        'engine': '4.0L Twin-Turbo V8 Hybrid',
+        'horsepower': '907 hp',
+        'torque': '627 lb-ft',
+        'top_speed': '210 mph',
+        'acceleration': '2.7 seconds (0-60 mph)',
+        'transmission': '8-Speed Dual-Clutch',
+        'drivetrain': 'All-Wheel Drive',
+        'fuel_economy': '14 mpg city / 20 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Hybrid V8 powertrain',
+            'Active aerodynamics package',
+            'Carbon fiber body panels',
+            'Advanced traction control',
+            'Customizable drive modes',
+            'Premium Alcantara interior',
+        ]
     },
     {
         'name': 'Hyundai Ioniq 5N',
         'slug': 'hyundai-ioniq-5n',
         'price': 67000,
         'category': 'electric sports',
-        'description': 'High-performance electric SUV with track capabilities.',
-        'video_url': '/static/2024_hyundai_ioniq_5_n.glb'
+        'description': 'The Ioniq 5 N combines high-performance electric propulsion with innovative technology and distinctive design.',
+        'video_url': '/static/2024_hyundai_ioniq_5_n.glb',
+        'model_file': '2024_hyundai_ioniq_5_n.glb',
+        'year': '2024',
+        'engine': 'Dual Electric Motors',
+        'horsepower': '641 hp',
+        'torque': '545 lb-ft',
+        'top_speed': '162 mph',
+        'acceleration': '3.4 seconds (0-60 mph)',
+        'transmission': 'Single-Speed Direct Drive',
+        'drivetrain': 'All-Wheel Drive',
+        'fuel_economy': '303 miles range',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Dual motor electric drivetrain',
+            'N Grin Boost mode',
+            'Ultra-fast charging capability',
+            'Active aerodynamics',
+            'Advanced driver assistance',
+            'Sporty N interior package',
+        ]
     },
     {
         'name': 'Jeep Wrangler Rubicon',
         'slug': 'jeep-wrangler-rubicon',
         'price': 45000,
         'category': 'off-road',
-        'description': 'Ultimate off-road SUV with legendary capability.',
-        'video_url': '/static/jeep_wrangler_rubicon.glb'
+        'description': 'The Jeep Wrangler Rubicon is the most capable off-road vehicle in the Jeep lineup.',
+        'video_url': '/static/jeep_wrangler_rubicon.glb',
+        'model_file': 'jeep_wrangler_rubicon.glb',
+        'year': '2023',
+        'engine': '3.6L V6',
+        'horsepower': '285 hp',
+        'torque': '260 lb-ft',
+        'top_speed': '112 mph',
+        'acceleration': '6.5 seconds (0-60 mph)',
+        'transmission': '8-Speed Automatic',
+        'drivetrain': '4WD',
+        'fuel_economy': '18 mpg city / 24 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Rock-Trac 4WD system',
+            'Rubicon rock rails',
+            'Electronic front and rear lockers',
+            'Disconnecting front sway bar',
+            'Skid plates protection',
+            'All-terrain tires',
+        ]
     },
     {
         'name': 'Mahindra Scorpio',
         'slug': 'mahindra-scorpio',
         'price': 15000,
         'category': 'suv',
-        'description': 'Rugged SUV with commanding presence and reliable performance.',
-        'video_url': '/static/mahindra_scorpio.glb'
+        'description': 'The Mahindra Scorpio is a rugged SUV built for Indian roads and tough conditions.',
+        'video_url': '/static/mahindra_scorpio.glb',
+        'model_file': 'mahindra_scorpio.glb',
+        'year': '2023',
+        'engine': '2.2L Turbo Diesel',
+        'horsepower': '130 hp',
+        'torque': '300 lb-ft',
+        'top_speed': '93 mph',
+        'acceleration': '11.5 seconds (0-60 mph)',
+        'transmission': '6-Speed Manual',
+        'drivetrain': '4WD',
+        'fuel_economy': '16 mpg city / 22 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            '4WD capability',
+            'High ground clearance',
+            'Robust build quality',
+            '7-seater configuration',
+            'Powerful diesel engine',
+            'Off-road capabilities',
+        ]
+    },
+    {
+        'name': 'Ferrari 296 GTB',
+        'slug': 'ferrari-296',
+        'price': 320000,
+        'category': 'sports',
+        'description': 'The Ferrari 296 GTB is a groundbreaking mid-rear-engined 2-seater berlinetta that introduces the new 120° V6 engine coupled with a plug-in electric motor.',
+        'video_url': '/static/ferrari_296.glb',
+        'model_file': 'ferrari_296.glb',
+        'year': '2023',
+        'engine': '2.9L V6 Hybrid Turbo',
+        'horsepower': '819 hp',
+        'torque': '546 lb-ft',
+        'top_speed': '205 mph',
+        'acceleration': '2.9 seconds (0-60 mph)',
+        'transmission': '8-Speed Dual-Clutch',
+        'drivetrain': 'Rear-Wheel Drive',
+        'fuel_economy': '16 mpg city / 22 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': 'Miami Showroom',
+        'color': 'Rosso Corsa',
+        'features': [
+            'Hybrid V6 powertrain',
+            'Active aerodynamics',
+            'Carbon fiber construction',
+            'Manettino dial with hybrid modes',
+            'F1-derived technology',
+            'Customizable interior options',
+        ]
+    },
+    {
+        'name': 'Koenigsegg Agera RS',
+        'slug': 'koenigsegg-agera-rs',
+        'price': 2500000,
+        'category': 'hypercar',
+        'description': 'The Koenigsegg Agera RS represents the ultimate expression of Swedish hypercar engineering with record-breaking performance.',
+        'video_url': '/static/koenigsegg_agera.glb',
+        'model_file': 'koenigsegg_agera.glb',
+        'year': '2023',
+        'engine': '5.0L Twin-Turbo V8',
+        'horsepower': '1,360 hp',
+        'torque': '1,011 lb-ft',
+        'top_speed': '278 mph',
+        'acceleration': '2.8 seconds (0-60 mph)',
+        'transmission': '7-Speed Automatic',
+        'drivetrain': 'Rear-Wheel Drive',
+        'fuel_economy': '12 mpg city / 18 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Carbon fiber construction',
+            'Active aerodynamics',
+            'Track-focused suspension',
+            'Lightweight titanium components',
+            'Bespoke interior craftsmanship',
+            'Advanced telemetry system',
+        ]
+    },
+    {
+        'name': '2003 Renault Clio V6 Sport',
+        'slug': 'renault-clio-v6',
+        'price': 45000,
+        'category': 'classic sports',
+        'description': 'The Renault Clio V6 is a unique mid-engined hot hatch that combines practicality with exceptional performance.',
+        'video_url': '/static/2003_renault_clio_v6_renault_sport.glb',
+        'model_file': '2003_renault_clio_v6_renault_sport.glb',
+        'year': '2003',
+        'engine': '3.0L V6',
+        'horsepower': '255 hp',
+        'torque': '221 lb-ft',
+        'top_speed': '153 mph',
+        'acceleration': '5.8 seconds (0-60 mph)',
+        'transmission': '6-Speed Manual',
+        'drivetrain': 'Rear-Wheel Drive',
+        'fuel_economy': '18 mpg city / 25 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Mid-mounted V6 engine',
+            'Widebody aerodynamic kit',
+            'Brembo braking system',
+            'Recaro sport seats',
+            'Limited production run',
+            'Track-focused suspension',
+        ]
+    },
+    {
+        'name': '2018 Porsche 718 Cayman GTS',
+        'slug': 'porsche-718-cayman-gts',
+        'price': 85000,
+        'category': 'sports',
+        'description': "The 718 Cayman GTS offers the perfect balance of performance and daily usability with Porsche's legendary handling.",
+        'video_url': '/static/2018_porsche_718_cayman_gts.glb',
+        'model_file': '2018_porsche_718_cayman_gts.glb',
+        'year': '2018',
+        'engine': '2.5L Turbo Flat-4',
+        'horsepower': '365 hp',
+        'torque': '309 lb-ft',
+        'top_speed': '180 mph',
+        'acceleration': '4.1 seconds (0-60 mph)',
+        'transmission': '6-Speed Manual',
+        'drivetrain': 'Rear-Wheel Drive',
+        'fuel_economy': '20 mpg city / 28 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Turbocharged flat-4 engine',
+            'Sport Chrono Package',
+            'PASM adaptive suspension',
+            'Sport exhaust system',
+            'Alcantara interior trim',
+            'GTS-specific styling',
+        ]
+    },
+    {
+        'name': '2022 Lamborghini Countach LPI 800-4',
+        'slug': 'lamborghini-countach',
+        'price': 2650000,
+        'category': 'limited edition',
+        'description': 'The modern Countach pays homage to the iconic original while delivering cutting-edge hybrid performance.',
+        'video_url': '/static/2022_lamborghini_countach_lpi_800-4.glb',
+        'model_file': '2022_lamborghini_countach_lpi_800-4.glb',
+        'year': '2022',
+        'engine': '6.5L V12 Hybrid',
+        'horsepower': '803 hp',
+        'torque': '531 lb-ft',
+        'top_speed': '221 mph',
+        'acceleration': '2.8 seconds (0-60 mph)',
+        'transmission': '7-Speed Automatic',
+        'drivetrain': 'All-Wheel Drive',
+        'fuel_economy': '10 mpg city / 16 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Hybrid V12 powertrain',
+            'Limited production (112 units)',
+            'Carbon fiber construction',
+            'Retro-futuristic design',
+            'Advanced aerodynamics',
+            'Exclusive interior materials',
+        ]
+    },
+    {
+        'name': '2024 Lamborghini Huracán Sterrato',
+        'slug': 'lamborghini-huracan-sterrato',
+        'price': 265000,
+        'category': 'off-road',
+        'description': "The Huracán Sterrato is the world's first super sports car designed for off-road adventures.",
+        'video_url': '/static/2024_lamborghini_huracan_sterrato.glb',
+        'model_file': '2024_lamborghini_huracan_sterrato.glb',
+        'year': '2024',
+        'engine': '5.2L V10',
+        'horsepower': '602 hp',
+        'torque': '413 lb-ft',
+        'top_speed': '162 mph',
+        'acceleration': '3.4 seconds (0-60 mph)',
+        'transmission': '7-Speed Dual-Clutch',
+        'drivetrain': 'All-Wheel Drive',
+        'fuel_economy': '13 mpg city / 18 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'Rally-inspired design',
+            'Increased ground clearance',
+            'All-terrain capabilities',
+            'Reinforced underbody protection',
+            'Off-road driving modes',
+            'Roof-mounted LED light bar',
+        ]
+    },
+    {
+        'name': 'SSC Tuatara Striker',
+        'slug': 'ssc-tuatara-striker',
+        'price': 1900000,
+        'category': 'hypercar',
+        'description': 'The SSC Tuatara Striker is designed to be the fastest production car in the world.',
+        'video_url': '/static/ssc_tuatara_striker.glb',
+        'model_file': 'ssc_tuatara_striker.glb',
+        'year': '2023',
+        'engine': '5.9L Twin-Turbo V8',
+        'horsepower': '1,750 hp',
+        'torque': '1,280 lb-ft',
+        'top_speed': '295 mph',
+        'acceleration': '2.5 seconds (0-60 mph)',
+        'transmission': '7-Speed Automated Manual',
+        'drivetrain': 'Rear-Wheel Drive',
+        'fuel_economy': '11 mpg city / 16 mpg highway',
+        'status': 'Available',
+        'mileage': '0 miles',
+        'location': None,
+        'color': None,
+        'features': [
+            'World record top speed',
+            'Carbon fiber monocoque',
+            'Active aerodynamics',
+            'Track-focused suspension',
+            'Lightweight construction',
+            'Advanced telemetry system',
+        ]
     }
 ]
 
 def populate_database():
     with app.app_context():
-        # Clear existing cars (optional)
-        Car.query.delete()
-        
-        # Add cars to database
+        # Upsert by slug so existing orders keep pointing at the same car rows
+        existing = {car.slug: car for car in Car.query.all()}
+        added = updated = 0
+
         for car_data in cars_data:
-            car = Car(
-                name=car_data['name'],
-                slug=car_data['slug'],
-                price=car_data['price'],
-                category=car_data['category'],
-                description=car_data['description'],
-                video_url=car_data['video_url']
-            )
-            db.session.add(car)
-        
+            values = dict(car_data, features=json.dumps(car_data['features']))
+            car = existing.get(car_data['slug'])
+            if car is None:
+                db.session.add(Car(**values))
+                added += 1
+            else:
+                for key, value in values.items():
+                    setattr(car, key, value)
+                updated += 1
+
         db.session.commit()
-        print(f"Successfully added {len(cars_data)} cars to the database!")
+
+        # Tell running app processes to reload their catalog snapshot
+        catalog.invalidate()
+        print(f"Successfully added {added} and updated {updated} cars in the database!")
 
 if __name__ == '__main__':
     populate_database()
@@ -0,0 +1,221 @@
+"""
+CarHub Recommendation Engine
+Scores every catalog listing against a customer's preferences in one vectorized NumPy pass
+"""
+
+import re
+import threading
+
+import numpy as np
+
+_NUMBER_RE = re.compile(r'(\d[\d,]*(?:\.\d+)?)\s*([km])?', re.IGNORECASE)
+
+# Feature columns: normalized to 0..1 when the arrays are built
+COLUMNS = ('performance', 'quickness', 'affordability', 'electric', 'newness')
+
+# usage -> (weight per feature column, reason shown to the customer)
+USAGE_PROFILES = {
+    'performance': ((1.5, 1.5, 0.0, 0.0, 0.0), "Strong performance: {horsepower}, {acceleration}"),
+    'track': ((2.0, 2.0, 0.0, 0.0, 0.0), "Built for the track: {horsepower}, {acceleration}"),
+    'daily': ((0.0, 0.0, 1.5, 0.5, 0.5), "Sensible daily driver at {price}"),
+    'commute': ((0.0, 0.0, 1.0, 1.5, 0.5), "Efficient for commuting"),
+    'eco': ((0.0, 0.0, 0.5, 2.5, 0.5), "Low-emission choice"),
+    'family': ((0.0, 0.0, 1.0, 0.5, 1.0), "Practical, recent model for the family"),
+    'luxury': ((0.5, 0.0, -1.0, 0.0, 0.5), "Premium flagship at {price}"),
+    'collector': ((0.0, 0.0, -0.5, 0.0, -1.5), "Collectible {year} model"),
+}
+
+CATEGORY_WEIGHT = 2.0
+BUDGET_WEIGHT = 1.0
+AVAILABLE_BONUS = 0.25
+INELIGIBLE_PENALTY = 1e9
+
+
+def parse_amount(text):
+    """'$60,000', '60k' or 1.2e6 -> float, or None"""
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = _NUMBER_RE.search(str(text or ''))
+    if not match:
+        return None
+    value = float(match.group(1).replace(',', ''))
+    suffix = (match.group(2) or '').lower()
+    return value * {'k': 1e3, 'm': 1e6}.get(suffix, 1)
+
+
+def parse_budget(budget):
+    """(low, high) price bounds from a budget preference, or None for 'any'.
+
+    Accepts a number (the maximum), {'min': ..., 'max': ...}, or text such
+    as '60000', '$50k-$100k' or 'under_50k'.
+    """
+    if budget is None or budget == '' or budget == 'any':
+        return None
+    if isinstance(budget, dict):
+        low = parse_amount(budget.get('min')) or 0.0
+        high = parse_amount(budget.get('max'))
+        return (low, high if high is not None else float('inf'))
+    if isinstance(budget, (int, float)):
+        return (0.0, float(budget))
+
+    amounts = []
+    for number, suffix in _NUMBER_RE.findall(str(budget)):
+        amounts.append(parse_amount(number + suffix))
+    if not amounts:
+        return None
+    if len(amounts) == 1:
+        if str(budget).lower().startswith(('over', 'above', 'from')):
+            return (amounts[0], float('inf'))
+        return (0.0, amounts[0])
+    return (min(amounts[:2]), max(amounts[:2]))
+
+
+def _normalize(values, invert=False):
+    """Scale to 0..1 ignoring NaNs; missing values score 0"""
+    finite = values[np.isfinite(values)]
+    if finite.size == 0:
+        return np.zeros_like(values)
+    low, high = finite.min(), finite.max()
+    scaled = (values - low) / (high - low) if high > low else np.ones_like(values)
+    if invert:
+        scaled = 1.0 - scaled
+    return np.nan_to_num(scaled, nan=0.0)
+
+
+class _Arrays:
+    """Column arrays for one catalog version"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        count = len(entries)
+        self.price = np.fromiter((entry['price_value'] for entry in entries), dtype=np.float64, count=count)
+        self.price32 = self.price.astype(np.float32)
+        self.categories = {}
+        self.category = np.fromiter(
+            (self.categories.setdefault((entry['category'] or '').lower(), len(self.categories)) for entry in entries),
+            dtype=np.int32, count=count
+        )
+        status = [(entry['status'] or '').lower() for entry in entries]
+        self.available = np.array([s == 'available' for s in status], dtype=bool)
+        self.unsold = np.array([s != 'sold' for s in status], dtype=bool)
+        self.available_bonus = (AVAILABLE_BONUS * self.available).astype(np.float32)
+
+        horsepower = np.array([parse_amount(entry['horsepower']) or np.nan for entry in entries], dtype=np.float64)
+        acceleration = np.array([parse_amount(entry['acceleration']) or np.nan for entry in entries], dtype=np.float64)
+        year = np.array([parse_amount(entry['year']) or np.nan for entry in entries], dtype=np.float64)
+        electric = np.array([
+            (entry['category'] or '').lower() == 'electric' or 'electric' in (entry['engine'] or '').lower()
+            for entry in entries
+        ], dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_price = np.log(np.where(self.price > 0, self.price, np.nan))
+
+        # One float32 row per feature column, so weighting them reads each row sequentially
+        self.features = np.ascontiguousarray(np.vstack([
+            _normalize(horsepower),
+            _normalize(acceleration, invert=True),
+            _normalize(log_price, invert=True),
+            electric,
+            _normalize(year),
+        ]), dtype=np.float32)
+
+
+class RecommendationEngine:
+    def __init__(self, catalog):
+        """Recommend catalog cars for a set of preferences.
+
+        The catalog is turned into NumPy column arrays once per catalog
+        version; each query is then a handful of vectorized operations
+        over every listing plus argpartition for the top k, so cost grows
+        only with the array length, not with Python-level loops.
+        """
+        self.catalog = catalog
+        self._arrays = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def recommend(self, preferences, limit=5):
+        """Top `limit` cars as {"car", "score", "reasons"} dicts, best first"""
+        arrays = self._current()
+        count = len(arrays.entries)
+        if count == 0 or limit <= 0:
+            return []
+
+        preferences = preferences or {}
+        score = np.zeros(count, dtype=np.float32)
+        eligible = arrays.unsold
+
+        categories = preferences.get('category', 'any')
+        if isinstance(categories, str):
+            categories = [categories]
+        wanted = [arrays.categories[c.lower()] for c in categories
+                  if isinstance(c, str) and c.lower() in arrays.categories]
+        if wanted:
+            category_match = arrays.category == wanted[0]
+            for code in wanted[1:]:
+                category_match |= arrays.category == code
+            score += np.float32(CATEGORY_WEIGHT) * category_match
+        elif any(isinstance(c, str) and c.lower() != 'any' for c in categories):
+            return []  # asked for a category we do not stock
+
+        bounds = parse_budget(preferences.get('budget', 'any'))
+        if bounds is not None:
+            low, high = bounds
+            eligible = eligible & (arrays.price >= low) & (arrays.price <= high)
+            # Within budget, prefer the car that makes the most of it
+            if np.isfinite(high) and high > 0:
+                score += np.float32(BUDGET_WEIGHT) * (1 + arrays.price32 / np.float32(high))
+            else:
+                score += np.float32(BUDGET_WEIGHT)
+
+        profile = USAGE_PROFILES.get(str(preferences.get('usage', 'any')).lower())
+        if profile is not None:
+            score += np.asarray(profile[0], dtype=np.float32) @ arrays.features
+
+        # Only cars that matched at least one preference, as before; availability breaks ties
+        eligible = eligible & (score > 0)
+        matches = int(np.count_nonzero(eligible))
+        if matches == 0:
+            return []
+        score += arrays.available_bonus
+        # Push ineligible cars out of reach arithmetically; masked assignment is far slower
+        score -= np.float32(INELIGIBLE_PENALTY) * ~eligible
+
+        k = min(limit, matches)
+        # Partition on the negated scores: with the mass of tied ineligible scores on the far
+        # side of the k-th element introselect stays linear (on the near side it degrades)
+        ranked = -score
+        top = np.argpartition(ranked, k - 1)[:k] if k < count else np.arange(count)
+        top = top[np.argsort(ranked[top], kind='stable')]
+
+        return [self._describe(arrays, int(i), float(score[i]), wanted, bounds, profile) for i in top]
+
+    def _current(self):
+        version = self.catalog.version
+        arrays = self._arrays
+        if arrays is not None and version == self._version:
+            return arrays
+        with self._lock:
+            if self._arrays is None or version != self._version:
+                self._arrays = _Arrays(self.catalog.all())
+                self._version = version
+            return self._arrays
+
+    @staticmethod
+    def _describe(arrays, index, score, wanted, bounds, profile):
+        entry = arrays.entries[index]
+        reasons = []
+        if wanted and arrays.category[index] in wanted:
+            reasons.append(f"Matches your preferred {entry['category']} category")
+        if bounds is not None:
+            reasons.append(f"Priced at {entry['price']}, within your budget")
+        if profile is not None:
+            reasons.append(profile[1].format(
+                horsepower=entry['horsepower'] or 'strong power',
+                acceleration=entry['acceleration'] or 'quick acceleration',
+                price=entry['price'],
+                year=entry['year'] or 'classic',
+            ))
+        if arrays.available[index]:
+            reasons.append("Available now")
+        return {"car": dict(entry), "score": round(score, 3), "reasons": reasons}
@@ -0,0 +1,244 @@
+"""
+CarHub Retrieval Index
+TF-IDF index over catalog, parts and service text, built offline and memory-mapped by every worker
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Build and query must tokenize identically, so both use these options.
+# scikit-learn and SciPy take over a second to import, so they are only
+# imported once there is an index to build or load.
+VECTORIZER_OPTIONS = {
+    'stop_words': 'english',
+    'ngram_range': (1, 2),
+    'sublinear_tf': True,
+    'dtype': np.float32,
+}
+
+POINTER_FILE = 'current.json'
+SNIPPET_CHARS = 400
+
+
+def _join(items):
+    return ', '.join(str(item) for item in items if item)
+
+
+def _snippet(text):
+    if len(text) <= SNIPPET_CHARS:
+        return text
+    return text[:SNIPPET_CHARS].rsplit(' ', 1)[0] + '...'
+
+
+def collect_documents(cars=(), parts=(), knowledge_base=None):
+    """Turn Car rows, Part rows and the chatbot's knowledge base sections into documents"""
+    documents = []
+
+    def add(kind, key, title, text):
+        text = ' '.join(text.split())
+        documents.append({'id': f'{kind}:{key}', 'kind': kind, 'title': title, 'text': text,
+                          'snippet': _snippet(text)})
+
+    for car in cars:
+        try:
+            features = json.loads(car.features) if car.features else []
+        except (TypeError, ValueError):
+            features = []
+        specs = _join([car.engine, car.horsepower, car.torque,
+                       f"0-60 in {car.acceleration}" if car.acceleration else None,
+                       f"top speed {car.top_speed}" if car.top_speed else None,
+                       car.transmission, car.drivetrain, car.fuel_economy])
+        add('car', car.slug, car.name,
+            f"{car.name} ({car.category}, {car.year or 'n/a'}) priced at ${car.price:,.0f}, "
+            f"status {car.status or 'Available'}. {car.description or ''} Specs: {specs}. "
+            f"Features: {_join(features)}. Location: {car.location or 'contact us'}. Color: {car.color or 'n/a'}.")
+
+    for part in parts:
+        add('part', part.id, part.name,
+            f"{part.name} by {part.brand or 'CarHub'} ({part.category or 'part'}, {part.condition or 'New'}) "
+            f"priced at {part.price}. {part.description or ''} Warranty: {part.warranty or 'standard'}.")
+
+    knowledge_base = knowledge_base or {}
+    for key, service in knowledge_base.get('services', {}).items():
+        title = key.replace('_', ' ').title()
+        details = ' '.join(f"{name.title()}: {_join(values)}." for name, values in service.items()
+                           if isinstance(values, list))
+        add('service', key, title, f"{title}: {service.get('description', '')}. {details}")
+
+    for key, items in knowledge_base.get('features', {}).items():
+        title = key.replace('_', ' ').title()
+        add('feature', key, title, f"{title}: {_join(items)}.")
+
+    for section in ('pricing_financing', 'contact_info', 'company_info'):
+        values = knowledge_base.get(section)
+        if values:
+            title = section.replace('_', ' ').title()
+            add('info', section, title, f"{title}: " + ' '.join(
+                f"{name.replace('_', ' ').title()}: {_join(value) if isinstance(value, list) else value}."
+                for name, value in values.items()))
+
+    return documents
+
+
+def build_index(documents, directory, keep=2):
+    """Fit TF-IDF over `documents` and publish it under `directory`.
+
+    Each build goes into its own subdirectory; the pointer file is swapped
+    atomically afterwards, so running workers never read a half-written
+    index. Only the newest `keep` builds are kept.
+    """
+    from scipy.sparse import csr_matrix
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    vectorizer = TfidfVectorizer(**VECTORIZER_OPTIONS)
+    matrix = csr_matrix(vectorizer.fit_transform([doc['text'] for doc in documents]), dtype=np.float32)
+    matrix.sort_indices()
+
+    version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    target = os.path.join(directory, version)
+    os.makedirs(target)
+    np.save(os.path.join(target, 'data.npy'), matrix.data)
+    # int32 indices are what scipy uses at this size, so loading wraps the maps without a copy
+    np.save(os.path.join(target, 'indices.npy'), matrix.indices.astype(np.int32))
+    np.save(os.path.join(target, 'indptr.npy'), matrix.indptr.astype(np.int32))
+    np.save(os.path.join(target, 'idf.npy'), vectorizer.idf_.astype(np.float32))
+    with open(os.path.join(target, 'vocabulary.json'), 'w') as f:
+        json.dump({term: int(column) for term, column in vectorizer.vocabulary_.items()}, f)
+    with open(os.path.join(target, 'documents.json'), 'w') as f:
+        json.dump([{k: doc[k] for k in ('id', 'kind', 'title', 'snippet')} for doc in documents], f)
+
+    meta = {'version': version, 'documents': matrix.shape[0], 'terms': matrix.shape[1],
+            'nonzeros': int(matrix.nnz), 'built_at': datetime.now().isoformat()}
+    pointer = os.path.join(directory, POINTER_FILE)
+    with open(pointer + '.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(pointer + '.tmp', pointer)
+
+    builds = sorted(name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name)))
+    for name in builds[:-keep]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    return meta
+
+
+class RetrievalIndex:
+    def __init__(self, directory, meta):
+        """One published build, with the term matrix memory-mapped read-only"""
+        from scipy.sparse import csr_matrix
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        path = os.path.join(directory, meta['version'])
+        self.meta = meta
+        # mmap_mode keeps the arrays in the page cache, shared by every worker process
+        data = np.load(os.path.join(path, 'data.npy'), mmap_mode='r')
+        indices = np.load(os.path.join(path, 'indices.npy'), mmap_mode='r')
+        indptr = np.load(os.path.join(path, 'indptr.npy'), mmap_mode='r')
+        self.matrix = csr_matrix((data, indices, indptr), shape=(meta['documents'], meta['terms']), copy=False)
+        with open(os.path.join(path, 'vocabulary.json')) as f:
+            vocabulary = json.load(f)
+        with open(os.path.join(path, 'documents.json')) as f:
+            self.documents = json.load(f)
+        self.vectorizer = TfidfVectorizer(vocabulary=vocabulary, **VECTORIZER_OPTIONS)
+        self.vectorizer.idf_ = np.load(os.path.join(path, 'idf.npy'))
+
+    def search(self, query, k=3, min_score=0.0):
+        """Best `k` documents for the query by cosine similarity, best first"""
+        vector = self.vectorizer.transform([query or ''])
+        if vector.nnz == 0 or not self.documents:
+            return []
+        scores = (self.matrix @ vector.T).toarray().ravel()
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [dict(self.documents[i], score=round(float(scores[i]), 4))
+                for i in top if scores[i] > min_score]
+
+
+class Retriever:
+    def __init__(self, directory, top_k=3, min_score=0.1, check_interval=5.0):
+        """Serve searches from the latest build under `directory`.
+
+        The pointer file is re-checked at most once per `check_interval`
+        seconds and a new build is loaded when it changes. With no build
+        yet, searches return nothing and the chatbot works as before.
+        """
+        self.directory = directory
+        self.top_k = top_k
+        self.min_score = min_score
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._index = None
+        self._pointer_stamp = None
+        self._next_check = 0.0
+        self.generation = 0
+
+    def search(self, query, k=None):
+        index = self.current()
+        if index is None:
+            return []
+        return index.search(query, k or self.top_k, self.min_score)
+
+    def current(self):
+        """The loaded index, reloading it if a newer build was published"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._index
+        with self._lock:
+            if now < self._next_check:
+                return self._index
+            self._next_check = now + self.check_interval
+            pointer = os.path.join(self.directory, POINTER_FILE)
+            try:
+                stat = os.stat(pointer)
+                # Every publish replaces the file, so the inode changes even within one mtime tick
+                stamp = (stat.st_ino, stat.st_mtime_ns)
+            except OSError:
+                stamp = None
+            if stamp != self._pointer_stamp:
+                index = self._load(pointer) if stamp is not None else None
+                if stamp is not None and index is None:
+                    # Keep serving the build we have and retry on the next check (the new one
+                    # may have been pruned between reading the pointer and loading its files)
+                    return self._index
+                self._pointer_stamp = stamp
+                self._index = index
+                self.generation += 1
+            return self._index
+
+    def stats(self):
+        index = self.current()
+        return {
+            'loaded': index is not None,
+            'generation': self.generation,
+            'top_k': self.top_k,
+            'min_score': self.min_score,
+            **(index.meta if index is not None else {}),
+        }
+
+    def _load(self, pointer):
+        try:
+            with open(pointer) as f:
+                meta = json.load(f)
+            index = RetrievalIndex(self.directory, meta)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Retrieval index load failed: {e}")
+            return None
+        print(f"📚 Retrieval index loaded: {meta['documents']} documents, {meta['terms']} terms")
+        return index
+
+
+def create_retriever(app):
+    """Build the retriever from RETRIEVAL_* settings; returns None when disabled"""
+    if not app.config.get('RETRIEVAL_ENABLED', True):
+        return None
+    return Retriever(
+        app.config.get('RETRIEVAL_INDEX_PATH') or os.path.join(app.instance_path, 'retrieval_index'),
+        top_k=app.config.get('RETRIEVAL_TOP_K', 3),
+        min_score=app.config.get('RETRIEVAL_MIN_SCORE', 0.1),
+    )
@@ -0,0 +1,270 @@
+"""
+CarHub SQL Profiler
+Per-request query counts, database time and slowest statements, with a rotating log of slow requests
+"""
+
+import heapq
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+MAX_STATEMENT_CHARS = 1000
+
+
+def redact(parameters):
+    """Bound parameters with their values replaced by type names, so the log never holds user data"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: _placeholder(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f'<{len(parameters)} parameter sets>'  # executemany
+        return [_placeholder(value) for value in parameters]
+    return _placeholder(parameters)
+
+
+def _placeholder(value):
+    return None if value is None else f'<{type(value).__name__}>'
+
+
+class RequestProfile:
+    __slots__ = ('method', 'route', 'path', 'status', 'queries', 'db_seconds', 'slowest')
+
+    def __init__(self, method, route, path):
+        self.method = method
+        self.route = route
+        self.path = path
+        self.status = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest = []  # min-heap of (seconds, sequence, statement, parameters)
+
+    def record(self, statement, parameters, seconds, keep):
+        self.queries += 1
+        self.db_seconds += seconds
+        if len(self.slowest) < keep:
+            heapq.heappush(self.slowest, (seconds, self.queries, statement, parameters))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, self.queries, statement, parameters))
+
+    def statements(self):
+        """Slowest statements first, with redacted parameters"""
+        return [
+            {'ms': round(seconds * 1000, 3), 'sql': statement[:MAX_STATEMENT_CHARS], 'params': redact(parameters)}
+            for seconds, _, statement, parameters in sorted(self.slowest, reverse=True)
+        ]
+
+
+class RouteStats:
+    __slots__ = ('requests', 'queries', 'db_seconds', 'max_db_seconds', 'max_queries', 'slow_requests', 'slowest')
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.max_db_seconds = 0.0
+        self.max_queries = 0
+        self.slow_requests = 0
+        self.slowest = {}  # sql -> worst ms, across all requests to the route
+
+    def add(self, profile, slow, keep):
+        self.requests += 1
+        self.queries += profile.queries
+        self.db_seconds += profile.db_seconds
+        self.max_db_seconds = max(self.max_db_seconds, profile.db_seconds)
+        self.max_queries = max(self.max_queries, profile.queries)
+        self.slow_requests += slow
+        for seconds, _, statement, _ in profile.slowest:
+            sql = statement[:MAX_STATEMENT_CHARS]
+            ms = round(seconds * 1000, 3)
+            if ms > self.slowest.get(sql, -1):
+                self.slowest[sql] = ms
+                if len(self.slowest) > keep:
+                    del self.slowest[min(self.slowest, key=self.slowest.get)]
+
+    def to_dict(self, route):
+        return {
+            'route': route,
+            'requests': self.requests,
+            'queries': self.queries,
+            'avg_queries': round(self.queries / self.requests, 1),
+            'max_queries': self.max_queries,
+            'db_ms': round(self.db_seconds * 1000, 1),
+            'avg_db_ms': round(self.db_seconds * 1000 / self.requests, 2),
+            'max_db_ms': round(self.max_db_seconds * 1000, 2),
+            'slow_requests': self.slow_requests,
+            'slowest': [{'ms': ms, 'sql': sql}
+                        for sql, ms in sorted(self.slowest.items(), key=lambda item: item[1], reverse=True)],
+        }
+
+
+class SQLProfiler:
+    def __init__(self, sample_rate=1.0, slow_ms=200, top_statements=5, log_path=None,
+                 log_max_bytes=5 * 1024 * 1024, log_backups=3):
+        """Times every statement a sampled request runs, through engine events.
+
+        A request is picked with probability `sample_rate` when it starts;
+        unpicked requests and background threads cost one thread-local
+        lookup per statement. When a picked request spends `slow_ms` or
+        more in the database it is written, with its `top_statements`
+        slowest statements, as a JSON line to a log at `log_path` that
+        rotates at `log_max_bytes`. Statement parameters are reduced to
+        type names before they are kept anywhere.
+        """
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.top_statements = top_statements
+        self.log_path = log_path
+
+        self._local = threading.local()
+        self._routes = {}  # 'GET /cars' -> RouteStats
+        self._lock = threading.Lock()
+        self.sampled = 0
+        self.slow = 0
+
+        # A private logger (not registered with logging) so each profiler owns its file
+        self.slow_log = logging.Logger('carhub.slow_queries', logging.INFO)
+        if log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            handler = RotatingFileHandler(log_path, maxBytes=log_max_bytes, backupCount=log_backups)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.slow_log.addHandler(handler)
+
+    def init_app(self, app, engine):
+        """Profile `app`'s requests against `engine`"""
+        self.listen(engine)
+
+        from flask import request
+
+        @app.before_request
+        def _start_profile():
+            if request.endpoint != 'static':
+                rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+                self.begin(request.method, rule, request.path)
+
+        @app.after_request
+        def _record_status(response):
+            profile = getattr(self._local, 'profile', None)
+            if profile is not None:
+                profile.status = response.status_code
+            return response
+
+        @app.teardown_request
+        def _finish_profile(exc):
+            self.end()
+
+    def listen(self, engine):
+        """Time the statements `engine` runs for profiled requests"""
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def remove(self, engine):
+        event.remove(engine, 'before_cursor_execute', self._before_execute)
+        event.remove(engine, 'after_cursor_execute', self._after_execute)
+
+    # Request lifecycle
+
+    def begin(self, method, route, path=None):
+        """Start profiling this thread's request, if it is sampled"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self._local.profile = None
+            return None
+        profile = RequestProfile(method, route, path or route)
+        self._local.profile = profile
+        return profile
+
+    def end(self):
+        """Fold this thread's request into the route totals and log it if it was slow"""
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            return None
+        self._local.profile = None
+
+        slow = profile.db_seconds * 1000 >= self.slow_ms
+        key = f'{profile.method} {profile.route}'
+        with self._lock:
+            self.sampled += 1
+            self.slow += slow
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = RouteStats()
+            stats.add(profile, slow, self.top_statements)
+        if slow:
+            self._log_slow(profile)
+        return profile
+
+    def _log_slow(self, profile):
+        self.slow_log.info(json.dumps({
+            'time': datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+            'method': profile.method,
+            'route': profile.route,
+            'path': profile.path,
+            'status': profile.status,
+            'queries': profile.queries,
+            'db_ms': round(profile.db_seconds * 1000, 2),
+            'statements': profile.statements(),
+        }))
+
+    # Engine events
+
+    # The start time lives on the statement's execution context, which is
+    # dropped with the statement, so one that raises leaves nothing behind
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None and getattr(self._local, 'profile', None) is not None:
+            context._sql_profiler_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        profile = getattr(self._local, 'profile', None)
+        started = getattr(context, '_sql_profiler_started', None)
+        if profile is not None and started is not None:
+            profile.record(statement, parameters, time.perf_counter() - started, self.top_statements)
+
+    # Reporting
+
+    def top_routes(self, limit=20):
+        """Routes with the most total database time"""
+        with self._lock:
+            routes = [stats.to_dict(route) for route, stats in self._routes.items()]
+        routes.sort(key=lambda route: route['db_ms'], reverse=True)
+        return routes[:limit]
+
+    def stats(self, limit=20):
+        with self._lock:
+            counters = {'sampled_requests': self.sampled, 'slow_requests': self.slow, 'routes_seen': len(self._routes)}
+        return dict(counters,
+                    sample_rate=self.sample_rate,
+                    slow_ms=self.slow_ms,
+                    slow_log=self.log_path,
+                    top_routes=self.top_routes(limit))
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self.sampled = 0
+            self.slow = 0
+
+
+def create_sql_profiler(app, db):
+    """Attach a profiler built from the SQL_PROFILE_* settings; returns None when disabled"""
+    if not app.config.get('SQL_PROFILE_ENABLED', True):
+        return None
+    profiler = SQLProfiler(
+        sample_rate=app.config.get('SQL_PROFILE_SAMPLE_RATE', 1.0),
+        slow_ms=app.config.get('SQL_SLOW_REQUEST_MS', 200),
+        top_statements=app.config.get('SQL_PROFILE_TOP_STATEMENTS', 5),
+        log_path=app.config.get('SQL_SLOW_LOG_PATH') or os.path.join(app.instance_path, 'slow_queries.log'),
+        log_max_bytes=app.config.get('SQL_SLOW_LOG_MAX_BYTES', 5 * 1024 * 1024),
+        log_backups=app.config.get('SQL_SLOW_LOG_BACKUPS', 3),
+    )
+    with app.app_context():
+        profiler.init_app(app, db.engine)
+    return profiler
@@ -0,0 +1,250 @@
+"""
+Shared pytest fixtures for CarHub
+Runs the app against an in-memory SQLite database
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('MAIL_SPOOL_PATH', tempfile.mkdtemp(prefix='carhub-mail-'))
+os.environ.setdefault('CATALOG_STAMP_PATH', os.path.join(tempfile.mkdtemp(prefix='carhub-catalog-'), 'catalog.stamp'))
+os.environ.setdefault('INVOICE_CACHE_PATH', tempfile.mkdtemp(prefix='carhub-invoices-'))
+os.environ.setdefault('SQL_SLOW_LOG_PATH', os.path.join(tempfile.mkdtemp(prefix='carhub-sql-'), 'slow_queries.log'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+
+@pytest.fixture
+def app_ctx():
+    """App context with freshly created tables"""
+    from app import app, db, activity_writer, principal_cache, user_search
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        yield app
+        # Don't let queued activity rows leak into the next test's tables
+        activity_writer.flush()
+        db.session.remove()
+        db.drop_all()
+        # Ids restart with the next test's tables, so cached users would belong to someone else
+        if principal_cache is not None:
+            principal_cache.invalidate()
+        if user_search.loaded:
+            user_search.invalidate()
+
+
+@pytest.fixture
+def add_car(app_ctx):
+    """add_car(slug, price, **columns): commit a sports car and return it"""
+    from app import db, Car
+
+    def add(slug='test-car', price=50000, **extra):
+        car = Car(
+            name=extra.pop('name', 'Test Car'),
+            slug=slug,
+            price=price,
+            category='sports',
+            features=json.dumps(['Feature A', 'Feature B']),
+            **extra
+        )
+        db.session.add(car)
+        db.session.commit()
+        return car
+    return add
+
+
+@pytest.fixture
+def login(app_ctx):
+    """login(email, username): create a user and return (test client signed in as them, user id)"""
+    from app import db, User
+
+    def sign_in(email='driver@example.com', username='driver'):
+        user = User(username=username, email=email, first_name='Dana', bio='Track days on weekends')
+        user.set_password('old-password')
+        db.session.add(user)
+        db.session.commit()
+
+        client = app_ctx.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user.id)
+            sess['_fresh'] = True
+        return client, user.id
+    return sign_in
+
+
+@pytest.fixture
+def new_request(app_ctx):
+    """new_request(): forget what the shared test app context kept from the previous request"""
+    from flask import g
+    from app import db
+
+    def forget():
+        g.pop('_login_user', None)
+        db.session.expunge_all()
+    return forget
+
+
+@pytest.fixture
+def user_queries(app_ctx):
+    """`with user_queries() as statements:` collects the SELECTs against the user table run in the block"""
+    from sqlalchemy import event
+    from app import db
+
+    @contextmanager
+    def collect():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT') and 'FROM user' in statement:
+                statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+    return collect
+
+
+class QueryCounter:
+    """SQL statements executed while serving each test client request, in request order"""
+
+    def __init__(self):
+        self.requests = []  # (path, statement count)
+        self.statements = []  # (path, statement, parameters), as sent to the driver
+        self._current = None
+
+    @property
+    def last(self):
+        return self.requests[-1][1]
+
+    def _started(self, sender, **extra):
+        from flask import request
+        self._current = [request.path, 0]
+
+    def _finished(self, sender, response, **extra):
+        if self._current is not None:
+            self.requests.append(tuple(self._current))
+            self._current = None
+
+    def _executed(self, conn, cursor, statement, parameters, context, executemany):
+        if self._current is not None:
+            self._current[1] += 1
+            self.statements.append((self._current[0], statement, parameters))
+
+
+@pytest.fixture
+def query_counter(app_ctx):
+    """Counts the statements each request runs, so a test can check a page's count does not grow with its rows"""
+    from flask import request_finished, request_started
+    from sqlalchemy import event
+    from app import db
+    counter = QueryCounter()
+    request_started.connect(counter._started, app_ctx)
+    request_finished.connect(counter._finished, app_ctx)
+    event.listen(db.engine, 'before_cursor_execute', counter._executed)
+    yield counter
+    event.remove(db.engine, 'before_cursor_execute', counter._executed)
+    request_started.disconnect(counter._started, app_ctx)
+    request_finished.disconnect(counter._finished, app_ctx)
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    """Minimal OpenAI-compatible chat completions server (streaming and non-streaming)"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeOpenAIHandler)
+        self.reply = ['Hello', ' from', ' the', ' CarHub', ' service team']
+        self.delay = 0.0  # seconds before a reply and between streamed chunks
+        self.fail = False
+        self.cached_tokens = 0  # reported as served from the provider's prompt cache
+        self.requests = []
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/v1'
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(body)
+        if self.server.fail:
+            self._json(500, {'error': {'message': 'upstream exploded', 'type': 'server_error'}})
+            return
+        prompt_tokens = sum(len(m['content']) for m in body['messages']) // 4
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(self.server.reply),
+                 'total_tokens': prompt_tokens + len(self.server.reply),
+                 'prompt_tokens_details': {'cached_tokens': self.server.cached_tokens}}
+        if not body.get('stream'):
+            time.sleep(self.server.delay)
+            self._json(200, {
+                'id': 'chatcmpl-1', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': ''.join(self.server.reply)}}],
+                'usage': usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        for piece in self.server.reply:
+            time.sleep(self.server.delay)
+            chunk = {'id': 'chatcmpl-1', 'object': 'chat.completion.chunk', 'created': 0, 'model': body['model'],
+                     'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+            self.wfile.flush()
+        if body.get('stream_options', {}).get('include_usage'):
+            chunk = {'id': 'chatcmpl-1', 'object': 'chat.completion.chunk', 'created': 0, 'model': body['model'],
+                     'choices': [], 'usage': usage}
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+        self.wfile.write(b'data: [DONE]\n\n')
+
+    def _json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def fake_openai():
+    server = FakeOpenAI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def chatbot(app_ctx, fake_openai, monkeypatch):
+    """The app's chatbot talking to fake_openai through a fresh gateway, with an empty response cache and memory"""
+    import openai
+    from app import chatbot_instance
+    from chat_cache import ChatResponseCache
+    from conversation_memory import ConversationMemory
+    from llm_gateway import LLMGateway
+    monkeypatch.setattr(chatbot_instance, 'llm', LLMGateway(
+        openai.OpenAI(api_key='test-key', base_url=fake_openai.url, max_retries=0)))
+    monkeypatch.setattr(chatbot_instance, 'openai_available', True)
+    monkeypatch.setattr(chatbot_instance, 'response_cache', ChatResponseCache())
+    monkeypatch.setattr(chatbot_instance, 'memory', ConversationMemory())
+    return chatbot_instance
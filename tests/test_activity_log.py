@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Activity log writer tests for CarHub
+Checks batching, flush-on-stop, drop counting and the pluggable sinks
+"""
+
+import json
+import threading
+
+from activity_log import ActivityLogWriter, JSONLSink
+
+
+class MemorySink:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def write_batch(self, rows):
+        if self.fail:
+            raise RuntimeError("sink unavailable")
+        with self.lock:
+            self.batches.append(list(rows))
+
+
+def test_rows_are_written_in_batches():
+    sink = MemorySink()
+    writer = ActivityLogWriter(sink, batch_size=10, flush_interval_ms=1000)
+    for i in range(25):
+        assert writer.record({'n': i})
+    writer.flush()
+
+    rows = [row['n'] for batch in sink.batches for row in batch]
+    assert rows == list(range(25))
+    assert all(len(batch) <= 10 for batch in sink.batches)
+    assert writer.stats()['written'] == 25
+    writer.stop()
+
+
+def test_stop_flushes_pending_rows():
+    sink = MemorySink()
+    writer = ActivityLogWriter(sink, batch_size=1000, flush_interval_ms=60000)
+    for i in range(5):
+        writer.record({'n': i})
+    writer.stop()
+
+    assert sum(len(batch) for batch in sink.batches) == 5
+    assert writer.stats()['queue_depth'] == 0
+
+
+def test_full_queue_drops_rows():
+    sink = MemorySink()
+    writer = ActivityLogWriter(sink, max_queue=3, batch_size=100, flush_interval_ms=60000)
+    # Keep the worker from draining so the queue fills up
+    writer._ensure_worker = lambda: None
+    results = [writer.record({'n': i}) for i in range(5)]
+
+    assert results == [True, True, True, False, False]
+    assert writer.stats()['dropped'] == 2
+    writer.stop()
+    assert sum(len(batch) for batch in sink.batches) == 3
+
+
+def test_flush_waits_out_a_full_queue():
+    writing, release = threading.Event(), threading.Event()
+
+    class SlowSink(MemorySink):
+        def write_batch(self, rows):
+            writing.set()
+            release.wait(5)
+            super().write_batch(rows)
+
+    sink = SlowSink()
+    writer = ActivityLogWriter(sink, max_queue=2, batch_size=1, flush_interval_ms=10)
+    writer.record({'n': 0})
+    assert writing.wait(5)  # the worker is stuck in the sink, so nothing drains the queue
+    assert writer.record({'n': 1}) and writer.record({'n': 2})
+
+    try:
+        writer.flush(timeout=0.1)  # no room for the flush marker; must not raise queue.Full
+    finally:
+        release.set()
+    writer.flush()
+    assert [row['n'] for batch in sink.batches for row in batch] == [0, 1, 2]
+    writer.stop()
+
+
+def test_sink_errors_are_counted():
+    writer = ActivityLogWriter(MemorySink(fail=True), batch_size=5, flush_interval_ms=50)
+    writer.record({'n': 1})
+    writer.flush()
+
+    stats = writer.stats()
+    assert stats['errors'] == 1
+    assert stats['dropped'] == 1
+    writer.stop()
+
+
+def test_jsonl_sink(tmp_path):
+    path = tmp_path / 'activity.jsonl'
+    writer = ActivityLogWriter(JSONLSink(str(path)), batch_size=2, flush_interval_ms=50)
+    writer.record({'user_id': 1, 'activity_type': 'login'})
+    writer.record({'user_id': 2, 'activity_type': 'logout'})
+    writer.stop()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line['activity_type'] for line in lines] == ['login', 'logout']
+
+
+def test_log_user_activity_reaches_database(app_ctx):
+    from app import db, User, UserActivity, log_user_activity, activity_writer
+    user = User(username='logger', email='logger@example.com')
+    db.session.add(user)
+    db.session.commit()
+
+    for i in range(3):
+        log_user_activity(user.id, 'car_view', f'Viewed car {i}', metadata={'i': i})
+    activity_writer.flush()
+
+    activities = UserActivity.query.filter_by(user_id=user.id).all()
+    assert len(activities) == 3
+    assert json.loads(activities[0].activity_data) == {'i': 0}
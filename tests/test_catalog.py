@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Vehicle catalog tests for CarHub
+Checks that car_details, buy_car and inventory all serve from the Car table
+"""
+
+
+def test_catalog_reads_car_table(app_ctx, add_car):
+    from app import catalog
+    add_car(engine='V8', year='2024', model_file='test.glb')
+
+    entry = catalog.get('TEST-CAR')
+    assert entry['name'] == 'Test Car'
+    assert entry['price'] == '$50,000'
+    assert entry['price_value'] == 50000
+    assert entry['features'] == ('Feature A', 'Feature B')
+    assert entry['model'] == 'test.glb'
+    assert catalog.get('missing-car') is None
+
+
+def test_catalog_entries_are_read_only(app_ctx, add_car):
+    from app import catalog
+    add_car()
+
+    entry = catalog.get('test-car')
+    try:
+        entry['price'] = '$1'
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("catalog entries should be immutable")
+
+
+def test_catalog_invalidated_on_commit(app_ctx, add_car):
+    from app import db, Car, catalog
+    car = add_car()
+    assert catalog.get('test-car')['price_value'] == 50000
+
+    car.price = 75000
+    db.session.commit()
+    assert catalog.get('test-car')['price_value'] == 75000
+
+    Car.query.filter_by(slug='test-car').delete()
+    db.session.commit()
+    assert catalog.get('test-car') is None
+
+
+def test_snapshot_reused_between_reads(app_ctx, add_car):
+    from app import catalog
+    add_car()
+    assert catalog.all() is catalog.all()
+
+
+def test_routes_serve_from_catalog(app_ctx, add_car):
+    add_car(name='Route Car', slug='route-car', model_file='route.glb')
+    client = app_ctx.test_client()
+
+    response = client.get('/car-details/route-car')
+    assert response.status_code == 200
+    assert b'Route Car' in response.data
+
+    response = client.get('/car-details/unknown-car')
+    assert response.status_code == 404
+
+    response = client.get('/inventory')
+    assert response.status_code == 200
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Chatbot response cache tests for CarHub
+Checks keys, expiry, persistence and which turns may be served from cache
+"""
+
+import time
+
+from chat_cache import ChatResponseCache, normalize_message
+
+
+def test_normalized_messages_share_a_key():
+    assert normalize_message('  What ELECTRIC cars do you have?? ') == 'what electric cars do you have'
+    key = ChatResponseCache.key('Financing options?', 'financing_inquiry', 'p1')
+    assert key == ChatResponseCache.key('financing   OPTIONS', 'financing_inquiry', 'p1')
+    assert key != ChatResponseCache.key('financing options', 'general_inquiry', 'p1')
+    assert key != ChatResponseCache.key('financing options', 'financing_inquiry', 'p2')
+
+
+def test_lru_eviction_and_ttl():
+    cache = ChatResponseCache(max_entries=2, ttl=60)
+    cache.put('a', {'message': 'A'}, 100)
+    cache.put('b', {'message': 'B'}, 100)
+    assert cache.get('a')['message'] == 'A'  # 'a' is now most recent
+    cache.put('c', {'message': 'C'}, 100)
+    assert cache.get('b') is None and cache.get('a') and cache.get('c')
+
+    cache.ttl = -1
+    cache.put('d', {'message': 'D'}, 100)
+    assert cache.get('d') is None
+
+    stats = cache.stats()
+    assert stats['hits'] == 3 and stats['misses'] == 2 and stats['hit_ratio'] == 0.6
+    assert stats['saved_ms'] == 300
+
+
+def test_sqlite_file_warms_a_new_instance(tmp_path):
+    path = str(tmp_path / 'chat_cache.db')
+    ChatResponseCache(path=path).put('k', {'message': 'Stored', 'metadata': {'intent': 'x'}}, 850)
+
+    fresh = ChatResponseCache(path=path)
+    assert fresh.get('k') == {'message': 'Stored', 'metadata': {'intent': 'x'}}
+    assert fresh.stats()['avg_saved_ms'] == 850
+
+    fresh.clear()
+    assert ChatResponseCache(path=path).get('k') is None
+
+
+def test_repeat_questions_skip_the_llm(chatbot, fake_openai):
+    fake_openai.delay = 0.05
+
+    first = chatbot.get_chat_response('What electric cars do you have?')
+    started = time.perf_counter()
+    second = chatbot.get_chat_response('what electric cars do you have')
+    assert time.perf_counter() - started < 0.05
+
+    assert len(fake_openai.requests) == 1
+    assert second['message'] == first['message'] and second['cached'] and 'cached' not in first
+
+    # Streaming turns share the same entries
+    events = list(chatbot.stream_chat_response('What electric cars do you have'))
+    assert [event for event, _ in events] == ['token', 'done'] and events[-1][1]['cached']
+    assert len(fake_openai.requests) == 1
+
+    stats = chatbot.response_cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 1 and stats['saved_ms'] > 0
+
+
+def test_personalized_and_follow_up_turns_bypass_the_cache(chatbot, fake_openai):
+    chatbot.get_chat_response('Financing options?')
+    chatbot.get_chat_response('Financing options?', user_context={'username': 'jane'})
+    chatbot.get_chat_response('Financing options?', conversation_history=[
+        {'role': 'user', 'content': 'I earn 50k'}, {'role': 'assistant', 'content': 'Noted'}])
+    list(chatbot.stream_chat_response('Financing options?', user_context={'username': 'jane'}))
+
+    assert len(fake_openai.requests) == 4
+    assert chatbot.response_cache.stats()['bypassed'] == 3
+
+
+def test_failed_and_fallback_replies_are_not_cached(chatbot, fake_openai):
+    fake_openai.fail = True
+    assert chatbot.get_chat_response('Financing options?')['fallback']
+    fake_openai.fail = False
+    assert 'cached' not in chatbot.get_chat_response('Financing options?')
+    assert len(fake_openai.requests) == 2
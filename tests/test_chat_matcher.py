@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Chat matcher tests for CarHub
+Checks whole-word matching, inflections, priorities and the chatbot metadata built on it
+"""
+
+from chat_matcher import ChatMatcher
+from chatbot import CarHubChatbot, FALLBACK_TOPIC_KEYWORDS, INTENT_KEYWORDS
+
+
+def _matcher():
+    return ChatMatcher(
+        intents=INTENT_KEYWORDS,
+        topics=FALLBACK_TOPIC_KEYWORDS,
+        cars=[('Tesla Model 3', 'Tesla Model 3'), ('BMW M2 G87', 'BMW M2 G87')],
+        services=[('car_buying', 'car buying')],
+        followup=['contact', 'more information'],
+    )
+
+
+def test_keywords_only_match_whole_words():
+    matcher = _matcher()
+    # "hi" in "this", "ev" in "every", "call" in "recall", "old" in "bold"
+    assert matcher.match('This is every recall on the bold new range')['topic'] is None
+    assert matcher.match('Hi!')['topic'] == 'greeting'
+    assert matcher.match('Tell me about the Tesla')['topic'] == 'electric'
+
+
+def test_inflections_and_multi_word_phrases():
+    matcher = _matcher()
+    assert matcher.match('I am buying my first car')['intent'] == 'buying_intent'
+    assert matcher.match('Trade-in values?')['intent'] == 'selling_intent'
+    assert matcher.match('HOW   much\nis it')['intent'] == 'pricing_inquiry'
+    assert matcher.match('Please contact us for more\ninformation')['followup'] is True
+    assert matcher.match('A contactless payment')['followup'] is False
+
+
+def test_first_label_wins_but_all_are_reported():
+    result = _matcher().match('I want to sell my car and buy a new one, what is the price?')
+    assert result['intent'] == 'buying_intent'
+    assert result['intents'] == ['buying_intent', 'selling_intent', 'pricing_inquiry']
+    assert result['topic'] == 'buying'
+    assert _matcher().match('Nothing relevant')['intent'] == 'general_inquiry'
+
+
+def test_cars_services_and_kind_filter():
+    matcher = _matcher()
+    text = 'The bmw m2 g87 and the Tesla Model 3 are great. Our car buying team can help.'
+    result = matcher.match(text)
+    assert result['cars'] == ['Tesla Model 3', 'BMW M2 G87']
+    assert result['services'] == ['car_buying']
+
+    only_cars = matcher.match(text, ('car',))
+    assert only_cars['cars'] == ['Tesla Model 3', 'BMW M2 G87']
+    assert only_cars['services'] == [] and only_cars['intent'] == 'general_inquiry'
+    # Tesla Model 35 is not the Tesla Model 3
+    assert matcher.match('The Tesla Model 35 concept', ('car',))['cars'] == []
+
+
+def test_chatbot_metadata_uses_the_matcher():
+    chatbot = CarHubChatbot(None, None, None, None)
+    metadata = chatbot._analyze_response(
+        'The Tesla Model 3 is in stock. Please contact a specialist about car servicing.',
+        'What does it cost?'
+    )
+    assert metadata == {
+        'intent': 'pricing_inquiry',
+        'mentioned_cars': ['Tesla Model 3'],
+        'mentioned_services': ['car_servicing'],
+        'requires_followup': True,
+    }
+    assert 'Welcome to CarHub' in chatbot._get_fallback_response('hey there')['message']
+    assert 'Welcome to CarHub' not in chatbot._get_fallback_response('Is this every model?')['message']
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Streaming chat tests for CarHub
+Runs /api/chat against a local fake OpenAI-compatible server
+"""
+
+import json
+import time
+
+
+def _events(data):
+    events = []
+    for block in data.decode().strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_stream_yields_tokens_then_metadata(chatbot, fake_openai):
+    events = list(chatbot.stream_chat_response('I want to buy a car, what service do you offer?'))
+
+    assert [payload for event, payload in events if event == 'token'] == fake_openai.reply
+    event, response = events[-1]
+    assert event == 'done'
+    assert response['message'] == 'Hello from the CarHub service team'
+    assert response['metadata']['intent'] == 'buying_intent'
+    assert fake_openai.requests[0]['stream'] is True
+
+
+def test_chat_endpoint_streams_server_sent_events(app_ctx, chatbot, fake_openai):
+    fake_openai.delay = 0.15
+    client = app_ctx.test_client()
+
+    started = time.perf_counter()
+    response = client.post('/api/chat', json={'message': 'Hi', 'stream': True}, buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    first = next(chunks)
+    first_token_at = time.perf_counter() - started
+    rest = b''.join(chunks)
+    total = time.perf_counter() - started
+
+    assert first.startswith(b'event: token')
+    assert first_token_at < total / 2
+    events = _events(first + rest)
+    assert ''.join(payload['content'] for event, payload in events if event == 'token') == 'Hello from the CarHub service team'
+    assert events[-1][0] == 'done' and events[-1][1]['success']
+
+
+def test_event_stream_accept_header_and_plain_json(app_ctx, chatbot):
+    client = app_ctx.test_client()
+
+    response = client.post('/api/chat', json={'message': 'Hi'}, headers={'Accept': 'text/event-stream'})
+    assert response.mimetype == 'text/event-stream'
+
+    response = client.post('/api/chat', json={'message': 'Hi'})
+    assert response.is_json and response.get_json()['message'] == 'Hello from the CarHub service team'
+
+
+def test_upstream_failure_falls_back_to_knowledge_base(chatbot, fake_openai):
+    fake_openai.fail = True
+    events = list(chatbot.stream_chat_response('What financing options do you have?'))
+
+    assert [event for event, _ in events] == ['token', 'done']
+    assert events[-1][1]['fallback'] is True
+    assert events[0][1] == events[-1][1]['message']
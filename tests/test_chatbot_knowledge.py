@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Chatbot knowledge base tests for CarHub
+Checks that the inventory in the system prompt follows the Car table
+"""
+
+
+
+def test_inventory_comes_from_car_table(chatbot, fake_openai, add_car):
+    add_car(slug='mclaren-720s', name='McLaren 720S', price=300000, status='Reserved')
+
+    response = chatbot.get_chat_response('Is the McLaren 720S available?')
+
+    assert chatbot.knowledge_base['current_inventory'] == [
+        {'name': 'McLaren 720S', 'price': '$300,000', 'category': 'sports', 'status': 'reserved'}]
+    prompt = fake_openai.requests[0]['messages'][0]['content']
+    assert prompt == chatbot.system_prompt
+    assert '["McLaren 720S","$300,000","sports","reserved"]' in prompt
+    assert 'Lamborghini Revuelto' not in prompt.split('CURRENT INVENTORY')[1]
+    assert '\n  ' not in prompt  # no pretty-printed JSON
+    assert chatbot.matcher.match('The McLaren 720S is reserved')['cars'] == ['McLaren 720S']
+    assert response['success']
+
+
+def test_prompt_rebuilt_only_when_the_catalog_changes(chatbot, fake_openai, add_car):
+    from app import db
+    car = add_car(slug='tesla-model-3', name='Tesla Model 3', price=45000)
+
+    chatbot.refresh_knowledge()
+    prompt, prompt_hash = chatbot.system_prompt, chatbot.system_prompt_hash
+    assert chatbot.refresh_knowledge() is False
+    chatbot.get_chat_response('What electric cars do you have?')
+    assert chatbot.system_prompt is prompt
+
+    car.price = 39000
+    db.session.commit()
+    chatbot.get_chat_response('What electric cars do you have?')
+
+    assert '"$39,000"' in chatbot.system_prompt
+    assert chatbot.system_prompt_hash != prompt_hash
+    # The reply cached under the old prompt is not reused
+    assert len(fake_openai.requests) == 2
+    assert fake_openai.requests[1]['messages'][0]['content'] == chatbot.system_prompt
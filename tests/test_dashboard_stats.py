@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Admin dashboard statistics tests for CarHub
+Checks the SQL aggregates and that commits update the cached snapshot in place
+"""
+
+from datetime import datetime, timedelta
+
+
+def _car():
+    from app import db, Car
+    car = Car(name='Test GT', slug='test-gt', price=100.0, category='sports')
+    db.session.add(car)
+    db.session.commit()
+    return car
+
+
+def _order(user, status, amount, created_at=None):
+    from app import Car, Order
+    car = Car.query.filter_by(slug='test-gt').first() or _car()
+    return Order(user_id=user.id, car_id=car.id, total_amount=amount, payment_method='paypal', payment_status=status,
+                 billing_name='Buyer', billing_email='buyer@example.com', billing_phone='555-0100',
+                 billing_address='1 Test Street', created_at=created_at or datetime.utcnow())
+
+
+def _fresh_stats():
+    from app import dashboard_stats
+    dashboard_stats.invalidate()
+    return dashboard_stats
+
+
+def test_aggregates_match_rows(app_ctx):
+    from app import db, User, FinanceApplication
+    old_user = User(username='old', email='old@example.com', created_at=datetime.utcnow() - timedelta(days=30))
+    new_user = User(username='new', email='new@example.com')
+    db.session.add_all([old_user, new_user])
+    db.session.commit()
+    db.session.add_all([
+        _order(new_user, 'completed', 100.0),
+        _order(new_user, 'completed', 250.0, created_at=datetime.utcnow() - timedelta(days=1)),
+        _order(new_user, 'failed', 999.0),
+        FinanceApplication(user_id=new_user.id, car_name='Test GT', car_price='$1', full_name='Buyer',
+                           email='buyer@example.com', phone='1', annual_income='1', employment_status='employed',
+                           address='1 Test Street', selected_plan='36 months'),
+    ])
+    db.session.commit()
+
+    stats = _fresh_stats().snapshot()
+    assert stats['total_users'] == 2
+    assert stats['new_users_this_week'] == 1
+    assert stats['total_orders'] == 3
+    assert stats['total_finance_apps'] == 1
+    assert stats['total_revenue'] == 350.0
+    assert stats['orders_by_status'] == {'completed': 2, 'failed': 1}
+
+    today = datetime.utcnow().strftime('%Y-%m-%d')
+    assert stats['orders_by_day'][-1] == {'day': today, 'orders': 2, 'revenue': 100.0}
+    assert stats['orders_by_day'][-2]['revenue'] == 250.0
+
+
+def test_commits_update_snapshot_without_requery(app_ctx):
+    from app import db, User, Order
+    user = User(username='buyer', email='buyer@example.com')
+    db.session.add(user)
+    db.session.commit()
+
+    stats = _fresh_stats()
+    stats.snapshot()
+    refreshes = stats.refreshes
+
+    order = _order(user, 'pending', 500.0)
+    db.session.add(order)
+    db.session.add(User(username='second', email='second@example.com'))
+    db.session.commit()
+
+    order = db.session.get(Order, order.id)
+    order.payment_status = 'completed'
+    db.session.commit()
+
+    snapshot = stats.snapshot()
+    assert stats.refreshes == refreshes
+    assert snapshot['total_users'] == 2
+    assert snapshot['new_users_this_week'] == 2
+    assert snapshot['total_orders'] == 1
+    assert snapshot['total_revenue'] == 500.0
+    assert snapshot['orders_by_status'] == {'completed': 1}
+    assert snapshot['orders_by_day'][-1]['revenue'] == 500.0
+
+
+def test_bulk_update_and_rollback(app_ctx):
+    from app import db, User, Order
+    user = User(username='buyer', email='buyer@example.com')
+    db.session.add(user)
+    db.session.commit()
+    db.session.add(_order(user, 'completed', 100.0))
+    db.session.commit()
+
+    stats = _fresh_stats()
+    stats.snapshot()
+
+    # Rolled-back writes are never applied
+    db.session.add(_order(user, 'completed', 900.0))
+    db.session.flush()
+    db.session.rollback()
+    assert stats.snapshot()['total_revenue'] == 100.0
+
+    # Bulk updates can't be applied as a delta, so the snapshot is recomputed
+    refreshes = stats.refreshes
+    Order.query.update({Order.payment_status: 'failed'})
+    db.session.commit()
+    snapshot = stats.snapshot()
+    assert stats.refreshes == refreshes + 1
+    assert snapshot['total_revenue'] == 0
+    assert snapshot['orders_by_status'] == {'failed': 1}
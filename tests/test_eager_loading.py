@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Eager loading tests for CarHub
+Checks that order and user pages run the same number of queries however many rows they render
+"""
+
+import pytest
+
+
+@pytest.fixture
+def add_orders(add_car):
+    """add_orders(count, owner_id, offset): orders each for its own car and (without `owner_id`) its own customer"""
+    from app import db, Order, User
+
+    def add(count, owner_id=None, offset=0):
+        for i in range(offset, offset + count):
+            car = add_car(f'eager-car-{i}', 50000 + i, name=f'Eager Car {i}')
+            user_id = owner_id
+            if user_id is None:
+                user = User(username=f'buyer{i}', email=f'buyer{i}@example.com')
+                db.session.add(user)
+                db.session.flush()
+                user_id = user.id
+            db.session.add(Order(user_id=user_id, car_id=car.id, total_amount=car.price,
+                                 billing_name='Dana Reyes', billing_email='dana@example.com',
+                                 billing_phone='555-0100', billing_address='1 Pit Lane', payment_method='credit_card'))
+        db.session.commit()
+    return add
+
+
+@pytest.fixture
+def page_queries(query_counter, new_request):
+    """page_queries(client, path, (marker, count)): statements run to render a page showing `count` markers"""
+    def fetch(client, path, expected):
+        new_request()
+        response = client.get(path)
+        assert response.status_code == 200 and response.data.count(expected[0]) == expected[1]
+        return query_counter.last
+    return fetch
+
+
+def test_my_orders_queries_do_not_grow_with_orders(login, add_orders, page_queries):
+    client, user_id = login()
+    client.get('/cars')
+
+    add_orders(2, owner_id=user_id)
+    few = page_queries(client, '/my-orders', (b'Eager Car ', 2))
+    add_orders(6, owner_id=user_id, offset=2)
+    assert page_queries(client, '/my-orders', (b'Eager Car ', 8)) == few
+
+
+def test_admin_orders_queries_do_not_grow_with_orders(login, add_orders, page_queries):
+    client, _ = login(email='admin@carhub.com', username='admin')
+    client.get('/cars')
+
+    add_orders(2)
+    few = page_queries(client, '/admin/orders', (b'@buyer', 2))
+    add_orders(10, offset=2)
+    assert page_queries(client, '/admin/orders', (b'@buyer', 12)) == few
+
+
+def test_admin_user_pages_queries_do_not_grow_with_rows(login, add_orders, page_queries):
+    client, _ = login(email='admin@carhub.com', username='admin')
+    client.get('/cars')
+
+    add_orders(2)
+    few = page_queries(client, '/admin/users', (b'1 orders', 2))
+    add_orders(6, offset=2)
+    assert page_queries(client, '/admin/users', (b'1 orders', 8)) == few
+
+    from app import User
+    owner_id = User.query.filter_by(username='buyer0').one().id
+    few = page_queries(client, f'/admin/user/{owner_id}', (b'Eager Car ', 1))
+    add_orders(5, owner_id=owner_id, offset=8)
+    assert page_queries(client, f'/admin/user/{owner_id}', (b'Eager Car ', 6)) == few
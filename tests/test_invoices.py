@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Invoice rendering tests for CarHub
+Checks the renderer output, the on-disk PDF cache and the download route
+"""
+
+import csv
+import io
+import os
+import subprocess
+import sys
+import zipfile
+from datetime import datetime, timedelta
+
+from invoices import InvoiceCache, export_invoices_zip, get_invoice_renderer, invoice_data, invoice_number
+
+STATIC_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'static')
+
+
+def _data(payment_status='paid', updated_at=None, order_id=42):
+    created = datetime(2025, 3, 14, 10, 30)
+    return {
+        'id': order_id,
+        'created_at': created,
+        'updated_at': updated_at or created,
+        'billing_name': 'Test Buyer',
+        'billing_email': 'buyer@example.com',
+        'billing_phone': None,
+        'billing_address': '1 Test Street',
+        'transaction_id': 'CC_abc',
+        'payment_method': 'credit_card',
+        'payment_status': payment_status,
+        'total_amount': 55000.0,
+        'car': {
+            'name': 'Test GT', 'price': 50000.0, 'year': '2024', 'engine': 'V8',
+            'transmission': '8-speed', 'color': None, 'updated_at': created,
+        },
+    }
+
+
+def test_renderer_produces_pdf():
+    renderer = get_invoice_renderer(STATIC_FOLDER)
+    assert get_invoice_renderer(STATIC_FOLDER) is renderer
+
+    for status in ('paid', 'pending'):
+        pdf = renderer.render(_data(payment_status=status))
+        assert pdf.startswith(b'%PDF')
+        # Static decoration is stored once as a form XObject
+        assert b'/FormXob' in pdf
+
+    assert invoice_number(_data()) == 'INV-42-20250314'
+
+
+def test_cache_hits_and_invalidates(tmp_path):
+    cache = InvoiceCache(str(tmp_path))
+    calls = []
+
+    def render(data):
+        calls.append(data['id'])
+        return b'%PDF-fake'
+
+    data = _data()
+    path, key, hit = cache.get_or_render(data, render)
+    assert not hit and os.path.exists(path)
+
+    path_again, key_again, hit = cache.get_or_render(data, render)
+    assert hit and key_again == key and path_again == path
+    assert calls == [42]
+
+    # An updated order gets a new key and the stale render is removed
+    changed = _data(updated_at=data['updated_at'] + timedelta(minutes=5))
+    new_path, new_key, hit = cache.get_or_render(changed, render)
+    assert not hit and new_key != key
+    assert not os.path.exists(path) and os.path.exists(new_path)
+
+
+def test_export_zip_renders_in_pool(tmp_path):
+    cache = InvoiceCache(str(tmp_path))
+    datas = [_data(order_id=i) for i in range(1, 6)]
+    # Order 1 is already cached and must not be re-rendered
+    cache.store(datas[0], cache.key(datas[0]), b'%PDF-cached')
+
+    chunks = list(export_invoices_zip(datas, STATIC_FOLDER, max_workers=2, cache=cache))
+    assert len(chunks) > 1
+
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+    names = archive.namelist()
+    assert names == [f'carhub_invoice_{i}.pdf' for i in range(1, 6)] + ['manifest.csv']
+    assert archive.read('carhub_invoice_1.pdf') == b'%PDF-cached'
+    assert archive.read('carhub_invoice_5.pdf').startswith(b'%PDF')
+
+    manifest = list(csv.DictReader(io.StringIO(archive.read('manifest.csv').decode('utf-8'))))
+    assert [row['cached'] for row in manifest] == ['yes', 'no', 'no', 'no', 'no']
+    assert all(float(row['render_ms']) > 0 for row in manifest[1:])
+
+    # Fresh renders were stored in the cache
+    assert os.path.exists(cache.path(datas[4]))
+
+
+def test_export_zip_rerenders_a_cached_pdf_pruned_mid_export(tmp_path):
+    cache = InvoiceCache(str(tmp_path))
+    datas = [_data(order_id=i) for i in range(1, 3)]
+    cache.store(datas[0], cache.key(datas[0]), b'%PDF-cached')
+
+    def prune_after_lookup():
+        yield datas[0]
+        os.remove(cache.path(datas[0]))  # found by the lookup, gone before it is read
+        yield datas[1]
+
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(
+        export_invoices_zip(prune_after_lookup(), STATIC_FOLDER, max_workers=1, cache=cache))))
+    assert archive.read('carhub_invoice_1.pdf').startswith(b'%PDF-1')
+    manifest = list(csv.DictReader(io.StringIO(archive.read('manifest.csv').decode('utf-8'))))
+    assert [(row['cached'], row['error']) for row in manifest] == [('no', ''), ('no', '')]
+
+
+def _buyer_with_order(app_ctx):
+    """A logged-in test client and a completed order of theirs"""
+    from app import db, User, Car, Order
+    user = User(username='buyer', email='buyer@example.com', first_name='Test', last_name='Buyer')
+    user.set_password('secret123')
+    car = Car(name='Test GT', slug='test-gt', price=50000.0, category='sports')
+    db.session.add_all([user, car])
+    db.session.commit()
+    order = Order(user_id=user.id, car_id=car.id, total_amount=55000.0, payment_method='credit_card',
+                  payment_status='completed', billing_name='Test Buyer', billing_email='buyer@example.com',
+                  billing_phone='555-0100', billing_address='1 Test Street', transaction_id='CC_abc')
+    db.session.add(order)
+    db.session.commit()
+
+    client = app_ctx.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user.id)
+        sess['_fresh'] = True
+    return client, order
+
+
+def test_download_invoice_route_uses_etag(app_ctx, tmp_path):
+    from app import invoice_cache
+    invoice_cache.cache_dir = str(tmp_path)
+    client, order = _buyer_with_order(app_ctx)
+    assert invoice_data(order)['car']['name'] == 'Test GT'
+
+    response = client.get(f'/download-invoice/{order.id}')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/pdf'
+    assert response.data.startswith(b'%PDF')
+    etag = response.headers['ETag']
+
+    cached = client.get(f'/download-invoice/{order.id}', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+
+
+def test_renderer_failure_redirects_with_a_message(app_ctx, monkeypatch):
+    import app as carhub
+
+    def broken(static_folder):
+        raise ImportError('reportlab is broken')
+
+    monkeypatch.setattr(carhub, 'get_invoice_renderer', broken)
+    client, order = _buyer_with_order(app_ctx)
+    response = client.get(f'/download-invoice/{order.id}')
+    assert response.status_code == 302 and response.location.endswith('/my-orders')
+
+
+WORKER_PROBE = """
+import atexit, os, sys
+if 'spawn_main' in ' '.join(sys.orig_argv):  # a render process
+    atexit.register(lambda: open(os.environ['CARHUB_WORKER_PROBE'], 'a').write(f"{'app' in sys.modules}\\n"))
+"""
+
+
+def test_export_script_workers_never_import_the_app(tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app import db, User, Car, Order
+
+    # A database file the export script can open from its own process
+    engine = create_engine(f"sqlite:///{tmp_path / 'shop.db'}")
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(username='buyer', email='buyer@example.com')
+        car = Car(name='Test GT', slug='test-gt', price=50000.0, category='sports')
+        session.add_all([user, car])
+        session.flush()
+        session.add(Order(user_id=user.id, car_id=car.id, total_amount=55000.0, payment_method='credit_card',
+                          payment_status='completed', billing_name='Test Buyer', billing_email='buyer@example.com',
+                          billing_phone='555-0100', billing_address='1 Test Street'))
+        session.commit()
+    engine.dispose()
+
+    # Every process the script starts reports, on exit, whether it had loaded the app
+    (tmp_path / 'sitecustomize.py').write_text(WORKER_PROBE)
+    probe = tmp_path / 'probe.txt'
+    env = dict(os.environ, PYTHONPATH=str(tmp_path), CARHUB_WORKER_PROBE=str(probe),
+               DATABASE_URL=f"sqlite:///{tmp_path / 'shop.db'}", INVOICE_CACHE_PATH=str(tmp_path / 'cache'),
+               MAIL_SPOOL_PATH=str(tmp_path / 'mail'), CATALOG_STAMP_PATH=str(tmp_path / 'catalog.stamp'),
+               SQL_SLOW_LOG_PATH=str(tmp_path / 'slow.log'))
+    output = tmp_path / 'invoices.zip'
+    result = subprocess.run([sys.executable, 'export_invoices.py', '-w', '2', '-o', str(output)],
+                            cwd=os.path.join(os.path.dirname(__file__), '..'), env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    with zipfile.ZipFile(output) as archive:
+        assert any(name.endswith('.pdf') for name in archive.namelist())
+    reports = probe.read_text().split()
+    assert reports and set(reports) == {'False'}
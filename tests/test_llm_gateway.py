@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+LLM gateway tests for CarHub
+Checks the circuit breaker, deadlines and concurrency cap against a local fake provider
+"""
+
+import threading
+import time
+
+from llm_gateway import LatencyHistogram, LLMGateway
+
+
+def _gateway(chatbot, monkeypatch, **options):
+    gateway = LLMGateway(chatbot.client, **options)
+    monkeypatch.setattr(chatbot, 'llm', gateway)
+    return gateway
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = LatencyHistogram(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.05, 0.5, 3.0):
+        histogram.observe(seconds)
+
+    snapshot = histogram.snapshot()
+    assert snapshot['buckets'] == {'0.1': 2, '1.0': 1, '+Inf': 1}
+    assert snapshot['count'] == 4 and snapshot['sum_seconds'] == 3.6
+    assert snapshot['p50_seconds'] == 0.1 and snapshot['p95_seconds'] is None  # beyond the last bound
+
+
+def test_breaker_opens_after_failures_and_recovers(chatbot, fake_openai, monkeypatch):
+    gateway = _gateway(chatbot, monkeypatch, failure_threshold=2, reset_timeout=0.2)
+    fake_openai.fail = True
+
+    for _ in range(3):
+        assert chatbot.get_chat_response('Financing options?')['fallback']
+    assert len(fake_openai.requests) == 2  # the third call never left the process
+    stats = gateway.stats()
+    assert stats['circuit'] == 'open' and stats['rejected_open'] == 1 and stats['circuit_trips'] == 1
+
+    # Streamed turns are refused the same way
+    events = list(chatbot.stream_chat_response('Financing options?'))
+    assert events[-1][1]['fallback'] and len(fake_openai.requests) == 2
+
+    fake_openai.fail = False
+    time.sleep(0.25)
+    assert gateway.stats()['circuit'] == 'half_open'
+    assert chatbot.get_chat_response('Financing options?')['message'] == 'Hello from the CarHub service team'
+    assert gateway.stats()['circuit'] == 'closed'
+
+
+def test_deadlines_bound_a_slow_provider(chatbot, fake_openai, monkeypatch):
+    gateway = _gateway(chatbot, monkeypatch, timeout=0.3)
+
+    fake_openai.delay = 1.0
+    started = time.perf_counter()
+    assert chatbot.get_chat_response('Hi')['fallback']
+    assert time.perf_counter() - started < 0.9
+
+    # A stream that keeps trickling is cut off at the deadline with what arrived so far
+    fake_openai.delay = 0.2
+    started = time.perf_counter()
+    response = list(chatbot.stream_chat_response('Hi'))[-1][1]
+    assert time.perf_counter() - started < 0.9
+    assert response['incomplete'] and response['message'].startswith('Hello')
+
+    stats = gateway.stats()
+    assert stats['timeouts'] == 2 and stats['in_flight'] == 0
+    assert stats['first_token']['count'] == 1 and stats['latency']['count'] == 2
+
+
+def test_concurrency_cap_turns_excess_calls_away(chatbot, fake_openai, monkeypatch):
+    gateway = _gateway(chatbot, monkeypatch, max_concurrency=1, queue_timeout=0.05)
+    fake_openai.delay = 0.1
+
+    slow = threading.Thread(target=lambda: list(gateway.stream(
+        model='gpt-3.5-turbo', messages=[{'role': 'user', 'content': 'Hi'}])))
+    slow.start()
+    time.sleep(0.05)
+    assert gateway.stats()['in_flight'] == 1
+
+    assert chatbot.get_chat_response('What cars do you sell?')['fallback']
+    slow.join()
+
+    stats = gateway.stats()
+    assert stats['rejected_busy'] == 1 and stats['in_flight'] == 0 and stats['calls'] == 1
+    assert len(fake_openai.requests) == 1
+
+
+def test_client_is_built_on_first_completion(fake_openai):
+    import openai
+    built = []
+
+    def factory():
+        built.append(openai.OpenAI(api_key='test-key', base_url=fake_openai.url, max_retries=0))
+        return built[-1]
+
+    gateway = LLMGateway(client_factory=factory)
+    assert built == []
+    for _ in range(2):
+        gateway.complete(model='gpt-3.5-turbo', messages=[{'role': 'user', 'content': 'Hi'}])
+    assert len(built) == 1 and gateway.client is built[0]
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Outbound mail queue tests for CarHub
+Delivers spooled messages to a local aiosmtpd server
+"""
+
+import os
+import socket
+import time
+
+import pytest
+
+from mail_queue import MailQueue, MailSpool, SMTPConnectionPool, SMTPTransport
+
+aiosmtpd = pytest.importorskip('aiosmtpd.controller')
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.responses = []  # replies to use (in order) instead of accepting
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.responses:
+            return self.responses.pop(0)
+        self.messages.append(envelope)
+        return '250 Message accepted'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = aiosmtpd.Controller(handler, hostname='127.0.0.1', port=_free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+@pytest.fixture
+def make_queue(smtp_server, tmp_path):
+    controller, _ = smtp_server
+    queues = []
+
+    def make(**options):
+        pool = SMTPConnectionPool(controller.hostname, controller.port, size=options.pop('size', 1))
+        queue = MailQueue(MailSpool(str(tmp_path / 'spool')), SMTPTransport(pool), **options)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop()
+
+
+def _raw(subject):
+    return f"From: shop@carhub.com\r\nTo: jane@example.com\r\nSubject: {subject}\r\n\r\nHello\r\n"
+
+
+def test_messages_share_one_pooled_connection(smtp_server, make_queue):
+    _, handler = smtp_server
+    queue = make_queue(workers=1)
+    for i in range(5):
+        queue.enqueue('shop@carhub.com', ['jane@example.com'], _raw(f'Message {i}'))
+    assert queue.flush()
+
+    assert len(handler.messages) == 5
+    assert handler.messages[0].rcpt_tos == ['jane@example.com']
+    stats = queue.stats()
+    assert stats['sent'] == 5 and stats['queue_depth'] == 0
+    assert stats['smtp_connects'] == 1
+    assert stats['delivery_latency_ms']['count'] == 5 and stats['smtp_send_ms']['p95'] is not None
+
+
+def test_temporary_failures_are_retried_and_permanent_ones_parked(smtp_server, make_queue):
+    _, handler = smtp_server
+    queue = make_queue(workers=1, retry_delay=0, max_attempts=3)
+
+    handler.responses = ['451 Try again later']
+    queue.enqueue('shop@carhub.com', ['jane@example.com'], _raw('Retried'))
+    assert queue.flush()
+    assert [m.content.count(b'Retried') for m in handler.messages] == [1]
+
+    handler.responses = ['550 No such user']
+    queue.enqueue('shop@carhub.com', ['ghost@example.com'], _raw('Rejected'))
+    assert queue.flush()
+
+    stats = queue.stats()
+    assert stats['retried'] == 1 and stats['failed'] == 1 and stats['failed_total'] == 1
+    assert '550' in stats['last_error']
+    assert len(handler.messages) == 1
+
+
+def test_reset_codes_do_not_stay_on_disk(smtp_server, make_queue, tmp_path):
+    _, handler = smtp_server
+    queue = make_queue(workers=1)
+    spool_dir = tmp_path / 'spool'
+
+    def raw_with_code(code):
+        return _raw('Password Reset Request - CarHub').replace('Hello', f'Your code is {code}')
+
+    queue.spool.put({'id': 'waiting', 'sender': 'shop@carhub.com', 'recipients': ['jane@example.com'],
+                     'raw': raw_with_code('111111'), 'attempts': 0, 'enqueued_at': time.time(),
+                     'next_attempt_at': time.time() + 3600, 'last_error': None})
+    assert all(oct(path.stat().st_mode & 0o777) == '0o600' for path in spool_dir.glob('*.json'))
+    assert oct(os.stat(queue.spool.failed_directory).st_mode & 0o777) == '0o700'
+    for path in spool_dir.glob('*.json'):
+        path.unlink()
+
+    queue.enqueue('shop@carhub.com', ['jane@example.com'], raw_with_code('482913'))
+    assert queue.flush()
+    handler.responses = ['550 No such user']
+    queue.enqueue('shop@carhub.com', ['ghost@example.com'], raw_with_code('739150'))
+    assert queue.flush()
+    assert b'482913' in handler.messages[0].content
+
+    files = [path for path in spool_dir.rglob('*') if path.is_file()]
+    assert [path.parent.name for path in files] == ['failed']
+    parked = files[0].read_text()
+    assert '739150' not in parked and '482913' not in parked
+    assert 'Password Reset Request' in parked and '550' in parked  # enough left to see what failed
+    assert oct(files[0].stat().st_mode & 0o777) == '0o600'
+
+    # Parked messages are deleted once they outlive the retention period
+    assert queue.spool.prune_failed() == 0
+    assert queue.spool.prune_failed(now=time.time() + queue.spool.failed_retention + 1) == 1
+    assert queue.stats()['failed_total'] == 0
+
+
+def test_spooled_messages_survive_a_restart(smtp_server, make_queue, tmp_path):
+    _, handler = smtp_server
+    spool = MailSpool(str(tmp_path / 'spool'))
+    now = time.time()
+    for i in range(3):
+        spool.put({'id': f'left-{i}', 'sender': 'shop@carhub.com', 'recipients': ['jane@example.com'],
+                   'raw': _raw(f'Left {i}'), 'attempts': 0, 'enqueued_at': now,
+                   'next_attempt_at': now, 'last_error': None})
+    # One was mid-send when the old process died
+    claimed_path, _ = spool.claim_due(1)[0]
+    os.utime(claimed_path, (now - 3600, now - 3600))
+
+    queue = make_queue(workers=1)
+    queue.enqueue('shop@carhub.com', ['jane@example.com'], _raw('New'))
+    assert queue.flush()
+    assert len(handler.messages) == 4
+
+
+def test_flask_mail_messages_are_queued_not_sent_inline(app_ctx, monkeypatch):
+    from flask_mail import Message
+    from app import mail_queue, send_email
+
+    delivered = []
+
+    class RecordingTransport:
+        def deliver(self, envelope):
+            delivered.append(envelope)
+
+    monkeypatch.setattr(mail_queue, 'transport', RecordingTransport())
+    assert send_email('Welcome', 'jane@example.com', '<p>Hi Jane</p>')
+    mail_queue.send(Message('Feedback', sender=('CarHub', 'shop@carhub.com'),
+                            recipients=['admin@carhub.com'], html='<p>Great</p>'))
+    assert mail_queue.flush()
+
+    assert [envelope['recipients'] for envelope in delivered] == [['jane@example.com'], ['admin@carhub.com']]
+    assert delivered[1]['sender'] == 'CarHub <shop@carhub.com>'
+    assert 'Subject: Welcome' in delivered[0]['raw']
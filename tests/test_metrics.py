@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Metrics tests for CarHub
+Checks per-thread counters, the Prometheus text format, request timing and the domain counters
+"""
+
+import threading
+
+from metrics import Metrics
+
+
+def _value(metrics, name, *labelvalues):
+    return metrics.values().get((name, labelvalues), 0)
+
+
+def test_counts_from_many_threads_add_up_after_the_threads_end():
+    metrics = Metrics()
+    hits = metrics.counter('hits_total', 'Hits', ('kind',))
+
+    def work():
+        for _ in range(1000):
+            hits.inc('a')
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    del thread, threads
+
+    assert _value(metrics, 'hits_total', 'a') == 8000
+    assert len(metrics._shards) == 0  # every worker's shard was folded into the retired totals
+
+
+def test_render_uses_the_prometheus_text_format():
+    metrics = Metrics()
+    latency = metrics.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(seconds, 'say "hi"')
+    metrics.counter('errors_total', 'Errors')
+    metrics.gauge('depth', 'Queue depth', callback=lambda: 7)
+
+    text = metrics.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="say \\"hi\\"",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{route="say \\"hi\\"",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{route="say \\"hi\\"",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{route="say \\"hi\\""} 3.65' in text
+    assert 'latency_seconds_count{route="say \\"hi\\""} 4' in text
+    assert 'errors_total 0' in text and '# TYPE depth gauge\ndepth 7' in text
+
+
+def test_requests_are_timed_by_endpoint(app_ctx):
+    from app import metrics
+    client = app_ctx.test_client()
+    served = _value(metrics, 'carhub_http_requests_total', 'cars', 'GET', '200')
+    assert client.get('/cars').status_code == 200
+
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert _value(metrics, 'carhub_http_requests_total', 'cars', 'GET', '200') == served + 1
+    assert 'carhub_http_request_duration_seconds_bucket{endpoint="cars",method="GET",le="+Inf"}' in text
+    assert 'carhub_http_requests_in_flight{endpoint="metrics_endpoint"} 1' in text  # the scrape itself
+    assert 'carhub_http_requests_in_flight{endpoint="cars"} 0' in text
+    assert 'carhub_mail_queue_depth ' in text
+
+
+def test_metrics_token_is_required_when_set(app_ctx, monkeypatch):
+    monkeypatch.setitem(app_ctx.config, 'METRICS_TOKEN', 'scrape-me')
+    client = app_ctx.test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-me'}).status_code == 200
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrapé-me'}).status_code == 401
+
+
+def test_metrics_are_local_only_without_a_token(app_ctx):
+    client = app_ctx.test_client()
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_overrides={'REMOTE_ADDR': '::1'}).status_code == 200
+    assert client.get('/metrics', environ_overrides={'REMOTE_ADDR': '203.0.113.7'}).status_code == 401
+    assert client.get('/metrics', headers={'X-Forwarded-For': '203.0.113.7'}).status_code == 401
+
+
+def test_payment_results_are_counted(app_ctx, add_car, login):
+    from app import db, metrics, record_payment_result, Order
+    _, user_id = login()
+    car = add_car('metric-car', 42000)
+    order = Order(user_id=user_id, car_id=car.id, total_amount=car.price, billing_name='Dana',
+                  billing_email='driver@example.com', billing_phone='555-0100', billing_address='1 Pit Lane')
+    db.session.add(order)
+    db.session.commit()
+
+    failed = _value(metrics, 'carhub_payments_total', 'failed')
+    record_payment_result(order, False, 'Card declined')
+    assert _value(metrics, 'carhub_payments_total', 'failed') == failed + 1
+
+
+def test_chatbot_answers_are_counted_by_source(chatbot, fake_openai):
+    from app import metrics
+    before = {source: _value(metrics, 'carhub_chatbot_answers_total', source) for source in ('llm', 'cache', 'fallback')}
+
+    chatbot.get_chat_response('What financing options do you offer?')
+    chatbot.get_chat_response('What financing options do you offer?')
+    fake_openai.fail = True
+    chatbot.get_chat_response('Do you service hybrids?', user_context={'username': 'dana'})
+
+    after = {source: _value(metrics, 'carhub_chatbot_answers_total', source) for source in before}
+    assert after == {'llm': before['llm'] + 1, 'cache': before['cache'] + 1, 'fallback': before['fallback'] + 1}
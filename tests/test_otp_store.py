@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Password reset OTP store tests for CarHub
+Runs the same expiry, single-use and rate-limit checks against the database and memory backends
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from otp_store import DatabaseOTPStore, MemoryOTPStore, OTPRateLimitError
+
+
+@pytest.fixture(params=['database', 'memory'])
+def store(request, app_ctx):
+    from app import db, PasswordResetOTP
+    options = dict(secret_key='test-secret', ttl=600, rate_limit=3, rate_window=900, max_attempts=3)
+    if request.param == 'database':
+        yield DatabaseOTPStore(db, PasswordResetOTP, **options)
+        return
+    store = MemoryOTPStore(sweep_interval=3600, **options)
+    yield store
+    store.stop()
+
+
+def _expire(store, email, window_too=False):
+    """Move an entry's expiry (and optionally its rate-limit window) into the past"""
+    if isinstance(store, MemoryOTPStore):
+        entry = store._entries[email]
+        entry['expires_at'] -= 601
+        if window_too:
+            entry['window_start'] -= 901
+        store._expiry = sorted((store._end_of_life(entry), key) for key, entry in store._entries.items())
+        return
+    from app import db, PasswordResetOTP
+    row = db.session.get(PasswordResetOTP, email)
+    row.expires_at -= timedelta(seconds=601)
+    if window_too:
+        row.window_start -= timedelta(seconds=901)
+    db.session.commit()
+
+
+def test_codes_are_single_use_and_expire(store):
+    store.issue('Jane@Example.com ', '123456')
+    assert not store.verify('jane@example.com', '654321')
+    assert store.verify('jane@example.com', '123456')
+    assert not store.verify('jane@example.com', '123456')
+
+    # A new code replaces the previous one
+    store.issue('jane@example.com', '111111')
+    store.issue('jane@example.com', '222222')
+    assert not store.verify('jane@example.com', '111111')
+    assert store.verify('jane@example.com', '222222')
+
+    assert not store.verify('nobody@example.com', '123456')
+
+
+def test_expired_codes_are_rejected(store):
+    store.issue('jane@example.com', '123456')
+    _expire(store, 'jane@example.com')
+    assert not store.verify('jane@example.com', '123456')
+
+
+def test_wrong_guesses_burn_the_code(store):
+    store.issue('jane@example.com', '123456')
+    for guess in ('000000', '111111', '222222'):
+        assert not store.verify('jane@example.com', guess)
+    assert not store.verify('jane@example.com', '123456')
+
+
+def test_rate_limit_per_email(store):
+    for otp in ('100000', '200000', '300000'):
+        store.issue('jane@example.com', otp)
+    with pytest.raises(OTPRateLimitError) as excinfo:
+        store.issue('jane@example.com', '400000')
+    assert 0 < excinfo.value.retry_after <= 900
+    assert 'minutes' in str(excinfo.value)
+
+    # The latest code still works, and other emails are unaffected
+    assert store.verify('jane@example.com', '300000')
+    store.issue('john@example.com', '500000')
+
+    # Once the window has passed the email may ask again
+    _expire(store, 'jane@example.com', window_too=True)
+    store.issue('jane@example.com', '600000')
+    assert store.verify('jane@example.com', '600000')
+
+
+def test_sweep_removes_only_finished_entries(store):
+    store.issue('old@example.com', '123456')
+    store.issue('new@example.com', '123456')
+    _expire(store, 'old@example.com')
+    assert store.sweep() == 0  # rate-limit window still open
+    _expire(store, 'old@example.com', window_too=True)
+    assert store.sweep() == 1
+    assert store.verify('new@example.com', '123456')
+
+
+def test_memory_store_is_bounded():
+    store = MemoryOTPStore('test-secret', max_entries=3, sweep_interval=3600)
+    for i in range(10):
+        store.issue(f'user{i}@example.com', '123456')
+    assert len(store) == 3
+    assert store.verify('user9@example.com', '123456')
+    assert not store.verify('user0@example.com', '123456')
+    store.stop()
+
+
+def test_database_rows_store_only_a_hash(app_ctx):
+    from app import db, PasswordResetOTP
+    DatabaseOTPStore(db, PasswordResetOTP, 'test-secret').issue('jane@example.com', '123456')
+    row = db.session.get(PasswordResetOTP, 'jane@example.com')
+    assert row.otp_hash and '123456' not in row.otp_hash
+    assert row.expires_at > datetime.utcnow()
+
+
+def test_forgot_password_reports_rate_limit(app_ctx, monkeypatch):
+    from app import db, User, password_reset_manager
+    for key in ('MAIL_SERVER', 'MAIL_USERNAME', 'MAIL_PASSWORD'):
+        monkeypatch.setitem(app_ctx.config, key, 'configured')
+    db.session.add(User(username='jane', email='jane@example.com'))
+    db.session.commit()
+    for _ in range(app_ctx.config['OTP_RATE_LIMIT']):
+        password_reset_manager.store_otp('jane@example.com', password_reset_manager.generate_otp())
+
+    client = app_ctx.test_client()
+    response = client.post('/forgot-password', data={'email': 'jane@example.com'})
+    assert response.status_code == 200
+    assert b'Too many reset requests' in response.data
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Keyset pagination tests for CarHub
+Walks the admin listings forwards and backwards through opaque cursors
+"""
+
+from datetime import datetime, timedelta
+
+from pagination import KeysetPaginator
+
+
+def _seed_activities(count=45):
+    from app import db, User, UserActivity
+    user = User(username='walker', email='walker@example.com')
+    db.session.add(user)
+    db.session.commit()
+    base = datetime(2025, 1, 1)
+    # Groups of three rows share a timestamp, so the id tie-breaker matters
+    db.session.add_all([
+        UserActivity(user_id=user.id, activity_type='login' if i % 2 else 'car_view',
+                     description=f'Activity {i}', created_at=base + timedelta(minutes=i // 3))
+        for i in range(count)
+    ])
+    db.session.commit()
+    return user
+
+
+def _expected_order():
+    from app import UserActivity
+    rows = UserActivity.query.all()
+    return [row.id for row in sorted(rows, key=lambda row: (row.created_at, row.id), reverse=True)]
+
+
+def test_walk_forward_and_back(app_ctx):
+    from app import UserActivity
+    _seed_activities()
+    paginator = KeysetPaginator('test-secret')
+
+    pages, cursor = [], None
+    while True:
+        page = paginator.paginate(UserActivity.query, UserActivity, cursor=cursor, per_page=10)
+        pages.append(page)
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+
+    assert [len(page.items) for page in pages] == [10, 10, 10, 10, 5]
+    assert [row.id for page in pages for row in page.items] == _expected_order()
+    assert not pages[0].has_prev and pages[-1].has_prev
+    assert pages[0].total_label == '~45'
+
+    # Walking back from the last page retraces the same pages
+    page = pages[-1]
+    for expected in reversed(pages[:-1]):
+        page = paginator.paginate(UserActivity.query, UserActivity, cursor=page.prev_cursor, per_page=10)
+        assert [row.id for row in page.items] == [row.id for row in expected.items]
+        assert page.has_next
+    assert not page.has_prev
+
+
+def test_rows_without_created_at_page_last(app_ctx):
+    from app import db, UserActivity
+    user = _seed_activities(15)
+    # Legacy scripts inserted rows without a timestamp
+    db.session.add_all([UserActivity(user_id=user.id, activity_type='login', description=f'Legacy {i}')
+                        for i in range(7)])
+    db.session.commit()
+    UserActivity.query.filter(UserActivity.description.like('Legacy%')).update({'created_at': None})
+    db.session.commit()
+    paginator = KeysetPaginator('test-secret')
+
+    pages, cursor = [], None
+    while True:
+        page = paginator.paginate(UserActivity.query, UserActivity, cursor=cursor, per_page=4)
+        pages.append(page)
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+
+    dated = [row.id for row in sorted(UserActivity.query.filter(UserActivity.created_at.isnot(None)),
+                                      key=lambda row: (row.created_at, row.id), reverse=True)]
+    undated = sorted((row.id for row in UserActivity.query.filter(UserActivity.created_at.is_(None))),
+                     reverse=True)
+    assert [row.id for page in pages for row in page.items] == dated + undated
+
+    page = pages[-1]
+    for expected in reversed(pages[:-1]):
+        page = paginator.paginate(UserActivity.query, UserActivity, cursor=page.prev_cursor, per_page=4)
+        assert [row.id for row in page.items] == [row.id for row in expected.items]
+    assert not page.has_prev
+
+
+def test_filtered_totals_and_bad_cursors(app_ctx):
+    from app import User, UserActivity
+    _seed_activities()
+    paginator = KeysetPaginator('test-secret', count_cap=20)
+
+    logins = UserActivity.query.filter(UserActivity.activity_type == 'login')
+    assert paginator.paginate(logins, UserActivity, per_page=10).total_label == '20+'
+    assert KeysetPaginator('test-secret').paginate(logins, UserActivity, per_page=10).total_label == '22'
+
+    first = paginator.paginate(UserActivity.query, UserActivity, per_page=10)
+    second = paginator.paginate(UserActivity.query, UserActivity, cursor=first.next_cursor, per_page=10)
+    assert second.items[0].id != first.items[0].id
+
+    # Tampered, foreign-secret and other-table cursors all fall back to the first page
+    for cursor in (first.next_cursor + 'x', KeysetPaginator('other').serializer.dumps(['x']), 'garbage'):
+        page = paginator.paginate(UserActivity.query, UserActivity, cursor=cursor, per_page=10)
+        assert [row.id for row in page.items] == [row.id for row in first.items]
+    page = paginator.paginate(User.query, User, cursor=first.next_cursor, per_page=10)
+    assert not page.has_prev
+
+
+def test_admin_activities_route_pages_with_cursor(app_ctx):
+    from app import db, User, paginator, UserActivity
+    _seed_activities(60)
+    admin = User(username='admin', email='admin@carhub.com')
+    db.session.add(admin)
+    db.session.commit()
+
+    client = app_ctx.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(admin.id)
+        sess['_fresh'] = True
+
+    first = paginator.paginate(UserActivity.query, UserActivity, per_page=50)
+    response = client.get('/admin/activities', query_string={'cursor': first.next_cursor})
+    assert response.status_code == 200
+    assert b'Activity 9' in response.data and b'Activity 10' not in response.data
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Payment pipeline tests for CarHub
+Checks the simulated gateway rules, the HTTP stub and the background order flow
+"""
+
+import threading
+from datetime import datetime
+
+from payments import HTTPStubGateway, PaymentProcessor, SimulatedGateway, run_stub_server
+
+FUTURE_EXPIRY = f"12/{(datetime.now().year + 2) % 100:02d}"
+
+
+def _card(number='4532015112830366', expiry=FUTURE_EXPIRY, cvv='123'):
+    return {'payment_method': 'credit_card', 'card_number': number, 'card_expiry': expiry, 'card_cvv': cvv}
+
+
+def test_simulated_gateway_rules():
+    gateway = SimulatedGateway(latency=0, paypal_latency=0)
+
+    success, txn, _ = gateway.authorize('k1', 100, _card())
+    assert success and txn.startswith('CC_')
+
+    assert gateway.authorize('k2', 100, _card(number='4532015112830000')) == (False, None, 'Card declined by issuer.')
+    assert gateway.authorize('k3', 100, _card(cvv='1'))[2] == 'Invalid CVV. Must be 3-4 digits.'
+    assert gateway.authorize('k4', 100, _card(expiry='01/20'))[2] == 'Card has expired.'
+    assert gateway.authorize('k5', 100, {'payment_method': 'bitcoin'})[2] == 'Unsupported payment method.'
+    assert gateway.authorize('k6', 100, {'payment_method': 'paypal'})[1].startswith('PP_')
+
+
+def test_simulated_gateway_is_idempotent():
+    gateway = SimulatedGateway(latency=0)
+    first = gateway.authorize('same-key', 100, _card())
+    second = gateway.authorize('same-key', 100, _card())
+    assert first == second
+
+
+def test_simulated_gateway_forgets_old_keys():
+    gateway = SimulatedGateway(latency=0, paypal_latency=0, max_results=2)
+    first = gateway.authorize('k1', 100, {'payment_method': 'paypal'})
+    gateway.authorize('k2', 100, {'payment_method': 'paypal'})
+    gateway.authorize('k3', 100, {'payment_method': 'paypal'})
+    assert list(gateway._results) == ['k2', 'k3']
+    assert gateway.authorize('k1', 100, {'payment_method': 'paypal'}) != first
+
+    expiring = SimulatedGateway(latency=0, paypal_latency=0, result_ttl=0)
+    assert expiring.authorize('k', 100, {'payment_method': 'paypal'}) != expiring.authorize('k', 100, {'payment_method': 'paypal'})
+
+
+def test_http_stub_gateway():
+    server = run_stub_server(port=0, gateway=SimulatedGateway(latency=0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        gateway = HTTPStubGateway(f"http://{host}:{port}")
+
+        success, txn, _ = gateway.authorize('stub-1', 100, _card())
+        assert success and txn.startswith('CC_')
+        assert gateway.capture('stub-1', txn, 100) == (True, txn, 'Captured')
+        assert gateway.authorize('stub-2', 100, _card(number='4532015112830000'))[0] is False
+    finally:
+        server.shutdown()
+
+
+def _make_order(db, User, Car, Order, key):
+    user = User(username=f'buyer-{key}', email=f'{key}@example.com')
+    car = Car(name='Test Car', slug=f'car-{key}', price=1000, category='sports')
+    db.session.add_all([user, car])
+    db.session.commit()
+    order = Order(
+        user_id=user.id, car_id=car.id, total_amount=1100, payment_status='pending',
+        payment_method='credit_card', idempotency_key=key, billing_name='Buyer',
+        billing_email='buyer@example.com', billing_phone='5551234567', billing_address='1 Test Street'
+    )
+    db.session.add(order)
+    db.session.commit()
+    return order.id
+
+
+def test_checkout_rejects_another_users_idempotency_key(app_ctx):
+    from app import db, User, Car, Order
+    order_id = _make_order(db, User, Car, Order, 'someone-elses-key')
+    intruder = User(username='intruder', email='intruder@example.com')
+    db.session.add(intruder)
+    db.session.commit()
+
+    client = app_ctx.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(intruder.id)
+        sess['_fresh'] = True
+        sess['purchase_car'] = {'slug': 'car-someone-elses-key', 'idempotency_key': 'mine'}
+    response = client.post('/payment', data={
+        'billing_name': 'Intruder', 'billing_email': 'intruder@example.com', 'billing_phone': '5551234567',
+        'billing_address': '2 Other Street', 'payment_method': 'paypal', 'idempotency_key': 'someone-elses-key',
+    })
+
+    assert response.status_code == 302 and response.location.endswith('/payment')
+    assert Order.query.count() == 1 and db.session.get(Order, order_id).payment_status == 'pending'
+    with client.session_transaction() as sess:
+        assert 'idempotency_key' not in sess['purchase_car']  # the next page load issues a fresh key
+        assert 'expired' in dict(sess['_flashes'])['error']
+
+
+def test_processor_completes_order(app_ctx):
+    from app import db, User, Car, Order
+    order_id = _make_order(db, User, Car, Order, 'ok-key')
+    results = []
+    processor = PaymentProcessor(app_ctx, db, Order, SimulatedGateway(latency=0),
+                                 on_result=lambda order, success, message: results.append(success))
+
+    processor.submit(order_id, _card()).result(timeout=10)
+    db.session.expire_all()
+    order = db.session.get(Order, order_id)
+    assert order.payment_status == 'completed'
+    assert order.order_status == 'processing'
+    assert order.transaction_id.startswith('CC_')
+    assert results == [True]
+
+    # Resubmitting a finished order is a no-op
+    processor.submit(order_id, _card()).result(timeout=10)
+    assert results == [True]
+    processor.shutdown()
+
+
+def test_processor_marks_declined_order_failed(app_ctx):
+    from app import db, User, Car, Order
+    order_id = _make_order(db, User, Car, Order, 'declined-key')
+    processor = PaymentProcessor(app_ctx, db, Order, SimulatedGateway(latency=0))
+
+    processor.submit(order_id, _card(number='4532015112830000')).result(timeout=10)
+    db.session.expire_all()
+    order = db.session.get(Order, order_id)
+    assert order.payment_status == 'failed'
+    assert order.payment_message == 'Card declined by issuer.'
+    processor.shutdown()
+
+
+def test_restart_requeues_interrupted_orders(app_ctx):
+    from app import db, User, Car, Order
+    gateway = SimulatedGateway(latency=0)  # outlives the restart, like a real gateway's idempotency store
+    authorized_id = _make_order(db, User, Car, Order, 'authorized-key')
+    reached_id = _make_order(db, User, Car, Order, 'reached-key')
+    lost_id = _make_order(db, User, Car, Order, 'lost-key')
+    fresh_id = _make_order(db, User, Car, Order, 'fresh-key')
+
+    # The old process authorized two orders, then died before capturing them or saving the second
+    txn = gateway.authorize('authorized-key', 1100, _card())[1]
+    reached_txn = gateway.authorize('reached-key', 1100, _card())[1]
+    db.session.get(Order, authorized_id).payment_status = 'authorized'
+    db.session.get(Order, authorized_id).transaction_id = txn
+    for order_id in (authorized_id, reached_id, lost_id):
+        db.session.get(Order, order_id).updated_at = datetime(2020, 1, 1)
+    db.session.commit()
+
+    # One worker: the in-memory test database is a single connection shared by every thread
+    processor = PaymentProcessor(app_ctx, db, Order, gateway, max_workers=1, stale_after=60)
+    futures = processor.recover()
+    assert len(futures) == 3  # the fresh order may still be running in another worker
+    for future in futures:
+        future.result(timeout=10)
+
+    db.session.expire_all()
+    assert db.session.get(Order, authorized_id).payment_status == 'completed'
+    reached = db.session.get(Order, reached_id)
+    assert reached.payment_status == 'completed' and reached.transaction_id == reached_txn  # replayed, not charged again
+    lost = db.session.get(Order, lost_id)
+    assert lost.payment_status == 'failed' and lost.payment_message.startswith('Payment was interrupted')
+    assert db.session.get(Order, fresh_id).payment_status == 'pending'
+    assert processor.recover() == []
+    processor.shutdown()
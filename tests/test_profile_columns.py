@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Deferred profile column tests for CarHub
+Checks that logins and order lists load a narrow User row and profile pages load the rest in one query
+"""
+
+
+
+def _full_user(db, User, email='driver@example.com'):
+    user = User(username=email.split('@')[0], email=email, first_name='Dana', last_name='Reyes',
+                phone='555-0100', address='1 Pit Lane', city='Monza', bio='Track days on weekends')
+    db.session.add(user)
+    db.session.commit()
+    user_id = user.id
+    db.session.expunge_all()
+    return user_id
+
+
+def test_plain_user_queries_skip_profile_columns(app_ctx, user_queries):
+    from app import db, User, PROFILE_COLUMNS
+    _full_user(db, User)
+
+    with user_queries() as queries:
+        user = User.query.filter_by(email='driver@example.com').first()
+        assert user.get_full_name() == 'Dana Reyes' and user.check_password('x') is False
+    assert len(queries) == 1 and 'bio' not in queries[0] and 'address' not in queries[0]
+    assert {'bio', 'address', 'phone', 'profile_picture'} <= set(PROFILE_COLUMNS)
+
+    with user_queries() as queries:
+        assert user.get_profile_completion_percentage() == 50
+        assert user.load_profile().bio == 'Track days on weekends' and user.city == 'Monza'
+    assert len(queries) == 1 and 'bio' in queries[0]  # one query for the whole group
+
+
+def test_profile_page_loads_the_profile_in_one_query(app_ctx, login, new_request, user_queries):
+    client, _ = login()
+    client.get('/cars')
+
+    with user_queries() as queries:
+        new_request()
+        response = client.get('/profile')
+    assert response.status_code == 200 and b'Track days on weekends' in response.data
+    assert len(queries) == 2  # the row, then its profile group
+
+
+def test_admin_users_page_loads_profiles_with_the_page(app_ctx, login, new_request, user_queries):
+    from app import db, User
+    for i in range(5):
+        _full_user(db, User, email=f'driver{i}@example.com')
+    client, _ = login(email='admin@carhub.com', username='admin')
+    client.get('/cars')
+
+    with user_queries() as queries:
+        new_request()
+        response = client.get('/admin/users')
+    assert response.status_code == 200 and response.data.count(b'555-0100') == 5
+    assert len(queries) <= 3  # no query per listed user
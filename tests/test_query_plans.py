@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Query plan regression tests for CarHub
+Runs EXPLAIN QUERY PLAN on the SQL the routes actually send and fails on full table scans
+"""
+
+import importlib.util
+import os
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+# (who, method, path): {name} fields are filled from the `shop` fixture
+ROUTES = [
+    ('customer', 'GET', '/my-orders'),
+    ('customer', 'GET', '/payment-status/{order_id}'),
+    ('customer', 'GET', '/payment'),
+    ('customer', 'POST', '/payment'),
+    ('visitor', 'POST', '/login'),
+    ('admin', 'GET', '/admin'),
+    ('admin', 'GET', '/admin/orders'),
+    ('admin', 'GET', '/admin/orders?status=completed'),
+    ('admin', 'GET', '{orders_next}'),
+    ('admin', 'GET', '/admin/activities'),
+    ('admin', 'GET', '/admin/activities?type=login'),
+    ('admin', 'GET', '/admin/activities?user_id={user_id}'),
+    ('admin', 'GET', '{activities_next}'),
+    ('admin', 'GET', '/admin/user/{user_id}'),
+]
+
+FORMS = {
+    '/payment': {'billing_name': 'Dana Reyes', 'billing_email': 'driver@example.com', 'billing_phone': '5550100100',
+                 'billing_address': '1 Pit Lane', 'payment_method': 'paypal', 'idempotency_key': 'fresh-key'},
+    '/login': {'email': 'driver@example.com', 'password': 'wrong-password'},
+}
+
+
+def _next_page(client, path):
+    """The href of a listing's "Next" link, as a browser would follow it"""
+    html = client.get(path).get_data(as_text=True)
+    return re.search(r'href="([^"]*cursor=[^"]*)" class="page-btn">Next', html).group(1).replace('&amp;', '&')
+
+
+@pytest.fixture
+def shop(app_ctx, login, add_car):
+    """Customer, admin and visitor clients over enough orders and activity for the admin listings to page"""
+    from app import db, Order, UserActivity, FinanceApplication
+    customer, user_id = login()
+    admin, _ = login('admin@carhub.com', 'admin')
+    car = add_car()
+
+    started = datetime.utcnow() - timedelta(days=3)
+    for i in range(25):
+        db.session.add(Order(user_id=user_id, car_id=car.id, total_amount=car.price, payment_status='completed',
+                             billing_name='Dana Reyes', billing_email='driver@example.com',
+                             billing_phone='5550100100', billing_address='1 Pit Lane', payment_method='paypal',
+                             created_at=started + timedelta(minutes=i)))
+    for i in range(60):
+        db.session.add(UserActivity(user_id=user_id, activity_type='login', description='Logged in',
+                                    created_at=started + timedelta(minutes=i)))
+    db.session.add(FinanceApplication(user_id=user_id, car_id=car.slug, car_name=car.name, car_price='$50,000',
+                                      full_name='Dana Reyes', email='driver@example.com', phone='5550100100',
+                                      annual_income='90000', employment_status='employed',
+                                      address='1 Pit Lane', selected_plan='60-month'))
+    db.session.commit()
+
+    with customer.session_transaction() as sess:
+        # A car that has since been delisted: checkout looks it up, then stops short of placing an order
+        sess['purchase_car'] = {'name': 'Sold Car', 'slug': 'sold-car', 'price': 50000, 'idempotency_key': 'fresh-key'}
+    return {
+        'clients': {'customer': customer, 'admin': admin, 'visitor': app_ctx.test_client()},
+        'user_id': user_id,
+        'order_id': Order.query.filter_by(user_id=user_id).first().id,
+        'orders_next': _next_page(admin, '/admin/orders?status=completed'),
+        'activities_next': _next_page(admin, '/admin/activities'),
+    }
+
+
+def explain(db, statement, parameters):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement as the driver received it"""
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def full_scans(db, plan):
+    """Plan lines that read a whole table without an index (scans of subquery results are fine)"""
+    return [line for line in plan if re.match(r'SCAN (\S+)$', line) and line.split()[1] in db.metadata.tables]
+
+
+@pytest.mark.parametrize('who, method, path', ROUTES)
+def test_route_queries_use_indexes(shop, query_counter, new_request, who, method, path):
+    from app import db
+    path = path.format(**shop)
+    client = shop['clients'][who]
+    new_request()
+    query_counter.statements.clear()
+    if method == 'POST':
+        response = client.post(path, data=FORMS[path])
+    else:
+        response = client.get(path)
+    assert response.status_code in (200, 302), response.status_code
+
+    selects = [(statement, parameters) for _, statement, parameters in query_counter.statements
+               if statement.lstrip().upper().startswith('SELECT')]
+    assert selects
+    for statement, parameters in selects:
+        plan = explain(db, statement, parameters)
+        assert not full_scans(db, plan), f"{method} {path} does a full table scan: {statement}\n{plan}"
+
+
+def test_migration_matches_models(app_ctx):
+    from app import db
+    path = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'migrate_indexes.py')
+    spec = importlib.util.spec_from_file_location('migrate_indexes', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    declared = {}
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            declared[index.name] = (table.name, [column.name for column in index.columns])
+
+    for name, definition in module.INDEXES.items():
+        assert declared.get(name) == definition, name
+
+    # And every index on the models is created by some migration: this one,
+    # the payment pipeline's unique key, or db.create_all() for new tables
+    created_elsewhere = {'ix_order_idempotency_key', 'ix_password_reset_otp_expires_at'}
+    assert set(declared) - created_elsewhere == set(module.INDEXES)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Recommendation engine tests for CarHub
+Checks preference parsing, scoring, top-k selection and catalog refreshes
+"""
+
+from recommender import RecommendationEngine, parse_budget
+
+
+class _Catalog:
+    version = 1
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def all(self):
+        return self.entries
+
+
+def _entry(i, price, category='sports', status='Available', horsepower='500 hp'):
+    return {'name': f'Car {i}', 'slug': f'car-{i}', 'price': f'${price:,.0f}', 'price_value': price,
+            'category': category, 'status': status, 'horsepower': horsepower,
+            'acceleration': '4.0 seconds (0-60 mph)', 'year': '2023', 'engine': 'V8'}
+
+
+def test_parse_budget():
+    assert parse_budget('any') is None and parse_budget(None) is None
+    assert parse_budget(60000) == (0.0, 60000.0)
+    assert parse_budget('$50k-$100k') == (50000.0, 100000.0)
+    assert parse_budget('under_50k') == (0.0, 50000.0)
+    assert parse_budget('over 1.5m') == (1500000.0, float('inf'))
+    assert parse_budget({'min': '20,000'}) == (20000.0, float('inf'))
+
+
+def test_top_k_matches_a_full_sort():
+    entries = [_entry(i, 20000 + (i * 7919) % 180000, category=('sports', 'luxury')[i % 2],
+                      status='Sold' if i % 11 == 0 else 'Available', horsepower=f'{100 + (i * 31) % 900} hp')
+               for i in range(2000)]
+    engine = RecommendationEngine(_Catalog(entries))
+    preferences = {'category': 'sports', 'budget': 150000, 'usage': 'performance'}
+
+    results = engine.recommend(preferences, limit=10)
+    assert len(results) == 10
+    scores = [r['score'] for r in results]
+    assert scores == sorted(scores, reverse=True)
+    for r in results:
+        assert r['car']['category'] == 'sports' and r['car']['price_value'] <= 150000
+        assert r['car']['status'] != 'Sold'
+
+    # Same winners as scoring everything and sorting
+    everything = engine.recommend(preferences, limit=len(entries))
+    assert [r['car']['slug'] for r in everything[:10]] == [r['car']['slug'] for r in results]
+
+
+def test_no_preferences_or_unknown_category_recommend_nothing():
+    engine = RecommendationEngine(_Catalog([_entry(1, 50000)]))
+    assert engine.recommend({}) == []
+    assert engine.recommend({'category': 'spaceship'}) == []
+    assert engine.recommend({'category': 'SPORTS'})[0]['reasons'] == [
+        'Matches your preferred sports category', 'Available now']
+
+
+def test_recommendations_follow_the_catalog(app_ctx, add_car):
+    from app import db
+    tesla = add_car(slug='tesla-model-3', name='Tesla Model 3', price=45000,
+                     engine='Dual Electric Motors', horsepower='480 hp', status='Available')
+    add_car(slug='mclaren-720s', name='McLaren 720S', price=300000, horsepower='710 hp')
+    add_car(slug='old-sold', name='Sold Car', price=30000, status='Sold')
+
+    client = app_ctx.test_client()
+    response = client.post('/api/chat/recommendations', json={'preferences': {'budget': '60k', 'usage': 'eco'}})
+    data = response.get_json()
+    assert data['success']
+    assert [r['car']['name'] for r in data['recommendations']] == ['Tesla Model 3']
+    assert 'Low-emission choice' in data['recommendations'][0]['reasons']
+
+    tesla.price = 65000
+    db.session.commit()
+    response = client.post('/api/chat/recommendations', json={'preferences': {'budget': '60k', 'usage': 'eco'}})
+    assert response.get_json()['recommendations'] == []
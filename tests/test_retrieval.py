@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Retrieval index tests for CarHub
+Checks index builds and reloads, snippets sent to the LLM and offline fallback answers
+"""
+
+import json
+import os
+
+from retrieval_index import POINTER_FILE, Retriever, build_index, collect_documents
+
+
+def _doc(key, text):
+    return {'id': f'info:{key}', 'kind': 'info', 'title': key, 'text': text, 'snippet': text}
+
+
+def _index_catalog(chatbot, directory, add_car):
+    from app import Car
+    add_car(slug='porsche-911-gt3', name='Porsche 911 GT3', price=240000,
+             description='Track-focused coupe with carbon ceramic brakes and a naturally aspirated flat-six.')
+    add_car(slug='tesla-model-3', name='Tesla Model 3', price=45000,
+             description='Electric sedan with autopilot and over-the-air updates.')
+    build_index(collect_documents(cars=Car.query.all(), knowledge_base=chatbot.knowledge_base), str(directory))
+    return Retriever(str(directory), check_interval=0)
+
+
+def test_search_uses_the_memory_mapped_build(tmp_path):
+    documents = [_doc('brakes', 'Carbon ceramic brakes resist fade on track days'),
+                 _doc('leasing', 'Lease a car with low monthly payments'),
+                 _doc('detailing', 'Ceramic coating and paint protection for your car')]
+    build_index(documents, str(tmp_path))
+    retriever = Retriever(str(tmp_path), top_k=2, check_interval=0)
+
+    hits = retriever.search('which brakes handle track days?')
+    assert [hit['id'] for hit in hits] == ['info:brakes']  # the others score 0
+    assert 0 < hits[0]['score'] <= 1 and hits[0]['snippet'] == documents[0]['text']
+    assert [hit['id'] for hit in retriever.search('ceramic', k=3)] == ['info:detailing', 'info:brakes']
+    assert retriever.search('') == [] and retriever.search('zzz qqq') == []
+
+    matrix = retriever.current().matrix
+    assert not matrix.data.flags.writeable and not matrix.indices.flags.writeable  # read-only maps, not copies
+
+
+def test_new_builds_are_picked_up_and_old_ones_pruned(tmp_path):
+    retriever = Retriever(str(tmp_path), check_interval=0)
+    assert retriever.search('lease') == [] and retriever.stats()['loaded'] is False
+
+    build_index([_doc('leasing', 'Lease a car with low monthly payments')], str(tmp_path))
+    assert retriever.search('lease')[0]['id'] == 'info:leasing'
+    generation = retriever.generation
+
+    for _ in range(2):
+        build_index([_doc('trade-in', 'Trade in your car for its best market value')], str(tmp_path))
+    assert retriever.search('lease') == [] and retriever.search('trade')[0]['id'] == 'info:trade-in'
+    assert retriever.generation == generation + 1
+    assert retriever.search('trade') and retriever.generation == generation + 1  # unchanged pointer, no reload
+    assert len([name for name in os.listdir(tmp_path) if os.path.isdir(tmp_path / name)]) == 2
+
+
+def test_failed_reload_keeps_the_current_build(tmp_path):
+    retriever = Retriever(str(tmp_path), check_interval=0)
+    build_index([_doc('leasing', 'Lease a car with low monthly payments')], str(tmp_path))
+    assert retriever.search('lease')
+
+    # A new build is published, then its files vanish before this worker loads them
+    build_index([_doc('trade-in', 'Trade in your car for its best market value')], str(tmp_path))
+    version = json.loads((tmp_path / POINTER_FILE).read_text())['version']
+    os.rename(tmp_path / version, tmp_path / 'moved')
+    generation = retriever.generation
+    assert retriever.search('lease')[0]['id'] == 'info:leasing'
+    assert retriever.generation == generation
+
+    # The same pointer is retried on the next check
+    os.rename(tmp_path / 'moved', tmp_path / version)
+    assert retriever.search('trade')[0]['id'] == 'info:trade-in' and retriever.search('lease') == []
+
+
+def test_relevant_snippets_are_sent_with_the_question(chatbot, fake_openai, monkeypatch, tmp_path, add_car):
+    monkeypatch.setattr(chatbot, 'retriever', _index_catalog(chatbot, tmp_path, add_car))
+    full_prompt = len(chatbot._create_static_prompt())
+
+    chatbot.get_chat_response('Does the Porsche have carbon ceramic brakes?')
+
+    system, snippets, question = fake_openai.requests[0]['messages']
+    assert 'SERVICES OFFERED' not in system['content'] and len(chatbot._static_prompt) < full_prompt
+    assert snippets['role'] == 'system' and snippets['content'].startswith('RELEVANT CARHUB INFORMATION')
+    assert snippets['content'].split('\n')[1].startswith('- [car] Porsche 911 GT3 (sports')
+    assert question['content'] == 'Does the Porsche have carbon ceramic brakes?'
+
+
+def test_fallback_answers_catalog_questions_offline(chatbot, fake_openai, monkeypatch, tmp_path, add_car):
+    monkeypatch.setattr(chatbot, 'retriever', _index_catalog(chatbot, tmp_path, add_car))
+    monkeypatch.setattr(chatbot, 'openai_available', False)
+
+    response = chatbot.get_chat_response('Which car has carbon ceramic brakes?')
+    assert response['fallback'] and 'Porsche 911 GT3' in response['message']
+    assert 'carbon ceramic brakes' in response['message']
+    assert response['metadata']['mentioned_cars'] == ['Porsche 911 GT3']
+
+    # Canned topics still answer greetings and general questions
+    assert chatbot.get_chat_response('Hello there')['message'].startswith('Welcome to CarHub!')
+    assert 'flexible financing' in chatbot.get_chat_response('What financing do you offer?')['message']
+    assert fake_openai.requests == []
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+SQL profiler tests for CarHub
+Checks per-route query counts and DB time, parameter redaction, sampling and the slow-request log
+"""
+
+import json
+
+from sqlalchemy import text
+
+from sql_profiler import SQLProfiler, redact
+
+
+def test_redact_keeps_types_not_values():
+    assert redact(('dana@example.com', 42, None)) == ['<str>', '<int>', None]
+    assert redact({'email': 'dana@example.com'}) == {'email': '<str>'}
+    assert redact([('a', 1), ('b', 2)]) == '<2 parameter sets>'
+
+
+def test_requests_are_grouped_by_route(app_ctx, login, new_request):
+    from app import sql_profiler
+    sql_profiler.reset()
+    client, _ = login(email='admin@carhub.com', username='admin')
+    for _ in range(2):
+        new_request()
+        assert client.get('/admin/orders').status_code == 200
+    new_request()
+    client.get('/cars')
+
+    response = client.get('/admin/sql-profile/stats')
+    assert response.status_code == 200
+    stats = response.get_json()['stats']
+    routes = {route['route']: route for route in stats['top_routes']}
+    orders = routes['GET /admin/orders']
+    assert orders['requests'] == 2 and orders['queries'] >= 2 and orders['db_ms'] > 0
+    assert orders['slowest'] and all('SELECT' in s['sql'] for s in orders['slowest'])
+    assert 'GET /cars' in routes
+    assert [r['db_ms'] for r in stats['top_routes']] == sorted((r['db_ms'] for r in stats['top_routes']), reverse=True)
+
+    page = client.get('/admin/sql-profile')
+    assert page.status_code == 200 and b'/admin/orders' in page.data
+
+
+def test_admin_pages_require_admin(app_ctx, login):
+    client, _ = login()
+    assert client.get('/admin/sql-profile/stats').status_code == 403
+    assert client.get('/admin/sql-profile').status_code == 302
+
+
+def test_slow_requests_are_logged_with_redacted_parameters(app_ctx, tmp_path):
+    from app import db
+    log_path = tmp_path / 'slow.log'
+    profiler = SQLProfiler(slow_ms=0, top_statements=2, log_path=str(log_path))
+    profiler.listen(db.engine)
+    try:
+        profiler.begin('POST', '/login')
+        for _ in range(3):
+            db.session.execute(text('SELECT :email'), {'email': 'dana@example.com'}).all()
+        profile = profiler.end()
+        db.session.execute(text('SELECT 1')).all()  # outside a request: not counted
+    finally:
+        profiler.remove(db.engine)
+    assert profile.queries == 3 and profiler.stats()['sampled_requests'] == 1
+
+    entry = json.loads(log_path.read_text().splitlines()[-1])
+    assert entry['route'] == '/login' and entry['queries'] == 3 and len(entry['statements']) == 2
+    assert 'dana@example.com' not in log_path.read_text()
+    assert entry['statements'][0]['params'] == ['<str>']
+    assert profiler.top_routes()[0]['queries'] == 3
+
+
+def test_unsampled_requests_are_not_profiled(app_ctx):
+    profiler = SQLProfiler(sample_rate=0.0)
+    assert profiler.begin('GET', '/cars') is None
+    assert profiler.end() is None and profiler.stats()['sampled_requests'] == 0
+
+
+def test_failed_statements_leave_nothing_on_the_connection(app_ctx):
+    from sqlalchemy.exc import OperationalError
+    from app import db
+    profiler = SQLProfiler()
+    profiler.listen(db.engine)
+    try:
+        profiler.begin('GET', '/cars')
+        for _ in range(3):
+            try:
+                db.session.execute(text('SELECT * FROM no_such_table')).all()
+            except OperationalError:
+                db.session.rollback()
+        db.session.execute(text('SELECT 1')).all()
+        connection_info = dict(db.session.connection().connection.info)
+        profile = profiler.end()
+    finally:
+        profiler.remove(db.engine)
+    assert profile.queries == 1 and profile.statements()[0]['sql'] == 'SELECT 1'
+    assert not any('sql_profiler' in str(key) for key in connection_info)
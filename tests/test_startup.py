@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Startup tests for CarHub
+Checks that importing the app leaves the slow optional modules for first use
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmark_startup import eager_lazy_modules, import_times
+from lazy import LazyModule, LazyObject, module_available
+
+
+@pytest.fixture
+def app_env(tmp_path):
+    """Environment for importing the app in a child process without touching the repo's instance folder"""
+    return {
+        'DATABASE_URL': 'sqlite://',
+        'MAIL_SPOOL_PATH': str(tmp_path / 'mail'),
+        'CATALOG_STAMP_PATH': str(tmp_path / 'catalog.stamp'),
+        'SQL_SLOW_LOG_PATH': str(tmp_path / 'slow_queries.log'),
+        'INVOICE_CACHE_PATH': str(tmp_path / 'invoices'),
+        'OPENAI_API_KEY': '',
+    }
+
+
+def test_app_import_defers_heavy_modules(app_env):
+    _, rows = import_times('app', env=app_env)
+    assert eager_lazy_modules(rows) == []
+    names = {name for name, _, _, _ in rows}
+    assert 'app' in names and 'recommender' not in names and 'retrieval_index' not in names
+
+
+def test_app_import_prints_nothing(app_env):
+    result = subprocess.run([sys.executable, '-c', 'import app'], cwd=os.path.dirname(os.path.dirname(__file__)),
+                            env=dict(os.environ, **app_env), capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert result.stdout == '' and 'initialized' not in result.stderr and 'OpenAI' not in result.stderr
+
+
+def test_lazy_object_builds_once_on_first_use():
+    built = []
+
+    class Thing:
+        size = 3
+
+    def build():
+        built.append(1)
+        return Thing()
+
+    thing = LazyObject(build, 'thing')
+    assert 'not built' in repr(thing) and not thing.loaded and built == []
+    thing.size = 5
+    assert thing.size == 5 and thing.loaded and built == [1]
+
+    failing = LazyObject(lambda: 1 / 0, 'failing')
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError):
+            failing.anything
+
+
+def test_lazy_module_imports_on_first_attribute():
+    lazy_json = LazyModule('json')
+    assert 'not loaded' in repr(lazy_json)
+    assert lazy_json.dumps([1]) == '[1]' and 'not loaded' not in repr(lazy_json)
+
+    missing = LazyModule('carhub_no_such_module')
+    with pytest.raises(ModuleNotFoundError):
+        missing.anything
+
+
+def test_module_available_does_not_raise_for_missing_parents():
+    assert module_available('json') is True
+    assert module_available('carhub_no_such_package.sub') is False
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Logged-in user cache tests for CarHub
+Checks that requests skip the User query, load the full row only when needed and see committed changes
+"""
+
+
+def test_pages_after_the_first_skip_the_user_query(app_ctx, login, new_request, user_queries):
+    from app import principal_cache
+    client, _ = login()
+
+    with user_queries() as queries:
+        new_request()
+        assert b'Dana' in client.get('/cars').data
+    assert len(queries) == 1  # miss: the row is loaded once and its fields cached
+
+    hits = principal_cache.stats()['hits']
+    with user_queries() as queries:
+        for path in ('/cars', '/my-orders'):
+            new_request()
+            response = client.get(path)
+            assert response.status_code == 200
+    assert b'Orders' in response.data
+    assert queries == []
+    assert principal_cache.stats()['hits'] == hits + 2
+
+
+def test_full_row_loads_only_when_a_page_needs_it(app_ctx, login):
+    from app import db, principal_cache
+    _, user_id = login()
+    principal_cache.load(user_id)
+    db.session.expunge_all()
+
+    principal = principal_cache.load(user_id)
+    assert principal.username == 'driver' and principal.is_admin is False and not principal.loaded
+    assert principal.get_id() == str(user_id) and principal.is_authenticated
+
+    assert principal.bio == 'Track days on weekends' and principal.loaded
+    assert principal.check_password('old-password')
+
+    principal.bio = 'Weekend autocross'  # writes go to the row
+    db.session.commit()
+    assert db.session.get(type(principal.user), user_id).bio == 'Weekend autocross'
+
+
+def test_profile_edits_and_password_resets_evict_the_user(app_ctx, login, new_request):
+    from app import principal_cache, password_reset_manager
+    client, user_id = login()
+    client.get('/cars')
+
+    new_request()
+    response = client.post('/edit-profile', data={
+        'username': 'dana', 'email': 'driver@example.com', 'first_name': 'Danielle',
+        'preferred_contact_method': 'email',
+    })
+    assert response.status_code == 302
+    new_request()
+    assert b'Danielle' in client.get('/cars').data
+
+    principal_cache.load(user_id)
+    invalidations = principal_cache.stats()['invalidations']
+    password_reset_manager.store_otp('driver@example.com', '123456')
+    assert password_reset_manager.reset_password('driver@example.com', '123456', 'new-password')[0]
+    assert principal_cache.stats()['invalidations'] == invalidations + 1
+    assert principal_cache.load(user_id).check_password('new-password')
+
+
+def test_admin_flag_is_cached(app_ctx, login):
+    from app import principal_cache
+    client, user_id = login(email='admin@carhub.com', username='admin')
+
+    assert principal_cache.load(user_id).is_admin is True
+    response = client.get('/admin/users/cache/stats')
+    assert response.status_code == 200 and response.get_json()['stats']['entries'] >= 1
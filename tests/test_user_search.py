@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Admin user search tests for CarHub
+Runs the same ranking and sync checks against the FTS5 and trigram backends
+"""
+
+import pytest
+
+from user_search import FTS5UserSearch, TrigramUserSearch
+
+_trigram = {}
+
+
+@pytest.fixture(params=['fts5', 'trigram'])
+def search(request, app_ctx):
+    from app import db, User
+    if request.param == 'fts5':
+        return FTS5UserSearch(db)
+    # One instance for the whole run; each adds session listeners
+    backend = _trigram.setdefault('backend', TrigramUserSearch(db, User))
+    backend.rebuild()
+    return backend
+
+
+def _users():
+    from app import db, User
+    users = [
+        User(username='jsmith', email='john.smith@example.com', first_name='John', last_name='Smith'),
+        User(username='smithy', email='ann@example.com', first_name='Ann', last_name='Jones'),
+        User(username='bob', email='bob@corp.example', first_name='Robert', last_name='Smithson'),
+        User(username='maria', email='maria@example.com', first_name='María', last_name='López'),
+    ]
+    db.session.add_all(users)
+    db.session.commit()
+    return {user.username: user.id for user in users}
+
+
+def test_ranked_prefix_search(search):
+    ids = _users()
+
+    # Username hits outrank email and last-name hits
+    results = search.search('smith')
+    assert results[0] == ids['smithy'] and results[-1] == ids['bob']
+    results = search.search('smi')
+    assert set(results) == {ids['jsmith'], ids['smithy'], ids['bob']}
+    assert results.index(ids['smithy']) < results.index(ids['bob'])
+
+    # Every word must match
+    assert search.search('john smi') == [ids['jsmith']]
+    assert search.search('corp') == [ids['bob']]
+    assert search.search('lópez') == [ids['maria']]
+    assert search.search('nobody') == []
+    assert search.search('') == []
+    assert search.search('sm', limit=1) and len(search.search('sm', limit=1)) == 1
+
+
+def test_index_follows_inserts_updates_and_deletes(search):
+    from app import db, User
+    ids = _users()
+    assert search.search('smi')  # builds the index
+
+    user = db.session.get(User, ids['maria'])
+    user.last_name = 'Smithers'
+    db.session.add(User(username='newcomer', email='new@example.com', first_name='Smitty'))
+    db.session.commit()
+    assert ids['maria'] in search.search('smithers')
+    assert search.search('lópez') == []
+    assert len(search.search('smitty')) == 1
+
+    db.session.delete(db.session.get(User, ids['bob']))
+    db.session.commit()
+    assert ids['bob'] not in search.search('smi')
+
+
+def test_search_input_is_not_query_syntax(search):
+    ids = _users()
+    for term in ['smith" OR "*', 'NEAR(smith)', 'username:smith', '-smith', '*']:
+        results = search.search(term)
+        assert set(results) <= set(ids.values())
+
+
+def test_admin_users_route_uses_index(app_ctx):
+    from app import db, User
+    ids = _users()
+    admin = User(username='admin', email='admin@carhub.com')
+    db.session.add(admin)
+    db.session.commit()
+
+    client = app_ctx.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(admin.id)
+        sess['_fresh'] = True
+
+    response = client.get('/admin/users', query_string={'search': 'smi'})
+    assert response.status_code == 200
+    assert b'jsmith' in response.data and b'maria' not in response.data
+    assert len(ids) == 4
+
+
+def test_fts5_index_is_checked_once_and_recreated_if_dropped(app_ctx):
+    from sqlalchemy import event, text
+    from app import db
+    ids = _users()
+    search = FTS5UserSearch(db)
+    checks = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'sqlite_master' in statement:
+            checks.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        for _ in range(3):
+            assert search.search('smi')
+        assert len(checks) == 1
+
+        db.session.execute(text(f'DROP TABLE {FTS5UserSearch.TABLE}'))
+        db.session.commit()
+        assert ids['jsmith'] in search.search('john')
+        assert len(checks) == 2
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
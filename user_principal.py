@@ -0,0 +1,180 @@
+"""
+CarHub Session Principals
+Slim, cached stand-ins for the logged-in user, so most requests skip the User query
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+
+from flask_login import UserMixin
+from sqlalchemy import event
+
+# What most pages read from current_user (the navigation bar and admin checks)
+PRINCIPAL_FIELDS = ('id', 'username', 'email', 'first_name')
+
+
+class UserPrincipal(UserMixin):
+    def __init__(self, fields, load, user=None):
+        """Read-only view of a user's cached fields, standing in for `current_user`.
+
+        Anything beyond PRINCIPAL_FIELDS (profile columns, methods such as
+        check_password) loads the full User row with `load(id)`, once per
+        request. Assignments go to that row, so existing
+        `current_user.bio = ...` code keeps working.
+        """
+        self.__dict__.update(_fields=fields, _load=load, _user=user)
+
+    @property
+    def user(self):
+        """The full User row, loaded on first use"""
+        user = self.__dict__['_user']
+        if user is None:
+            user = self.__dict__['_load'](self.__dict__['_fields']['id'])
+            if user is None:
+                raise LookupError(f"User {self.__dict__['_fields']['id']} no longer exists")
+            self.__dict__['_user'] = user
+        return user
+
+    @property
+    def is_admin(self):
+        return self.__dict__['_fields']['is_admin']
+
+    @property
+    def loaded(self):
+        """Whether this request needed the full row"""
+        return self.__dict__['_user'] is not None
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        user = self.__dict__['_user']
+        if user is None:
+            fields = self.__dict__['_fields']
+            if name in fields:
+                return fields[name]
+            user = self.user
+        return getattr(user, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.user, name, value)
+
+    def __repr__(self):
+        return f"<UserPrincipal {self.__dict__['_fields']['username']}>"
+
+
+class PrincipalCache:
+    def __init__(self, db, User, is_admin=None, max_entries=10000, ttl=60):
+        """Flask-Login user loader backed by an LRU of principal fields.
+
+        A hit builds a UserPrincipal without touching the database; a miss
+        loads the row once and caches its PRINCIPAL_FIELDS for `ttl`
+        seconds. Committing a change to a User (profile edit, password
+        reset, admin change) evicts that user here; other processes see
+        the change once their entry expires.
+        """
+        self.db = db
+        self.User = User
+        self.is_admin = is_admin or (lambda user: False)
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries = OrderedDict()  # user id -> (expires_at, fields)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._register_hooks()
+
+    def load(self, user_id):
+        """UserPrincipal for `user_id`, or None if there is no such user"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return UserPrincipal(entry[1], self._load_row)
+            self.misses += 1
+
+        user = self._load_row(user_id)
+        if user is None:
+            return None
+        fields = {name: getattr(user, name) for name in PRINCIPAL_FIELDS}
+        fields['is_admin'] = bool(self.is_admin(user))
+        fields = MappingProxyType(fields)
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, fields)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        # The row is already here, so this request does not load it again
+        return UserPrincipal(fields, self._load_row, user)
+
+    def invalidate(self, user_id=None):
+        """Forget one user, or everyone"""
+        with self._lock:
+            if user_id is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+            }
+
+    def _load_row(self, user_id):
+        return self.db.session.get(self.User, user_id)
+
+    # ORM hooks
+
+    def _register_hooks(self):
+        User = self.User
+        session = self.db.session
+
+        @event.listens_for(session, 'after_flush')
+        def _collect_changed(sess, flush_context):
+            changed = {obj.id for obj in list(sess.dirty) + list(sess.deleted) if isinstance(obj, User)}
+            if changed:
+                sess.info.setdefault('principals_dirty', set()).update(changed)
+
+        @event.listens_for(session, 'do_orm_execute')
+        def _mark_bulk(orm_execute_state):
+            if orm_execute_state.is_update or orm_execute_state.is_delete:
+                if any(mapper.class_ is User for mapper in orm_execute_state.all_mappers):
+                    orm_execute_state.session.info['principals_dirty_all'] = True
+
+        @event.listens_for(session, 'after_commit')
+        def _invalidate_on_commit(sess):
+            if sess.info.pop('principals_dirty_all', False):
+                self.invalidate()
+            for user_id in sess.info.pop('principals_dirty', ()):
+                self.invalidate(user_id)
+
+        @event.listens_for(session, 'after_rollback')
+        def _clear_on_rollback(sess):
+            sess.info.pop('principals_dirty', None)
+            sess.info.pop('principals_dirty_all', None)
+
+
+def create_principal_cache(app, db, User, is_admin=None):
+    """Build the principal cache from USER_CACHE_* settings; returns None when disabled"""
+    if not app.config.get('USER_CACHE_ENABLED', True):
+        return None
+    return PrincipalCache(
+        db, User, is_admin=is_admin,
+        max_entries=app.config.get('USER_CACHE_SIZE', 10000),
+        ttl=app.config.get('USER_CACHE_TTL', 60),
+    )
@@ -0,0 +1,283 @@
+"""
+CarHub User Search
+Ranked prefix search over username, email and names for the admin panel
+"""
+
+import re
+import threading
+from collections import defaultdict
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from lazy import LazyObject
+
+SEARCH_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+# Relative weight of a hit in each field when ranking results
+FIELD_WEIGHTS = {'username': 10.0, 'email': 5.0, 'first_name': 3.0, 'last_name': 3.0}
+
+_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def tokenize(value):
+    """Lower-cased word tokens, split the same way FTS5's unicode61 tokenizer does"""
+    return _TOKEN_RE.findall((value or '').lower())
+
+
+class FTS5UserSearch:
+    """SQLite FTS5 index over the user table, kept in sync by triggers.
+
+    The index is an external-content FTS5 table, so it stores only the
+    inverted index and reads field values from `user`. Insert, update and
+    delete triggers keep it current for every writer, including scripts
+    that bypass the ORM. The table and triggers are checked for (and
+    created, and the index rebuilt, if missing) on the first search, and
+    again only when a search fails because the table has gone.
+    """
+
+    TABLE = 'user_search'
+
+    SCHEMA = [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+            username, email, first_name, last_name,
+            content='user', content_rowid='id', tokenize='unicode61', prefix='2 3'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_ai AFTER INSERT ON "user" BEGIN
+            INSERT INTO {TABLE}(rowid, username, email, first_name, last_name)
+            VALUES (new.id, new.username, new.email, new.first_name, new.last_name);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_ad AFTER DELETE ON "user" BEGIN
+            INSERT INTO {TABLE}({TABLE}, rowid, username, email, first_name, last_name)
+            VALUES ('delete', old.id, old.username, old.email, old.first_name, old.last_name);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_au AFTER UPDATE OF username, email, first_name, last_name ON "user" BEGIN
+            INSERT INTO {TABLE}({TABLE}, rowid, username, email, first_name, last_name)
+            VALUES ('delete', old.id, old.username, old.email, old.first_name, old.last_name);
+            INSERT INTO {TABLE}(rowid, username, email, first_name, last_name)
+            VALUES (new.id, new.username, new.email, new.first_name, new.last_name);
+        END""",
+    ]
+
+    OBJECTS = (TABLE, f'{TABLE}_ai', f'{TABLE}_ad', f'{TABLE}_au')
+
+    def __init__(self, db):
+        self.db = db
+        self._ready = False  # table and triggers known to exist
+
+    def search(self, term, limit=100):
+        """Return user ids matching every word of `term` as a prefix, best match first"""
+        query = self._match_query(term)
+        if not query:
+            return []
+        try:
+            return self._search(query, limit)
+        except OperationalError:
+            # The index went away since it was checked: recreate it and try once more
+            self.db.session.rollback()
+            self._ready = False
+            return self._search(query, limit)
+
+    def _search(self, query, limit):
+        if not self._ready:
+            self.ensure_index()
+        weights = ', '.join(str(FIELD_WEIGHTS[field]) for field in SEARCH_FIELDS)
+        rows = self.db.session.execute(
+            text(f"SELECT rowid FROM {self.TABLE} WHERE {self.TABLE} MATCH :query "
+                 f"ORDER BY bm25({self.TABLE}, {weights}) LIMIT :limit"),
+            {'query': query, 'limit': limit}
+        )
+        return [row[0] for row in rows]
+
+    def ensure_index(self):
+        """Create the FTS table and triggers if missing; returns True if they were created"""
+        session = self.db.session
+        placeholders = ', '.join(f":n{i}" for i in range(len(self.OBJECTS)))
+        found = session.execute(
+            text(f"SELECT count(*) FROM sqlite_master WHERE name IN ({placeholders})"),
+            {f"n{i}": name for i, name in enumerate(self.OBJECTS)}
+        ).scalar()
+        if found == len(self.OBJECTS):
+            self._ready = True
+            return False
+
+        for statement in self.SCHEMA:
+            session.execute(text(statement))
+        self.rebuild()
+        self._ready = True
+        return True
+
+    def invalidate(self):
+        """Check for the table and triggers again on the next search, e.g. after the user table was recreated"""
+        self._ready = False
+
+    def rebuild(self):
+        """Re-index every user from the content table"""
+        self.db.session.execute(text(f"INSERT INTO {self.TABLE}({self.TABLE}) VALUES ('rebuild')"))
+        self.db.session.commit()
+
+    @staticmethod
+    def _match_query(term):
+        # Quote each token so user input can never be parsed as FTS5 syntax
+        return ' '.join(f'"{token}"*' for token in tokenize(term))
+
+
+class TrigramUserSearch:
+    """In-process trigram index for databases without FTS5.
+
+    Built from the user table on first search and updated from ORM commits
+    in this process; writes from other processes or raw SQL are picked up
+    on the next rebuild().
+    """
+
+    def __init__(self, db, User):
+        self.db = db
+        self.User = User
+        self._lock = threading.RLock()
+        self._docs = None      # user id -> {field: [tokens]}
+        self._grams = None     # trigram -> set of user ids
+
+        self._register_hooks()
+
+    def search(self, term, limit=100):
+        """Return user ids matching every word of `term` as a prefix, best match first"""
+        tokens = tokenize(term)
+        if not tokens:
+            return []
+        with self._lock:
+            docs, grams = self._current()
+
+            candidates = None
+            for token in tokens:
+                token_grams = self._trigrams(token)
+                if not token_grams:
+                    continue
+                ids = set.intersection(*(grams.get(gram, set()) for gram in token_grams))
+                candidates = ids if candidates is None else candidates & ids
+            if candidates is None:
+                # Only one- and two-letter words: nothing to narrow with, check every user
+                candidates = docs.keys()
+
+            scored = []
+            for user_id in candidates:
+                score = self._score(docs[user_id], tokens)
+                if score:
+                    scored.append((-score, user_id))
+        scored.sort()
+        return [user_id for _, user_id in scored[:limit]]
+
+    def ensure_index(self):
+        self._current()
+        return False
+
+    def rebuild(self):
+        self.invalidate()
+        self._current()
+
+    def invalidate(self):
+        """Rebuild from the user table on the next search"""
+        with self._lock:
+            self._docs = self._grams = None
+
+    # Index handling
+
+    def _current(self):
+        with self._lock:
+            if self._docs is None:
+                columns = [getattr(self.User, field) for field in SEARCH_FIELDS]
+                rows = self.db.session.query(self.User.id, *columns).all()
+                self._docs, self._grams = {}, defaultdict(set)
+                for row in rows:
+                    self._add(row[0], dict(zip(SEARCH_FIELDS, row[1:])))
+            return self._docs, self._grams
+
+    def _add(self, user_id, values):
+        doc = {field: tokenize(values.get(field)) for field in SEARCH_FIELDS}
+        self._docs[user_id] = doc
+        for tokens in doc.values():
+            for token in tokens:
+                for gram in self._trigrams(token):
+                    self._grams[gram].add(user_id)
+
+    def _remove(self, user_id):
+        doc = self._docs.pop(user_id, None)
+        if not doc:
+            return
+        for tokens in doc.values():
+            for token in tokens:
+                for gram in self._trigrams(token):
+                    self._grams[gram].discard(user_id)
+
+    @staticmethod
+    def _trigrams(token):
+        return {token[i:i + 3] for i in range(len(token) - 2)}
+
+    @staticmethod
+    def _score(doc, tokens):
+        """Weighted count of fields where each query word prefixes a token; 0 unless every word matches"""
+        score = 0.0
+        for query_token in tokens:
+            matched = 0.0
+            for field, field_tokens in doc.items():
+                if any(token.startswith(query_token) for token in field_tokens):
+                    matched += FIELD_WEIGHTS[field]
+            if not matched:
+                return 0.0
+            score += matched
+        return score
+
+    # ORM hooks
+
+    def _register_hooks(self):
+        User = self.User
+        session = self.db.session
+
+        @event.listens_for(session, 'after_flush')
+        def _collect(sess, flush_context):
+            changes = sess.info.setdefault('user_search_changes', {})
+            for obj in list(sess.new) + list(sess.dirty):
+                if isinstance(obj, User):
+                    changes[obj.id] = {field: getattr(obj, field) for field in SEARCH_FIELDS}
+            for obj in sess.deleted:
+                if isinstance(obj, User):
+                    changes[obj.id] = None
+
+        @event.listens_for(session, 'after_commit')
+        def _apply(sess):
+            changes = sess.info.pop('user_search_changes', None)
+            if not changes:
+                return
+            with self._lock:
+                if self._docs is None:
+                    return
+                for user_id, values in changes.items():
+                    self._remove(user_id)
+                    if values is not None:
+                        self._add(user_id, values)
+
+        @event.listens_for(session, 'after_rollback')
+        def _discard(sess):
+            sess.info.pop('user_search_changes', None)
+
+
+def fts5_available(db):
+    """True if the database is SQLite built with FTS5"""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    with db.engine.connect() as conn:
+        options = {row[0] for row in conn.execute(text("PRAGMA compile_options"))}
+    return 'ENABLE_FTS5' in options
+
+
+def create_user_search(app, db, User):
+    """The backend selected by USER_SEARCH_BACKEND (auto, fts5 or trigram), picked on first use
+    so that importing the app does not connect to the database"""
+    def build():
+        backend = app.config.get('USER_SEARCH_BACKEND', 'auto')
+        if backend == 'trigram':
+            return TrigramUserSearch(db, User)
+        with app.app_context():
+            if backend == 'fts5' or fts5_available(db):
+                return FTS5UserSearch(db)
+        return TrigramUserSearch(db, User)
+    return LazyObject(build, 'user_search')